@@ -10,12 +10,14 @@ Design rules:
 - ERPNext is authoritative for locating the barrel row, resolving tara_weight, calculating net_weight,
   updating child rows, and recalculating Batch AMB totals
 - batch_name is optional as a narrowing hint, not the primary lookup key
+- Readings may carry a client_event_id; retries with the same id are answered, not re-applied
+- Bursts can be sent as one batch; batch totals move by SQL deltas, not full reloads
 """
 
 import json
 import frappe
 from frappe import _
-from frappe.utils import now, flt
+from frappe.utils import now, now_datetime, flt
 
 
 def _normalize_timestamp(timestamp: str = None) -> str:
@@ -41,25 +43,54 @@ def _resolve_event_type(mode: str = None) -> str:
     return event_type_map.get((mode or "").strip().lower(), "Weight Capture")
 
 
-def _find_container_row(barrel_serial: str, batch_name: str = None) -> dict:
-    rows = frappe.get_all(
-        "Container Barrels",
-        filters={"barrel_serial_number": barrel_serial},
-        fields=[
-            "name",
-            "parent",
-            "parenttype",
-            "parentfield",
-            "barrel_serial_number",
-            "packaging_type",
-            "tara_weight",
-            "gross_weight",
-            "net_weight",
-            "weight_validated",
-            "scan_timestamp",
-        ],
-        limit=20,
-    )
+BARREL_CACHE_TTL = 10 * 60
+TARA_CACHE_TTL = 60 * 60
+
+BARREL_ROW_FIELDS = ["name", "parent", "barrel_serial_number", "packaging_type", "tara_weight"]
+
+WEIGHT_EVENT_FIELDS = (
+    "name", "owner", "creation", "modified", "modified_by", "docstatus", "idx", "naming_series",
+    "client_event_id", "event_timestamp", "event_type", "device_id", "barrel_serial",
+    "gross_weight", "tara_weight", "net_weight", "batch_no", "quality_status", "sync_status", "raw_payload",
+)
+
+
+def _barrel_cache_key(barrel_serial: str) -> str:
+    return f"sensor_skill:barrel:{barrel_serial}"
+
+
+def _get_barrel_candidates(serials, use_cache: bool = True) -> dict:
+    """Container rows per barrel serial; serial -> row lookups are cached briefly"""
+    candidates = {}
+    missing = []
+
+    for serial in set(serials):
+        cached = frappe.cache().get_value(_barrel_cache_key(serial)) if use_cache else None
+        if cached is None:
+            missing.append(serial)
+        else:
+            candidates[serial] = [frappe._dict(row) for row in cached]
+
+    if missing:
+        found = {serial: [] for serial in missing}
+        for row in frappe.get_all(
+            "Container Barrels",
+            filters={"barrel_serial_number": ["in", missing]},
+            fields=BARREL_ROW_FIELDS,
+        ):
+            found.setdefault(row.barrel_serial_number, []).append(row)
+
+        for serial, rows in found.items():
+            # Unknown serials are not cached so a barrel added moments later is found
+            if rows:
+                frappe.cache().set_value(_barrel_cache_key(serial), rows, expires_in_sec=BARREL_CACHE_TTL)
+            candidates[serial] = rows
+
+    return candidates
+
+
+def _find_container_row(barrel_serial: str, batch_name: str = None, candidates: list = None) -> dict:
+    rows = candidates if candidates is not None else _get_barrel_candidates([barrel_serial])[barrel_serial]
 
     if batch_name:
         narrowed = [r for r in rows if r.get("parent") == batch_name]
@@ -77,6 +108,15 @@ def _find_container_row(barrel_serial: str, batch_name: str = None) -> dict:
     return rows[0]
 
 
+def _get_packaging_tara(packaging_type: str) -> float:
+    key = f"sensor_skill:tara:{packaging_type}"
+    tara = frappe.cache().get_value(key)
+    if tara is None:
+        tara = flt(frappe.db.get_value("Item", packaging_type, "weightperunit"))
+        frappe.cache().set_value(key, tara, expires_in_sec=TARA_CACHE_TTL)
+    return flt(tara)
+
+
 def _resolve_tara_weight(row: dict, request_tara) -> float:
     row_tara = flt(row.get("tara_weight"))
     if row_tara > 0:
@@ -84,7 +124,7 @@ def _resolve_tara_weight(row: dict, request_tara) -> float:
 
     packaging_type = row.get("packaging_type")
     if packaging_type:
-        item_tara = flt(frappe.db.get_value("Item", packaging_type, "weightperunit"))
+        item_tara = _get_packaging_tara(packaging_type)
         if item_tara > 0:
             return item_tara
 
@@ -96,6 +136,7 @@ def _resolve_tara_weight(row: dict, request_tara) -> float:
 
 
 def _recalculate_container_totals(batch_name: str):
+    """Full recompute of a Batch AMB's weight totals (repair path; ingestion applies deltas)"""
     if not batch_name or not frappe.db.exists("Batch AMB", batch_name):
         return
 
@@ -126,6 +167,389 @@ def _recalculate_container_totals(batch_name: str):
     }, update_modified=True)
 
 
+def _error(code: str, message: str, context: dict = None) -> dict:
+    return {"status": "error", "code": code, "message": message, "context": context or {}}
+
+
+def _parse_reading(reading: dict):
+    """Normalise one device reading; returns (reading, None) or (None, error response)"""
+    errors = []
+    if not reading.get("device_id"):
+        errors.append("device_id is required")
+    if not reading.get("barrel_serial"):
+        errors.append("barrel_serial is required")
+    if reading.get("gross_weight") is None:
+        errors.append("gross_weight is required")
+
+    if errors:
+        return None, _error("missing_fields", "; ".join(errors), {"missing_fields": errors})
+
+    gross_weight = flt(reading.get("gross_weight"))
+    if gross_weight <= 0:
+        return None, _error("invalid_weight", "gross_weight must be greater than zero", {"gross_weight": gross_weight})
+
+    parsed = frappe._dict(reading)
+    parsed.update({
+        "barrel_serial": (reading.get("barrel_serial") or "").strip().upper(),
+        "gross_weight": gross_weight,
+        "event_time": _normalize_timestamp(reading.get("timestamp")),
+        "event_type": _resolve_event_type(reading.get("mode")),
+        "unit": reading.get("unit") or "kg",
+        "client_event_id": (reading.get("client_event_id") or "").strip() or None,
+    })
+    return parsed, None
+
+
+def _resolve_reading(reading, candidates) -> dict:
+    """Locate the barrel row; returns an error response or None"""
+    try:
+        row = _find_container_row(reading.barrel_serial, reading.batch_name, candidates.get(reading.barrel_serial, []))
+    except frappe.ValidationError as e:
+        return _error("ambiguous_serial", str(e), {"barrel_serial": reading.barrel_serial})
+
+    if not row:
+        return _error("serial_not_found", f"Barrel serial '{reading.barrel_serial}' not found in container rows", {
+            "batch_name": reading.batch_name,
+            "barrel_serial": reading.barrel_serial,
+        })
+
+    reading.row = row
+    reading.resolved_batch_name = row.get("parent")
+    return None
+
+
+def _weigh_reading(reading, row) -> dict:
+    """Compute tara/net from the locked barrel row; returns an error response or None"""
+    reading.resolved_tara = _resolve_tara_weight(row, reading.get("tara_weight"))
+
+    if reading.resolved_tara <= 0:
+        return _error("tara_not_resolved", f"No valid tara weight resolved for barrel '{reading.barrel_serial}'", {
+            "batch_name": reading.resolved_batch_name,
+            "barrel_serial": reading.barrel_serial,
+            "packaging_type": row.get("packaging_type"),
+            "request_tara": reading.get("tara_weight"),
+        })
+
+    reading.resolved_net = flt(reading.gross_weight) - flt(reading.resolved_tara)
+    if reading.resolved_net <= 0:
+        return _error("invalid_net_weight", f"Net weight must be positive for barrel '{reading.barrel_serial}'", {
+            "gross_weight": reading.gross_weight,
+            "tara_weight": reading.resolved_tara,
+            "net_weight": reading.resolved_net,
+        })
+
+    return None
+
+
+def _validate_weight_event(reading) -> dict:
+    """Run the Weight Event validations bulk_insert skips and set the reading's quality status
+
+    Returns an error response or None.
+    """
+    doc = frappe.get_doc({
+        "doctype": "Weight Event",
+        "event_type": reading.event_type,
+        "device_id": reading.get("device_id"),
+        "barrel_serial": reading.barrel_serial,
+        "gross_weight": reading.gross_weight,
+        "tara_weight": reading.resolved_tara,
+        "net_weight": reading.resolved_net,
+        "batch_no": reading.resolved_batch_name,
+    })
+    try:
+        doc.run_method("validate")
+    except frappe.ValidationError as e:
+        return _error("invalid_weight_event", str(e), {"barrel_serial": reading.barrel_serial})
+
+    quality_status = doc.get("quality_status") or "Pass"
+    # Outside the device's weight limits: recorded, but held for review
+    if doc.get("weight_range_status") == "Alarm" and quality_status == "Pass":
+        quality_status = "Pending Review"
+    reading.quality_status = quality_status
+    return None
+
+
+def _lock_barrel_rows(names) -> dict:
+    """Current weights of the barrel rows being written, locked for this transaction"""
+    if not names:
+        return {}
+
+    rows = frappe.db.sql("""
+        SELECT name, parent, barrel_serial_number, packaging_type, gross_weight, tara_weight, net_weight
+        FROM `tabContainer Barrels`
+        WHERE name IN %(names)s
+        ORDER BY name
+        FOR UPDATE
+    """, {"names": sorted(names)}, as_dict=True)
+    return {row.name: row for row in rows}
+
+
+def _resolve_readings(readings, results, use_cache: bool = True):
+    """Locate barrel rows for readings; failures are written to `results`"""
+    candidates = _get_barrel_candidates([r.barrel_serial for r in readings], use_cache=use_cache)
+
+    resolved = []
+    for reading in readings:
+        error = _resolve_reading(reading, candidates)
+        if error:
+            results[reading.index] = error
+        else:
+            resolved.append(reading)
+    return resolved
+
+
+def _find_recorded_events(readings) -> dict:
+    client_ids = list({r.client_event_id for r in readings if r.client_event_id})
+    if not client_ids or not frappe.db.exists("DocType", "Weight Event"):
+        return {}
+
+    return {
+        event.client_event_id: event
+        for event in frappe.get_all(
+            "Weight Event",
+            filters={"client_event_id": ["in", client_ids]},
+            fields=["name", "client_event_id", "batch_no", "barrel_serial", "gross_weight", "tara_weight", "net_weight"],
+        )
+    }
+
+
+def _duplicate_response(reading, event) -> dict:
+    return {
+        "status": "success",
+        "code": "duplicate",
+        "message": "Weight event already recorded",
+        "weight_event_id": event.get("name"),
+        "client_event_id": reading.client_event_id,
+        "batch_name": event.get("batch_no"),
+        "barrel_serial": event.get("barrel_serial"),
+        "gross_weight": event.get("gross_weight"),
+        "tara_weight": event.get("tara_weight"),
+        "net_weight": event.get("net_weight"),
+    }
+
+
+def _apply_readings(readings, results):
+    """Write barrel rows, batch total deltas, Weight Events and process data for resolved readings"""
+    if not readings:
+        return
+
+    current = _lock_barrel_rows({r.row["name"] for r in readings})
+
+    # A cached row that was deleted or re-serialised since: resolve those readings again from the DB
+    stale = [r for r in readings if (current.get(r.row["name"]) or {}).get("barrel_serial_number") != r.barrel_serial]
+    if stale:
+        for reading in stale:
+            frappe.cache().delete_value(_barrel_cache_key(reading.barrel_serial))
+        retried = _resolve_readings(stale, results, use_cache=False)
+        if not retried and len(stale) == len(readings):
+            return
+        current.update(_lock_barrel_rows({r.row["name"] for r in retried}))
+        stale_ids = {id(r) for r in stale}
+        readings = [r for r in readings if id(r) not in stale_ids] + retried
+        readings.sort(key=lambda r: r.index)
+
+    # Tara comes from the locked rows, not the cached lookup, so a re-tared barrel is weighed right
+    record_events = frappe.db.exists("DocType", "Weight Event")
+    weighed = []
+    for reading in readings:
+        error = _weigh_reading(reading, current[reading.row["name"]])
+        if not error and record_events:
+            error = _validate_weight_event(reading)
+        if error:
+            results[reading.index] = error
+        else:
+            weighed.append(reading)
+
+    readings = weighed
+    if not readings:
+        return
+
+    # Fold readings in arrival order: the last reading of a barrel wins and
+    # batch totals move by the difference to the row's previous weights
+    final_rows = {}
+    deltas = {}
+    for reading in readings:
+        row = current[reading.row["name"]]
+        delta = deltas.setdefault(row.parent, [0.0, 0.0, 0.0])
+        delta[0] += reading.gross_weight - flt(row.gross_weight)
+        delta[1] += reading.resolved_tara - flt(row.tara_weight)
+        delta[2] += reading.resolved_net - flt(row.net_weight)
+
+        row.gross_weight = reading.gross_weight
+        row.tara_weight = reading.resolved_tara
+        row.net_weight = reading.resolved_net
+        final_rows[row.name] = (row, reading.event_time)
+
+    if final_rows:
+        _update_barrel_rows(final_rows.values())
+
+    for parent in sorted(deltas):
+        gross, tara, net = deltas[parent]
+        frappe.db.sql("""
+            UPDATE `tabBatch AMB`
+            SET total_gross_weight = IFNULL(total_gross_weight, 0) + %s,
+                total_tara_weight = IFNULL(total_tara_weight, 0) + %s,
+                total_net_weight = IFNULL(total_net_weight, 0) + %s,
+                modified = NOW()
+            WHERE name = %s
+        """, (gross, tara, net, parent))
+
+    if record_events:
+        _insert_weight_events(readings)
+
+    _insert_process_data(readings)
+
+    for reading in readings:
+        results[reading.index] = {
+            "status": "success",
+            "code": "updated",
+            "message": "Weight recorded and Batch AMB updated",
+            "weight_event_id": reading.get("weight_event_id"),
+            "client_event_id": reading.client_event_id,
+            "batch_name": reading.resolved_batch_name,
+            "container_name": reading.resolved_batch_name,
+            "row_name": reading.row["name"],
+            "barrel_serial": reading.barrel_serial,
+            "gross_weight": reading.gross_weight,
+            "tara_weight": reading.resolved_tara,
+            "net_weight": reading.resolved_net,
+            "unit": reading.unit,
+            "timestamp": reading.event_time,
+            "operator_id": reading.get("operator_id"),
+            "device_id": reading.get("device_id"),
+            "mode": reading.get("mode"),
+            "source": reading.get("source"),
+            "weight_validated": 1,
+        }
+
+
+def _update_barrel_rows(rows):
+    """One UPDATE for all touched barrel rows"""
+    names = []
+    cases = {"gross_weight": [], "tara_weight": [], "net_weight": [], "scan_timestamp": []}
+    values = {"gross_weight": [], "tara_weight": [], "net_weight": [], "scan_timestamp": []}
+
+    for row, event_time in rows:
+        names.append(row.name)
+        for field, value in (("gross_weight", row.gross_weight), ("tara_weight", row.tara_weight),
+                             ("net_weight", row.net_weight), ("scan_timestamp", event_time)):
+            cases[field].append("WHEN %s THEN %s")
+            values[field].extend([row.name, value])
+
+    assignments = ",\n                ".join(
+        f"{field} = CASE name {' '.join(cases[field])} END" for field in cases
+    )
+    params = [v for field in cases for v in values[field]] + [tuple(names)]
+
+    frappe.db.sql(f"""
+        UPDATE `tabContainer Barrels`
+        SET {assignments},
+            weight_validated = 1,
+            modified = NOW()
+        WHERE name IN %s
+    """, params)
+
+
+def _insert_weight_events(readings):
+    from amb_w_spc.system_integration.utils import reserve_series_names
+
+    now_dt = now_datetime()
+    user = frappe.session.user
+    names = reserve_series_names(now_dt.strftime("WE-%Y-%m-%d-"), len(readings))
+
+    values = []
+    for name, reading in zip(names, readings):
+        reading.weight_event_id = name
+        values.append((
+            name, user, now_dt, now_dt, user, 0, 0, "WE-.YYYY.-.MM.-.DD.-.#####",
+            reading.client_event_id, reading.event_time, reading.event_type, reading.get("device_id"),
+            reading.barrel_serial, reading.gross_weight, reading.resolved_tara, reading.resolved_net,
+            reading.resolved_batch_name, reading.quality_status,
+            # Container Barrels is updated right here, so there is nothing left to sync
+            "Synced",
+            json.dumps(reading.raw, default=str),
+        ))
+
+    frappe.db.bulk_insert("Weight Event", fields=WEIGHT_EVENT_FIELDS, values=values)
+
+
+def _insert_process_data(readings):
+    """Weight readings as Real Time Process Data for SPC tracking, plus rollups"""
+    from amb_w_spc.sensor_management.rollups import update_rollups
+    from amb_w_spc.shop_floor_control.polling_engine import insert_process_data_rows
+
+    rows = [frappe._dict({
+        "timestamp": reading.event_time,
+        "sensor": reading.get("device_id"),
+        "parameter_name": "weight",
+        "value": reading.resolved_net,
+        "unit_of_measure": reading.unit,
+        "data_type": "Float",
+        "status": "Normal",
+        "within_spec": 1,
+        "batch_no": reading.resolved_batch_name,
+    }) for reading in readings]
+
+    insert_process_data_rows(rows)
+    update_rollups(rows)
+
+
+def ingest_weight_events(readings) -> list:
+    """Process scale readings in one transaction; returns one response per reading, in order
+
+    Readings carrying a `client_event_id` that was already recorded are
+    answered with the original event instead of being applied again.
+    """
+    results = [None] * len(readings)
+    parsed = []
+    seen_ids = {}
+
+    for index, raw in enumerate(readings):
+        reading, error = _parse_reading(raw or {})
+        if error:
+            results[index] = error
+            continue
+
+        reading.index = index
+        reading.raw = raw
+
+        # The same id twice in one request: only the first one is applied
+        if reading.client_event_id and reading.client_event_id in seen_ids:
+            reading.duplicate_of = seen_ids[reading.client_event_id]
+        elif reading.client_event_id:
+            seen_ids[reading.client_event_id] = reading
+        parsed.append(reading)
+
+    for attempt in range(2):
+        recorded = _find_recorded_events(parsed)
+        pending = [r for r in parsed if r.client_event_id not in recorded and not r.get("duplicate_of")]
+
+        for reading in parsed:
+            if reading.client_event_id in recorded:
+                results[reading.index] = _duplicate_response(reading, recorded[reading.client_event_id])
+
+        try:
+            _apply_readings(_resolve_readings(pending, results), results)
+            frappe.db.commit()
+            break
+        except Exception as e:
+            frappe.db.rollback()
+            # A concurrent retry recorded one of our client ids first: answer it as a duplicate
+            if attempt == 0 and frappe.db.is_unique_key_violation(e):
+                continue
+            raise
+
+    for reading in parsed:
+        original = reading.get("duplicate_of")
+        if original and (results[original.index] or {}).get("status") == "success":
+            results[reading.index] = dict(results[original.index], code="duplicate",
+                                          message="Weight event already recorded")
+        elif original:
+            results[reading.index] = results[original.index]
+
+    return results
+
+
 @frappe.whitelist()
 def receive_weight_event(
     device_id: str = None,
@@ -140,6 +564,7 @@ def receive_weight_event(
     timestamp: str = None,
     operator_id: str = None,
     source: str = None,
+    client_event_id: str = None,
 ) -> dict:
     """
     Receive and process weight event from a scale device.
@@ -151,135 +576,56 @@ def receive_weight_event(
     - batch_name: optional hint
     - tara_weight: optional hint only; authoritative tara is resolved server-side
     - net_weight from client is ignored; server always recalculates
+    - client_event_id: optional; a retry with the same id returns the original event
     """
     try:
-        errors = []
-        if not device_id:
-            errors.append("device_id is required")
-        if not barrel_serial:
-            errors.append("barrel_serial is required")
-        if gross_weight is None:
-            errors.append("gross_weight is required")
-
-        if errors:
-            return {
-                "status": "error",
-                "code": "missing_fields",
-                "message": "; ".join(errors),
-                "context": {"missing_fields": errors},
-            }
-
-        barrel_serial = (barrel_serial or "").strip().upper()
-        gross_weight = flt(gross_weight)
-        event_time = _normalize_timestamp(timestamp)
-        event_type = _resolve_event_type(mode)
-
-        if gross_weight <= 0:
-            return {
-                "status": "error",
-                "code": "invalid_weight",
-                "message": "gross_weight must be greater than zero",
-                "context": {"gross_weight": gross_weight},
-            }
-
-        row = _find_container_row(barrel_serial, batch_name=batch_name)
-        if not row:
-            return {
-                "status": "error",
-                "code": "serial_not_found",
-                "message": f"Barrel serial '{barrel_serial}' not found in container rows",
-                "context": {
-                    "batch_name": batch_name,
-                    "barrel_serial": barrel_serial,
-                },
-            }
-
-        resolved_batch_name = row.get("parent")
-        resolved_tara = _resolve_tara_weight(row, tara_weight)
-
-        if resolved_tara <= 0:
-            return {
-                "status": "error",
-                "code": "tara_not_resolved",
-                "message": f"No valid tara weight resolved for barrel '{barrel_serial}'",
-                "context": {
-                    "batch_name": resolved_batch_name,
-                    "barrel_serial": barrel_serial,
-                    "packaging_type": row.get("packaging_type"),
-                    "request_tara": tara_weight,
-                },
-            }
-
-        resolved_net = flt(gross_weight) - flt(resolved_tara)
-        if resolved_net <= 0:
-            return {
+        return ingest_weight_events([{
+            "device_id": device_id,
+            "mode": mode,
+            "batch_name": batch_name,
+            "barrel_serial": barrel_serial,
+            "gross_weight": gross_weight,
+            "tara_weight": tara_weight,
+            "unit": unit,
+            "tolerance_profile": tolerance_profile,
+            "timestamp": timestamp,
+            "operator_id": operator_id,
+            "source": source,
+            "client_event_id": client_event_id,
+        }])[0]
+
+    except Exception as e:
+        frappe.log_error(frappe.get_traceback(), "receive_weight_event failed")
+        return {
                 "status": "error",
-                "code": "invalid_net_weight",
-                "message": f"Net weight must be positive for barrel '{barrel_serial}'",
-                "context": {
-                    "gross_weight": gross_weight,
-                    "tara_weight": resolved_tara,
-                    "net_weight": resolved_net,
-                },
-            }
+                "code": "exception",
+                "message": str(e),
+                "context": {},
+        }
 
-        frappe.db.sql("""
-            UPDATE `tabContainer Barrels`
-            SET gross_weight = %s,
-                tara_weight = %s,
-                net_weight = %s,
-                weight_validated = 1,
-                scan_timestamp = %s,
-                modified = NOW()
-            WHERE name = %s
-        """, (gross_weight, resolved_tara, resolved_net, event_time, row["name"]))
-
-        weight_event_id = None
-        if frappe.db.exists("DocType", "Weight Event"):
-            evt = frappe.get_doc({
-                "doctype": "Weight Event",
-                "device_id": device_id,
-                "event_type": event_type,
-                "batch_name": resolved_batch_name,
-                "barrel_serial": barrel_serial,
-                "gross_weight": gross_weight,
-                "tara_weight": resolved_tara,
-                "net_weight": resolved_net,
-                "unit_of_measure": unit or "kg",
-                "tolerance_profile": tolerance_profile,
-                "event_timestamp": event_time,
-                "operator_id": operator_id,
-                "status": "Completed",
-            })
-            evt.insert(ignore_permissions=True)
-            weight_event_id = evt.name
-
-        _recalculate_container_totals(resolved_batch_name)
-        frappe.db.commit()
 
+@frappe.whitelist()
+def receive_weight_events(readings) -> dict:
+    """
+    Receive a burst of readings (same fields as receive_weight_event) in one call.
+
+    All readings are written in a single transaction; the response holds one
+    result per reading, in request order.
+    """
+    try:
+        if isinstance(readings, str):
+            readings = json.loads(readings)
+
+        results = ingest_weight_events(readings or [])
         return {
-                "status": "success",
-                "code": "updated",
-                "message": "Weight recorded and Batch AMB updated",
-                "weight_event_id": weight_event_id,
-                "batch_name": resolved_batch_name,
-                "container_name": resolved_batch_name,
-                "row_name": row["name"],
-                "barrel_serial": barrel_serial,
-                "gross_weight": gross_weight,
-                "tara_weight": resolved_tara,
-                "net_weight": resolved_net,
-                "unit": unit or "kg",
-                "timestamp": event_time,
-                "operator_id": operator_id,
-                "device_id": device_id,
-                "mode": mode,
-                "source": source,
-                "weight_validated": 1,
+            "status": "success",
+            "processed": len(results),
+            "failed": len([r for r in results if r.get("status") != "success"]),
+            "results": results,
         }
 
     except Exception as e:
-        frappe.log_error(frappe.get_traceback(), "receive_weight_event failed")
+        frappe.log_error(frappe.get_traceback(), "receive_weight_events failed")
         return {
                 "status": "error",
                 "code": "exception",
@@ -0,0 +1,35 @@
+import click
+from frappe.commands import get_site, pass_context
+
+
+@click.command("audit-indexes")
+@click.option("--create", is_flag=True, default=False, help="Create missing hot-path indexes before explaining")
+@pass_context
+def audit_indexes(context, create=False):
+    """EXPLAIN the app's hot-path queries and report full table scans"""
+    import frappe
+
+    from amb_w_spc.system_integration.index_audit import ensure_indexes, explain_query_shapes
+
+    frappe.init(site=get_site(context))
+    frappe.connect()
+
+    try:
+        if create:
+            for result in ensure_indexes():
+                click.echo(f"{result['doctype']} ({', '.join(result['fields'])}): {result['status']}")
+            frappe.db.commit()
+
+        full_scans = 0
+        for entry in explain_query_shapes():
+            full_scans += entry["status"] == "full scan"
+            click.echo(f"[{entry['status']}] {entry['query']} on {entry['doctype']}: "
+                       f"key={entry.get('key')} rows={entry.get('rows')}")
+
+        if full_scans:
+            click.secho(f"{full_scans} query shape(s) scan the whole table", fg="yellow")
+    finally:
+        frappe.destroy()
+
+
+commands = [audit_indexes]
@@ -0,0 +1,311 @@
+# NumPy-backed control chart engine
+# Computes X-bar/R, X-bar/S, I-MR, EWMA and CUSUM charts for a window of
+# SPC Data Point values, with control chart constants derived for any
+# subgroup size instead of a fixed n=2..10 lookup table.
+
+import math
+from functools import lru_cache
+
+import frappe
+import numpy as np
+from frappe import _
+from frappe.utils import cint, flt
+
+CHART_TYPES = ("xbar_r", "xbar_s", "imr", "ewma", "cusum")
+
+DEFAULT_EWMA_LAMBDA = 0.2
+DEFAULT_EWMA_L = 3.0
+DEFAULT_CUSUM_K = 0.5
+DEFAULT_CUSUM_H = 5.0
+
+# Integration grid for the range distribution (d2, d3)
+_GRID = np.linspace(-8.0, 8.0, 1601)
+_GRID_STEP = float(_GRID[1] - _GRID[0])
+_PHI = 0.5 * (1.0 + np.vectorize(math.erf)(_GRID / math.sqrt(2.0)))
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+@lru_cache(maxsize=None)
+def get_chart_constants(n):
+    """Control chart constants for subgroup size n (n >= 2)
+
+    d2 and d3 are the mean and standard deviation of the range of n standard
+    normal variables, integrated numerically; c4 uses its closed form.
+    """
+    n = cint(n)
+    if n < 2:
+        frappe.throw(_("Subgroup size must be at least 2"))
+
+    # E[R] = integral of 1 - Phi^n - (1 - Phi)^n
+    d2 = float((1.0 - _PHI ** n - (1.0 - _PHI) ** n).sum()) * _GRID_STEP
+
+    # E[R^2] = 2 * double integral over x < y of
+    #          1 - Phi(y)^n - (1 - Phi(x))^n + (Phi(y) - Phi(x))^n
+    phi_x = _PHI[np.newaxis, :]
+    phi_y = _PHI[:, np.newaxis]
+    integrand = 1.0 - phi_y ** n - (1.0 - phi_x) ** n + np.clip(phi_y - phi_x, 0.0, None) ** n
+    # Region x < y, with the boundary x == y at half weight (trapezoid rule)
+    area = float(np.tril(integrand, k=-1).sum()) + 0.5 * float(np.trace(integrand))
+    second_moment = 2.0 * area * _GRID_STEP * _GRID_STEP
+    d3 = math.sqrt(max(second_moment - d2 * d2, 0.0))
+
+    c4 = math.sqrt(2.0 / (n - 1)) * math.exp(math.lgamma(n / 2.0) - math.lgamma((n - 1) / 2.0))
+    s_spread = 3.0 * math.sqrt(max(1.0 - c4 * c4, 0.0)) / c4
+
+    return {
+        "n": n,
+        "d2": d2,
+        "d3": d3,
+        "c4": c4,
+        "A2": 3.0 / (d2 * math.sqrt(n)),
+        "A3": 3.0 / (c4 * math.sqrt(n)),
+        "D3": max(0.0, 1.0 - 3.0 * d3 / d2),
+        "D4": 1.0 + 3.0 * d3 / d2,
+        "B3": max(0.0, 1.0 - s_spread),
+        "B4": 1.0 + s_spread,
+    }
+
+# =============================================================================
+# CHARTS
+# =============================================================================
+
+def to_subgroups(values, n):
+    """Reshape values into complete subgroups of size n (incomplete tail dropped)"""
+    values = np.asarray(values, dtype=float)
+    count = (len(values) // n) * n
+    return values[:count].reshape(-1, n)
+
+def xbar_r_chart(values, n):
+    subgroups = to_subgroups(values, n)
+    if not len(subgroups):
+        return None
+
+    constants = get_chart_constants(n)
+    means = subgroups.mean(axis=1)
+    ranges = np.ptp(subgroups, axis=1)
+    grand_mean = float(means.mean())
+    avg_range = float(ranges.mean())
+
+    return {
+        "center": grand_mean,
+        "ucl": grand_mean + constants["A2"] * avg_range,
+        "lcl": grand_mean - constants["A2"] * avg_range,
+        "r_center": avg_range,
+        "r_ucl": constants["D4"] * avg_range,
+        "r_lcl": constants["D3"] * avg_range,
+        "sigma": avg_range / constants["d2"],
+        "points": means.tolist(),
+        "ranges": ranges.tolist(),
+    }
+
+def xbar_s_chart(values, n):
+    subgroups = to_subgroups(values, n)
+    if not len(subgroups):
+        return None
+
+    constants = get_chart_constants(n)
+    means = subgroups.mean(axis=1)
+    stdevs = subgroups.std(axis=1, ddof=1)
+    grand_mean = float(means.mean())
+    avg_s = float(stdevs.mean())
+
+    return {
+        "center": grand_mean,
+        "ucl": grand_mean + constants["A3"] * avg_s,
+        "lcl": grand_mean - constants["A3"] * avg_s,
+        "s_center": avg_s,
+        "s_ucl": constants["B4"] * avg_s,
+        "s_lcl": constants["B3"] * avg_s,
+        "sigma": avg_s / constants["c4"],
+        "points": means.tolist(),
+        "stdevs": stdevs.tolist(),
+    }
+
+def imr_chart(values):
+    values = np.asarray(values, dtype=float)
+    if len(values) < 2:
+        return None
+
+    constants = get_chart_constants(2)
+    moving_ranges = np.abs(np.diff(values))
+    mean = float(values.mean())
+    avg_mr = float(moving_ranges.mean())
+    sigma = avg_mr / constants["d2"]
+
+    return {
+        "center": mean,
+        "ucl": mean + 3.0 * sigma,
+        "lcl": mean - 3.0 * sigma,
+        "mr_center": avg_mr,
+        "mr_ucl": constants["D4"] * avg_mr,
+        "mr_lcl": constants["D3"] * avg_mr,
+        "sigma": sigma,
+        "points": values.tolist(),
+        "moving_ranges": moving_ranges.tolist(),
+    }
+
+def ewma_series(values, lam, start):
+    """z_t = lam * x_t + (1 - lam) * z_{t-1}, starting from z_0 = start
+
+    Evaluated by the recursion itself: closed forms need (1 - lam) ** -t,
+    which overflows for lam close to 1 and divides by zero at lam = 1.
+    """
+    values = np.asarray(values, dtype=float)
+    decay = 1.0 - lam
+    result = np.empty_like(values)
+    previous = float(start)
+
+    for index, value in enumerate(values.tolist()):
+        previous = lam * value + decay * previous
+        result[index] = previous
+
+    return result
+
+def ewma_chart(values, target=None, sigma=None, lam=DEFAULT_EWMA_LAMBDA, L=DEFAULT_EWMA_L):
+    values = np.asarray(values, dtype=float)
+    if len(values) < 2:
+        return None
+
+    target = float(values.mean()) if target is None else flt(target)
+    sigma = sigma or imr_chart(values)["sigma"]
+
+    z = ewma_series(values, lam, target)
+    t = np.arange(1, len(values) + 1)
+    spread = L * sigma * np.sqrt(lam / (2.0 - lam) * (1.0 - (1.0 - lam) ** (2 * t)))
+
+    return {
+        "center": target,
+        "ucl": (target + spread).tolist(),
+        "lcl": (target - spread).tolist(),
+        "sigma": sigma,
+        "lambda": lam,
+        "L": L,
+        "points": z.tolist(),
+        "out_of_control": np.flatnonzero((z > target + spread) | (z < target - spread)).tolist(),
+    }
+
+def cusum_chart(values, target=None, sigma=None, k=DEFAULT_CUSUM_K, h=DEFAULT_CUSUM_H):
+    """Tabular CUSUM; k and h are in units of sigma"""
+    values = np.asarray(values, dtype=float)
+    if len(values) < 2:
+        return None
+
+    target = float(values.mean()) if target is None else flt(target)
+    sigma = sigma or imr_chart(values)["sigma"]
+
+    upper_dev = values - (target + k * sigma)
+    lower_dev = (target - k * sigma) - values
+    c_plus = np.empty_like(values)
+    c_minus = np.empty_like(values)
+
+    # The max(0, ...) reset makes this recursion inherently sequential
+    hi = lo = 0.0
+    for i in range(len(values)):
+        hi = max(0.0, upper_dev[i] + hi)
+        lo = max(0.0, lower_dev[i] + lo)
+        c_plus[i] = hi
+        c_minus[i] = lo
+
+    decision = h * sigma
+    return {
+        "center": target,
+        "decision_interval": decision,
+        "sigma": sigma,
+        "k": k,
+        "h": h,
+        "c_plus": c_plus.tolist(),
+        "c_minus": c_minus.tolist(),
+        "out_of_control": np.flatnonzero((c_plus > decision) | (c_minus > decision)).tolist(),
+    }
+
+def describe(values, ddof=1):
+    values = np.asarray(values, dtype=float)
+    if not len(values):
+        return {"count": 0}
+
+    return {
+        "count": int(len(values)),
+        "mean": float(values.mean()),
+        "std_dev": float(values.std(ddof=ddof)) if len(values) > ddof else 0.0,
+        "min": float(values.min()),
+        "max": float(values.max()),
+    }
+
+def compute_charts(values, subgroup_size=5, chart_types=None, target=None, sigma=None, **options):
+    """Compute every requested chart type for one series of values"""
+    chart_types = chart_types or CHART_TYPES
+    n = cint(subgroup_size) or 5
+    values = np.asarray([flt(v) for v in values], dtype=float)
+
+    result = {
+        "summary": describe(values),
+        "subgroup_size": n,
+        "constants": get_chart_constants(max(n, 2)),
+    }
+
+    imr = imr_chart(values)
+    if "imr" in chart_types:
+        result["imr"] = imr
+
+    # Individual-value charts share the short-term sigma estimate from I-MR
+    sigma = sigma or (imr["sigma"] if imr else None)
+
+    if "xbar_r" in chart_types and n >= 2:
+        result["xbar_r"] = xbar_r_chart(values, n)
+    if "xbar_s" in chart_types and n >= 2:
+        result["xbar_s"] = xbar_s_chart(values, n)
+    if "ewma" in chart_types:
+        result["ewma"] = ewma_chart(values, target, sigma,
+                                    flt(options.get("ewma_lambda")) or DEFAULT_EWMA_LAMBDA,
+                                    flt(options.get("ewma_L")) or DEFAULT_EWMA_L)
+    if "cusum" in chart_types:
+        result["cusum"] = cusum_chart(values, target, sigma,
+                                      flt(options.get("cusum_k")) or DEFAULT_CUSUM_K,
+                                      flt(options.get("cusum_h")) or DEFAULT_CUSUM_H)
+
+    return result
+
+# =============================================================================
+# DATA ACCESS
+# =============================================================================
+
+def get_window_values(parameter=None, workstation=None, limit=500, from_date=None, status=None):
+    """Measured values for a parameter/workstation window, oldest first"""
+    filters = {}
+    if parameter:
+        filters["parameter"] = parameter
+    if workstation:
+        filters["workstation"] = workstation
+    if from_date:
+        filters["timestamp"] = [">=", from_date]
+    if status:
+        filters["status"] = status
+
+    points = frappe.get_all("SPC Data Point",
+        filters=filters,
+        fields=["measured_value", "timestamp"],
+        order_by="timestamp desc",
+        limit=cint(limit) or 500
+    )
+    points.reverse()
+    return points
+
+@frappe.whitelist()
+def get_control_chart_data(parameter=None, workstation=None, subgroup_size=5, chart_types=None, limit=500,
+                           target=None):
+    """All requested control charts for a parameter and/or workstation window"""
+    if not parameter and not workstation:
+        frappe.throw(_("Parameter or Workstation is required"))
+
+    if isinstance(chart_types, str):
+        chart_types = frappe.parse_json(chart_types) if chart_types.startswith("[") else chart_types.split(",")
+
+    points = get_window_values(parameter, workstation, limit)
+    result = compute_charts([p.measured_value for p in points], subgroup_size, chart_types,
+                            target=flt(target) if target not in (None, "") else None)
+    result["timestamps"] = [p.timestamp for p in points]
+    result["parameter"] = parameter
+    result["workstation"] = workstation
+    return result
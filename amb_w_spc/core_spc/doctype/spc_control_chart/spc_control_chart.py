@@ -1,7 +1,32 @@
 import frappe
 from frappe.model.document import Document
+from frappe.utils import cint
+
+# Chart Type option -> control_chart_engine chart key
+CHART_TYPE_MAP = {
+    "X-bar R": "xbar_r",
+    "X-bar S": "xbar_s",
+    "Individual": "imr",
+    "I-MR": "imr",
+    "EWMA": "ewma",
+    "CUSUM": "cusum",
+}
 
 class SPCControlChart(Document):
     """SPC Control Chart Doctype"""
-    
-    pass
+
+    @frappe.whitelist()
+    def get_chart_data(self):
+        """Chart series and limits for rendering, computed by the control chart engine"""
+        from amb_w_spc.core_spc.control_chart_engine import get_control_chart_data
+
+        chart_type = CHART_TYPE_MAP.get(self.get("chart_type"))
+
+        return get_control_chart_data(
+            parameter=self.get("parameter"),
+            workstation=self.get("workstation"),
+            subgroup_size=cint(self.get("sample_size")) or 5,
+            chart_types=[chart_type] if chart_type else None,
+            limit=cint(self.get("data_points_to_display")) or 500,
+            target=self.get("target_value")
+        )
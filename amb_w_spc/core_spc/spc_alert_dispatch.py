@@ -0,0 +1,273 @@
+# Background fan-out of SPC alert notifications
+# Saving a data point only appends an alert event to a Redis list; a
+# background job drains the list, deduplicates and rate-limits events per
+# (chart, parameter, rule), coalesces bursts into one digest per recipient
+# set and bulk-inserts the Notification Log rows.
+
+import json
+
+import frappe
+from frappe.utils import cint, now_datetime
+
+EVENT_QUEUE_KEY = "spc_alert_events"
+SENT_KEY_PREFIX = "spc_alert_sent"
+SUPPRESSED_KEY = "spc_alert_suppressed"
+FLUSH_JOB_ID = "amb_w_spc_alert_dispatch"
+
+# Seconds during which repeats of the same (chart, parameter, rule) are only
+# counted; override with `amb_w_spc_alert_dedupe_window` in site_config.json
+DEFAULT_DEDUPE_WINDOW = 15 * 60
+
+CHART_CACHE_TTL = 5 * 60
+
+NOTIFICATION_LOG_FIELDS = (
+    "name", "owner", "creation", "modified", "modified_by", "docstatus", "idx",
+    "subject", "email_content", "for_user", "from_user", "type", "document_type", "document_name", "read",
+)
+
+
+def get_dedupe_window():
+    return cint(frappe.conf.get("amb_w_spc_alert_dedupe_window")) or DEFAULT_DEDUPE_WINDOW
+
+
+def get_group_key(event):
+    return "|".join(str(event.get(part) or "") for part in ("chart", "parameter", "rule"))
+
+
+# =============================================================================
+# SAVE PATH
+# =============================================================================
+
+def queue_alert_event(event):
+    """Queue an alert event for background delivery once the transaction commits
+
+    `event` carries either a `chart` (recipients from the chart) or an
+    `alert` (recipients from the SPC Alert / plant defaults), plus
+    `parameter`, `rule`, `subject` and `message`.
+    """
+
+    event = dict(event, queued_at=str(now_datetime()))
+    payload = json.dumps(event, default=str)
+
+    def push():
+        cache = frappe.cache()
+        cache.pipeline().rpush(cache.make_key(EVENT_QUEUE_KEY), payload).execute()
+        frappe.enqueue(
+            "amb_w_spc.core_spc.spc_alert_dispatch.flush_alert_events",
+            queue="short",
+            job_id=FLUSH_JOB_ID,
+            deduplicate=True
+        )
+
+    frappe.db.after_commit.add(push)
+
+
+def get_alert_charts(parameter):
+    """Active alert-enabled control charts for a parameter, cached briefly"""
+
+    key = f"spc_alert_charts:{parameter}"
+    charts = frappe.cache().get_value(key)
+    if charts is None:
+        charts = frappe.get_all("SPC Control Chart",
+                               filters={
+                                   "parameter": parameter,
+                                   "status": "Active",
+                                   "enable_alerts": 1
+                               },
+                               pluck="name")
+        frappe.cache().set_value(key, charts, expires_in_sec=CHART_CACHE_TTL)
+
+    return charts
+
+
+# =============================================================================
+# BACKGROUND DELIVERY
+# =============================================================================
+
+def drain_events():
+    cache = frappe.cache()
+    key = cache.make_key(EVENT_QUEUE_KEY)
+
+    pipe = cache.pipeline()
+    pipe.lrange(key, 0, -1)
+    pipe.delete(key)
+    raw_events, _deleted = pipe.execute()
+
+    return [json.loads(raw) for raw in raw_events]
+
+
+def flush_alert_events():
+    """Deliver queued alert events as deduplicated, coalesced digests"""
+
+    # Raw Redis commands go through a pipeline: the cache wrapper's own
+    # hash/set/exists helpers prefix keys again and pickle values
+    cache = frappe.cache()
+    window = get_dedupe_window()
+    suppressed_key = cache.make_key(SUPPRESSED_KEY)
+
+    def sent_key(group_key):
+        return cache.make_key(f"{SENT_KEY_PREFIX}:{group_key}")
+
+    groups = {}
+    for event in drain_events():
+        groups.setdefault(get_group_key(event), []).append(event)
+
+    # The first group in a window is delivered; later ones are only counted
+    pipe = cache.pipeline()
+    for group_key in groups:
+        pipe.set(sent_key(group_key), 1, nx=True, ex=window)
+    first_in_window = pipe.execute()
+
+    deliver = []
+    pipe = cache.pipeline()
+    for (group_key, events), is_first in zip(groups.items(), first_in_window):
+        if is_first:
+            deliver.append({"events": events, "suppressed": 0})
+        else:
+            pipe.hincrby(suppressed_key, group_key, len(events))
+            pipe.hset(suppressed_key, f"{group_key}|last", json.dumps(events[-1], default=str))
+    pipe.execute()
+
+    # Summarise repeats of groups whose window has closed since
+    suppressed = {frappe.safe_decode(field): value
+                  for field, value in (cache.pipeline().hgetall(suppressed_key).execute()[0] or {}).items()}
+    counted = [group_key for group_key in suppressed if not group_key.endswith("|last")]
+
+    pipe = cache.pipeline()
+    for group_key in counted:
+        pipe.exists(sent_key(group_key))
+    still_open = pipe.execute() if counted else []
+
+    pipe = cache.pipeline()
+    for group_key, is_open in zip(counted, still_open):
+        if is_open:
+            continue
+
+        last_event = json.loads(suppressed.get(f"{group_key}|last") or "{}")
+        pipe.hdel(suppressed_key, group_key, f"{group_key}|last")
+        pipe.set(sent_key(group_key), 1, ex=window)
+        deliver.append({"events": [last_event], "suppressed": cint(frappe.safe_decode(suppressed[group_key]))})
+    pipe.execute()
+
+    if deliver:
+        send_digests(deliver)
+
+    return len(deliver)
+
+
+def send_digests(groups):
+    """One email per distinct recipient set, and one bulk Notification Log insert"""
+
+    recipients_cache = {}
+    emails_by_groups = {}
+    system_notifications = []
+
+    for index, group in enumerate(groups):
+        event = group["events"][-1]
+        source = ("chart", event.get("chart")) if event.get("chart") else ("alert", event.get("alert"))
+
+        if source not in recipients_cache:
+            recipients_cache[source] = get_event_recipients(event)
+
+        for recipient in recipients_cache[source]:
+            if recipient.get("email"):
+                emails_by_groups.setdefault(recipient["email"], []).append(index)
+            if recipient.get("system") and recipient.get("user"):
+                system_notifications.append((recipient["user"], group))
+
+    recipients_by_digest = {}
+    for email, indexes in emails_by_groups.items():
+        recipients_by_digest.setdefault(tuple(indexes), []).append(email)
+
+    for indexes, emails in recipients_by_digest.items():
+        digest = [groups[i] for i in indexes]
+        frappe.sendmail(
+            recipients=emails,
+            subject=get_digest_subject(digest),
+            message="<hr>".join(format_group(group) for group in digest)
+        )
+
+    insert_notification_logs(system_notifications)
+
+
+def get_event_recipients(event):
+    """Normalised recipients: dicts with user, email and whether to post a system notification
+
+    Chart events go to the chart's recipients; alert events to the alert's
+    recipients, or the plant defaults when it has none.
+    """
+
+    if event.get("chart"):
+        source = ("SPC Control Chart", event["chart"])
+    elif event.get("alert"):
+        source = ("SPC Alert", event["alert"])
+    else:
+        source = None
+
+    rows = []
+    if source:
+        rows = frappe.get_all("SPC Alert Recipient",
+            filters={"parenttype": source[0], "parent": source[1]},
+            fields=["user", "notification_method"]
+        )
+
+    if rows or event.get("chart"):
+        return [{
+            "user": row.user,
+            "email": row.user if row.notification_method in ("Email", "Both") else None,
+            "system": bool(row.user),
+        } for row in rows]
+
+    from amb_w_spc.system_integration.scripts.automation_scripts import get_default_alert_recipients
+    return [{
+        "user": recipient.get("recipient"),
+        "email": recipient.get("recipient") if recipient.get("notification_type") in ("Email", None, "") else None,
+        "system": recipient.get("notification_type") == "System",
+    } for recipient in get_default_alert_recipients(event.get("plant"), event.get("severity"))]
+
+
+def get_digest_subject(groups):
+    if len(groups) == 1:
+        return groups[0]["events"][-1].get("subject") or "SPC Alert"
+
+    parameters = sorted({group["events"][-1].get("parameter") or "" for group in groups})
+    return f"SPC Alert digest: {len(groups)} alerts ({', '.join(parameters)})"
+
+
+def format_group(group):
+    event = group["events"][-1]
+    occurrences = len(group["events"])
+    lines = [f"<p><b>{frappe.utils.escape_html(event.get('subject') or '')}</b></p>",
+             f"<pre>{frappe.utils.escape_html(event.get('message') or '')}</pre>"]
+
+    if group["suppressed"]:
+        lines.append(f"<p>{group['suppressed']} further occurrence(s) were suppressed in the last "
+                     f"{get_dedupe_window() // 60} minutes.</p>")
+    elif occurrences > 1:
+        lines.append(f"<p>{occurrences} occurrences between {group['events'][0].get('queued_at')} "
+                     f"and {event.get('queued_at')}.</p>")
+
+    return "\n".join(lines)
+
+
+def insert_notification_logs(notifications):
+    if not notifications:
+        return
+
+    now = now_datetime()
+    user = frappe.session.user
+    values = []
+    for for_user, group in notifications:
+        event = group["events"][-1]
+        values.append((
+            frappe.generate_hash(length=10), user, now, now, user, 0, 0,
+            event.get("subject"), format_group(group), for_user, user, "Alert",
+            "SPC Data Point" if event.get("data_point") else "SPC Alert",
+            event.get("data_point") or event.get("alert"), 0,
+        ))
+
+    frappe.db.bulk_insert("Notification Log", fields=NOTIFICATION_LOG_FIELDS, values=values)
+    frappe.db.commit()
+
+    for for_user in {for_user for for_user, _group in notifications}:
+        frappe.publish_realtime("notification", user=for_user)
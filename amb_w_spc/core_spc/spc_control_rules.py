@@ -0,0 +1,354 @@
+# Streaming Western Electric / Nelson rule evaluation for SPC Data Point
+# Each parameter keeps a compact state in Redis (run counters and the zones
+# of the last five points) so that all eight Nelson rules are evaluated in
+# constant time per measurement, without reading the point history.
+
+import frappe
+from frappe.utils import cint, flt, now_datetime
+
+from amb_w_spc.core_spc.spc_rolling_statistics import get_rolling_state
+
+CACHE_KEY_PREFIX = "spc_control_rules"
+STATE_TTL = 6 * 60 * 60
+
+# Longest run any rule looks at; a rebuild replays this many points
+MAX_RUN_LENGTH = 15
+
+NELSON_RULES = {
+    1: "One point beyond 3 sigma",
+    2: "Nine points in a row on the same side of the center line",
+    3: "Six points in a row steadily increasing or decreasing",
+    4: "Fourteen points in a row alternating up and down",
+    5: "Two out of three points beyond 2 sigma on the same side",
+    6: "Four out of five points beyond 1 sigma on the same side",
+    7: "Fifteen points in a row within 1 sigma",
+    8: "Eight points in a row beyond 1 sigma",
+}
+
+
+def sign(value):
+    return (value > 0) - (value < 0)
+
+
+class ControlRuleState:
+    """Run counters for one parameter's stream of measurements
+
+    `center` and `sigma` are the reference the zones are measured against;
+    counters are reset whenever the reference changes.
+    """
+
+    def __init__(self, center=0.0, sigma=0.0):
+        self.center = flt(center)
+        self.sigma = flt(sigma)
+        self.reset()
+
+    def reset(self):
+        self.last_value = None
+        self.last_direction = 0
+        self.side = 0
+        self.side_run = 0
+        self.trend_run = 0
+        self.alternate_run = 0
+        self.within_run = 0
+        self.outside_run = 0
+        self.zones = []  # signed sigma level of the last five points
+        self.active = []
+
+    def set_reference(self, center, sigma):
+        center, sigma = flt(center), flt(sigma)
+        if (center, sigma) != (self.center, self.sigma):
+            self.center = center
+            self.sigma = sigma
+            self.reset()
+
+    def push(self, value):
+        """Add a measurement; return (rules violated, rules that just became violated)"""
+        value = flt(value)
+        violated = []
+
+        if self.sigma <= 0:
+            self.last_value = value
+            return violated, []
+
+        deviation = (value - self.center) / self.sigma
+        side = sign(deviation)
+        level = 3 if abs(deviation) > 3 else 2 if abs(deviation) > 2 else 1 if abs(deviation) > 1 else 0
+
+        # Rule 2: run on one side of the center line
+        self.side_run = self.side_run + 1 if side and side == self.side else (1 if side else 0)
+        self.side = side
+
+        # Rules 3 and 4: runs are counted in points, so a first step spans two
+        direction = sign(value - self.last_value) if self.last_value is not None else 0
+        self.trend_run = self.trend_run + 1 if direction and direction == self.last_direction else (2 if direction else 1)
+        self.alternate_run = self.alternate_run + 1 if direction and direction == -self.last_direction else (2 if direction else 1)
+        self.last_direction = direction
+        self.last_value = value
+
+        # Rules 7 and 8
+        self.within_run = self.within_run + 1 if level == 0 else 0
+        self.outside_run = self.outside_run + 1 if level >= 1 else 0
+
+        # Rules 5 and 6
+        self.zones = (self.zones + [side * level])[-5:]
+        last_three = self.zones[-3:]
+
+        if level == 3:
+            violated.append(1)
+        if self.side_run >= 9:
+            violated.append(2)
+        if self.trend_run >= 6:
+            violated.append(3)
+        if self.alternate_run >= 14:
+            violated.append(4)
+        if any(sum(1 for zone in last_three if zone * s >= 2) >= 2 for s in (1, -1)):
+            violated.append(5)
+        if any(sum(1 for zone in self.zones if zone * s >= 1) >= 4 for s in (1, -1)):
+            violated.append(6)
+        if self.within_run >= 15:
+            violated.append(7)
+        if self.outside_run >= 8:
+            violated.append(8)
+
+        new_rules = [rule for rule in violated if rule not in self.active]
+        self.active = violated
+        return violated, new_rules
+
+    def copy(self):
+        return ControlRuleState.from_dict(self.as_dict())
+
+    def as_dict(self):
+        return {
+            "center": self.center,
+            "sigma": self.sigma,
+            "last_value": self.last_value,
+            "last_direction": self.last_direction,
+            "side": self.side,
+            "side_run": self.side_run,
+            "trend_run": self.trend_run,
+            "alternate_run": self.alternate_run,
+            "within_run": self.within_run,
+            "outside_run": self.outside_run,
+            "zones": self.zones,
+            "active": self.active,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls(data.get("center"), data.get("sigma"))
+        state.last_value = data.get("last_value")
+        state.last_direction = cint(data.get("last_direction"))
+        state.side = cint(data.get("side"))
+        state.side_run = cint(data.get("side_run"))
+        state.trend_run = cint(data.get("trend_run"))
+        state.alternate_run = cint(data.get("alternate_run"))
+        state.within_run = cint(data.get("within_run"))
+        state.outside_run = cint(data.get("outside_run"))
+        state.zones = list(data.get("zones") or [])
+        state.active = list(data.get("active") or [])
+        return state
+
+
+def format_violations(rules):
+    return "\n".join(f"Rule {rule}: {NELSON_RULES[rule]}" for rule in rules)
+
+
+def get_cache_key(parameter):
+    return f"{CACHE_KEY_PREFIX}:{parameter}"
+
+
+def get_reference(upper_control_limit=None, lower_control_limit=None):
+    """Center line and sigma implied by a point's control limits, if it has any"""
+
+    if upper_control_limit and lower_control_limit:
+        ucl, lcl = flt(upper_control_limit), flt(lower_control_limit)
+        return (ucl + lcl) / 2, (ucl - lcl) / 6
+
+    return None
+
+
+def get_rolling_reference(parameter):
+    rolling = get_rolling_state(parameter)
+    return rolling.mean, rolling.stdev()
+
+
+def get_rule_state(parameter, reference=None, exclude=None):
+    """Cached state for a parameter, rebuilt from its latest points on a miss
+
+    Without explicit control limits the reference is taken from the rolling
+    window once and then kept fixed, so a drifting process does not drag its
+    own center line along with it.
+    """
+
+    data = frappe.cache().get_value(get_cache_key(parameter))
+    if not data:
+        return rebuild_rule_state(parameter, reference, exclude)
+
+    state = ControlRuleState.from_dict(data)
+    if reference:
+        state.set_reference(*reference)
+    elif state.sigma <= 0:
+        state.set_reference(*get_rolling_reference(parameter))
+
+    return state
+
+
+def rebuild_rule_state(parameter, reference=None, exclude=None):
+    """Replay the latest points of a parameter; `exclude` skips a just-inserted point"""
+
+    recent_points = frappe.get_all("SPC Data Point",
+                                  filters={"parameter": parameter, "name": ["!=", exclude or ""]},
+                                  fields=["measured_value"],
+                                  order_by="timestamp desc",
+                                  limit=MAX_RUN_LENGTH)
+
+    state = ControlRuleState(*(reference or get_rolling_reference(parameter)))
+    for point in reversed(recent_points):
+        state.push(point.measured_value)
+
+    save_rule_state(parameter, state)
+    return state
+
+
+def save_rule_state(parameter, state):
+    frappe.cache().set_value(get_cache_key(parameter), state.as_dict(), expires_in_sec=STATE_TTL)
+
+
+def invalidate_rule_state(parameter):
+    frappe.cache().delete_value(get_cache_key(parameter))
+
+
+def get_state_lock(parameter):
+    return frappe.cache().lock(frappe.cache().make_key(f"{get_cache_key(parameter)}:lock"), timeout=5)
+
+
+# =============================================================================
+# DOCUMENT HOOKS
+# =============================================================================
+
+def evaluate_control_rules(doc):
+    """validate: fill is_out_of_control / violation_rules for a new point
+
+    The cached state is not advanced here; that happens in
+    `record_control_rules` once the point has been committed.
+    """
+
+    if not doc.parameter or not doc.is_new():
+        return
+
+    reference = get_reference(doc.upper_control_limit, doc.lower_control_limit)
+    violated, _new_rules = get_rule_state(doc.parameter, reference).copy().push(doc.measured_value)
+
+    doc.is_out_of_control = 1 if violated else 0
+    doc.violation_rules = format_violations(violated) or None
+
+
+def record_control_rules(doc, method=None):
+    """after_insert hook: alert on new violations, advance the cached state once committed
+
+    The alert is written in the inserting transaction, so it rolls back with
+    the point; the state only moves after commit.
+    """
+
+    if not doc.parameter:
+        return
+
+    reference = get_reference(doc.upper_control_limit, doc.lower_control_limit)
+
+    _violated, new_rules = get_rule_state(doc.parameter, reference, exclude=doc.name).copy().push(doc.measured_value)
+    advance_rule_state_after_commit(doc.parameter, reference, [doc.measured_value])
+
+    if new_rules:
+        create_rule_alert(doc, new_rules)
+
+
+def advance_rule_state_after_commit(parameter, reference, values):
+    """Push `values` into the cached state when the transaction commits"""
+
+    values = list(values)
+    frappe.db.after_commit.add(lambda: advance_rule_state(parameter, reference, values))
+
+
+def advance_rule_state(parameter, reference, values):
+    """Push committed values (oldest first) into the cached state
+
+    Without a cached state there is nothing to advance; the next read
+    rebuilds it from the committed points, the new ones included.
+    """
+
+    with get_state_lock(parameter):
+        data = frappe.cache().get_value(get_cache_key(parameter))
+        if not data:
+            return
+
+        state = ControlRuleState.from_dict(data)
+        if reference:
+            state.set_reference(*reference)
+        for value in values:
+            state.push(value)
+        save_rule_state(parameter, state)
+
+
+def refresh_control_rules(doc, method=None):
+    """on_update / on_trash hook: edits to existing points invalidate the state after commit"""
+
+    if not doc.parameter or doc.flags.in_insert:
+        return
+
+    parameter = doc.parameter
+    frappe.db.after_commit.add(lambda: invalidate_rule_state(parameter))
+
+
+def evaluate_rows(rows):
+    """Evaluate a batch of rows (dicts with parameter, measured_value, timestamp)
+
+    Fills is_out_of_control / violation_rules / new_rules on each row, in
+    timestamp order per parameter. The cached states are not advanced; the
+    caller does that for the rows it actually writes
+    (`advance_rule_state_after_commit`).
+    """
+
+    by_parameter = {}
+    for row in sorted(rows, key=lambda r: r["timestamp"]):
+        by_parameter.setdefault(row["parameter"], []).append(row)
+
+    for parameter, parameter_rows in by_parameter.items():
+        reference = get_reference(parameter_rows[0].get("upper_control_limit"),
+                                  parameter_rows[0].get("lower_control_limit"))
+
+        state = get_rule_state(parameter, reference).copy()
+        for row in parameter_rows:
+            violated, new_rules = state.push(row["measured_value"])
+            row["is_out_of_control"] = 1 if violated else 0
+            row["violation_rules"] = format_violations(violated) or None
+            row["new_rules"] = new_rules
+
+
+# =============================================================================
+# ALERTS
+# =============================================================================
+
+def create_rule_alert(data_point, rules):
+    """Create one SPC Alert for the rules a data point has just started violating"""
+
+    alert = frappe.get_doc({
+        "doctype": "SPC Alert",
+        "data_point": data_point.get("name"),
+        "parameter": data_point.get("parameter"),
+        "workstation": data_point.get("workstation"),
+        "plant": data_point.get("plant"),
+        "alert_type": "Control Rule Violation",
+        "severity": "Critical" if 1 in rules else "Warning",
+        "measurement_value": data_point.get("measured_value"),
+        "status": "Open",
+        "priority": "High" if 1 in rules else "Medium",
+        "alert_time": now_datetime(),
+        "description": f"Parameter {data_point.get('parameter')} is out of statistical control.\n"
+                       f"{format_violations(rules)}"
+    })
+    alert.insert(ignore_permissions=True)
+
+    from amb_w_spc.system_integration.scripts.automation_scripts import send_alert_notifications
+    send_alert_notifications(alert.name)
+
+    return alert.name
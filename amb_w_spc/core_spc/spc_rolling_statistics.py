@@ -0,0 +1,224 @@
+# Incremental rolling statistics for SPC Data Point validation
+# Keeps a per-parameter sliding window in Redis so that x_bar, range,
+# moving range and standard deviation can be derived without querying
+# the last N data points on every save.
+
+import math
+
+import frappe
+from frappe.utils import flt
+
+WINDOW_SIZE = 30
+SUBGROUP_SIZE = 5
+CACHE_KEY_PREFIX = "spc_rolling_stats"
+# The state is a cache, not a source of truth: let it expire so any drift
+# (missed hooks, direct SQL edits) heals with a rebuild from the database
+STATE_TTL = 6 * 60 * 60
+
+
+class RollingStatistics:
+    """Sliding-window statistics over the last `window_size` measurements
+
+    Mean and variance are maintained with Welford's algorithm (including the
+    inverse update when a value drops out of the window), and the raw values
+    live in a fixed-size ring buffer for range and moving range.
+    """
+
+    def __init__(self, window_size=WINDOW_SIZE):
+        self.window_size = window_size
+        self.buffer = [0.0] * window_size
+        self.head = 0  # index the next value will be written to
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def push(self, value):
+        """Add a value, evicting the oldest one once the window is full"""
+        value = flt(value)
+
+        if self.count == self.window_size:
+            self._remove(self.buffer[self.head])
+
+        self.buffer[self.head] = value
+        self.head = (self.head + 1) % self.window_size
+        self._add(value)
+
+    def _add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def _remove(self, value):
+        if self.count <= 1:
+            self.count = 0
+            self.mean = 0.0
+            self.m2 = 0.0
+            return
+
+        self.count -= 1
+        delta = value - self.mean
+        self.mean -= delta / self.count
+        self.m2 = max(self.m2 - delta * (value - self.mean), 0.0)
+
+    def last(self, k):
+        """Return the most recent k values, oldest first"""
+        k = min(k, self.count)
+        return [self.buffer[(self.head - k + i) % self.window_size] for i in range(k)]
+
+    def values(self):
+        return self.last(self.count)
+
+    def stdev(self):
+        if self.count < 2:
+            return 0.0
+        return math.sqrt(self.m2 / (self.count - 1))
+
+    def summary(self):
+        """Statistical values as stored on SPC Data Point"""
+        result = {}
+
+        if self.count < 2:
+            return result
+
+        result["x_bar"] = self.mean
+        result["standard_deviation"] = self.stdev()
+
+        if self.count >= SUBGROUP_SIZE:
+            subgroup = self.last(SUBGROUP_SIZE)
+            result["r_value"] = max(subgroup) - min(subgroup)
+
+        previous, current = self.last(2)
+        result["moving_range"] = abs(current - previous)
+
+        return result
+
+    def copy(self):
+        clone = RollingStatistics(self.window_size)
+        clone.buffer = list(self.buffer)
+        clone.head = self.head
+        clone.count = self.count
+        clone.mean = self.mean
+        clone.m2 = self.m2
+        return clone
+
+    def as_dict(self):
+        return {
+            "window_size": self.window_size,
+            "values": self.values(),
+            "mean": self.mean,
+            "m2": self.m2,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls(data.get("window_size") or WINDOW_SIZE)
+        values = data.get("values") or []
+        state.buffer[:len(values)] = values
+        state.head = len(values) % state.window_size
+        state.count = len(values)
+        state.mean = flt(data.get("mean"))
+        state.m2 = flt(data.get("m2"))
+        return state
+
+
+def get_cache_key(parameter):
+    return f"{CACHE_KEY_PREFIX}:{parameter}"
+
+
+def get_rolling_state(parameter):
+    """Return the cached state for a parameter, rebuilding it on a miss"""
+
+    data = frappe.cache().get_value(get_cache_key(parameter))
+    if data:
+        return RollingStatistics.from_dict(data)
+
+    return rebuild_rolling_state(parameter)
+
+
+def rebuild_rolling_state(parameter):
+    """Rebuild the window for a parameter from its most recent Valid points"""
+
+    recent_points = frappe.get_all("SPC Data Point",
+                                  filters={
+                                      "parameter": parameter,
+                                      "status": "Valid"
+                                  },
+                                  fields=["measured_value"],
+                                  order_by="timestamp desc",
+                                  limit=WINDOW_SIZE)
+
+    state = RollingStatistics()
+    for point in reversed(recent_points):
+        state.push(point.measured_value)
+
+    save_rolling_state(parameter, state)
+    return state
+
+
+def save_rolling_state(parameter, state):
+    frappe.cache().set_value(get_cache_key(parameter), state.as_dict(), expires_in_sec=STATE_TTL)
+
+
+def invalidate_rolling_state(parameter):
+    frappe.cache().delete_value(get_cache_key(parameter))
+
+
+def preview_statistical_values(parameter, measured_value):
+    """Statistics the window would have after adding `measured_value`
+
+    The cached state is not modified; the value is only committed once the
+    data point has been committed (see `record_data_point`).
+    """
+
+    state = get_rolling_state(parameter).copy()
+    state.push(measured_value)
+    return state.summary()
+
+
+def record_data_point(doc, method=None):
+    """after_insert hook: push a new Valid measurement into the window once committed"""
+
+    if not doc.parameter or doc.status != "Valid":
+        return
+
+    record_values_after_commit(doc.parameter, [doc.measured_value])
+
+
+def record_values_after_commit(parameter, values):
+    """Push `values` when the transaction commits; a rollback leaves the window untouched"""
+
+    values = list(values)
+    frappe.db.after_commit.add(lambda: record_values(parameter, values))
+
+
+def record_values(parameter, values):
+    """Push committed Valid measurements (oldest first) into the window"""
+
+    lock = frappe.cache().lock(frappe.cache().make_key(f"{get_cache_key(parameter)}:lock"), timeout=5)
+    with lock:
+        data = frappe.cache().get_value(get_cache_key(parameter))
+        if not data:
+            # A rebuild reads the committed rows, which already include the
+            # new points
+            rebuild_rolling_state(parameter)
+            return
+
+        state = RollingStatistics.from_dict(data)
+        for value in values:
+            state.push(value)
+        save_rolling_state(parameter, state)
+
+
+def refresh_data_point_window(doc, method=None):
+    """on_update / on_trash hook: edits to existing points invalidate the window"""
+
+    if not doc.parameter:
+        return
+
+    # on_update also fires while inserting; record_data_point covers the new point
+    if doc.flags.in_insert:
+        return
+
+    parameter = doc.parameter
+    frappe.db.after_commit.add(lambda: invalidate_rolling_state(parameter))
@@ -7,6 +7,14 @@ from frappe.utils import flt, getdate, nowdate
 import statistics
 import math
 
+from amb_w_spc.core_spc.spc_alert_dispatch import get_alert_charts, queue_alert_event
+from amb_w_spc.core_spc.spc_control_rules import evaluate_control_rules
+from amb_w_spc.core_spc.spc_rolling_statistics import (
+    WINDOW_SIZE,
+    RollingStatistics,
+    preview_statistical_values,
+)
+
 class SPCValidationError(frappe.ValidationError):
     pass
 
@@ -62,6 +70,9 @@ def validate_spc_data_point(doc, method):
     # Auto-validate status
     auto_validate_data_point_status(doc)
     
+    # Nelson rules against the parameter's streaming state
+    evaluate_control_rules(doc)
+    
     # Check for alerts
     check_spc_alerts(doc)
 
@@ -129,6 +140,20 @@ def calculate_statistical_values(doc):
     if not doc.parameter:
         return
     
+    if doc.is_new():
+        # New points read the cached rolling window (last 29 Valid points + current)
+        stats = preview_statistical_values(doc.parameter, doc.measured_value)
+    else:
+        # Re-saving an existing point: it is already part of the cached window,
+        # so recompute from the database excluding itself
+        stats = calculate_statistical_values_from_db(doc)
+    
+    for fieldname, value in stats.items():
+        doc.set(fieldname, value)
+
+def calculate_statistical_values_from_db(doc):
+    """Recompute statistical values from the last 29 Valid points in the database"""
+    
     # Get recent data points for the same parameter (last 30 points)
     recent_points = frappe.get_all("SPC Data Point",
                                   filters={
@@ -138,25 +163,14 @@ def calculate_statistical_values(doc):
                                   },
                                   fields=["measured_value", "timestamp"],
                                   order_by="timestamp desc",
-                                  limit=29)  # Get 29 + current = 30 total
-    
-    values = [flt(point.measured_value) for point in recent_points]
-    values.append(flt(doc.measured_value))  # Add current value
-    
-    if len(values) >= 2:
-        # Calculate X-bar (mean)
-        doc.x_bar = statistics.mean(values)
-        
-        # Calculate Range (if we have subgroups)
-        if len(values) >= 5:
-            # Take last 5 values as subgroup
-            subgroup = values[-5:]
-            doc.range_value = max(subgroup) - min(subgroup)
-        
-        # Calculate Moving Range
-        if len(values) >= 2:
-            moving_ranges = [abs(values[i] - values[i-1]) for i in range(1, len(values))]
-            doc.moving_range = moving_ranges[-1] if moving_ranges else 0
+                                  limit=WINDOW_SIZE - 1)  # Get 29 + current = 30 total
+    
+    state = RollingStatistics()
+    for point in reversed(recent_points):
+        state.push(point.measured_value)
+    state.push(doc.measured_value)  # Add current value
+    
+    return state.summary()
 
 def auto_validate_data_point_status(doc):
     """Auto-validate SPC Data Point status based on limits"""
@@ -220,29 +234,13 @@ def check_spc_alerts(doc):
     if doc.status != "Invalid":
         return
     
-    # Get control charts for this parameter
-    charts = frappe.get_all("SPC Control Chart",
-                           filters={
-                               "parameter": doc.parameter,
-                               "status": "Active",
-                               "enable_alerts": 1
-                           },
-                           fields=["name", "chart_name"])
-    
-    # For each chart, check alert conditions and send notifications
-    for chart in charts:
-        send_spc_alert(chart.name, doc)
+    # For each alert-enabled chart of this parameter, queue a notification
+    for chart_name in get_alert_charts(doc.parameter):
+        send_spc_alert(chart_name, doc)
 
 def send_spc_alert(chart_name, data_point):
-    """Send SPC alert notifications"""
-    
-    # Get alert recipients for the chart
-    chart_doc = frappe.get_doc("SPC Control Chart", chart_name)
-    
-    if not chart_doc.alert_recipients:
-        return
+    """Queue SPC alert notifications; delivery, dedupe and digests run in the background"""
     
-    # Prepare alert message
     subject = f"SPC Alert: {data_point.parameter} Out of Control"
     message = f"""
     SPC Alert Notification
@@ -259,27 +257,14 @@ def send_spc_alert(chart_name, data_point):
     Please investigate and take corrective action.
     """
     
-    # Send notifications to recipients
-    for recipient in chart_doc.alert_recipients:
-        if recipient.alert_method in ["Email", "All Methods"]:
-            frappe.sendmail(
-                recipients=[recipient.email or recipient.user],
-                subject=subject,
-                message=message,
-                reference_doctype="SPC Data Point",
-                reference_name=data_point.name
-            )
-        
-        # Add notification to ERPNext notification system
-        frappe.get_doc({
-            "doctype": "Notification Log",
-            "subject": subject,
-            "email_content": message,
-            "for_user": recipient.user,
-            "type": "Alert",
-            "document_type": "SPC Data Point",
-            "document_name": data_point.name
-        }).insert(ignore_permissions=True)
+    queue_alert_event({
+        "chart": chart_name,
+        "parameter": data_point.parameter,
+        "rule": data_point.validation_notes or "Out of Control",
+        "data_point": data_point.name,
+        "subject": subject,
+        "message": message
+    })
 
 # Hooks to add to your app's hooks.py file:
 """
@@ -0,0 +1,291 @@
+"""
+SPC Audit Trail Writer
+======================
+
+Document events capture an audit record (one serialisation of the document,
+every changed field) into a per-transaction buffer. The buffer is written to
+SPC Audit Trail Queue in one statement just before the transaction commits,
+so a record exists if and only if the audited change does. A background
+writer drains the queue in bulk and chains every record to the previous one:
+
+    hash_value = SHA-256(previous_hash || canonical record)
+
+Editing, deleting or reordering a chained record breaks every hash after it.
+"""
+
+import hashlib
+import json
+
+import frappe
+from frappe.utils import get_datetime, now_datetime
+
+from amb_w_spc.fda_compliance.compliance_metrics import audit_record_counts, increment_metrics
+
+QUEUE_DOCTYPE = "SPC Audit Trail Queue"
+ANCHOR_DOCTYPE = "SPC Audit Trail Anchor"
+WRITER_JOB_ID = "amb_w_spc_audit_trail_writer"
+WRITE_BATCH_SIZE = 1000
+
+# Hash of the (virtual) record before the first chained one
+GENESIS_HASH = "0" * 64
+
+ACTION_TYPES = {
+    "after_insert": "Create",
+    "on_update": "Update",
+    "on_cancel": "Delete",
+    "on_submit": "Approve",
+    "before_print": "Print",
+}
+
+# Audit infrastructure and framework logs are not audited themselves
+EXCLUDED_DOCTYPES = frozenset((
+    "SPC Audit Trail", QUEUE_DOCTYPE, "Version", "Error Log", "Scheduled Job Log",
+    "Activity Log", "Access Log", "Route History", "Deleted Document", "Audit Trail Verification Segment",
+    ANCHOR_DOCTYPE,
+))
+
+# Regulated (21 CFR Part 11) records; the "*" doc events return at once for every other doctype
+AUDITED_MODULES = frozenset(("Core SPC", "SPC Quality Management", "FDA Compliance"))
+
+AUDITED_FIELDTYPES = frozenset((
+    "Data", "Small Text", "Text", "Long Text", "Text Editor", "Code", "Select", "Link", "Dynamic Link",
+    "Int", "Float", "Currency", "Percent", "Check", "Date", "Datetime", "Time", "Rating", "Duration",
+))
+
+# Content covered by hash_value, in canonical order
+HASHED_FIELDS = (
+    "sequence", "record_id", "timestamp", "user_id", "action_type", "table_name", "record_name",
+    "field_changed", "old_value", "new_value", "ip_address", "browser_info", "session_id", "checksum",
+)
+
+AUDIT_TRAIL_FIELDS = (
+    "name", "owner", "creation", "modified", "modified_by", "docstatus",
+) + HASHED_FIELDS + ("date_time_stamp", "previous_hash", "hash_value", "tamper_evidence", "backup_status")
+
+# Data columns are varchar(140)
+DATA_LENGTH = 140
+
+# =============================================================================
+# HASHING
+# =============================================================================
+
+def canonical_record(record):
+    """Stable serialisation of the hashed fields, identical before and after a database round trip"""
+    values = {}
+    for field in HASHED_FIELDS:
+        value = record.get(field)
+        if field == "sequence":
+            value = int(value or 0)
+        elif field == "timestamp" and value:
+            value = get_datetime(value).strftime("%Y-%m-%d %H:%M:%S.%f")
+        else:
+            value = "" if value is None else str(value)
+        values[field] = value
+
+    return json.dumps(values, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+def hash_record(previous_hash, record):
+    digest = hashlib.sha256(previous_hash.encode())
+    digest.update(canonical_record(record).encode())
+    return digest.hexdigest()
+
+def chain_records(records, last_sequence=0, previous_hash=GENESIS_HASH):
+    """Number and hash records in order after the chain head; returns the records"""
+    for record in records:
+        last_sequence += 1
+        record["sequence"] = last_sequence
+        record["previous_hash"] = previous_hash
+        record["hash_value"] = previous_hash = hash_record(previous_hash, record)
+    return records
+
+# =============================================================================
+# CAPTURE
+# =============================================================================
+
+def diff_values(old, new, fieldnames):
+    """{field: (old, new)} for every field whose value changed"""
+    changes = {}
+    for fieldname in fieldnames:
+        old_value, new_value = old.get(fieldname), new.get(fieldname)
+        if old_value != new_value and (old_value or new_value):
+            changes[fieldname] = (old_value, new_value)
+    return changes
+
+def get_document_changes(old_doc, new_doc):
+    if not old_doc:
+        return {}
+
+    fieldnames = [field.fieldname for field in new_doc.meta.fields if field.fieldtype in AUDITED_FIELDTYPES]
+    return diff_values(old_doc, new_doc, fieldnames)
+
+def get_document_checksum(doc):
+    """SHA-256 of the document's full content, child rows included"""
+    return hashlib.sha256(json.dumps(doc.as_dict(), sort_keys=True, default=str).encode()).hexdigest()
+
+def build_audit_record(doc, action_type, changes=None):
+    timestamp = now_datetime()
+    request = getattr(frappe.local, "request", None)
+
+    record = {
+        "record_id": f"{timestamp:%Y%m%d%H%M%S%f}-{frappe.generate_hash(length=8)}",
+        "timestamp": timestamp,
+        "user_id": frappe.session.user,
+        "action_type": action_type,
+        "table_name": doc.doctype,
+        "record_name": str(doc.name)[:DATA_LENGTH],
+        "ip_address": frappe.utils.get_request_ip() if request else "",
+        "browser_info": (request.headers.get("User-Agent", "") if request else "")[:DATA_LENGTH],
+        "session_id": getattr(frappe.session, "sid", None) or "",
+        # The document is serialised exactly once, for its content checksum
+        "checksum": get_document_checksum(doc),
+    }
+
+    if changes:
+        record["field_changed"] = ", ".join(changes)[:DATA_LENGTH]
+        record["old_value"] = json.dumps({field: old for field, (old, new) in changes.items()}, default=str)
+        record["new_value"] = json.dumps({field: new for field, (old, new) in changes.items()}, default=str)
+
+    return record
+
+def is_audited(doctype):
+    return doctype not in EXCLUDED_DOCTYPES and frappe.get_meta(doctype).module in AUDITED_MODULES
+
+def capture_audit_trail(doc, method=None):
+    """Document event ("*"): buffer an audit record for a change to a regulated document"""
+    if not is_audited(doc.doctype) or frappe.flags.in_install or frappe.flags.in_migrate:
+        return
+
+    # An insert is recorded once, by after_insert
+    if method == "on_update" and doc.flags.in_insert:
+        return
+
+    try:
+        changes = get_document_changes(doc.get_doc_before_save(), doc) if method == "on_update" else None
+        buffer_audit_record(build_audit_record(doc, ACTION_TYPES.get(method, "Read"), changes))
+    except Exception as e:
+        frappe.log_error(f"Audit trail capture failed: {str(e)}", "FDA Compliance Error")
+
+# =============================================================================
+# HANDOFF
+# =============================================================================
+
+def buffer_audit_record(record):
+    """Hold a record until the transaction commits; dropped if it rolls back"""
+    buffer = getattr(frappe.local, "spc_audit_buffer", None)
+    if buffer is None:
+        buffer = frappe.local.spc_audit_buffer = []
+
+        def discard():
+            if getattr(frappe.local, "spc_audit_buffer", None) is buffer:
+                frappe.local.spc_audit_buffer = None
+
+        frappe.db.before_commit.add(lambda: queue_audit_records(buffer))
+        frappe.db.after_rollback.add(discard)
+
+    buffer.append(record)
+
+def queue_audit_records(buffer):
+    """before_commit: write the buffered records in the committing transaction"""
+    if getattr(frappe.local, "spc_audit_buffer", None) is buffer:
+        frappe.local.spc_audit_buffer = None
+    if not buffer:
+        return
+
+    now = now_datetime()
+    user = frappe.session.user
+    frappe.db.bulk_insert(QUEUE_DOCTYPE,
+        fields=["name", "owner", "creation", "modified", "modified_by", "docstatus",
+                "table_name", "record_name", "payload"],
+        values=[
+            (record["record_id"], user, now, now, user, 0,
+             record["table_name"], record["record_name"], json.dumps(record, default=str))
+            for record in buffer
+        ])
+
+    frappe.db.after_commit.add(enqueue_audit_writer)
+
+def enqueue_audit_writer():
+    frappe.enqueue(
+        "amb_w_spc.fda_compliance.audit_trail.write_audit_trail",
+        queue="short",
+        job_id=WRITER_JOB_ID,
+        deduplicate=True
+    )
+
+# =============================================================================
+# BACKGROUND WRITER
+# =============================================================================
+
+def get_chain_head(for_update=False):
+    """(sequence, hash_value) of the last chained record"""
+    head = frappe.db.sql(f"""
+        SELECT sequence, hash_value
+        FROM `tabSPC Audit Trail`
+        WHERE sequence IS NOT NULL
+        ORDER BY sequence DESC
+        LIMIT 1
+        {"FOR UPDATE" if for_update else ""}
+    """)
+    return (int(head[0][0]), head[0][1]) if head else (0, GENESIS_HASH)
+
+def get_chain_anchor():
+    """(sequence, hash_value) of the last archived record, or the genesis if nothing is archived"""
+    anchor = frappe.db.sql(f"""
+        SELECT archived_through, anchor_hash
+        FROM `tab{ANCHOR_DOCTYPE}`
+        ORDER BY archived_through DESC
+        LIMIT 1
+    """)
+    return (int(anchor[0][0]), anchor[0][1]) if anchor else (0, GENESIS_HASH)
+
+def record_chain_anchor(sequence, hash_value, archived_count, retention_run=None):
+    """Store where the archived part of the chain ends; call in the transaction that deletes it"""
+    frappe.get_doc({
+        "doctype": ANCHOR_DOCTYPE,
+        "archived_through": sequence,
+        "anchor_hash": hash_value,
+        "archived_count": archived_count,
+        "retention_run": retention_run,
+    }).insert(ignore_permissions=True)
+
+def write_audit_trail(batch_size=WRITE_BATCH_SIZE):
+    """Chain queued records into SPC Audit Trail, one transaction per batch
+
+    The chain head row is locked for the batch and `sequence` is unique, so
+    concurrent writers serialise instead of forking the chain. A batch is
+    deleted from the queue, and counted in the compliance metrics, in the
+    transaction that writes it.
+    """
+    written = 0
+    while True:
+        last_sequence, previous_hash = get_chain_head(for_update=True)
+        queued = frappe.db.sql(f"""
+            SELECT name, payload
+            FROM `tab{QUEUE_DOCTYPE}`
+            ORDER BY name
+            LIMIT %s
+            FOR UPDATE
+        """, batch_size)
+        if not queued:
+            frappe.db.commit()
+            break
+
+        records = chain_records([json.loads(payload) for _, payload in queued], last_sequence, previous_hash)
+
+        now = now_datetime()
+        user = frappe.session.user
+        frappe.db.bulk_insert("SPC Audit Trail", fields=list(AUDIT_TRAIL_FIELDS), values=[
+            (frappe.generate_hash(length=10), user, now, now, user, 0)
+            + tuple(record.get(field) for field in HASHED_FIELDS)
+            + (record["timestamp"], record["previous_hash"], record["hash_value"], 0, "Pending")
+            for record in records
+        ])
+        frappe.db.sql(f"DELETE FROM `tab{QUEUE_DOCTYPE}` WHERE name IN %s", [[name for name, _ in queued]])
+        increment_metrics(audit_record_counts(records))
+        frappe.db.commit()
+
+        written += len(records)
+        if len(queued) < batch_size:
+            break
+
+    return written
@@ -0,0 +1,317 @@
+"""
+SPC Audit Trail Integrity Verification
+======================================
+
+Recomputes the hash chain written by audit_trail.py. The trail is split into
+one segment per month (a contiguous range of sequences); segments are
+verified in parallel by background workers, streaming their records in
+sequence order, and each result is checkpointed. Later runs only re-verify
+segments that grew, so a multi-year trail is verified incrementally. The
+report joins the segments (each segment's first link must match the previous
+segment's last hash) and lists every gap and mismatch per audited document.
+The first segment must continue from the chain anchor the retention policy
+stores when it archives the oldest records (the genesis hash if nothing is
+archived), so records missing at the start of the trail are a gap, not an
+archive.
+"""
+
+import json
+import re
+
+import frappe
+from frappe import _
+from frappe.utils import cint, now_datetime
+
+from amb_w_spc.fda_compliance.audit_trail import GENESIS_HASH, HASHED_FIELDS, get_chain_anchor, hash_record
+
+SEGMENT_DOCTYPE = "Audit Trail Verification Segment"
+CHUNK_SIZE = 5000
+
+# Issues kept per segment checkpoint; the count is always exact
+MAX_STORED_ISSUES = 1000
+
+REPORT_ROLES = ("System Manager", "Quality Manager", "QA Manager")
+
+SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+# =============================================================================
+# CHAIN VERIFICATION
+# =============================================================================
+
+class ChainVerifier:
+    """Checks a run of audit records fed in sequence order
+
+    Each record must hash to its hash_value, link to the preceding record's
+    hash and follow it without a gap in sequence numbers.
+    """
+
+    def __init__(self, expected_start):
+        self.expected = expected_start
+        self.previous = None
+        self.first_previous_hash = None
+        self.last_hash = None
+        self.records = 0
+        self.issue_count = 0
+        self.issues = []
+
+    def add_issue(self, issue_type, row, detail):
+        self.issue_count += 1
+        if len(self.issues) < MAX_STORED_ISSUES:
+            self.issues.append({
+                "type": issue_type,
+                "sequence": cint(row.get("sequence")),
+                "audit_record": row.get("name"),
+                "table_name": row.get("table_name"),
+                "record_name": row.get("record_name"),
+                "detail": detail,
+            })
+
+    def feed(self, rows):
+        for row in rows:
+            sequence = cint(row.get("sequence"))
+
+            if sequence != self.expected:
+                self.add_issue("gap", row,
+                    _("Sequences {0} to {1} are missing").format(self.expected, sequence - 1))
+            elif self.previous is not None and row.get("previous_hash") != self.previous.get("hash_value"):
+                self.add_issue("broken_link", row,
+                    _("Does not link to sequence {0}").format(sequence - 1))
+
+            if hash_record(row.get("previous_hash") or "", row) != row.get("hash_value"):
+                self.add_issue("hash_mismatch", row, _("Content does not match its hash value"))
+
+            if not SHA256_PATTERN.match(row.get("checksum") or ""):
+                self.add_issue("invalid_checksum", row, _("Document checksum is missing or malformed"))
+
+            if self.previous is None:
+                self.first_previous_hash = row.get("previous_hash")
+            self.previous = row
+            self.last_hash = row.get("hash_value")
+            self.expected = sequence + 1
+            self.records += 1
+
+    def finish(self, expected_end):
+        """Flag records missing at the end of the segment"""
+        if self.expected <= expected_end:
+            self.add_issue("gap", self.previous or {"sequence": self.expected},
+                _("Sequences {0} to {1} are missing").format(self.expected, expected_end))
+
+def split_segments(periods):
+    """Contiguous sequence ranges from (period, first sequence, last sequence) rows
+
+    A month's segment runs from its first sequence up to the next month's
+    first sequence, so records committed late still belong to exactly one
+    segment.
+    """
+    periods = sorted(periods, key=lambda period: period[1])
+    last_sequence = max((period[2] for period in periods), default=0)
+
+    segments = []
+    for index, (period, start, _end) in enumerate(periods):
+        end = periods[index + 1][1] - 1 if index + 1 < len(periods) else last_sequence
+        if end >= start:
+            segments.append({"period": period, "start": start, "end": end})
+    return segments
+
+def find_boundary_issues(segments, anchor=(0, GENESIS_HASH)):
+    """Links between consecutive verified segments, and from the chain anchor to the first one"""
+    issues = []
+    for previous, segment in zip(segments, segments[1:]):
+        if previous.last_hash and segment.first_previous_hash and segment.first_previous_hash != previous.last_hash:
+            issues.append({
+                "type": "broken_link",
+                "sequence": segment.segment_start,
+                "detail": _("Segment starting at {0} does not link to the segment ending at {1}").format(
+                    segment.segment_start, previous.segment_end),
+            })
+
+    archived_through, anchor_hash = anchor
+    if segments and cint(segments[0].segment_start) != archived_through + 1:
+        issues.append({
+            "type": "gap",
+            "sequence": archived_through + 1,
+            "detail": _("Sequences {0} to {1} are missing and were not archived").format(
+                archived_through + 1, cint(segments[0].segment_start) - 1),
+        })
+    elif segments and segments[0].first_previous_hash not in (None, anchor_hash):
+        issues.append({
+            "type": "broken_link",
+            "sequence": archived_through + 1,
+            "detail": _("The first record does not start from the genesis hash") if not archived_through
+                else _("The first record does not link to the archived record {0}").format(archived_through),
+        })
+
+    return issues
+
+# =============================================================================
+# SEGMENTS
+# =============================================================================
+
+def get_segments():
+    return split_segments(frappe.db.sql("""
+        SELECT DATE_FORMAT(timestamp, '%Y-%m-01') AS period, MIN(sequence), MAX(sequence)
+        FROM `tabSPC Audit Trail`
+        WHERE sequence IS NOT NULL
+        GROUP BY period
+    """))
+
+def stream_records(start, end, chunk_size=CHUNK_SIZE):
+    """Chained records of a sequence range, in order, one chunk at a time"""
+    fields = ", ".join(f"`{field}`" for field in ("name", "previous_hash", "hash_value") + HASHED_FIELDS)
+    last_sequence = start - 1
+
+    while True:
+        rows = frappe.db.sql(f"""
+            SELECT {fields}
+            FROM `tabSPC Audit Trail`
+            WHERE sequence > %s AND sequence <= %s
+            ORDER BY sequence
+            LIMIT %s
+        """, (last_sequence, end, chunk_size), as_dict=True)
+        if not rows:
+            return
+
+        yield rows
+        last_sequence = rows[-1].sequence
+
+def verify_segment(start, end, period=None):
+    """Verify one sequence range and checkpoint the result"""
+    start, end = cint(start), cint(end)
+    verifier = ChainVerifier(start)
+    for rows in stream_records(start, end):
+        verifier.feed(rows)
+    verifier.finish(end)
+
+    name = frappe.db.get_value(SEGMENT_DOCTYPE, {"segment_start": start})
+    segment = frappe.get_doc(SEGMENT_DOCTYPE, name) if name else frappe.new_doc(SEGMENT_DOCTYPE)
+    segment.update({
+        "period": period,
+        "segment_start": start,
+        "segment_end": end,
+        "status": "Failed" if verifier.issue_count else "Verified",
+        "records": verifier.records,
+        "issue_count": verifier.issue_count,
+        "first_previous_hash": verifier.first_previous_hash,
+        "last_hash": verifier.last_hash,
+        "verified_on": now_datetime(),
+        "issues": json.dumps(verifier.issues, default=str),
+    })
+    segment.flags.ignore_permissions = True
+    segment.save()
+    frappe.db.commit()
+
+    return {"start": start, "end": end, "records": verifier.records, "issues": verifier.issue_count}
+
+def mark_pending(segment, checkpoint=None):
+    """Checkpoint a segment as awaiting verification so the report shows it as incomplete"""
+    values = {"period": segment["period"], "segment_end": segment["end"], "status": "Pending"}
+    if checkpoint:
+        frappe.db.set_value(SEGMENT_DOCTYPE, checkpoint.name, values)
+    else:
+        frappe.get_doc(dict(values, doctype=SEGMENT_DOCTYPE, segment_start=segment["start"])).insert(ignore_permissions=True)
+
+def run_audit_verification(full=False, enqueue=True):
+    """Verify every segment that changed since its checkpoint (all of them if `full`)
+
+    Segments are fanned out as background jobs on the long queue, one per
+    month; without `enqueue` they are verified in this process instead.
+    """
+    segments = get_segments()
+    checkpoints = {
+        checkpoint.segment_start: checkpoint
+        for checkpoint in frappe.get_all(SEGMENT_DOCTYPE, fields=["name", "segment_start", "segment_end", "status"])
+    }
+
+    # Boundaries move when retention archives the oldest records
+    starts = {segment["start"] for segment in segments}
+    for start, checkpoint in checkpoints.items():
+        if start not in starts:
+            frappe.delete_doc(SEGMENT_DOCTYPE, checkpoint.name, ignore_permissions=True, force=True)
+
+    stale = [
+        segment for segment in segments
+        if full
+        or segment["start"] not in checkpoints
+        or checkpoints[segment["start"]].segment_end != segment["end"]
+        or checkpoints[segment["start"]].status == "Pending"
+    ]
+
+    for segment in stale:
+        mark_pending(segment, checkpoints.get(segment["start"]))
+        if enqueue:
+            frappe.enqueue(
+                "amb_w_spc.fda_compliance.audit_verification.verify_segment",
+                queue="long",
+                timeout=60 * 60,
+                job_id=f"amb_w_spc_audit_verification_{segment['start']}",
+                deduplicate=True,
+                enqueue_after_commit=True,
+                start=segment["start"],
+                end=segment["end"],
+                period=segment["period"]
+            )
+        else:
+            verify_segment(segment["start"], segment["end"], segment["period"])
+
+    frappe.db.commit()
+    return {"segments": len(segments), "verifying": len(stale)}
+
+@frappe.whitelist()
+def verify_audit_trail(full=0, enqueue=1):
+    frappe.only_for("System Manager")
+    return run_audit_verification(full=cint(full), enqueue=cint(enqueue))
+
+def enqueue_audit_verification():
+    """Scheduler hook (daily): incremental verification"""
+    run_audit_verification()
+
+def enqueue_full_audit_verification():
+    """Scheduler hook (weekly): re-verify every segment, checkpointed or not"""
+    run_audit_verification(full=True)
+
+# =============================================================================
+# REPORT
+# =============================================================================
+
+@frappe.whitelist()
+def get_audit_trail_integrity_report():
+    """Verification state of the whole trail, with findings grouped per audited document"""
+    if not set(REPORT_ROLES) & set(frappe.get_roles()):
+        frappe.throw(_("Not permitted to read the audit trail integrity report"), frappe.PermissionError)
+
+    segments = frappe.get_all(SEGMENT_DOCTYPE,
+        fields=["period", "segment_start", "segment_end", "status", "records", "issue_count",
+                "first_previous_hash", "last_hash", "verified_on", "issues"],
+        order_by="segment_start asc")
+
+    documents = {}
+    for segment in segments:
+        for issue in json.loads(segment.issues or "[]"):
+            key = f"{issue.get('table_name') or ''}/{issue.get('record_name') or ''}"
+            documents.setdefault(key, []).append(issue)
+        del segment["issues"]
+
+    anchor = get_chain_anchor()
+    boundary_issues = find_boundary_issues(segments, anchor)
+    issue_count = sum(cint(segment.issue_count) for segment in segments) + len(boundary_issues)
+    unverified = [segment for segment in segments if segment.status == "Pending"]
+
+    if issue_count:
+        status = "Tampered"
+    elif unverified or not segments:
+        status = "Incomplete"
+    else:
+        status = "Intact"
+
+    return {
+        "status": status,
+        "records_verified": sum(cint(segment.records) for segment in segments),
+        "first_sequence": segments[0].segment_start if segments else None,
+        # Sequences up to here have been archived by the retention policy
+        "archived_through": anchor[0],
+        "last_verified_on": max((segment.verified_on for segment in segments if segment.verified_on), default=None),
+        "issue_count": issue_count,
+        "issues_by_document": documents,
+        "boundary_issues": boundary_issues,
+        "segments": segments,
+    }
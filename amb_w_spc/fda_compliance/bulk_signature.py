@@ -0,0 +1,314 @@
+"""
+Bulk Electronic Signatures
+==========================
+
+Signs many documents in one session: the signer re-authenticates once, every
+document is locked, hashed and signed in one pass, and the whole session is
+one transaction, so either every document is signed or none is. Each
+signature becomes a leaf
+
+    leaf = SHA-256(document type, name, content hash, signature hash)
+
+and the session's SPC Signature Manifest records the Merkle root over the
+leaves in signing order. Changing, adding or dropping any signature of the
+session no longer reproduces the manifest hash.
+"""
+
+import hashlib
+import json
+from collections import Counter
+
+import frappe
+from frappe import _
+from frappe.permissions import get_doctype_roles
+from frappe.utils import now_datetime
+from frappe.utils.password import check_password
+
+from amb_w_spc.fda_compliance.audit_trail import build_audit_record, buffer_audit_record, get_document_checksum
+from amb_w_spc.fda_compliance.compliance_metrics import increment_metrics, signature_counts
+from amb_w_spc.fda_compliance.validation_scripts import generate_signature_hash, get_signature_components
+
+SIGNATURE_DOCTYPE = "SPC Electronic Signature"
+MANIFEST_DOCTYPE = "SPC Signature Manifest"
+
+MAX_DOCUMENTS = 1000
+
+# Bulk release signing covers many records at once
+DEFAULT_AUTHORIZATION_LEVEL = "Level 3 - Advanced"
+
+# Document fields set by a signature, per meaning; "user" and "timestamp" stand for the signer and signing time
+SIGNATURE_STATUS_FIELDS = {
+    "Approved": {"approval_status": "Approved", "approved_by": "user", "approval_date": "timestamp"},
+    "Reviewed": {"review_status": "Reviewed", "reviewed_by": "user", "review_date": "timestamp"},
+    "Acknowledged": {"acknowledged": 1, "acknowledged_by": "user", "acknowledgment_date": "timestamp"},
+}
+
+SIGNATURE_FIELDS = (
+    "name", "owner", "creation", "modified", "modified_by", "docstatus",
+    "signature_id", "document_type", "document_name", "signer_name", "signer_role", "signature_meaning",
+    "signature_date", "signature_method", "user_credentials_verified", "multi_factor_auth",
+    "authorization_level", "cfr_part11_compliant", "signature_components", "signature_valid",
+    "verification_method", "signature_hash",
+)
+
+# =============================================================================
+# MANIFEST HASHING
+# =============================================================================
+
+def hash_leaf(document_type, document_name, document_hash, signature_hash):
+    entry = json.dumps([document_type, document_name, document_hash, signature_hash], separators=(",", ":"))
+    return hashlib.sha256(entry.encode()).hexdigest()
+
+def hash_pair(left, right):
+    return hashlib.sha256(bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+def merkle_root(leaves):
+    """Root over hex leaf hashes; an odd node out is carried up a level unchanged"""
+    level = list(leaves)
+    if not level:
+        return None
+
+    while len(level) > 1:
+        level = [
+            hash_pair(level[index], level[index + 1]) if index + 1 < len(level) else level[index]
+            for index in range(0, len(level), 2)
+        ]
+    return level[0]
+
+# =============================================================================
+# SIGNING
+# =============================================================================
+
+def get_signature_status_values(signature_meaning, user, timestamp):
+    """Document field values recording a signature of this meaning"""
+    placeholders = {"user": user, "timestamp": timestamp}
+    return {
+        fieldname: placeholders.get(value, value) if isinstance(value, str) else value
+        for fieldname, value in SIGNATURE_STATUS_FIELDS.get(signature_meaning, {}).items()
+    }
+
+def parse_documents(documents):
+    """Unique (doctype, name) pairs, in order, from a list of pairs or {doctype, name} dicts"""
+    pairs = []
+    for document in frappe.parse_json(documents) or []:
+        if isinstance(document, dict):
+            document = (document.get("doctype") or document.get("document_type"),
+                        document.get("name") or document.get("document_name"))
+        pairs.append(tuple(document))
+
+    pairs = list(dict.fromkeys(pairs))
+    if not pairs:
+        frappe.throw(_("Select at least one document to sign"))
+    if len(pairs) > MAX_DOCUMENTS:
+        frappe.throw(_("At most {0} documents can be signed in one session").format(MAX_DOCUMENTS))
+    return pairs
+
+def get_existing_signatures(pairs, signature_meaning):
+    """{(doctype, name): signature} for documents already signed with this meaning"""
+    names_by_doctype = {}
+    for doctype, name in pairs:
+        names_by_doctype.setdefault(doctype, []).append(name)
+
+    existing = {}
+    for doctype, names in names_by_doctype.items():
+        for name, signature in frappe.db.sql(f"""
+            SELECT document_name, name
+            FROM `tab{SIGNATURE_DOCTYPE}`
+            WHERE document_type = %s AND signature_meaning = %s AND document_name IN %s
+        """, (doctype, signature_meaning, names)):
+            existing[(doctype, name)] = signature
+    return existing
+
+def apply_signature_status(docs, signature_meaning, user, timestamp):
+    """Set the signature fields on every signed document, one UPDATE per doctype and docstatus"""
+    values = get_signature_status_values(signature_meaning, user, timestamp)
+    if not values:
+        return
+
+    groups = {}
+    for doc in docs:
+        # Submitted documents only take fields that allow it
+        fieldnames = []
+        for fieldname in values:
+            field = doc.meta.get_field(fieldname)
+            if field and (doc.docstatus == 0 or field.allow_on_submit):
+                fieldnames.append(fieldname)
+        fieldnames = tuple(fieldnames)
+        if fieldnames:
+            groups.setdefault((doc.doctype, fieldnames), []).append(doc)
+
+    for (doctype, fieldnames), group in groups.items():
+        update = {fieldname: values[fieldname] for fieldname in fieldnames}
+        frappe.db.set_value(doctype, {"name": ["in", [doc.name for doc in group]]}, update)
+
+        for doc in group:
+            changes = {fieldname: (doc.get(fieldname), value) for fieldname, value in update.items()
+                       if doc.get(fieldname) != value}
+            doc.update(update)
+            if changes:
+                buffer_audit_record(build_audit_record(doc, "Update", changes))
+
+def get_signing_roles(doctype):
+    """Roles that may sign a doctype: those allowed to write or submit it"""
+    return set(get_doctype_roles(doctype, "write")) | set(get_doctype_roles(doctype, "submit"))
+
+def check_signer_role(pairs, signer_role, user):
+    """The signer must hold `signer_role`, and it must be a role that may sign every doctype in the session"""
+    if signer_role not in frappe.get_roles(user):
+        frappe.throw(_("You do not have the role '{0}' to sign these documents").format(signer_role),
+                     frappe.PermissionError)
+
+    for doctype in dict.fromkeys(doctype for doctype, _name in pairs):
+        if signer_role not in get_signing_roles(doctype):
+            frappe.throw(_("Role '{0}' cannot sign {1} documents").format(signer_role, doctype),
+                         frappe.PermissionError)
+
+def check_not_cancelled(pairs):
+    """Cancelled documents cannot be signed; checked for the whole session before anything is locked"""
+    names_by_doctype = {}
+    for doctype, name in pairs:
+        names_by_doctype.setdefault(doctype, []).append(name)
+
+    for doctype, names in names_by_doctype.items():
+        cancelled = frappe.get_all(doctype, filters={"name": ["in", names], "docstatus": 2}, pluck="name")
+        if cancelled:
+            frappe.throw(_("Cancelled {0} documents cannot be signed: {1}").format(doctype, ", ".join(cancelled)))
+
+def check_signing_permission(doc):
+    """Signing writes approval fields, so it needs write access (or submit access once submitted)"""
+    if doc.docstatus == 2:
+        frappe.throw(_("Cancelled {0} {1} cannot be signed").format(doc.doctype, doc.name))
+
+    ptypes = ("write", "submit") if doc.docstatus == 1 else ("write",)
+    if not any(doc.has_permission(ptype) for ptype in ptypes):
+        frappe.throw(_("Not permitted to sign {0} {1}").format(doc.doctype, doc.name), frappe.PermissionError)
+
+@frappe.whitelist()
+def sign_documents(documents, signature_meaning, password, signer_role,
+                   signature_method="Password", authorization_level=DEFAULT_AUTHORIZATION_LEVEL):
+    """Sign every document with one authentication, in one transaction
+
+    Documents already signed with this meaning are skipped and reported.
+    """
+    user = frappe.session.user
+    pairs = parse_documents(documents)
+
+    meanings = (frappe.get_meta(SIGNATURE_DOCTYPE).get_field("signature_meaning").options or "").split("\n")
+    if signature_meaning not in meanings:
+        frappe.throw(_("Invalid signature meaning {0}").format(signature_meaning))
+
+    check_signer_role(pairs, signer_role, user)
+    check_not_cancelled(pairs)
+
+    # 21 CFR 11.200: the session's signatures are executed with one re-authentication
+    check_password(user, password)
+
+    existing = get_existing_signatures(pairs, signature_meaning)
+    timestamp = now_datetime()
+    printed_name = frappe.db.get_value("User", user, "full_name") or user
+    manifest = frappe.generate_hash(length=10)
+
+    docs, rows, entries = [], [], []
+    for doctype, name in pairs:
+        if (doctype, name) in existing:
+            continue
+
+        # Locked until commit so the content cannot change between hashing and signing
+        doc = frappe.get_doc(doctype, name, for_update=True)
+        check_signing_permission(doc)
+
+        document_hash = get_document_checksum(doc)
+        signature_hash = generate_signature_hash(user, timestamp, signature_meaning, doctype, name)
+        signature = frappe.generate_hash(length=10)
+        components = get_signature_components(printed_name, timestamp, signature_meaning, signature_method)
+        components.update({"manifest": manifest, "document_hash": document_hash, "leaf_index": len(entries)})
+
+        docs.append(doc)
+        rows.append({
+            "name": signature, "owner": user, "creation": timestamp, "modified": timestamp,
+            "modified_by": user, "docstatus": 1,
+            "signature_id": f"{manifest}-{len(entries) + 1:04d}",
+            "document_type": doctype, "document_name": name,
+            "signer_name": user, "signer_role": signer_role, "signature_meaning": signature_meaning,
+            "signature_date": timestamp, "signature_method": signature_method,
+            "user_credentials_verified": 1, "multi_factor_auth": 0,
+            "authorization_level": authorization_level, "cfr_part11_compliant": 1,
+            "signature_components": json.dumps(components, default=str),
+            "signature_valid": 1, "verification_method": "Hash Validation",
+            "signature_hash": signature_hash,
+        })
+        entries.append({
+            "document_type": doctype, "document_name": name, "signature": signature,
+            "document_hash": document_hash, "signature_hash": signature_hash,
+            "leaf": hash_leaf(doctype, name, document_hash, signature_hash),
+        })
+
+    manifest_hash = merkle_root(entry["leaf"] for entry in entries)
+    if rows:
+        frappe.db.bulk_insert(SIGNATURE_DOCTYPE, fields=list(SIGNATURE_FIELDS),
+                              values=[tuple(row[field] for field in SIGNATURE_FIELDS) for row in rows])
+
+        # bulk_insert runs no document events; record what they would have
+        counts = Counter()
+        for row in rows:
+            buffer_audit_record(build_audit_record(frappe.get_doc(dict(row, doctype=SIGNATURE_DOCTYPE)), "Create"))
+            counts.update(signature_counts(row))
+        increment_metrics(counts)
+
+        apply_signature_status(docs, signature_meaning, user, timestamp)
+
+        frappe.get_doc({
+            "doctype": MANIFEST_DOCTYPE,
+            "signer": user,
+            "signer_role": signer_role,
+            "signature_meaning": signature_meaning,
+            "signed_on": timestamp,
+            "document_count": len(entries),
+            "manifest_hash": manifest_hash,
+            "entries": json.dumps(entries),
+        }).insert(ignore_permissions=True, set_name=manifest)
+
+    return {
+        "manifest": manifest if rows else None,
+        "manifest_hash": manifest_hash,
+        "signed": [{"document_type": e["document_type"], "document_name": e["document_name"],
+                    "signature": e["signature"]} for e in entries],
+        "already_signed": [{"document_type": doctype, "document_name": name, "signature": signature}
+                           for (doctype, name), signature in existing.items()],
+    }
+
+# =============================================================================
+# VERIFICATION
+# =============================================================================
+
+@frappe.whitelist()
+def verify_signature_manifest(manifest):
+    """Recompute a session's manifest hash from its stored signature records"""
+    frappe.has_permission(MANIFEST_DOCTYPE, "read", throw=True)
+    doc = frappe.get_doc(MANIFEST_DOCTYPE, manifest)
+    entries = json.loads(doc.entries or "[]")
+
+    stored = {
+        row.name: row
+        for row in frappe.get_all(SIGNATURE_DOCTYPE,
+            filters={"name": ["in", [entry["signature"] for entry in entries]]},
+            fields=["name", "document_type", "document_name", "signature_hash"])
+    }
+
+    issues, leaves = [], []
+    for entry in entries:
+        signature = stored.get(entry["signature"])
+        if not signature:
+            issues.append({"signature": entry["signature"], "issue": _("Signature record is missing")})
+            continue
+
+        leaf = hash_leaf(signature.document_type, signature.document_name,
+                         entry["document_hash"], signature.signature_hash)
+        if leaf != entry["leaf"]:
+            issues.append({"signature": signature.name, "document_type": signature.document_type,
+                           "document_name": signature.document_name,
+                           "issue": _("Signature record does not match the manifest")})
+        leaves.append(leaf)
+
+    intact = len(leaves) == len(entries) and merkle_root(leaves) == doc.manifest_hash
+    return {"manifest": doc.name, "intact": intact, "document_count": len(entries), "issues": issues}
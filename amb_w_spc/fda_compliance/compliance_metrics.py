@@ -0,0 +1,267 @@
+"""
+FDA Compliance Metrics
+======================
+
+Precomputed counters behind the compliance dashboard and the weekly audit
+summary, so neither counts the audit trail (the largest table) on read:
+
+- daily counts: audit records per day, action and user; signatures per day
+- gauges: open and overdue deviations and CAPAs, batches pending release
+
+Counters move in the transaction that changes their source: the audit
+writer adds the records it chains, and document events add the difference
+between a document's contribution before and after the change. A nightly
+job recomputes the gauges and the last days of daily counts from source,
+which also catches deviations and CAPAs that became overdue overnight.
+"""
+
+import hashlib
+from collections import Counter
+
+import frappe
+from frappe.utils import add_days, cint, get_datetime, getdate, now_datetime
+
+METRICS_DOCTYPE = "FDA Compliance Metric"
+
+AUDIT_RECORDS = "audit_records"
+SIGNATURES = "signatures"
+OPEN_DEVIATIONS = "open_deviations"
+OVERDUE_DEVIATIONS = "overdue_deviations"
+OPEN_CAPAS = "open_capas"
+OVERDUE_CAPAS = "overdue_capas"
+BATCHES_PENDING_RELEASE = "batches_pending_release"
+
+DAILY_METRICS = (AUDIT_RECORDS, SIGNATURES)
+GAUGES = (OPEN_DEVIATIONS, OVERDUE_DEVIATIONS, OPEN_CAPAS, OVERDUE_CAPAS, BATCHES_PENDING_RELEASE)
+
+OPEN_DEVIATION_STATUSES = ("Open", "Under Investigation")
+CLOSED_DEVIATION_STATUSES = ("Closed", "Cancelled")
+PENDING_RELEASE_STATUSES = ("Complete", "Approved")
+
+# Days of daily counts recomputed by the nightly reconciliation; audit
+# records are chained a little after capture, so yesterday is still moving
+RECONCILE_DAYS = 2
+
+# =============================================================================
+# CONTRIBUTIONS
+# =============================================================================
+
+def metric_key(metric, metric_date=None, action_type="", user_id=""):
+    return (metric, getdate(metric_date) if metric_date else None, action_type or "", user_id or "")
+
+def audit_record_counts(records):
+    """Daily counts for a batch of audit records"""
+    return Counter(
+        metric_key(AUDIT_RECORDS, get_datetime(record.get("timestamp")), record.get("action_type"), record.get("user_id"))
+        for record in records
+    )
+
+def signature_counts(doc, today=None):
+    if not doc or not doc.get("signature_date"):
+        return Counter()
+    return Counter({metric_key(SIGNATURES, get_datetime(doc.get("signature_date"))): 1})
+
+def deviation_counts(doc, today=None):
+    """Gauges a deviation contributes to, including its corrective and preventive actions"""
+    counts = Counter()
+    if not doc or cint(doc.get("docstatus")) == 2:
+        return counts
+
+    today = getdate(today)
+    status = doc.get("deviation_status")
+    if status in OPEN_DEVIATION_STATUSES:
+        counts[metric_key(OPEN_DEVIATIONS)] += 1
+    if status not in CLOSED_DEVIATION_STATUSES and doc.get("investigation_target_date") \
+            and getdate(doc.get("investigation_target_date")) < today:
+        counts[metric_key(OVERDUE_DEVIATIONS)] += 1
+
+    for action in (doc.get("corrective_actions") or []) + (doc.get("preventive_actions") or []):
+        if action.get("status") == "Closed":
+            continue
+        counts[metric_key(OPEN_CAPAS)] += 1
+        if action.get("target_completion_date") and getdate(action.get("target_completion_date")) < today:
+            counts[metric_key(OVERDUE_CAPAS)] += 1
+
+    return counts
+
+def batch_record_counts(doc, today=None):
+    if not doc or cint(doc.get("docstatus")) == 2 or doc.get("batch_status") not in PENDING_RELEASE_STATUSES:
+        return Counter()
+    return Counter({metric_key(BATCHES_PENDING_RELEASE): 1})
+
+DOCUMENT_COUNTS = {
+    "SPC Electronic Signature": signature_counts,
+    "SPC Deviation": deviation_counts,
+    "SPC Batch Record": batch_record_counts,
+}
+
+def get_count_changes(before, after):
+    """Non-zero differences between two contributions"""
+    changes = Counter(after)
+    changes.subtract(before)
+    return {key: value for key, value in changes.items() if value}
+
+# =============================================================================
+# STORE
+# =============================================================================
+
+def get_metric_name(key):
+    metric, metric_date, action_type, user_id = key
+    return hashlib.md5(f"{metric}|{metric_date or ''}|{action_type}|{user_id}".encode()).hexdigest()
+
+def increment_metrics(changes):
+    """Add counts to their rows in one statement, creating missing rows"""
+    if not changes:
+        return
+
+    now = now_datetime()
+    user = frappe.session.user
+    # Sorted by row name so concurrent transactions lock rows in the same order
+    rows = sorted((get_metric_name(key), key, value) for key, value in changes.items())
+
+    values = []
+    for name, (metric, metric_date, action_type, user_id), value in rows:
+        values.extend((name, user, now, now, user, metric, metric_date, action_type, user_id, value))
+
+    frappe.db.sql(f"""
+        INSERT INTO `tab{METRICS_DOCTYPE}`
+            (name, owner, creation, modified, modified_by, metric, metric_date, action_type, user_id, value)
+        VALUES {", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"] * len(rows))}
+        ON DUPLICATE KEY UPDATE value = value + VALUES(value), modified = VALUES(modified)
+    """, values)
+
+def update_compliance_metrics(doc, method=None):
+    """Document event: apply the change in the document's contribution to the counters"""
+    counts = DOCUMENT_COUNTS.get(doc.doctype)
+    if not counts or frappe.flags.in_install or frappe.flags.in_migrate:
+        return
+
+    today = getdate()
+    if method == "on_trash":
+        before, after = counts(doc, today), Counter()
+    else:
+        before, after = counts(doc.get_doc_before_save(), today), counts(doc, today)
+
+    increment_metrics(get_count_changes(before, after))
+
+# =============================================================================
+# RECONCILIATION
+# =============================================================================
+
+def count_from_source(from_date=None):
+    """Gauges and, from `from_date` (all history if None), daily counts"""
+    today = getdate()
+    counts = Counter()
+
+    for day, action_type, user_id, count in frappe.db.sql(f"""
+        SELECT DATE(timestamp), action_type, user_id, COUNT(*)
+        FROM `tabSPC Audit Trail`
+        WHERE timestamp IS NOT NULL {"AND timestamp >= %(from_date)s" if from_date else ""}
+        GROUP BY DATE(timestamp), action_type, user_id
+    """, {"from_date": from_date}):
+        counts[metric_key(AUDIT_RECORDS, day, action_type, user_id)] = count
+
+    for day, count in frappe.db.sql(f"""
+        SELECT DATE(signature_date), COUNT(*)
+        FROM `tabSPC Electronic Signature`
+        WHERE signature_date IS NOT NULL {"AND signature_date >= %(from_date)s" if from_date else ""}
+        GROUP BY DATE(signature_date)
+    """, {"from_date": from_date}):
+        counts[metric_key(SIGNATURES, day)] = count
+
+    deviations = frappe.db.sql("""
+        SELECT
+            SUM(deviation_status IN %(open)s),
+            SUM(IFNULL(deviation_status, '') NOT IN %(closed)s AND investigation_target_date < %(today)s)
+        FROM `tabSPC Deviation`
+        WHERE docstatus < 2
+    """, {"open": OPEN_DEVIATION_STATUSES, "closed": CLOSED_DEVIATION_STATUSES, "today": today})[0]
+
+    capas = frappe.db.sql("""
+        SELECT COUNT(*), SUM(capa.target_completion_date < %(today)s)
+        FROM `tabDeviation CAPA Action` capa
+        JOIN `tabSPC Deviation` deviation ON deviation.name = capa.parent
+        WHERE capa.parenttype = 'SPC Deviation'
+            AND deviation.docstatus < 2
+            AND IFNULL(capa.status, '') != 'Closed'
+    """, {"today": today})[0]
+
+    pending_release = frappe.db.sql("""
+        SELECT COUNT(*)
+        FROM `tabSPC Batch Record`
+        WHERE docstatus < 2 AND batch_status IN %(statuses)s
+    """, {"statuses": PENDING_RELEASE_STATUSES})[0][0]
+
+    for metric, value in zip(GAUGES, (*deviations, *capas, pending_release)):
+        counts[metric_key(metric)] = cint(value)
+
+    return counts
+
+def reconcile_compliance_metrics(days=RECONCILE_DAYS):
+    """Replace the gauges and the last `days` of daily counts (all of them if None) with fresh counts"""
+    from amb_w_spc.fda_compliance.audit_trail import get_chain_head
+
+    from_date = add_days(getdate(), -days) if days is not None else None
+
+    # Holds the audit writer off so no batch is counted twice or not at all
+    get_chain_head(for_update=True)
+
+    counts = count_from_source(from_date)
+    frappe.db.sql(f"""
+        DELETE FROM `tab{METRICS_DOCTYPE}`
+        WHERE metric IN %(gauges)s
+            OR (metric IN %(daily)s {"AND metric_date >= %(from_date)s" if from_date else ""})
+    """, {"gauges": GAUGES, "daily": DAILY_METRICS, "from_date": from_date})
+    increment_metrics({key: value for key, value in counts.items() if value})
+
+    # Days the retention policy has archived out of the audit trail
+    oldest = frappe.db.sql("SELECT MIN(timestamp) FROM `tabSPC Audit Trail`")[0][0]
+    frappe.db.sql(f"""
+        DELETE FROM `tab{METRICS_DOCTYPE}`
+        WHERE metric = %s AND metric_date < %s
+    """, (AUDIT_RECORDS, getdate(oldest) if oldest else getdate()))
+    frappe.db.commit()
+
+    return {"metrics": len(counts), "from_date": from_date}
+
+@frappe.whitelist()
+def rebuild_compliance_metrics():
+    """Recount every metric from the full history, in the background"""
+    frappe.only_for("System Manager")
+    frappe.enqueue(
+        "amb_w_spc.fda_compliance.compliance_metrics.reconcile_compliance_metrics",
+        queue="long",
+        timeout=60 * 60,
+        job_id="amb_w_spc_compliance_metrics_rebuild",
+        deduplicate=True,
+        days=None
+    )
+
+# =============================================================================
+# READ
+# =============================================================================
+
+def get_gauges():
+    values = dict(frappe.db.sql(f"""
+        SELECT metric, value
+        FROM `tab{METRICS_DOCTYPE}`
+        WHERE metric IN %s AND metric_date IS NULL
+    """, [GAUGES]))
+    return {metric: cint(values.get(metric)) for metric in GAUGES}
+
+def get_daily_total(metric, from_date=None):
+    return cint(frappe.db.sql(f"""
+        SELECT SUM(value)
+        FROM `tab{METRICS_DOCTYPE}`
+        WHERE metric = %(metric)s {"AND metric_date >= %(from_date)s" if from_date else ""}
+    """, {"metric": metric, "from_date": from_date})[0][0])
+
+def get_audit_summary(from_date):
+    """Audit records per action and user since `from_date`"""
+    return frappe.db.sql(f"""
+        SELECT action_type, SUM(value) AS count, user_id
+        FROM `tab{METRICS_DOCTYPE}`
+        WHERE metric = %(metric)s AND metric_date >= %(from_date)s
+        GROUP BY action_type, user_id
+        ORDER BY count DESC
+    """, {"metric": AUDIT_RECORDS, "from_date": from_date}, as_dict=True)
@@ -0,0 +1,13 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+class AuditTrailVerificationSegment(Document):
+    """Verification checkpoint for one month of the audit hash chain
+
+    Rows are written by amb_w_spc.fda_compliance.audit_verification, never by hand.
+    """
+    
+    pass
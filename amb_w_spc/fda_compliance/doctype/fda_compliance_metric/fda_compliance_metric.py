@@ -0,0 +1,16 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+class FDAComplianceMetric(Document):
+    """One compliance counter: a daily count or a current-state gauge
+
+    Rows are written by amb_w_spc.fda_compliance.compliance_metrics, never by hand.
+    """
+    
+    pass
+
+def on_doctype_update():
+    frappe.db.add_index("FDA Compliance Metric", ["metric", "metric_date"])
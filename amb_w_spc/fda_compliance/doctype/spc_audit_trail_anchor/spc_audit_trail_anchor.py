@@ -0,0 +1,13 @@
+# Copyright (c) 2025, SPC System and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+class SPCAuditTrailAnchor(Document):
+    """Where the archived part of the audit hash chain ends
+
+    Rows are written by amb_w_spc.system_integration.data_retention, never by hand.
+    """
+    
+    pass
@@ -0,0 +1,13 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+class SPCAuditTrailQueue(Document):
+    """Audit record waiting for the background writer
+
+    Rows are written and drained by amb_w_spc.fda_compliance.audit_trail, never by hand.
+    """
+    
+    pass
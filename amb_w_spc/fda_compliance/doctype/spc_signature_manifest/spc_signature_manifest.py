@@ -0,0 +1,13 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+class SPCSignatureManifest(Document):
+    """Manifest of one bulk electronic signing session
+
+    Rows are written by amb_w_spc.fda_compliance.bulk_signature, never by hand.
+    """
+    
+    pass
@@ -17,84 +17,14 @@ from frappe import _
 # AUDIT TRAIL CAPTURE
 # =============================================================================
 
-def capture_audit_trail(doc, method):
-    """
-    Automatic audit trail capture for all document operations
-    This should be called from document hooks (after_insert, on_update, on_cancel, etc.)
-    """
-    if doc.doctype == "SPC Audit Trail":
-        return  # Prevent recursive calls
-    
-    try:
-        # Determine action type based on method
-        action_mapping = {
-            'after_insert': 'Create',
-            'on_update': 'Update', 
-            'on_cancel': 'Delete',
-            'on_submit': 'Approve',
-            'before_print': 'Print'
-        }
-        
-        action_type = action_mapping.get(method, 'Read')
-        
-        # Get session information
-        request = frappe.local.request
-        ip_address = frappe.utils.get_request_ip()
-        browser_info = request.headers.get('User-Agent', '') if request else ''
-        
-        # Create audit trail record
-        audit_trail = frappe.get_doc({
-            'doctype': 'SPC Audit Trail',
-            'record_id': f"{doc.doctype}_{doc.name}_{frappe.utils.now()}",
-            'timestamp': frappe.utils.now(),
-            'user_id': frappe.session.user,
-            'action_type': action_type,
-            'table_name': doc.doctype,
-            'record_name': doc.name,
-            'ip_address': ip_address,
-            'browser_info': browser_info,
-            'session_id': frappe.session.sid,
-            'checksum': generate_checksum(doc),
-            'hash_value': generate_hash(doc),
-            'backup_status': 'Pending'
-        })
-        
-        # Add field changes for updates
-        if method == 'on_update' and hasattr(doc, '_doc_before_save'):
-            changes = get_document_changes(doc._doc_before_save, doc)
-            if changes:
-                audit_trail.field_changed = changes['field']
-                audit_trail.old_value = changes['old_value']
-                audit_trail.new_value = changes['new_value']
-        
-        audit_trail.insert(ignore_permissions=True)
-        
-    except Exception as e:
-        frappe.log_error(f"Audit trail capture failed: {str(e)}", "FDA Compliance Error")
-
-def generate_checksum(doc):
-    """Generate MD5 checksum for document data integrity"""
-    doc_data = json.dumps(doc.as_dict(), sort_keys=True, default=str)
-    return hashlib.md5(doc_data.encode()).hexdigest()
-
-def generate_hash(doc):
-    """Generate SHA-256 hash for tamper detection"""
-    doc_data = json.dumps(doc.as_dict(), sort_keys=True, default=str)
-    return hashlib.sha256(doc_data.encode()).hexdigest()
-
-def get_document_changes(old_doc, new_doc):
-    """Compare documents and return first significant change"""
-    for field in new_doc.meta.fields:
-        if field.fieldtype in ['Data', 'Text', 'Select', 'Float', 'Int', 'Date', 'Datetime']:
-            old_value = old_doc.get(field.fieldname)
-            new_value = new_doc.get(field.fieldname)
-            if old_value != new_value:
-                return {
-                    'field': field.fieldname,
-                    'old_value': str(old_value or ''),
-                    'new_value': str(new_value or '')
-                }
-    return None
+# Capture, hash chaining and the background writer live in audit_trail.py;
+# re-exported here for hooks and scripts that still use this module's path
+from amb_w_spc.fda_compliance.audit_trail import capture_audit_trail, get_document_changes
+from amb_w_spc.fda_compliance.compliance_metrics import (
+    AUDIT_RECORDS, BATCHES_PENDING_RELEASE, OPEN_CAPAS, OPEN_DEVIATIONS, OVERDUE_CAPAS, OVERDUE_DEVIATIONS,
+    SIGNATURES, get_audit_summary, get_daily_total, get_gauges,
+)
+from amb_w_spc.system_integration.sequences import next_sequence
 
 # =============================================================================
 # ELECTRONIC SIGNATURE VALIDATION
@@ -119,20 +49,30 @@ def validate_electronic_signature(doc, method):
     
     # Generate signature hash
     if not doc.signature_hash:
-        signature_data = f"{doc.signer_name}_{doc.signature_date}_{doc.signature_meaning}_{doc.document_type}_{doc.document_name}"
-        doc.signature_hash = hashlib.sha256(signature_data.encode()).hexdigest()
+        doc.signature_hash = generate_signature_hash(doc.signer_name, doc.signature_date, doc.signature_meaning,
+                                                     doc.document_type, doc.document_name)
     
     # Set CFR Part 11 compliance flag
     doc.cfr_part11_compliant = 1
     
     # Create signature components JSON
-    components = {
-        'printed_name': frappe.get_value('User', doc.signer_name, 'full_name'),
-        'date_time': doc.signature_date,
-        'meaning': doc.signature_meaning,
-        'method': doc.signature_method
+    doc.signature_components = json.dumps(get_signature_components(
+        frappe.get_value('User', doc.signer_name, 'full_name'), doc.signature_date,
+        doc.signature_meaning, doc.signature_method), default=str)
+
+def generate_signature_hash(signer, signature_date, signature_meaning, document_type, document_name):
+    """Hash binding a signer, time and meaning to a document"""
+    signature_data = f"{signer}_{signature_date}_{signature_meaning}_{document_type}_{document_name}"
+    return hashlib.sha256(signature_data.encode()).hexdigest()
+
+def get_signature_components(printed_name, signature_date, signature_meaning, signature_method):
+    """The signature manifestation required by 21 CFR 11.50"""
+    return {
+        'printed_name': printed_name,
+        'date_time': signature_date,
+        'meaning': signature_meaning,
+        'method': signature_method
     }
-    doc.signature_components = json.dumps(components)
 
 # =============================================================================
 # BATCH RECORD VALIDATION
@@ -206,24 +146,21 @@ def validate_deviation(doc, method):
             doc.regulatory_timeline = frappe.utils.add_days(doc.detection_date, 15)
 
 def generate_deviation_number(plant, deviation_type):
-    """Generate unique deviation number"""
+    """Generate unique deviation number from the plant/type/year sequence"""
     plant_code = frappe.get_value('Warehouse', plant, 'warehouse_name')[:3].upper()
     type_code = deviation_type[:3].upper()
     year = datetime.now().year
+    prefix = f"DEV-{plant_code}-{type_code}-{year}-"
     
-    # Get next sequence number
-    existing = frappe.get_all('SPC Deviation', 
-                            filters={'name': ['like', f'DEV-{plant_code}-{type_code}-{year}-%']},
-                            order_by='creation desc',
-                            limit=1)
-    
-    if existing:
-        last_num = existing[0].name.split('-')[-1]
-        next_num = int(last_num) + 1
-    else:
-        next_num = 1
+    def last_issued():
+        # Seeds the counter once, from numbers issued before it existed
+        return frappe.db.sql("""
+            SELECT MAX(CAST(SUBSTRING_INDEX(deviation_number, '-', -1) AS UNSIGNED))
+            FROM `tabSPC Deviation`
+            WHERE deviation_number LIKE %s
+        """, f"{prefix}%")[0][0]
     
-    return f"DEV-{plant_code}-{type_code}-{year}-{next_num:04d}"
+    return f"{prefix}{next_sequence(prefix, seed=last_issued):04d}"
 
 # =============================================================================
 # DATA INTEGRITY VALIDATION
@@ -339,22 +276,16 @@ doc_events = {
 # =============================================================================
 
 def get_fda_compliance_dashboard():
-    """Generate FDA compliance dashboard data"""
+    """Generate FDA compliance dashboard data from the precomputed compliance metrics"""
+    gauges = get_gauges()
     return {
-        'audit_trail_count': frappe.db.count('SPC Audit Trail'),
-        'signatures_today': frappe.db.count('SPC Electronic Signature', {
-            'signature_date': ['>=', frappe.utils.today()]
-        }),
-        'open_deviations': frappe.db.count('SPC Deviation', {
-            'deviation_status': ['in', ['Open', 'Under Investigation']]
-        }),
-        'overdue_capadont': frappe.db.count('Deviation CAPA Action', {
-            'status': ['!=', 'Closed'],
-            'target_completion_date': ['<', frappe.utils.today()]
-        }),
-        'batches_pending_release': frappe.db.count('SPC Batch Record', {
-            'batch_status': ['in', ['Complete', 'Approved']]
-        })
+        'audit_trail_count': get_daily_total(AUDIT_RECORDS),
+        'signatures_today': get_daily_total(SIGNATURES, from_date=frappe.utils.today()),
+        'open_deviations': gauges[OPEN_DEVIATIONS],
+        'overdue_deviations': gauges[OVERDUE_DEVIATIONS],
+        'open_capas': gauges[OPEN_CAPAS],
+        'overdue_capadont': gauges[OVERDUE_CAPAS],
+        'batches_pending_release': gauges[BATCHES_PENDING_RELEASE]
     }
 
 def run_compliance_check():
@@ -376,12 +307,15 @@ def run_compliance_check():
     if overdue_investigations:
         issues.append(f"Found {len(overdue_investigations)} overdue investigations")
     
-    # Check for missing audit trails
-    recent_changes = frappe.get_all('Version', filters={'creation': ['>=', frappe.utils.add_days(None, -1)]})
-    audit_records = frappe.get_all('SPC Audit Trail', filters={'timestamp': ['>=', frappe.utils.add_days(None, -1)]})
+    # Check the audit trail hash chain (verified incrementally in the background)
+    from amb_w_spc.fda_compliance.audit_verification import get_audit_trail_integrity_report
     
-    if len(recent_changes) != len(audit_records):
-        issues.append("Audit trail records do not match document changes")
+    integrity = get_audit_trail_integrity_report()
+    if integrity['issue_count']:
+        issues.append(f"Audit trail integrity check found {integrity['issue_count']} gaps or mismatches "
+                      f"across {len(integrity['issues_by_document'])} documents")
+    elif integrity['status'] == 'Incomplete':
+        issues.append("Audit trail integrity verification has not completed")
     
     return issues
 
@@ -403,13 +337,7 @@ def daily_compliance_check():
 
 def weekly_audit_trail_summary():
     """Weekly audit trail summary for compliance review"""
-    summary = frappe.db.sql("""
-        SELECT action_type, COUNT(*) as count, user_id
-        FROM `tabSPC Audit Trail`
-        WHERE timestamp >= DATE_SUB(NOW(), INTERVAL 7 DAY)
-        GROUP BY action_type, user_id
-        ORDER BY count DESC
-    """, as_dict=True)
+    summary = get_audit_summary(frappe.utils.add_days(frappe.utils.today(), -7))
     
     # Generate and email summary report
     html_content = frappe.render_template('templates/audit_trail_summary.html', {'data': summary})
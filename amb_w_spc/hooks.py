@@ -47,6 +47,29 @@ override_doctype_class = {
 }
 
 doc_events = {
+    # ---- 21 CFR Part 11 audit trail for the regulated SPC/FDA modules (buffered per transaction, chained in the background)
+    "*": {
+        "after_insert": "amb_w_spc.fda_compliance.audit_trail.capture_audit_trail",
+        "on_update": "amb_w_spc.fda_compliance.audit_trail.capture_audit_trail",
+        "on_submit": "amb_w_spc.fda_compliance.audit_trail.capture_audit_trail",
+        "on_cancel": "amb_w_spc.fda_compliance.audit_trail.capture_audit_trail",
+    },
+    # ---- SPC Data Point validation, rolling window statistics and Nelson rule state (applied once the point is committed)
+    "SPC Data Point": {
+        "validate": "amb_w_spc.core_spc.spc_server_validations.validate_spc_data_point",
+        "after_insert": [
+            "amb_w_spc.core_spc.spc_rolling_statistics.record_data_point",
+            "amb_w_spc.core_spc.spc_control_rules.record_control_rules",
+        ],
+        "on_update": [
+            "amb_w_spc.core_spc.spc_rolling_statistics.refresh_data_point_window",
+            "amb_w_spc.core_spc.spc_control_rules.refresh_control_rules",
+        ],
+        "on_trash": [
+            "amb_w_spc.core_spc.spc_rolling_statistics.refresh_data_point_window",
+            "amb_w_spc.core_spc.spc_control_rules.refresh_control_rules",
+        ],
+    },
     # ---- Batch AMB: Golden number auto-generation via amb_w_spc controller
     "Batch AMB": {
         "validate": [
@@ -55,5 +78,129 @@ doc_events = {
         "before_save": [
             "amb_w_spc.sfc_manufacturing.doctype.batch_amb.batch_amb.batch_amb_before_save",
         ],
+        # ---- Batch AMB Closure (hierarchy index) and widget announcement pushes
+        "on_update": [
+            "amb_w_spc.sfc_manufacturing.integration.batch_genealogy.update_batch_closure",
+            "amb_w_spc.sfc_manufacturing.integration.batch_announcements.publish_batch_change",
+        ],
+        "on_trash": [
+            "amb_w_spc.sfc_manufacturing.integration.batch_genealogy.remove_batch_closure",
+            "amb_w_spc.sfc_manufacturing.integration.batch_announcements.publish_batch_removal",
+        ],
+    },
+    # ---- Warehouse dashboard snapshots and access context cache
+    "Warehouse": {
+        "on_update": [
+            "amb_w_spc.sfc_manufacturing.warehouse_management.dashboard_snapshots.queue_snapshot_refresh",
+            "amb_w_spc.system_integration.access_context.clear_all_access_contexts",
+        ],
+        "after_insert": "amb_w_spc.system_integration.access_context.clear_all_access_contexts",
+        "on_trash": "amb_w_spc.system_integration.access_context.clear_all_access_contexts",
+    },
+    # ---- Pick task priorities and zone pick queues (pick tasks are child rows of the fulfillment)
+    "Sales Order Fulfillment": {
+        "before_save": "amb_w_spc.sfc_manufacturing.warehouse_management.pick_scheduler.set_fulfillment_task_priorities",
+        "on_update": [
+            "amb_w_spc.sfc_manufacturing.warehouse_management.dashboard_snapshots.queue_snapshot_refresh",
+            "amb_w_spc.sfc_manufacturing.warehouse_management.pick_scheduler.queue_task_requeue",
+        ],
+        "on_trash": [
+            "amb_w_spc.sfc_manufacturing.warehouse_management.dashboard_snapshots.queue_snapshot_refresh",
+            "amb_w_spc.sfc_manufacturing.warehouse_management.pick_scheduler.queue_task_requeue",
+        ],
+    },
+    "Warehouse Alert": {
+        "on_update": "amb_w_spc.sfc_manufacturing.warehouse_management.dashboard_snapshots.queue_snapshot_refresh",
+        "on_trash": "amb_w_spc.sfc_manufacturing.warehouse_management.dashboard_snapshots.queue_snapshot_refresh",
+    },
+    # ---- FDA compliance dashboard counters
+    "SPC Electronic Signature": {
+        "on_update": "amb_w_spc.fda_compliance.compliance_metrics.update_compliance_metrics",
+        "on_update_after_submit": "amb_w_spc.fda_compliance.compliance_metrics.update_compliance_metrics",
+        "on_cancel": "amb_w_spc.fda_compliance.compliance_metrics.update_compliance_metrics",
+        "on_trash": "amb_w_spc.fda_compliance.compliance_metrics.update_compliance_metrics",
+    },
+    "SPC Deviation": {
+        "on_update": "amb_w_spc.fda_compliance.compliance_metrics.update_compliance_metrics",
+        "on_update_after_submit": "amb_w_spc.fda_compliance.compliance_metrics.update_compliance_metrics",
+        "on_cancel": "amb_w_spc.fda_compliance.compliance_metrics.update_compliance_metrics",
+        "on_trash": "amb_w_spc.fda_compliance.compliance_metrics.update_compliance_metrics",
+    },
+    "SPC Batch Record": {
+        "on_update": "amb_w_spc.fda_compliance.compliance_metrics.update_compliance_metrics",
+        "on_update_after_submit": "amb_w_spc.fda_compliance.compliance_metrics.update_compliance_metrics",
+        "on_cancel": "amb_w_spc.fda_compliance.compliance_metrics.update_compliance_metrics",
+        "on_trash": "amb_w_spc.fda_compliance.compliance_metrics.update_compliance_metrics",
+    },
+    # ---- Warehouse access context cache
+    "User": {
+        "on_update": "amb_w_spc.system_integration.access_context.clear_user_access_context",
+        "on_trash": "amb_w_spc.system_integration.access_context.clear_user_access_context",
+    },
+    "User Permission": {
+        "on_update": "amb_w_spc.system_integration.access_context.clear_user_access_context",
+        "on_trash": "amb_w_spc.system_integration.access_context.clear_user_access_context",
+    },
+    "Role": {
+        "on_update": "amb_w_spc.system_integration.access_context.clear_all_access_contexts",
+        "on_trash": "amb_w_spc.system_integration.access_context.clear_all_access_contexts",
+    },
+    # ---- Receiving Operations Dashboard report cache and batch traceability graphs
+    "Purchase Receipt": {
+        "on_submit": [
+            "amb_w_spc.sfc_manufacturing.report.receiving_operations_dashboard.receiving_operations_dashboard.clear_report_cache",
+            "amb_w_spc.sfc_manufacturing.warehouse_management.traceability.clear_traceability_cache",
+        ],
+        "on_cancel": [
+            "amb_w_spc.sfc_manufacturing.report.receiving_operations_dashboard.receiving_operations_dashboard.clear_report_cache",
+            "amb_w_spc.sfc_manufacturing.warehouse_management.traceability.clear_traceability_cache",
+        ],
+    },
+    "Quality Inspection": {
+        "on_submit": "amb_w_spc.sfc_manufacturing.report.receiving_operations_dashboard.receiving_operations_dashboard.clear_report_cache",
+        "on_cancel": "amb_w_spc.sfc_manufacturing.report.receiving_operations_dashboard.receiving_operations_dashboard.clear_report_cache",
+    },
+    "Stock Entry": {
+        "on_submit": [
+            "amb_w_spc.sfc_manufacturing.report.receiving_operations_dashboard.receiving_operations_dashboard.clear_report_cache",
+            "amb_w_spc.sfc_manufacturing.warehouse_management.traceability.clear_traceability_cache",
+        ],
+        "on_cancel": [
+            "amb_w_spc.sfc_manufacturing.report.receiving_operations_dashboard.receiving_operations_dashboard.clear_report_cache",
+            "amb_w_spc.sfc_manufacturing.warehouse_management.traceability.clear_traceability_cache",
+        ],
+    },
+    "Delivery Note": {
+        "on_submit": "amb_w_spc.sfc_manufacturing.warehouse_management.traceability.clear_traceability_cache",
+        "on_cancel": "amb_w_spc.sfc_manufacturing.warehouse_management.traceability.clear_traceability_cache",
+    },
+}
+
+scheduler_events = {
+    "cron": {
+        # ---- Shop floor polling engine watchdog (restarts the engine when its heartbeat stops)
+        "* * * * *": [
+            "amb_w_spc.shop_floor_control.scheduler.collect_sensor_data",
+        ],
     },
+    "hourly": [
+        # ---- Alert digests, audit trail writer catch-up, warehouse snapshots and connectivity compaction
+        "amb_w_spc.system_integration.scripts.automation_scripts.hourly_spc_checks",
+        # ---- Re-rank open pick tasks for date drift and rebuild the zone pick queues
+        "amb_w_spc.sfc_manufacturing.warehouse_management.scheduler.update_pick_task_priorities",
+    ],
+    "daily": [
+        # ---- Archive and purge aged telemetry and audit trail rows (runs on the long queue)
+        "amb_w_spc.system_integration.data_retention.enqueue_retention_run",
+        # ---- Recount the batch widget stats (doc events adjust them in between)
+        "amb_w_spc.sfc_manufacturing.integration.batch_announcements.rebuild_stats",
+        # ---- Verify audit trail months that changed since their last checkpoint (fanned out on the long queue)
+        "amb_w_spc.fda_compliance.audit_verification.enqueue_audit_verification",
+        # ---- Recount compliance gauges and the last days of daily counts (doc events adjust them in between)
+        "amb_w_spc.fda_compliance.compliance_metrics.reconcile_compliance_metrics",
+    ],
+    "weekly": [
+        # ---- Full audit trail verification, including months whose checkpoints still match
+        "amb_w_spc.fda_compliance.audit_verification.enqueue_full_audit_verification",
+    ],
 }
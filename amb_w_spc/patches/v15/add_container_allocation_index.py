@@ -0,0 +1,12 @@
+import frappe
+
+
+def execute():
+    """(parent, idx) index on Container Barrels for bulk serial allocation"""
+    from amb_w_spc.system_integration.index_audit import ensure_index
+
+    result = ensure_index("Container Barrels", ["parent", "idx"])
+    if result["status"] not in ("exists", "created"):
+        print(f"Skipped index {result['index_name']} on {result['doctype']}: {result['status']}")
+
+    frappe.db.commit()
@@ -0,0 +1,12 @@
+import frappe
+
+
+def execute():
+    """Composite indexes for the filters used on ingestion, SPC and polling hot paths"""
+    from amb_w_spc.system_integration.index_audit import ensure_indexes
+
+    for result in ensure_indexes():
+        if result["status"] not in ("exists", "created"):
+            print(f"Skipped index {result['index_name']} on {result['doctype']}: {result['status']}")
+
+    frappe.db.commit()
@@ -0,0 +1,13 @@
+import frappe
+
+
+def execute():
+    """Create the SPC Control Chart columns the chart and alert code read"""
+    frappe.reload_doc("core_spc", "doctype", "spc_control_chart", force=True)
+
+    # Charts created before the fields existed stay active with alerts on, as before
+    frappe.db.sql("""
+        UPDATE `tabSPC Control Chart`
+        SET status = IFNULL(status, 'Active'), enable_alerts = IFNULL(enable_alerts, 1)
+    """)
+    frappe.db.commit()
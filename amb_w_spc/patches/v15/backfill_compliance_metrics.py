@@ -0,0 +1,13 @@
+import frappe
+
+
+def execute():
+    """Count the compliance metrics from full history"""
+    frappe.enqueue(
+        "amb_w_spc.fda_compliance.compliance_metrics.reconcile_compliance_metrics",
+        queue="long",
+        timeout=60 * 60,
+        job_id="amb_w_spc_compliance_metrics_rebuild",
+        deduplicate=True,
+        days=None
+    )
@@ -0,0 +1,10 @@
+import frappe
+
+
+def execute():
+    """Backfill the Batch AMB Closure table from parent_batch_amb"""
+    from amb_w_spc.sfc_manufacturing.integration.batch_genealogy import rebuild_batch_closure
+
+    frappe.reload_doc("sfc_manufacturing", "doctype", "batch_amb_closure")
+    rebuild_batch_closure()
+    frappe.db.commit()
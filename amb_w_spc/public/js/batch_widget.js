@@ -30,7 +30,7 @@ if (typeof frappe !== 'undefined' && frappe.router) {
 
 // Enhanced Configuration
 amb.batch_widget.config = {
-    refreshInterval: 300000, // 5 minutes (300,000 ms)
+    feedLimit: 50, // batches kept by the widget (same window as the server)
     autoMinimizeDelay: 120000, // 2 minutes
     maxRetries: 3,
     retryDelay: 10000, // 10 seconds
@@ -52,7 +52,8 @@ amb.batch_widget.state = {
     lastFetchTime: null,
     cache: null,
     cacheTimestamp: null,
-    refreshTimer: null,
+    cursor: null, // latest `modified` seen; the server sends only newer changes
+    announcements: {}, // name -> announcement, merged from snapshot, deltas and realtime pushes
     isOnline: true,
     isDragging: false
 };
@@ -266,15 +267,24 @@ function setupResizeHandler() {
 // =============================================================================
 
 function setupSmartRefresh() {
-    if (amb.batch_widget.state.refreshTimer) {
-        clearInterval(amb.batch_widget.state.refreshTimer);
-    }
+    // Changes are pushed by the server to the Batch AMB room; no polling
+    frappe.realtime.doctype_subscribe('Batch AMB');
+    frappe.realtime.off('batch_announcements');
+    frappe.realtime.on('batch_announcements', function(data) {
+        if (!amb.batch_widget.state.cursor) return; // no snapshot yet, the first fetch will include it
+        merge_announcement_feed(data);
+        if (!document.hidden && !isWidgetHidden() && $('.batch-announcement-widget').length) {
+            display_cached_data();
+        }
+    });
     
-    amb.batch_widget.state.refreshTimer = setInterval(function() {
-        if (!document.hidden && amb.batch_widget.state.isOnline && !isWidgetHidden()) {
+    // Catch up on anything pushed while the socket was down
+    frappe.realtime.on('connect', function() {
+        if (amb.batch_widget.state.cursor && !isWidgetHidden()) {
+            amb.batch_widget.state.cacheTimestamp = null;
             update_batch_announcements();
         }
-    }, amb.batch_widget.config.refreshInterval);
+    });
     
     document.addEventListener('visibilitychange', function() {
         if (!document.hidden && !amb.batch_widget.state.isFetching && !isWidgetHidden()) {
@@ -315,7 +325,8 @@ function update_batch_announcements() {
         args: {
             include_companies: true,
             include_plants: true,
-            include_quality: true
+            include_quality: true,
+            since: amb.batch_widget.state.cursor
         },
         callback: function(r) {
             amb.batch_widget.state.isFetching = false;
@@ -323,8 +334,8 @@ function update_batch_announcements() {
             
             if (r.message && r.message.success) {
                 console.log('✅ API call successful');
-                amb.batch_widget.state.cache = r.message;
-                process_api_response(r.message);
+                merge_announcement_feed(r.message);
+                process_api_response(amb.batch_widget.state.cache);
             } else {
                 console.warn('⚠️ API returned unsuccessful response:', r.message);
                 handle_api_error(r.message || {error: 'Unknown API error'});
@@ -339,6 +350,51 @@ function update_batch_announcements() {
     });
 }
 
+// Apply a snapshot (reset), a delta or a realtime push to the local state
+function merge_announcement_feed(feed) {
+    const state = amb.batch_widget.state;
+    if (feed.reset) {
+        state.announcements = {};
+    }
+    
+    (feed.removed || []).forEach(function(name) {
+        delete state.announcements[name];
+    });
+    (feed.announcements || []).forEach(function(announcement) {
+        state.announcements[announcement.name] = announcement;
+    });
+    
+    if (feed.cursor && (!state.cursor || feed.cursor > state.cursor)) {
+        state.cursor = feed.cursor;
+    }
+    
+    const announcements = Object.values(state.announcements)
+        .sort(function(a, b) { return a.modified < b.modified ? 1 : -1; })
+        .slice(0, amb.batch_widget.config.feedLimit);
+    state.announcements = {};
+    announcements.forEach(function(announcement) {
+        state.announcements[announcement.name] = announcement;
+    });
+    
+    const grouped = {};
+    announcements.forEach(function(announcement) {
+        const company = announcement.company;
+        const plant = announcement.plant_code || '1';
+        grouped[company] = grouped[company] || {};
+        grouped[company][plant] = grouped[company][plant] || [];
+        grouped[company][plant].push(announcement);
+    });
+    
+    state.cache = {
+        success: true,
+        announcements: announcements,
+        grouped_announcements: grouped,
+        stats: feed.stats || (state.cache && state.cache.stats) || {total: 0},
+        message: announcements.length ? undefined : 'No active batches'
+    };
+    state.cacheTimestamp = Date.now();
+}
+
 function process_api_response(response) {
     if (!response) {
         show_error_message('No data received from server');
@@ -913,12 +969,6 @@ window.reset_batch_widget_position = function() {
     }
 };
 
-$(window).on('beforeunload', function() {
-    if (amb.batch_widget.state.refreshTimer) {
-        clearInterval(amb.batch_widget.state.refreshTimer);
-    }
-});
-
 console.log('✅ Enhanced Batch Widget v2.0 loaded (Responsive + Draggable + Hide Duration)');
 
 // =============================================================================
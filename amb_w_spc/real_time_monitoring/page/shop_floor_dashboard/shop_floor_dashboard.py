@@ -5,6 +5,12 @@ import frappe
 from frappe import _
 from frappe.utils import now, add_hours, add_minutes
 
+from amb_w_spc.sensor_management.rollups import choose_resolution, get_rollup_series
+from amb_w_spc.shop_floor_control.connectivity import get_connection_quality
+
+STATION_STATUS_CACHE_KEY = "shop_floor_dashboard:station_status"
+STATION_STATUS_TTL = 5
+
 @frappe.whitelist()
 def get_dashboard_data():
     """Get all data needed for real-time dashboard"""
@@ -22,7 +28,19 @@ def get_dashboard_data():
         return {"error": str(e)}
 
 def get_station_status():
-    """Get current status of all manufacturing stations"""
+    """Get current status of all manufacturing stations
+    
+    Built once every few seconds and shared by every dashboard viewer.
+    """
+    stations = frappe.cache().get_value(STATION_STATUS_CACHE_KEY)
+    if stations is None:
+        stations = build_station_status()
+        frappe.cache().set_value(STATION_STATUS_CACHE_KEY, stations, expires_in_sec=STATION_STATUS_TTL)
+    
+    return stations
+
+def build_station_status():
+    """Station rows plus sensor, alert and connection figures from grouped queries"""
     try:
         stations = frappe.db.sql("""
             SELECT 
@@ -51,19 +69,17 @@ def get_station_status():
             ORDER BY ms.station_name
         """, as_dict=True)
         
-        # Enhance station data with real-time metrics
+        if not stations:
+            return stations
+        
+        station_names = [station.name for station in stations]
+        sensor_counts = get_active_counts_by_station("Sensor Configuration", station_names)
+        alert_counts = get_active_counts_by_station("Process Alert", station_names)
+        connection_quality = get_connection_quality(station_names)
+        
         for station in stations:
-            # Get latest sensor readings count
-            station['sensor_count'] = frappe.db.count("Sensor Configuration", {
-                "station": station.name,
-                "status": "Active"
-            })
-            
-            # Get active alerts count
-            station['active_alerts'] = frappe.db.count("Process Alert", {
-                "station": station.name,
-                "status": "Active"
-            })
+            station['sensor_count'] = sensor_counts.get(station.name, 0)
+            station['active_alerts'] = alert_counts.get(station.name, 0)
             
             # Calculate production progress
             if station.current_work_order and station.work_order_qty:
@@ -71,8 +87,8 @@ def get_station_status():
             else:
                 station['production_progress'] = 0
             
-            # Get latest communication status
-            station['connection_quality'] = get_connection_quality(station.name)
+            # Share of polling attempts in the last hour that got a reading
+            station['connection_quality'] = connection_quality[station.name]
         
         return stations
         
@@ -80,27 +96,14 @@ def get_station_status():
         frappe.log_error(f"Error getting station status: {str(e)}")
         return []
 
-def get_connection_quality(station_name):
-    """Calculate connection quality based on recent communication"""
-    try:
-        # Get communication attempts in last hour
-        recent_communications = frappe.db.sql("""
-            SELECT 
-                COUNT(*) as total_attempts,
-                SUM(CASE WHEN communication_status = 'Online' THEN 1 ELSE 0 END) as successful_attempts
-            FROM `tabManufacturing Station`
-            WHERE name = %s
-            AND last_communication >= DATE_SUB(NOW(), INTERVAL 1 HOUR)
-        """, (station_name,), as_dict=True)
-        
-        if recent_communications and recent_communications[0].total_attempts > 0:
-            success_rate = recent_communications[0].successful_attempts / recent_communications[0].total_attempts
-            return round(success_rate * 100, 1)
-        
-        return 0
-        
-    except Exception:
-        return 0
+def get_active_counts_by_station(doctype, station_names):
+    """{station: count} of Active records of `doctype`, in one grouped query"""
+    return dict(frappe.db.sql(f"""
+        SELECT station, COUNT(*)
+        FROM `tab{doctype}`
+        WHERE status = 'Active' AND station IN %(stations)s
+        GROUP BY station
+    """, {"stations": tuple(station_names)}))
 
 def get_active_alerts():
     """Get all active process alerts"""
@@ -392,29 +395,50 @@ def get_station_details(station_name):
 
 @frappe.whitelist()
 def get_sensor_trend_chart_data(sensor_name, hours=24):
-    """Get trend data for sensor charts"""
+    """Get trend data for sensor charts
+    
+    Windows long enough to be served from rollups (see
+    sensor_management.rollups.choose_resolution) read pre-aggregated buckets;
+    short windows still read raw readings.
+    """
     try:
         from_time = add_hours(now(), -int(hours))
+        resolution = choose_resolution(hours)
         
-        data = frappe.db.sql("""
-            SELECT 
-                timestamp,
-                value,
-                status,
-                upper_limit,
-                lower_limit,
-                upper_alarm_limit,
-                lower_alarm_limit
-            FROM `tabReal-time Process Data`
-            WHERE sensor = %s
-            AND timestamp >= %s
-            ORDER BY timestamp ASC
-        """, (sensor_name, from_time), as_dict=True)
+        if resolution:
+            data = get_rollup_series(sensor_name, from_time, resolution)
+            
+            limits = frappe.db.get_value("Sensor Configuration", sensor_name,
+                ["upper_warning", "lower_warning", "upper_alarm", "lower_alarm"], as_dict=True) or {}
+            for point in data:
+                point.update({
+                    "status": "Normal" if not point.out_of_spec_count else "Warning",
+                    "upper_limit": limits.get("upper_warning"),
+                    "lower_limit": limits.get("lower_warning"),
+                    "upper_alarm_limit": limits.get("upper_alarm"),
+                    "lower_alarm_limit": limits.get("lower_alarm")
+                })
+        else:
+            data = frappe.db.sql("""
+                SELECT 
+                    timestamp,
+                    value,
+                    status,
+                    upper_limit,
+                    lower_limit,
+                    upper_alarm_limit,
+                    lower_alarm_limit
+                FROM `tabReal Time Process Data`
+                WHERE sensor = %s
+                AND timestamp >= %s
+                ORDER BY timestamp ASC
+            """, (sensor_name, from_time), as_dict=True)
         
         return {
             "sensor_name": sensor_name,
             "data": data,
-            "hours": hours
+            "hours": hours,
+            "resolution": resolution or "raw"
         }
         
     except Exception as e:
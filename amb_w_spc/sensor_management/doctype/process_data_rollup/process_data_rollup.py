@@ -0,0 +1,19 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+class ProcessDataRollup(Document):
+    """Aggregated Real Time Process Data for one sensor, parameter and time bucket
+
+    Rows are written by amb_w_spc.sensor_management.rollups, never by hand.
+    """
+    
+    pass
+
+def on_doctype_update():
+    # One row per bucket: rollups are upserted against this key
+    frappe.db.add_unique("Process Data Rollup", ["sensor", "parameter_name", "resolution", "bucket_start"],
+                         constraint_name="unique_rollup_bucket")
+    frappe.db.add_index("Process Data Rollup", ["sensor", "resolution", "bucket_start"])
@@ -4,4 +4,19 @@ from frappe.model.document import Document
 class RealTimeProcessData(Document):
     """Real Time Process Data Doctype"""
     
-    pass
+    def after_insert(self):
+        # Keep the 1m/15m/1h rollups in step with single-document inserts;
+        # batched writers (polling engine) update them per flush instead
+        from amb_w_spc.sensor_management.rollups import update_rollups
+        
+        update_rollups([self.as_dict()])
+
+
+@frappe.whitelist()
+def archive_old_data(days_to_keep=90):
+    """Archive readings older than `days_to_keep` days to compressed files and purge them"""
+    from amb_w_spc.system_integration.data_retention import archive_doctype
+    
+    frappe.only_for("System Manager")
+    
+    return archive_doctype("Real Time Process Data", days_to_keep, "timestamp")
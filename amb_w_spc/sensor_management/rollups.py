@@ -0,0 +1,205 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# Time-bucketed rollups of Real Time Process Data
+#
+# Every reading is folded into 1-minute, 15-minute and 1-hour buckets per
+# sensor and parameter (count, mean, sum of squared deviations from the mean,
+# min, max, out-of-spec count). Buckets are merged with Chan's parallel
+# variance update, so nothing grows with the square of the readings and no
+# difference of two large sums is taken. Trend queries read the coarsest bucket size that still gives a
+# usable number of points for the requested window instead of raw rows.
+
+import frappe
+from frappe.utils import add_to_date, cint, flt, get_datetime, now_datetime
+
+PROCESS_DATA_DOCTYPE = "Real Time Process Data"
+ROLLUP_DOCTYPE = "Process Data Rollup"
+
+# Resolution label -> bucket size in seconds, finest first
+RESOLUTIONS = (
+    ("1m", 60),
+    ("15m", 15 * 60),
+    ("1h", 60 * 60),
+)
+
+# A trend chart should have at least this many points before we fall back to
+# a finer resolution (or raw data)
+MIN_CHART_POINTS = 96
+
+
+def get_bucket_start(timestamp, seconds):
+    """Floor a timestamp to its bucket (bucket sizes divide an hour evenly)"""
+    timestamp = get_datetime(timestamp).replace(second=0, microsecond=0)
+    minutes = seconds // 60
+    return timestamp.replace(minute=timestamp.minute - timestamp.minute % minutes)
+
+
+def is_out_of_spec(reading):
+    if reading.get("status"):
+        return reading.get("status") != "Normal"
+    return reading.get("within_spec") is not None and not cint(reading.get("within_spec"))
+
+
+def get_std_dev(count, value_m2):
+    if count < 2:
+        return 0.0
+    return (max(value_m2, 0.0) / (count - 1)) ** 0.5
+
+
+def aggregate_readings(readings):
+    """Fold readings into {(sensor, parameter, resolution, bucket_start): aggregate}"""
+    buckets = {}
+
+    for reading in readings:
+        if not reading.get("sensor") or reading.get("value") is None:
+            continue
+
+        value = flt(reading.get("value"))
+        out_of_spec = 1 if is_out_of_spec(reading) else 0
+
+        for resolution, seconds in RESOLUTIONS:
+            key = (reading.get("sensor"), reading.get("parameter_name") or "", resolution,
+                   get_bucket_start(reading.get("timestamp") or now_datetime(), seconds))
+
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = {
+                    "station": reading.get("station"),
+                    "sample_count": 1,
+                    "mean_value": value,
+                    "value_m2": 0.0,
+                    "min_value": value,
+                    "max_value": value,
+                    "out_of_spec_count": out_of_spec,
+                }
+                continue
+
+            # Welford's update
+            bucket["sample_count"] += 1
+            delta = value - bucket["mean_value"]
+            bucket["mean_value"] += delta / bucket["sample_count"]
+            bucket["value_m2"] += delta * (value - bucket["mean_value"])
+            bucket["min_value"] = min(bucket["min_value"], value)
+            bucket["max_value"] = max(bucket["max_value"], value)
+            bucket["out_of_spec_count"] += out_of_spec
+
+    return buckets
+
+
+def update_rollups(readings):
+    """Merge a batch of readings into the rollup table with one upsert"""
+    buckets = aggregate_readings(readings)
+    if not buckets:
+        return 0
+
+    now = now_datetime()
+    user = frappe.session.user
+    placeholders = []
+    values = []
+
+    for (sensor, parameter_name, resolution, bucket_start), bucket in buckets.items():
+        count = bucket["sample_count"]
+        placeholders.append("(%s, %s, %s, %s, %s, 0, 0, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)")
+        values.extend([
+            frappe.generate_hash(length=12), now, now, user, user,
+            sensor, bucket["station"], parameter_name, resolution, bucket_start,
+            count, bucket["mean_value"], bucket["value_m2"],
+            bucket["min_value"], bucket["max_value"], bucket["out_of_spec_count"],
+            get_std_dev(count, bucket["value_m2"]),
+        ])
+
+    # Assignments are applied left to right: value_m2 and mean_value are
+    # merged against the stored count and mean before sample_count moves,
+    # and std_dev sees the merged values
+    frappe.db.sql(f"""
+        INSERT INTO `tab{ROLLUP_DOCTYPE}`
+            (name, creation, modified, owner, modified_by, docstatus, idx,
+             sensor, station, parameter_name, resolution, bucket_start,
+             sample_count, mean_value, value_m2, min_value, max_value, out_of_spec_count,
+             std_dev)
+        VALUES {", ".join(placeholders)}
+        ON DUPLICATE KEY UPDATE
+            modified = VALUES(modified),
+            value_m2 = value_m2 + VALUES(value_m2)
+                + POW(VALUES(mean_value) - mean_value, 2) * sample_count * VALUES(sample_count)
+                / (sample_count + VALUES(sample_count)),
+            mean_value = mean_value
+                + (VALUES(mean_value) - mean_value) * VALUES(sample_count) / (sample_count + VALUES(sample_count)),
+            sample_count = sample_count + VALUES(sample_count),
+            min_value = LEAST(min_value, VALUES(min_value)),
+            max_value = GREATEST(max_value, VALUES(max_value)),
+            out_of_spec_count = out_of_spec_count + VALUES(out_of_spec_count),
+            std_dev = IF(sample_count > 1, SQRT(GREATEST(value_m2, 0) / (sample_count - 1)), 0)
+    """, values)
+
+    return len(buckets)
+
+
+def choose_resolution(hours):
+    """Coarsest resolution that still yields MIN_CHART_POINTS over the window, or None for raw data"""
+    window_seconds = flt(hours) * 3600
+    chosen = None
+
+    for resolution, seconds in RESOLUTIONS:
+        if window_seconds / seconds >= MIN_CHART_POINTS:
+            chosen = resolution
+
+    return chosen
+
+
+def get_rollup_series(sensor, from_time, resolution, to_time=None, parameter_name=None):
+    """Rollup rows for a sensor between two timestamps, oldest first"""
+    conditions = ["sensor = %(sensor)s", "resolution = %(resolution)s", "bucket_start >= %(from_time)s"]
+    params = {"sensor": sensor, "resolution": resolution, "from_time": from_time}
+
+    if to_time:
+        conditions.append("bucket_start < %(to_time)s")
+        params["to_time"] = to_time
+
+    if parameter_name:
+        conditions.append("parameter_name = %(parameter_name)s")
+        params["parameter_name"] = parameter_name
+
+    return frappe.db.sql(f"""
+        SELECT
+            bucket_start AS timestamp,
+            parameter_name,
+            mean_value AS value,
+            min_value,
+            max_value,
+            std_dev,
+            sample_count,
+            out_of_spec_count
+        FROM `tab{ROLLUP_DOCTYPE}`
+        WHERE {" AND ".join(conditions)}
+        ORDER BY bucket_start ASC
+    """, params, as_dict=True)
+
+
+def rebuild_rollups(from_time, to_time=None, chunk_hours=1):
+    """Recompute rollups from raw readings (backfill or repair), one chunk at a time"""
+    # Work on whole hours so no bucket is rebuilt from a partial set of readings
+    from_time = get_bucket_start(from_time, RESOLUTIONS[-1][1])
+    to_time = get_bucket_start(to_time, RESOLUTIONS[-1][1]) if to_time else now_datetime()
+
+    frappe.db.sql(f"""
+        DELETE FROM `tab{ROLLUP_DOCTYPE}`
+        WHERE bucket_start >= %s AND bucket_start < %s
+    """, (from_time, to_time))
+
+    chunk_start = from_time
+    while chunk_start < to_time:
+        chunk_end = min(add_to_date(chunk_start, hours=chunk_hours), to_time)
+        readings = frappe.db.sql(f"""
+            SELECT sensor, station, parameter_name, value, status, within_spec, timestamp
+            FROM `tab{PROCESS_DATA_DOCTYPE}`
+            WHERE timestamp >= %s AND timestamp < %s
+        """, (chunk_start, chunk_end), as_dict=True)
+
+        update_rollups(readings)
+        frappe.db.commit()
+        chunk_start = chunk_end
+
+
+def backfill_recent_rollups(days=7):
+    """bench execute amb_w_spc.sensor_management.rollups.backfill_recent_rollups --kwargs "{'days': 7}" """
+    rebuild_rollups(add_to_date(now_datetime(), days=-cint(days)))
@@ -5,6 +5,9 @@ import frappe
 from frappe import _
 from frappe.utils import flt, getdate
 import json
+import numpy as np
+
+from amb_w_spc.core_spc.control_chart_engine import describe
 
 @frappe.whitelist()
 def record_quality_measurement(work_order, operation_sequence, measurements, inspector=None):
@@ -76,26 +79,26 @@ def record_quality_measurement(work_order, operation_sequence, measurements, ins
         }
 
 @frappe.whitelist()
-def get_spc_analysis(work_order=None, operation=None, parameter=None, days=30):
-    """Get SPC analysis for quality parameters"""
+def get_spc_analysis(work_order=None, parameter=None, days=30):
+    """Get SPC analysis for quality parameters
+
+    SPC Data Point has no work order of its own; a point belongs to the work
+    order of the Batch AMB named in its batch_number.
+    """
     try:
         conditions = []
         values = []
         
         if work_order:
-            conditions.append("work_order = %s")
+            conditions.append("batch.work_order_ref = %s")
             values.append(work_order)
         
-        if operation:
-            conditions.append("operation = %s")
-            values.append(operation)
-        
         if parameter:
-            conditions.append("parameter = %s")
+            conditions.append("dp.parameter = %s")
             values.append(parameter)
         
         # Add date filter
-        conditions.append("timestamp >= DATE_SUB(NOW(), INTERVAL %s DAY)")
+        conditions.append("dp.timestamp >= DATE_SUB(NOW(), INTERVAL %s DAY)")
         values.append(days)
         
         where_clause = " AND ".join(conditions) if conditions else "1=1"
@@ -103,14 +106,14 @@ def get_spc_analysis(work_order=None, operation=None, parameter=None, days=30):
         # Get measurement data
         data_points = frappe.db.sql(f"""
             SELECT 
-                parameter,
-                measurement_value,
-                timestamp,
-                work_order,
-                operation
-            FROM `tabSPC Data Point`
+                dp.parameter,
+                dp.measured_value,
+                dp.timestamp,
+                batch.work_order_ref AS work_order
+            FROM `tabSPC Data Point` dp
+            LEFT JOIN `tabBatch AMB` batch ON batch.name = dp.batch_number
             WHERE {where_clause}
-            ORDER BY parameter, timestamp
+            ORDER BY dp.parameter, dp.timestamp
         """, values, as_dict=True)
         
         # Group by parameter for analysis
@@ -120,37 +123,33 @@ def get_spc_analysis(work_order=None, operation=None, parameter=None, days=30):
             if param not in parameter_data:
                 parameter_data[param] = []
             parameter_data[param].append({
-                'value': point['measurement_value'],
+                'value': point['measured_value'],
                 'timestamp': point['timestamp'],
-                'work_order': point['work_order'],
-                'operation': point['operation']
+                'work_order': point['work_order']
             })
         
         # Calculate SPC statistics for each parameter
         analysis_results = {}
         for param, values_list in parameter_data.items():
             if len(values_list) >= 3:  # Minimum points for analysis
-                values_only = [v['value'] for v in values_list]
+                values_only = np.array([flt(v['value']) for v in values_list])
                 
-                # Calculate basic statistics
-                mean = sum(values_only) / len(values_only)
-                variance = sum([(x - mean) ** 2 for x in values_only]) / len(values_only)
-                std_dev = variance ** 0.5
+                # Population statistics over the whole window
+                stats = describe(values_only, ddof=0)
+                mean = stats['mean']
+                std_dev = stats['std_dev']
                 
                 # Calculate control limits (3-sigma)
                 ucl = mean + (3 * std_dev)
                 lcl = mean - (3 * std_dev)
                 
                 # Identify out-of-control points
-                out_of_control = []
-                for i, v in enumerate(values_list):
-                    if v['value'] > ucl or v['value'] < lcl:
-                        out_of_control.append({
-                            'index': i,
-                            'value': v['value'],
-                            'timestamp': v['timestamp'],
-                            'work_order': v['work_order']
-                        })
+                out_of_control = [{
+                    'index': int(i),
+                    'value': values_list[i]['value'],
+                    'timestamp': values_list[i]['timestamp'],
+                    'work_order': values_list[i]['work_order']
+                } for i in np.flatnonzero((values_only > ucl) | (values_only < lcl))]
                 
                 analysis_results[param] = {
                     'mean': mean,
@@ -159,7 +158,7 @@ def get_spc_analysis(work_order=None, operation=None, parameter=None, days=30):
                     'lcl': lcl,
                     'data_points': values_list,
                     'out_of_control': out_of_control,
-                    'process_capability': calculate_process_capability(values_only, ucl, lcl)
+                    'process_capability': calculate_process_capability(values_only, ucl, lcl, stats)
                 }
         
         return {
@@ -175,14 +174,15 @@ def get_spc_analysis(work_order=None, operation=None, parameter=None, days=30):
             'message': str(e)
         }
 
-def calculate_process_capability(values, ucl, lcl):
+def calculate_process_capability(values, ucl, lcl, stats=None):
     """Calculate process capability indices"""
     if len(values) < 10:  # Need sufficient data
         return None
     
     # Calculate Cp and Cpk
-    mean = sum(values) / len(values)
-    std_dev = (sum([(x - mean) ** 2 for x in values]) / len(values)) ** 0.5
+    stats = stats or describe(values, ddof=0)
+    mean = stats['mean']
+    std_dev = stats['std_dev']
     
     if std_dev == 0:
         return None
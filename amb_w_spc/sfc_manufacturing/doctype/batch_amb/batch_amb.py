@@ -20,6 +20,12 @@ from frappe.utils import (
 )
 from frappe.utils.nestedset import NestedSet
 
+from amb_w_spc.sfc_manufacturing.integration.batch_announcements import (
+    get_announcement_feed,
+    queue_announcement_push,
+)
+from amb_w_spc.system_integration.sequences import next_sequence, reserve_sequence
+
 
 # ======================================================================
 #  DOC_EVENTS WRAPPER FUNCTIONS (required by hooks.py doc_events)
@@ -45,6 +51,40 @@ def _set_field(doc, field, value):
     setattr(doc, field, value)
 
 
+# Child title suffix per level: sub-lot (2), container (3), serial (4)
+CHILD_TITLE_FORMATS = {
+    "2": "{base}-{index}",
+    "3": "{base}-C{index:03d}",
+    "4": "{base}-{index:03d}",
+}
+
+
+def _allocate_child_title(doc, level, parent_batch):
+    """Title for a Level 2-4 batch: parent golden number / title plus the next child index.
+
+    Indices come from a per-parent sequence, so batches created in parallel
+    never share one; a saved batch keeps the index it was given.
+    """
+    parent = frappe.db.get_value(
+        "Batch AMB", parent_batch, ["name", "title", "custom_golden_number"], as_dict=True
+    )
+    if not parent:
+        raise frappe.DoesNotExistError(f"Batch AMB {parent_batch} not found")
+
+    base = (parent.custom_golden_number if level == "2" else None) or parent.title or parent.name
+    if not doc.is_new() and (getattr(doc, "title", None) or "").startswith(f"{base}-"[:60]):
+        return doc.title
+
+    def count_children():
+        return frappe.db.count(
+            "Batch AMB",
+            {"parent_batch_amb": parent_batch, "custom_batch_level": level, "name": ["!=", doc.name]},
+        )
+
+    index = next_sequence(f"BATCH-AMB-LEVEL{level}-{parent_batch}", seed=count_children)
+    return CHILD_TITLE_FORMATS[level].format(base=base, index=index)
+
+
 def batch_amb_validate(doc, method=None):
     """Validate hook - generate golden number components for Level 1 batches."""
     try:
@@ -161,65 +201,15 @@ def batch_amb_before_save(doc, method=None):
             else:
                 doc.title = getattr(doc, 'name', None) or "Untitled"
 
-        elif level == "2":
+        elif level in CHILD_TITLE_FORMATS:
             parent_batch = _get_field(doc, 'parent_batch_amb', 'parentbatchamb')
             if parent_batch:
                 try:
-                    parent = frappe.get_doc("Batch AMB", parent_batch)
-                    parent_gn = getattr(parent, 'custom_golden_number', None) or getattr(parent, 'title', None) or parent.name
-                    siblings = frappe.db.count(
-                        "Batch AMB",
-                        {
-                            "parent_batch_amb": parent_batch,
-                            "custom_batch_level": "2",
-                            "name": ["!=", doc.name],
-                        },
-                    )
-                    doc.title = f"{parent_gn}-{siblings + 1}"
+                    doc.title = _allocate_child_title(doc, level, parent_batch)
                 except Exception:
-                    doc.title = f"{doc.name}-L2"
+                    doc.title = f"{doc.name}-L{level}"
             else:
-                doc.title = f"{doc.name}-L2"
-
-        elif level == "3":
-            parent_batch = _get_field(doc, 'parent_batch_amb', 'parentbatchamb')
-            if parent_batch:
-                try:
-                    parent = frappe.get_doc("Batch AMB", parent_batch)
-                    parent_title = getattr(parent, 'title', None) or parent.name
-                    siblings = frappe.db.count(
-                        "Batch AMB",
-                        {
-                            "parent_batch_amb": parent_batch,
-                            "custom_batch_level": "3",
-                            "name": ["!=", doc.name],
-                        },
-                    )
-                    doc.title = f"{parent_title}-C{siblings + 1:03d}"
-                except Exception:
-                    doc.title = f"{doc.name}-L3"
-            else:
-                doc.title = f"{doc.name}-L3"
-
-        elif level == "4":
-            parent_batch = _get_field(doc, 'parent_batch_amb', 'parentbatchamb')
-            if parent_batch:
-                try:
-                    parent = frappe.get_doc("Batch AMB", parent_batch)
-                    parent_title = getattr(parent, 'title', None) or parent.name
-                    siblings = frappe.db.count(
-                        "Batch AMB",
-                        {
-                            "parent_batch_amb": parent_batch,
-                            "custom_batch_level": "4",
-                            "name": ["!=", doc.name],
-                        },
-                    )
-                    doc.title = f"{parent_title}-{siblings + 1:03d}"
-                except Exception:
-                    doc.title = f"{doc.name}-L4"
-            else:
-                doc.title = f"{doc.name}-L4"
+                doc.title = f"{doc.name}-L{level}"
 
         # Safety: trim very long titles
         if getattr(doc, 'title', None) and len(doc.title) > 60:
@@ -404,58 +394,13 @@ class BatchAMB(NestedSet):
                 self.title = self.name
 
         # Level 2: <GoldenNumber>-<sub lot index>
-        elif level == "2":
-            if self.parent_batch_amb:
-                parent = frappe.get_doc("Batch AMB", self.parent_batch_amb)
-                parent_gn = parent.custom_golden_number or parent.title or parent.name
-
-                siblings = frappe.db.count(
-                    "Batch AMB",
-                    {
-                        "parent_batch_amb": self.parent_batch_amb,
-                        "custom_batch_level": "2",
-                        "name": ["!=", self.name],
-                    },
-                )
-                self.title = f"{parent_gn}-{siblings + 1}"
-            else:
-                self.title = f"{self.name}-L2"
-
         # Level 3: <Level2Title>-C<container index>
-        elif level == "3":
-            if self.parent_batch_amb:
-                parent = frappe.get_doc("Batch AMB", self.parent_batch_amb)
-                parent_title = parent.title or parent.name
-
-                siblings = frappe.db.count(
-                    "Batch AMB",
-                    {
-                        "parent_batch_amb": self.parent_batch_amb,
-                        "custom_batch_level": "3",
-                        "name": ["!=", self.name],
-                    },
-                )
-                self.title = f"{parent_title}-C{siblings + 1:03d}"
-            else:
-                self.title = f"{self.name}-L3"
-
         # Level 4: <Level3Title>-<serial 3-digit>
-        elif level == "4":
+        elif level in CHILD_TITLE_FORMATS:
             if self.parent_batch_amb:
-                parent = frappe.get_doc("Batch AMB", self.parent_batch_amb)
-                parent_title = parent.title or parent.name
-
-                siblings = frappe.db.count(
-                    "Batch AMB",
-                    {
-                        "parent_batch_amb": self.parent_batch_amb,
-                        "custom_batch_level": "4",
-                        "name": ["!=", self.name],
-                    },
-                )
-                self.title = f"{parent_title}-{siblings + 1:03d}"
+                self.title = _allocate_child_title(self, level, self.parent_batch_amb)
             else:
-                self.title = f"{self.name}-L4"
+                self.title = f"{self.name}-L{level}"
 
         # Safety: trim very long titles
         if self.title and len(self.title) > 60:
@@ -1315,113 +1260,15 @@ def get_available_containers(warehouse=None):
 
 @frappe.whitelist()
 def get_running_batch_announcements(
-    include_companies=True, include_plants=True, include_quality=True
+    include_companies=True, include_plants=True, include_quality=True, since=None
 ):
-    """Get running batch announcements for widget"""
-    try:
-        batches = frappe.get_all(
-            "Batch AMB",
-            filters={"docstatus": ["!=", 2]},
-            fields=[
-                "name",
-                "title",
-                "item_to_manufacture",
-                "item_code",
-                "wo_item_name",
-                "quality_status",
-                "target_plant",
-                "production_plant_name",
-                "custom_plant_code",
-                "custom_batch_level",
-                "barrel_count",
-                "total_net_weight",
-                "wo_start_date",
-                "modified",
-                "creation",
-                "work_order_ref",
-                "custom_golden_number",
-            ],
-            order_by="modified desc",
-            limit=50,
-        )
-
-        if not batches:
-            return {
-                "success": True,
-                "message": "No active batches",
-                "announcements": [],
-                "grouped_announcements": {},
-                "stats": {"total": 0},
-            }
-
-        announcements = []
-        grouped = {}
-        stats = {
-            "total": len(batches),
-            "high_priority": 0,
-            "quality_check": 0,
-            "container_level": 0,
-        }
+    """Get running batch announcements for widget.
 
-        for batch in batches:
-            company = (
-                batch.production_plant_name or batch.target_plant or "Unknown"
-            )
-
-            announcement = {
-                "name": batch.name,
-                "title": batch.title or batch.name,
-                "batch_code": batch.name,
-                "item_code": batch.item_to_manufacture
-                or batch.item_code
-                or "N/A",
-                "status": "Active",
-                "company": company,
-                "level": batch.custom_batch_level or "Batch",
-                "priority": "high"
-                if batch.quality_status == "Failed"
-                else "medium",
-                "quality_status": batch.quality_status or "Pending",
-                "content": (
-                    f"Item: {batch.wo_item_name or batch.item_code or 'N/A'}\n"
-                    f"Plant: {batch.custom_plant_code or 'N/A'}\n"
-                    f"Weight: {batch.total_net_weight or 0}\n"
-                    f"Barrels: {batch.barrel_count or 0}"
-                ),
-                "message": f"Level {batch.custom_batch_level or '?'} batch in production",
-                "modified": str(batch.modified) if batch.modified else "",
-                "creation": str(batch.creation) if batch.creation else "",
-                "batch_name": batch.name,
-                "work_order": batch.work_order_ref or "N/A",
-                "plant": batch.custom_plant_code
-                or batch.production_plant_name
-                or "N/A",
-                "golden_number": batch.custom_golden_number or "",
-            }
-
-            announcements.append(announcement)
-
-            if batch.quality_status == "Failed":
-                stats["high_priority"] += 1
-            if batch.quality_status in ["Pending", "In Testing"]:
-                stats["quality_check"] += 1
-            if batch.custom_batch_level == "3":
-                stats["container_level"] += 1
-
-            if include_companies:
-                plant = batch.custom_plant_code or "1"
-                if company not in grouped:
-                    grouped[company] = {}
-                if plant not in grouped[company]:
-                    grouped[company][plant] = []
-                grouped[company][plant].append(announcement)
-
-        return {
-            "success": True,
-            "announcements": announcements,
-            "grouped_announcements": grouped,
-            "stats": stats,
-        }
+    Without `since` returns a snapshot of the latest batches; with the cursor
+    from a previous response returns only what changed (see batch_announcements).
+    """
+    try:
+        return get_announcement_feed(since, include_companies=include_companies)
 
     except Exception as e:
         import traceback
@@ -1734,6 +1581,59 @@ def resolve_container_prefix(batch, default_prefix=None):
     return prefix or default_prefix
 
 
+CONTAINER_SERIES_PREFIX = "BATCH-AMB-CONTAINER-"
+
+# Optional Container Barrels columns (custom fields on some sites)
+CONTAINER_OPTIONAL_FIELDS = ("status", "batch_amb", "item_code", "created_date")
+
+
+def reserve_container_sequence(batch_name, quantity):
+    """Reserve `quantity` container sequence numbers for a batch.
+
+    The counter is seeded from the existing serials the first time; callers
+    must hold the Batch AMB row lock.
+    """
+    def count_serials():
+        return frappe.db.sql("""
+            SELECT COUNT(*) FROM `tabContainer Barrels`
+            WHERE parent = %s AND parenttype = 'Batch AMB' AND parentfield = 'container_barrels'
+              AND TRIM(IFNULL(barrel_serial_number, '')) != ''
+        """, batch_name)[0][0]
+
+    return reserve_sequence(f"{CONTAINER_SERIES_PREFIX}{batch_name}", quantity, seed=count_serials)
+
+
+def insert_container_rows(batch, serials, packaging_type, tara_weight):
+    """Bulk insert Container Barrels rows after the batch's last idx"""
+    last_idx = frappe.db.sql("""
+        SELECT COALESCE(MAX(idx), 0) FROM `tabContainer Barrels`
+        WHERE parent = %s AND parenttype = 'Batch AMB' AND parentfield = 'container_barrels'
+    """, batch.name)[0][0]
+
+    optional_values = {
+        "status": "Empty",
+        "batch_amb": batch.name,
+        "item_code": batch.item_to_manufacture or batch.get("current_item_code") or "",
+        "created_date": nowdate(),
+    }
+    optional_fields = [f for f in CONTAINER_OPTIONAL_FIELDS if frappe.db.has_column("Container Barrels", f)]
+
+    fields = ["name", "parent", "parenttype", "parentfield", "idx", "docstatus", "owner", "modified_by",
+              "creation", "modified", "barrel_serial_number", "packaging_type", "tara_weight",
+              "gross_weight", "net_weight", "weight_validated"] + optional_fields
+
+    user = frappe.session.user
+    now = now_datetime()
+    values = [
+        (frappe.generate_hash(length=10), batch.name, "Batch AMB", "container_barrels", last_idx + i, 0,
+         user, user, now, now, serial, packaging_type, tara_weight, 0, 0, 0)
+        + tuple(optional_values[f] for f in optional_fields)
+        for i, serial in enumerate(serials, start=1)
+    ]
+
+    frappe.db.bulk_insert("Container Barrels", fields=fields, values=values)
+
+
 @frappe.whitelist()
 def generate_serial_numbers(batch_name, quantity=1, prefix=None, packaging_type=None, tara_weight=None):
     """Generate serial numbers for batch and add to container_barrels table.
@@ -1741,12 +1641,26 @@ def generate_serial_numbers(batch_name, quantity=1, prefix=None, packaging_type=
     Serial format (golden hierarchy):
       Level 3/4: <PREFIX>-<GoldenChain>-<NNN>
       where GoldenChain = title (e.g. 0334925261-1-C1) and NNN is 001..999
+
+    Rows are bulk inserted under the Batch AMB row lock and the batch totals are
+    updated in place (no full document save), so the cost grows with
+    `quantity` rather than with the containers already on the batch.
     """
     try:
-        batch = frappe.get_doc("Batch AMB", batch_name)
-
         if isinstance(quantity, str):
             quantity = int(quantity)
+        if quantity < 1:
+            frappe.throw(_("Quantity must be at least 1"))
+
+        # Row lock serialises concurrent allocations for the same batch
+        batch = frappe.db.sql("""
+            SELECT name, title, custom_golden_number, custom_batch_level, default_packaging_type,
+                   production_plant_name, item_to_manufacture, current_item_code
+            FROM `tabBatch AMB` WHERE name = %s FOR UPDATE
+        """, batch_name, as_dict=True)
+        if not batch:
+            frappe.throw(_("Batch AMB {0} not found").format(batch_name))
+        batch = batch[0]
 
         batch_level = batch.custom_batch_level or "1"
 
@@ -1756,22 +1670,13 @@ def generate_serial_numbers(batch_name, quantity=1, prefix=None, packaging_type=
         # Resolve prefix based on packaging/plant, unless explicitly passed in
         resolved_prefix = prefix or resolve_container_prefix(batch, default_prefix=None)
 
-        # Collect existing serials in the child table
-        existing_serials = []
-        for row in batch.container_barrels:
-            if row.barrel_serial_number and row.barrel_serial_number.strip():
-                existing_serials.append(row.barrel_serial_number.strip())
-
-        existing_count = len(existing_serials)
-        new_serials = []
         # BUG-112V: Auto-fetch tara_weight from packaging_type Item if not provided
         resolved_tara = flt(tara_weight) if tara_weight else 0
         if not resolved_tara and packaging_type:
             resolved_tara = flt(frappe.db.get_value("Item", packaging_type, "weight_per_unit"))
 
-        for i in range(quantity):
-            seq_num = existing_count + i + 1
-
+        new_serials = []
+        for seq_num in reserve_container_sequence(batch.name, quantity):
             # Level 3/4: PREFIX-GoldenChain-NNN (e.g. BRL-0334925261-1-C1-001)
             if batch_level in ("3", "4") and resolved_prefix:
                 serial = f"{resolved_prefix}-{base_title}-{seq_num:03d}"
@@ -1779,54 +1684,41 @@ def generate_serial_numbers(batch_name, quantity=1, prefix=None, packaging_type=
                 # Generic fallback: GoldenChain-NNN
                 serial = f"{base_title}-{seq_num:03d}"
 
-            if len(serial) > 50:
-                serial = serial[:50]
-
-            new_serials.append(serial)
+            new_serials.append(serial[:50])
 
         # BUG-112R: Use only canonical Container Barrels fields from JSON
-            row_data = {
-                "barrel_serial_number": serial,
-                "status": "Empty",
-                "packaging_type": packaging_type or batch.default_packaging_type or "",
-                "tara_weight": resolved_tara,
-                "gross_weight": 0,
-                "net_weight": 0,
-                "weight_validated": 0,
-                "batch_amb": batch_name,
-                "item_code": batch.item_to_manufacture
-                or getattr(batch, "current_item_code", "")
-                or "",
-                "created_date": nowdate(),
-                "parent": batch.name,
-                "parentfield": "container_barrels",
-                "parenttype": "Batch AMB",
-            }
-            batch.append("container_barrels", row_data)
+        insert_container_rows(batch, new_serials, packaging_type or batch.default_packaging_type or "", resolved_tara)
+
+        # Same totals calculate_container_weights() would derive; new rows carry tara only
+        updates = [
+            "barrel_count = IFNULL(barrel_count, 0) + %(count)s",
+            "total_containers = IFNULL(total_containers, 0) + %(count)s",
+            "total_tara_weight = IFNULL(total_tara_weight, 0) + %(tara)s",
+            "modified = %(now)s",
+            "modified_by = %(user)s",
+        ]
+        values = {
+            "name": batch.name,
+            "count": len(new_serials),
+            "tara": resolved_tara * len(new_serials),
+            "now": now_datetime(),
+            "user": frappe.session.user,
+            # Serials are unique (reserved range), so the list is appended to, not rebuilt
+            "serials": "\n".join(new_serials),
+        }
 
         # Persist a newline list of serials (for non-Level 4 batches)
         if batch_level != "4":
-            existing_text = []
-            if batch.custom_serial_numbers:
-                existing_text = [
-                    s.strip()
-                    for s in batch.custom_serial_numbers.split("\n")
-                    if s.strip()
-                ]
-
-            all_text = existing_text + new_serials
-            truncated_text = []
-            for text in set(all_text):
-                if len(text) > 140:
-                    truncated_text.append(text[:140])
-                else:
-                    truncated_text.append(text)
-
-            batch.custom_serial_numbers = "\n".join(sorted(truncated_text))
-            batch.custom_last_api_sync = now_datetime()
-            batch.custom_serial_tracking_integrated = 1
-
-        batch.save(ignore_permissions=True)
+            updates += [
+                "custom_serial_numbers = CONCAT_WS('\\n', NULLIF(custom_serial_numbers, ''), %(serials)s)",
+                "custom_last_api_sync = %(now)s",
+            ]
+            if frappe.db.has_column("Batch AMB", "custom_serial_tracking_integrated"):
+                updates.append("custom_serial_tracking_integrated = 1")
+
+        frappe.db.sql(f"UPDATE `tabBatch AMB` SET {', '.join(updates)} WHERE name = %(name)s", values)
+        frappe.clear_document_cache("Batch AMB", batch.name)
+        queue_announcement_push(batch.name)
         frappe.db.commit()
 
         return {
@@ -1837,6 +1729,7 @@ def generate_serial_numbers(batch_name, quantity=1, prefix=None, packaging_type=
         }
 
     except Exception as e:
+        frappe.db.rollback()
         error_msg = f"Error generating serials for {batch_name[:30]}"
         frappe.log_error(
             title=error_msg,
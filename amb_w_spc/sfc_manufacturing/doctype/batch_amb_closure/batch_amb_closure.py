@@ -0,0 +1,17 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+class BatchAMBClosure(Document):
+    """One ancestor/descendant pair of the Batch AMB hierarchy
+
+    Rows are written by amb_w_spc.sfc_manufacturing.integration.batch_genealogy, never by hand.
+    """
+    
+    pass
+
+def on_doctype_update():
+    frappe.db.add_unique("Batch AMB Closure", ["ancestor", "descendant"], constraint_name="unique_batch_closure_pair")
+    frappe.db.add_index("Batch AMB Closure", ["descendant", "depth"])
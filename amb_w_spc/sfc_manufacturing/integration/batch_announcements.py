@@ -0,0 +1,193 @@
+# batch_announcements.py
+# Announcements feed for the batch navbar widget. Clients load one snapshot,
+# then receive changed batches over realtime (or ask for the delta since
+# their `modified` cursor after a reconnect). Stats are counters kept in
+# Redis and adjusted by the Batch AMB doc events instead of recounted.
+import frappe
+
+REALTIME_EVENT = "batch_announcements"
+FEED_LIMIT = 50
+
+# Raw Redis hash, always accessed through a pipeline on its make_key'd name
+STATS_KEY = "batch_announcements:stats"
+STATS_FIELDS = ("total", "high_priority", "quality_check", "container_level")
+
+ANNOUNCEMENT_FIELDS = [
+    "name",
+    "title",
+    "item_to_manufacture",
+    "item_code",
+    "wo_item_name",
+    "quality_status",
+    "target_plant",
+    "production_plant_name",
+    "custom_plant_code",
+    "custom_batch_level",
+    "barrel_count",
+    "total_net_weight",
+    "wo_start_date",
+    "modified",
+    "creation",
+    "work_order_ref",
+    "custom_golden_number",
+    "docstatus",
+]
+
+def build_announcement(batch):
+    """Widget announcement for a Batch AMB row or document"""
+    return {
+        "name": batch.name,
+        "title": batch.get("title") or batch.name,
+        "batch_code": batch.name,
+        "item_code": batch.get("item_to_manufacture") or batch.get("item_code") or "N/A",
+        "status": "Active",
+        "company": batch.get("production_plant_name") or batch.get("target_plant") or "Unknown",
+        "level": batch.get("custom_batch_level") or "Batch",
+        "priority": "high" if batch.get("quality_status") == "Failed" else "medium",
+        "quality_status": batch.get("quality_status") or "Pending",
+        "content": (
+            f"Item: {batch.get('wo_item_name') or batch.get('item_code') or 'N/A'}\n"
+            f"Plant: {batch.get('custom_plant_code') or 'N/A'}\n"
+            f"Weight: {batch.get('total_net_weight') or 0}\n"
+            f"Barrels: {batch.get('barrel_count') or 0}"
+        ),
+        "message": f"Level {batch.get('custom_batch_level') or '?'} batch in production",
+        "modified": str(batch.modified) if batch.modified else "",
+        "creation": str(batch.creation) if batch.creation else "",
+        "batch_name": batch.name,
+        "work_order": batch.get("work_order_ref") or "N/A",
+        "plant": batch.get("custom_plant_code") or batch.get("production_plant_name") or "N/A",
+        "plant_code": batch.get("custom_plant_code") or "1",
+        "golden_number": batch.get("custom_golden_number") or "",
+    }
+
+def group_announcements(announcements):
+    """{company: {plant_code: [announcement]}}"""
+    grouped = {}
+    for announcement in announcements:
+        grouped.setdefault(announcement["company"], {}).setdefault(announcement["plant_code"], []).append(announcement)
+    return grouped
+
+# =============================================================================
+# FEED
+# =============================================================================
+
+def get_announcement_feed(since=None, include_companies=True):
+    """Snapshot of the latest batches, or only the batches modified since `since`
+
+    The cursor is inclusive (batches saved in the same second as the cursor
+    are sent again), so clients upsert by name. A delta larger than the feed
+    window is answered with a fresh snapshot (`reset`).
+    """
+    rows = None
+    if since:
+        rows = frappe.get_all("Batch AMB", filters={"modified": [">=", since]}, fields=ANNOUNCEMENT_FIELDS,
+                              order_by="modified asc", limit=FEED_LIMIT + 1)
+
+    reset = rows is None or len(rows) > FEED_LIMIT
+    if reset:
+        rows = frappe.get_all("Batch AMB", filters={"docstatus": ["!=", 2]}, fields=ANNOUNCEMENT_FIELDS,
+                              order_by="modified desc", limit=FEED_LIMIT)
+
+    announcements = [build_announcement(row) for row in rows if row.docstatus != 2]
+    feed = {
+        "success": True,
+        "reset": reset,
+        "cursor": max((str(row.modified) for row in rows), default=since or ""),
+        "announcements": announcements,
+        "removed": [row.name for row in rows if row.docstatus == 2],
+        "stats": get_stats(),
+    }
+
+    if reset:
+        feed["grouped_announcements"] = group_announcements(announcements) if include_companies else {}
+        if not announcements:
+            feed["message"] = "No active batches"
+
+    return feed
+
+# =============================================================================
+# STATS
+# =============================================================================
+
+def get_stats_contribution(batch):
+    """What one batch adds to each counter"""
+    if not batch or batch.get("docstatus") == 2:
+        return dict.fromkeys(STATS_FIELDS, 0)
+
+    return {
+        "total": 1,
+        "high_priority": int(batch.get("quality_status") == "Failed"),
+        "quality_check": int(batch.get("quality_status") in ("Pending", "In Testing")),
+        "container_level": int(batch.get("custom_batch_level") == "3"),
+    }
+
+def get_stats_delta(before, after):
+    old, new = get_stats_contribution(before), get_stats_contribution(after)
+    return {field: new[field] - old[field] for field in STATS_FIELDS if new[field] != old[field]}
+
+def get_stats():
+    cache = frappe.cache()
+    stats = cache.pipeline().hgetall(cache.make_key(STATS_KEY)).execute()[0]
+
+    # Counters incremented before a rebuild has seeded the hash are not trusted
+    if not stats or b"seeded" not in stats:
+        return rebuild_stats()
+
+    return {field: int(stats.get(field.encode(), 0)) for field in STATS_FIELDS}
+
+def rebuild_stats():
+    """Recount every counter from the database (seed / daily repair)"""
+    row = frappe.db.sql("""
+        SELECT COUNT(*),
+               SUM(CASE WHEN quality_status = 'Failed' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN quality_status IN ('Pending', 'In Testing') THEN 1 ELSE 0 END),
+               SUM(CASE WHEN custom_batch_level = '3' THEN 1 ELSE 0 END)
+        FROM `tabBatch AMB`
+        WHERE docstatus != 2
+    """)[0]
+    stats = {field: int(value or 0) for field, value in zip(STATS_FIELDS, row)}
+
+    cache = frappe.cache()
+    key = cache.make_key(STATS_KEY)
+    pipe = cache.pipeline()
+    pipe.delete(key)
+    pipe.hset(key, mapping=dict(stats, seeded=1))
+    pipe.execute()
+
+    return stats
+
+# =============================================================================
+# PUSH
+# =============================================================================
+
+def queue_announcement_push(batch_name, stats_delta=None):
+    """After commit: apply the stats delta and push the batch's announcement (or removal)"""
+    def push():
+        cache = frappe.cache()
+        if stats_delta:
+            key = cache.make_key(STATS_KEY)
+            pipe = cache.pipeline()
+            for field, delta in stats_delta.items():
+                pipe.hincrby(key, field, delta)
+            pipe.execute()
+
+        row = frappe.get_all("Batch AMB", filters={"name": batch_name}, fields=ANNOUNCEMENT_FIELDS)
+        active = row and row[0].docstatus != 2
+        # Only sessions subscribed to the Batch AMB room (which requires read permission) receive it
+        frappe.publish_realtime(REALTIME_EVENT, {
+            "announcements": [build_announcement(row[0])] if active else [],
+            "removed": [] if active else [batch_name],
+            "cursor": str(row[0].modified) if row else None,
+            "stats": get_stats(),
+        }, doctype="Batch AMB")
+
+    frappe.db.after_commit.add(push)
+
+def publish_batch_change(doc, method=None):
+    """Batch AMB on_update"""
+    queue_announcement_push(doc.name, get_stats_delta(doc.get_doc_before_save(), doc))
+
+def publish_batch_removal(doc, method=None):
+    """Batch AMB on_trash"""
+    queue_announcement_push(doc.name, get_stats_delta(doc, None))
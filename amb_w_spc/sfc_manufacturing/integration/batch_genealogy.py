@@ -0,0 +1,200 @@
+# batch_genealogy.py
+# Closure table for the Batch AMB hierarchy: one row per (ancestor,
+# descendant) pair with its depth, so trees, ancestors and descendants are
+# read with a single indexed query instead of walking parent links.
+import hashlib
+
+import frappe
+from frappe import _
+
+CLOSURE_TABLE = "tabBatch AMB Closure"
+
+BATCH_INFO_FIELDS = ["name", "parent_batch_amb", "custom_batch_level", "workflow_state", "item_to_manufacture",
+                     "production_plant_name", "batch_qty", "total_net_weight"]
+
+def get_batch_select(fields=BATCH_INFO_FIELDS, alias="b"):
+    """SELECT list for Batch AMB columns; fields that are custom or workflow-added may be missing"""
+    return ", ".join(
+        f"{alias}.`{field}`" if frappe.db.has_column("Batch AMB", field) else f"NULL AS `{field}`"
+        for field in fields
+    )
+
+def get_batch_info(batch):
+    """Get batch information for hierarchy"""
+    return {
+        'name': batch.name,
+        'level': batch.custom_batch_level,
+        'workflow_state': batch.workflow_state,
+        'item': batch.item_to_manufacture,
+        'plant': batch.production_plant_name,
+        'quantity': batch.batch_qty,
+        'net_weight': batch.total_net_weight
+    }
+
+# =============================================================================
+# MAINTENANCE
+# =============================================================================
+
+def get_pair_name(ancestor, descendant):
+    # Same as the MD5(CONCAT(...)) names generated in SQL below
+    return hashlib.md5(f"{ancestor}::{descendant}".encode()).hexdigest()
+
+def insert_closure_pairs(ancestor_of, descendant_of, depth_offset):
+    """Link every ancestor of `ancestor_of` to every descendant of `descendant_of`"""
+    user = frappe.session.user
+    frappe.db.sql(f"""
+        INSERT IGNORE INTO `{CLOSURE_TABLE}`
+            (name, ancestor, descendant, depth, owner, modified_by, creation, modified, docstatus, idx)
+        SELECT MD5(CONCAT(a.ancestor, '::', d.descendant)), a.ancestor, d.descendant,
+               a.depth + d.depth + %(offset)s, %(user)s, %(user)s, NOW(), NOW(), 0, 0
+        FROM `{CLOSURE_TABLE}` a
+        JOIN `{CLOSURE_TABLE}` d ON d.ancestor = %(descendant_of)s
+        WHERE a.descendant = %(ancestor_of)s
+    """, {"ancestor_of": ancestor_of, "descendant_of": descendant_of, "offset": depth_offset, "user": user})
+
+def get_descendant_names(batch_name):
+    return frappe.db.sql_list(f"SELECT descendant FROM `{CLOSURE_TABLE}` WHERE ancestor = %s", batch_name)
+
+def get_ancestor_names(batch_name, include_self=False):
+    return frappe.db.sql_list(f"""
+        SELECT ancestor FROM `{CLOSURE_TABLE}`
+        WHERE descendant = %s AND depth >= %s
+        ORDER BY depth
+    """, (batch_name, 0 if include_self else 1))
+
+def update_batch_closure(doc, method=None):
+    """Batch AMB on_update: keep the closure rows in step with parent_batch_amb
+
+    Runs in the save transaction; re-parenting moves the whole subtree.
+    """
+    parent = doc.get("parent_batch_amb") or None
+    has_self = frappe.db.exists("Batch AMB Closure", {"ancestor": doc.name, "descendant": doc.name})
+    current_parents = get_ancestor_names(doc.name)[:1] if has_self else []
+
+    if has_self and current_parents == ([parent] if parent else []):
+        return
+
+    if not has_self:
+        frappe.db.sql(f"""
+            INSERT IGNORE INTO `{CLOSURE_TABLE}`
+                (name, ancestor, descendant, depth, owner, modified_by, creation, modified, docstatus, idx)
+            VALUES (MD5(CONCAT(%(name)s, '::', %(name)s)), %(name)s, %(name)s, 0, %(user)s, %(user)s, NOW(), NOW(), 0, 0)
+        """, {"name": doc.name, "user": frappe.session.user})
+
+    subtree = get_descendant_names(doc.name)
+
+    if parent and parent in subtree:
+        frappe.throw(_("Batch {0} cannot be its own ancestor (via {1})").format(doc.name, parent))
+
+    # Detach the subtree from its old ancestors
+    old_ancestors = get_ancestor_names(doc.name)
+    if old_ancestors:
+        frappe.db.sql(f"""
+            DELETE FROM `{CLOSURE_TABLE}`
+            WHERE ancestor IN %(ancestors)s AND descendant IN %(subtree)s
+        """, {"ancestors": tuple(old_ancestors), "subtree": tuple(subtree)})
+
+    if parent:
+        if not frappe.db.exists("Batch AMB Closure", {"ancestor": parent, "descendant": parent}):
+            update_batch_closure(frappe.get_doc("Batch AMB", parent))
+        insert_closure_pairs(parent, doc.name, 1)
+
+def remove_batch_closure(doc, method=None):
+    """Batch AMB on_trash: drop every pair the batch takes part in"""
+    frappe.db.sql(f"DELETE FROM `{CLOSURE_TABLE}` WHERE ancestor = %(name)s OR descendant = %(name)s",
+                  {"name": doc.name})
+
+def rebuild_batch_closure():
+    """Rebuild the whole closure table from parent_batch_amb (backfill / repair)"""
+    parents = dict(frappe.db.sql("SELECT name, parent_batch_amb FROM `tabBatch AMB`"))
+
+    user = frappe.session.user
+    now = frappe.utils.now_datetime()
+    values = []
+    for name in parents:
+        ancestor, depth, seen = name, 0, set()
+        while ancestor and ancestor in parents and ancestor not in seen:
+            seen.add(ancestor)
+            values.append((get_pair_name(ancestor, name), ancestor, name, depth, user, user, now, now, 0, 0))
+            ancestor, depth = parents[ancestor], depth + 1
+
+    frappe.db.sql(f"DELETE FROM `{CLOSURE_TABLE}`")
+    if values:
+        frappe.db.bulk_insert("Batch AMB Closure",
+            fields=("name", "ancestor", "descendant", "depth", "owner", "modified_by", "creation", "modified", "docstatus", "idx"),
+            values=values)
+
+    return len(values)
+
+# =============================================================================
+# QUERIES
+# =============================================================================
+
+def get_subtree_rows(batch_names=None, plant=None):
+    """Batch rows under the given roots (or under every Level 1 batch of a plant), with their root"""
+    conditions = []
+    values = {}
+
+    if batch_names is not None:
+        conditions.append("c.ancestor IN %(roots)s")
+        values["roots"] = tuple(batch_names) or ("",)
+    else:
+        conditions.append("r.custom_batch_level = '1'")
+        if plant:
+            conditions.append("r.production_plant_name = %(plant)s")
+            values["plant"] = plant
+
+    return frappe.db.sql(f"""
+        SELECT {get_batch_select()}, c.ancestor AS root, c.depth, r.production_plant_name AS root_plant
+        FROM `{CLOSURE_TABLE}` c
+        JOIN `tabBatch AMB` r ON r.name = c.ancestor
+        JOIN `tabBatch AMB` b ON b.name = c.descendant
+        WHERE {" AND ".join(conditions)}
+        ORDER BY c.ancestor, c.depth, b.name
+    """, values, as_dict=True)
+
+def build_trees(rows):
+    """Nest subtree rows into {root: info with nested 'children'}"""
+    trees = {}
+    nodes = {}
+
+    for row in rows:
+        info = get_batch_info(row)
+        info['children'] = []
+        nodes[(row.root, row.name)] = info
+
+        if row.depth == 0:
+            trees[row.root] = info
+        else:
+            parent = nodes.get((row.root, row.parent_batch_amb))
+            if parent:
+                parent['children'].append(info)
+
+    return trees
+
+def get_ancestors(batch_name):
+    """Ancestors of a batch, nearest first"""
+    rows = frappe.db.sql(f"""
+        SELECT {get_batch_select()}
+        FROM `{CLOSURE_TABLE}` c
+        JOIN `tabBatch AMB` b ON b.name = c.ancestor
+        WHERE c.descendant = %s AND c.depth > 0
+        ORDER BY c.depth
+    """, batch_name, as_dict=True)
+    return [get_batch_info(row) for row in rows]
+
+def get_descendants(batch_name):
+    """Nested descendants of a batch"""
+    tree = build_trees(get_subtree_rows([batch_name])).get(batch_name)
+    return tree['children'] if tree else []
+
+def get_plant_trees(plant=None):
+    """Level 1 trees grouped by plant"""
+    rows = get_subtree_rows(plant=plant)
+    plants = {}
+    trees = build_trees(rows)
+    root_plants = {row.root: row.root_plant for row in rows if row.depth == 0}
+    for root, tree in trees.items():
+        plants.setdefault(root_plants.get(root) or "Unknown Plant", []).append(tree)
+
+    return plants
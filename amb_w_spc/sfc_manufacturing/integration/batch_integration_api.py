@@ -1,16 +1,24 @@
 # batch_integration_api.py
 import frappe
 from frappe import _
+from frappe.utils import now_datetime
+
+from amb_w_spc.sfc_manufacturing.integration.batch_genealogy import (
+    get_ancestors,
+    get_batch_info,
+    get_descendants,
+    get_plant_trees,
+)
 
 @frappe.whitelist()
-def get_batch_hierarchy_tree(batch_name=None):
+def get_batch_hierarchy_tree(batch_name=None, plant=None):
     """Get complete batch hierarchy tree"""
     if batch_name:
         # Get specific batch hierarchy
         return get_specific_batch_hierarchy(batch_name)
     else:
         # Get all level 1 batches with their hierarchies
-        return get_all_batch_hierarchies()
+        return get_all_batch_hierarchies(plant)
 
 def get_specific_batch_hierarchy(batch_name):
     """Get hierarchy for a specific batch"""
@@ -24,63 +32,26 @@ def get_specific_batch_hierarchy(batch_name):
     
     return hierarchy
 
-def get_all_batch_hierarchies():
+def get_all_batch_hierarchies(plant=None):
     """Get all batch hierarchies organized by plant"""
-    level1_batches = frappe.get_all("Batch AMB", 
-        filters={"custom_batch_level": "1"},
-        fields=["name", "production_plant_name", "item_to_manufacture", "workflow_state"]
-    )
-    
     hierarchies = {}
-    for batch in level1_batches:
-        plant = batch.production_plant_name or "Unknown Plant"
-        if plant not in hierarchies:
-            hierarchies[plant] = []
-        
-        hierarchy = get_specific_batch_hierarchy(batch.name)
-        hierarchies[plant].append(hierarchy)
+    for plant_name, trees in get_plant_trees(plant).items():
+        # Level 1 batches have no parents; the tree root is the current batch
+        hierarchies[plant_name] = [{
+            'current': {key: value for key, value in tree.items() if key != 'children'},
+            'parents': [],
+            'children': tree['children']
+        } for tree in trees]
     
     return hierarchies
 
-def get_batch_info(batch):
-    """Get batch information for hierarchy"""
-    return {
-        'name': batch.name,
-        'level': batch.custom_batch_level,
-        'workflow_state': batch.workflow_state,
-        'item': batch.item_to_manufacture,
-        'plant': batch.production_plant_name,
-        'quantity': batch.batch_qty,
-        'net_weight': batch.total_net_weight
-    }
-
 def get_parent_hierarchy(batch):
-    """Get parent hierarchy"""
-    parents = []
-    current_parent = batch.parent_batch_amb
-    
-    while current_parent:
-        parent = frappe.get_doc("Batch AMB", current_parent)
-        parents.append(get_batch_info(parent))
-        current_parent = parent.parent_batch_amb
-    
-    return parents
+    """Get parent hierarchy, nearest parent first"""
+    return get_ancestors(batch.name)
 
 def get_child_hierarchy(batch):
-    """Get child hierarchy recursively"""
-    children = frappe.get_all("Batch AMB",
-        filters={"parent_batch_amb": batch.name},
-        fields=["name"]
-    )
-    
-    child_data = []
-    for child in children:
-        child_doc = frappe.get_doc("Batch AMB", child.name)
-        child_info = get_batch_info(child_doc)
-        child_info['children'] = get_child_hierarchy(child_doc)
-        child_data.append(child_info)
-    
-    return child_data
+    """Get child hierarchy as nested children"""
+    return get_descendants(batch.name)
 
 @frappe.whitelist()
 def get_batch_dashboard_data():
@@ -1,19 +1,44 @@
 import frappe
 from frappe import _
 from frappe.utils import nowdate, add_days, add_months, flt
+import hashlib
 import json
 
+# Report results are cached per filter signature; submitting or cancelling a
+# Purchase Receipt, Quality Inspection or Stock Entry rotates the version token
+CACHE_KEY_PREFIX = "receiving_operations_dashboard"
+CACHE_VERSION_KEY = "receiving_operations_dashboard:version"
+# Bounds drift from integration status changes that do not rotate the version
+CACHE_TTL = 10 * 60
+
 def execute(filters=None):
     """
     Main report execution function for Receiving Operations Dashboard
     """
+    filters = frappe._dict(filters or {})
     columns = get_columns()
-    data = get_data(filters)
-    chart = get_chart_data(filters)
-    summary = get_summary_data(filters)
+    data, chart, summary = get_report_result(filters)
     
     return columns, data, None, chart, summary
 
+def get_report_result(filters):
+    """Data, chart and summary for the filters, cached per filter signature"""
+    cache = frappe.cache()
+    version = cache.get_value(CACHE_VERSION_KEY) or ""
+    signature = hashlib.md5(json.dumps(filters, sort_keys=True, default=str).encode()).hexdigest()
+    cache_key = f"{CACHE_KEY_PREFIX}:{version}:{signature}"
+
+    result = cache.get_value(cache_key)
+    if result is None:
+        result = (get_data(filters), get_chart_data(filters), get_summary_data(filters))
+        cache.set_value(cache_key, result, expires_in_sec=CACHE_TTL)
+
+    return result
+
+def clear_report_cache(doc=None, method=None):
+    """Purchase Receipt / Quality Inspection / Stock Entry submit and cancel"""
+    frappe.cache().set_value(CACHE_VERSION_KEY, frappe.generate_hash(length=10))
+
 def get_columns():
     """Define report columns"""
     return [
@@ -95,7 +120,7 @@ def get_columns():
 
 def get_data(filters):
     """Get report data based on filters"""
-    conditions = get_conditions(filters)
+    conditions, values = get_conditions(filters)
     
     # Main query for Purchase Receipts with integration data
     data = frappe.db.sql(f"""
@@ -109,28 +134,33 @@ def get_data(filters):
             pri.warehouse_integration_status as integration_status,
             pri.quality_approval_status as quality_status,
             pri.warehouse_placement_status as warehouse_status,
-            COUNT(DISTINCT ba.name) as batch_count,
             pr.grand_total as total_value,
             GROUP_CONCAT(DISTINCT pri_item.plant_code) as plant_codes
         FROM `tabPurchase Receipt` pr
         LEFT JOIN `tabPurchase Receipt Integration` pri ON pr.name = pri.purchase_receipt_reference
         LEFT JOIN `tabPurchase Receipt Integration Item` pri_item ON pri.name = pri_item.parent
-        LEFT JOIN `tabBatch AMB` ba ON pr.name = ba.purchase_receipt_reference
         WHERE {conditions}
         GROUP BY pr.name
         ORDER BY pr.posting_date DESC
-    """, as_dict=True)
+    """, values, as_dict=True)
+    
+    # Batch counts and completion figures for every receipt in one grouped query each
+    receipts = [row.purchase_receipt for row in data]
+    batch_counts = get_batch_counts(receipts)
+    inspections = get_inspection_counts(receipts)
+    placements = get_placement_counts(receipts)
     
-    # Enhance data with additional calculations
     for row in data:
+        row.batch_count = batch_counts.get(row.purchase_receipt, 0)
+        
         # Calculate completion percentages
         if row.total_items > 0:
             if row.inspection_required > 0:
-                row.inspection_completion = calculate_inspection_completion(row.purchase_receipt)
+                row.inspection_completion = get_completion(inspections.get(row.purchase_receipt))
             else:
                 row.inspection_completion = 100
                 
-            row.placement_completion = calculate_placement_completion(row.purchase_receipt)
+            row.placement_completion = get_completion(placements.get(row.purchase_receipt))
         else:
             row.inspection_completion = 0
             row.placement_completion = 0
@@ -143,61 +173,58 @@ def get_data(filters):
     return data
 
 def get_conditions(filters):
-    """Build WHERE conditions based on filters"""
+    """Build WHERE conditions and bound values based on filters"""
     conditions = ["pr.docstatus = 1"]  # Only submitted receipts
+    values = {}
     
-    if filters.get("from_date"):
-        conditions.append(f"pr.posting_date >= '{filters.get('from_date')}'")
+    for key, condition in (
+        ("from_date", "pr.posting_date >= %(from_date)s"),
+        ("to_date", "pr.posting_date <= %(to_date)s"),
+        ("supplier", "pr.supplier = %(supplier)s"),
+        ("plant_code", "pri_item.plant_code = %(plant_code)s"),
+        ("integration_status", "pri.warehouse_integration_status = %(integration_status)s"),
+    ):
+        if filters.get(key):
+            conditions.append(condition)
+            values[key] = filters.get(key)
         
-    if filters.get("to_date"):
-        conditions.append(f"pr.posting_date <= '{filters.get('to_date')}'")
-        
-    if filters.get("supplier"):
-        conditions.append(f"pr.supplier = '{filters.get('supplier')}'")
-        
-    if filters.get("plant_code"):
-        conditions.append(f"pri_item.plant_code = '{filters.get('plant_code')}'")
-        
-    if filters.get("integration_status"):
-        conditions.append(f"pri.warehouse_integration_status = '{filters.get('integration_status')}'")
-        
-    return " AND ".join(conditions)
+    return " AND ".join(conditions), values
 
-def calculate_inspection_completion(purchase_receipt):
-    """Calculate inspection completion percentage"""
-    try:
-        # Get quality inspections for this receipt
-        inspections = frappe.db.sql("""
-            SELECT COUNT(*) as total, 
-                   SUM(CASE WHEN status = 'Accepted' THEN 1 ELSE 0 END) as completed
-            FROM `tabQuality Inspection`
-            WHERE reference_name = %s AND inspection_type = 'Incoming'
-        """, purchase_receipt, as_dict=True)
+def get_grouped_counts(doctype, reference_field, receipts, completed="0", extra_condition=""):
+    """{receipt: (total, completed)} for rows of `doctype` referencing the receipts"""
+    if not receipts or not frappe.db.has_column(doctype, reference_field):
+        return {}
         
-        if inspections and inspections[0].total > 0:
-            return (inspections[0].completed / inspections[0].total) * 100
-        return 0
-        
-    except Exception:
-        return 0
+    rows = frappe.db.sql(f"""
+        SELECT `{reference_field}`, COUNT(*), SUM(CASE WHEN {completed} THEN 1 ELSE 0 END)
+        FROM `tab{doctype}`
+        WHERE `{reference_field}` IN %(receipts)s {extra_condition}
+        GROUP BY `{reference_field}`
+    """, {"receipts": tuple(receipts)})
+    
+    return {receipt: (total, completed_count or 0) for receipt, total, completed_count in rows}
 
-def calculate_placement_completion(purchase_receipt):
-    """Calculate warehouse placement completion percentage"""
-    try:
-        # Check stock entries for this receipt
-        stock_entries = frappe.db.sql("""
-            SELECT COUNT(*) as total,
-                   SUM(CASE WHEN docstatus = 1 THEN 1 ELSE 0 END) as completed
-            FROM `tabStock Entry`
-            WHERE custom_purchase_receipt_reference = %s
-        """, purchase_receipt, as_dict=True)
-        
-        if stock_entries and stock_entries[0].total > 0:
-            return (stock_entries[0].completed / stock_entries[0].total) * 100
-        return 0
-        
-    except Exception:
-        return 0
+def get_batch_counts(receipts):
+    """Batch AMB records created from each receipt"""
+    counts = get_grouped_counts("Batch AMB", "purchase_receipt_reference", receipts)
+    return {receipt: total for receipt, (total, _completed) in counts.items()}
+
+def get_inspection_counts(receipts):
+    """Incoming quality inspections per receipt: (total, accepted)"""
+    return get_grouped_counts("Quality Inspection", "reference_name", receipts,
+                              completed="status = 'Accepted'",
+                              extra_condition="AND inspection_type = 'Incoming'")
+
+def get_placement_counts(receipts):
+    """Stock entries per receipt: (total, submitted)"""
+    return get_grouped_counts("Stock Entry", "custom_purchase_receipt_reference", receipts,
+                              completed="docstatus = 1")
+
+def get_completion(counts):
+    """Completion percentage from a (total, completed) pair"""
+    if counts and counts[0] > 0:
+        return (flt(counts[1]) / counts[0]) * 100
+    return 0
 
 def format_status_indicator(status):
     """Format status with color indicators"""
@@ -222,35 +249,19 @@ def get_chart_data(filters):
     date_range = get_date_range(filters)
     
     # Daily receiving volume chart
-    daily_data = frappe.db.sql(f"""
+    daily_data = frappe.db.sql("""
         SELECT 
             pr.posting_date,
             COUNT(*) as receipt_count,
             SUM(pr.grand_total) as total_value,
             COUNT(DISTINCT pr.supplier) as supplier_count
         FROM `tabPurchase Receipt` pr
-        WHERE pr.posting_date >= '{date_range['from_date']}'
-        AND pr.posting_date <= '{date_range['to_date']}'
+        WHERE pr.posting_date >= %(from_date)s
+        AND pr.posting_date <= %(to_date)s
         AND pr.docstatus = 1
         GROUP BY pr.posting_date
         ORDER BY pr.posting_date
-    """, as_dict=True)
-    
-    # Plant-wise distribution
-    plant_data = frappe.db.sql(f"""
-        SELECT 
-            pri_item.plant_code,
-            COUNT(DISTINCT pr.name) as receipt_count,
-            SUM(pri_item.qty) as total_quantity,
-            SUM(pri_item.amount) as total_value
-        FROM `tabPurchase Receipt` pr
-        JOIN `tabPurchase Receipt Integration` pri ON pr.name = pri.purchase_receipt_reference
-        JOIN `tabPurchase Receipt Integration Item` pri_item ON pri.name = pri_item.parent
-        WHERE pr.posting_date >= '{date_range['from_date']}'
-        AND pr.posting_date <= '{date_range['to_date']}'
-        AND pr.docstatus = 1
-        GROUP BY pri_item.plant_code
-    """, as_dict=True)
+    """, date_range, as_dict=True)
     
     return {
         "data": {
@@ -276,7 +287,7 @@ def get_summary_data(filters):
     date_range = get_date_range(filters)
     
     # Overall statistics
-    summary_stats = frappe.db.sql(f"""
+    summary_stats = frappe.db.sql("""
         SELECT 
             COUNT(DISTINCT pr.name) as total_receipts,
             SUM(pr.grand_total) as total_value,
@@ -287,13 +298,13 @@ def get_summary_data(filters):
         FROM `tabPurchase Receipt` pr
         LEFT JOIN `tabPurchase Receipt Integration` pri ON pr.name = pri.purchase_receipt_reference
         LEFT JOIN `tabPurchase Receipt Integration Item` pri_item ON pri.name = pri_item.parent
-        WHERE pr.posting_date >= '{date_range['from_date']}'
-        AND pr.posting_date <= '{date_range['to_date']}'
+        WHERE pr.posting_date >= %(from_date)s
+        AND pr.posting_date <= %(to_date)s
         AND pr.docstatus = 1
-    """, as_dict=True)[0]
+    """, date_range, as_dict=True)[0]
     
     # Integration statistics
-    integration_stats = frappe.db.sql(f"""
+    integration_stats = frappe.db.sql("""
         SELECT 
             SUM(CASE WHEN pri.warehouse_integration_status = 'Completed' THEN 1 ELSE 0 END) as warehouse_completed,
             SUM(CASE WHEN pri.quality_system_integration_status = 'Completed' THEN 1 ELSE 0 END) as quality_completed,
@@ -301,22 +312,22 @@ def get_summary_data(filters):
             COUNT(*) as total_integrations
         FROM `tabPurchase Receipt Integration` pri
         JOIN `tabPurchase Receipt` pr ON pr.name = pri.purchase_receipt_reference
-        WHERE pr.posting_date >= '{date_range['from_date']}'
-        AND pr.posting_date <= '{date_range['to_date']}'
+        WHERE pr.posting_date >= %(from_date)s
+        AND pr.posting_date <= %(to_date)s
         AND pr.docstatus = 1
-    """, as_dict=True)[0]
+    """, date_range, as_dict=True)[0]
     
     # Quality inspection statistics
-    quality_stats = frappe.db.sql(f"""
+    quality_stats = frappe.db.sql("""
         SELECT 
             COUNT(*) as total_inspections,
             SUM(CASE WHEN status = 'Accepted' THEN 1 ELSE 0 END) as passed_inspections,
             SUM(CASE WHEN status = 'Rejected' THEN 1 ELSE 0 END) as failed_inspections
         FROM `tabQuality Inspection` qi
-        WHERE qi.report_date >= '{date_range['from_date']}'
-        AND qi.report_date <= '{date_range['to_date']}'
+        WHERE qi.report_date >= %(from_date)s
+        AND qi.report_date <= %(to_date)s
         AND qi.inspection_type = 'Incoming'
-    """, as_dict=True)[0]
+    """, date_range, as_dict=True)[0]
     
     return [
         {
@@ -221,13 +221,14 @@ class BatchShipmentTracking:
             return {"success": False, "message": str(e)}
     
     @staticmethod
-    def initiate_batch_recall(batch_no, recall_reason, severity_level):
-        """Initiate batch recall process"""
+    def initiate_batch_recall(batch_no, recall_reason, severity_level, scope="family"):
+        """Initiate batch recall process for everything traced from the batch"""
         try:
-            # Get all customers who received this batch
-            shipments = frappe.get_all("Batch Shipment Tracking",
-                                     filters={"batch_no": batch_no},
-                                     fields=["customer", "delivery_note", "shipped_qty"])
+            from amb_w_spc.sfc_manufacturing.warehouse_management.traceability import get_traceability_graph
+            
+            # Fresh trace: a real recall must not work from a cached graph
+            graph = get_traceability_graph(batch_no, scope, use_cache=False)
+            shipments = graph["shipments"]
             
             if not shipments:
                 return {"success": False, "message": "No shipments found for this batch"}
@@ -240,8 +241,8 @@ class BatchShipmentTracking:
                 "severity_level": severity_level,
                 "recall_date": nowdate(),
                 "recall_status": "Initiated",
-                "affected_customers": len(set([s.customer for s in shipments])),
-                "total_qty_recalled": sum([s.shipped_qty for s in shipments]),
+                "affected_customers": graph["blast_radius"]["customers"],
+                "total_qty_recalled": graph["blast_radius"]["shipped_qty"],
                 "customer_notifications": []
             })
             
@@ -250,25 +251,26 @@ class BatchShipmentTracking:
                 recall_doc.append("customer_notifications", {
                     "customer": shipment.customer,
                     "delivery_note": shipment.delivery_note,
-                    "qty_to_recall": shipment.shipped_qty,
+                    "qty_to_recall": shipment.qty,
                     "notification_status": "Pending",
                     "notification_method": "Email"
                 })
             
             recall_doc.insert()
             
-            # Update batch recall records
+            # Update batch recall records of every shipped batch in the family
             frappe.db.sql("""
                 UPDATE `tabBatch Recall Record`
                 SET recall_status = 'Initiated', recall_date = %s
-                WHERE batch_no = %s
-            """, (nowdate(), batch_no))
+                WHERE batch_no IN %s
+            """, (nowdate(), tuple({s.batch_no for s in shipments})))
             
             return {
                 "success": True,
                 "recall_id": recall_doc.name,
-                "affected_customers": len(set([s.customer for s in shipments])),
-                "total_qty": sum([s.shipped_qty for s in shipments])
+                "affected_customers": graph["blast_radius"]["customers"],
+                "total_qty": graph["blast_radius"]["shipped_qty"],
+                "blast_radius": graph["blast_radius"]
             }
             
         except Exception as e:
@@ -279,6 +281,8 @@ class BatchShipmentTracking:
     def get_traceability_chain(batch_no):
         """Get complete traceability chain from production to delivery"""
         try:
+            from amb_w_spc.sfc_manufacturing.warehouse_management.traceability import get_traceability_graph
+            
             # Get Batch AMB record
             batch_amb = frappe.db.get_value("Batch AMB", 
                                           {"erpnext_batch_reference": batch_no}, 
@@ -289,6 +293,9 @@ class BatchShipmentTracking:
             
             batch_doc = frappe.get_doc("Batch AMB", batch_amb)
             
+            graph = get_traceability_graph(batch_amb)
+            batch_refs = [b["erpnext_batch"] for b in graph["nodes"].get("batches", {}).values() if b["erpnext_batch"]]
+            
             traceability_chain = {
                 "batch_no": batch_no,
                 "batch_amb": batch_amb,
@@ -301,7 +308,14 @@ class BatchShipmentTracking:
                 },
                 "processing_history": [],
                 "quality_records": [],
-                "shipment_history": [],
+                "shipment_history": graph["shipments"],
+                "genealogy": {
+                    "root": graph["root"],
+                    "blast_radius": graph["blast_radius"],
+                    "affected_customers": graph["affected_customers"],
+                    "purchase_receipts": graph["nodes"].get("purchase_receipts", {}),
+                    "raw_material_batches": graph["nodes"].get("raw_material_batches", {})
+                },
                 "current_status": batch_doc.workflow_state
             }
             
@@ -310,17 +324,10 @@ class BatchShipmentTracking:
                 history_doc = frappe.get_doc("Batch Processing History", batch_doc.batch_processing_history)
                 traceability_chain["processing_history"] = history_doc.processing_steps
             
-            # Get quality records
-            coa_records = frappe.get_all("COA AMB",
-                                       filters={"batch_no": batch_no},
-                                       fields=["name", "validation_status", "overall_compliance_status"])
-            traceability_chain["quality_records"] = coa_records
-            
-            # Get shipment history
-            shipments = frappe.get_all("Batch Shipment Tracking",
-                                     filters={"batch_no": batch_no},
-                                     fields=["*"])
-            traceability_chain["shipment_history"] = shipments
+            # Get quality records for the whole family
+            traceability_chain["quality_records"] = frappe.get_all("COA AMB",
+                                       filters={"batch_no": ["in", batch_refs or [batch_no]]},
+                                       fields=["name", "batch_no", "validation_status", "overall_compliance_status"])
             
             return {"success": True, "traceability_chain": traceability_chain}
             
@@ -367,6 +374,6 @@ def get_customer_shipment_history(customer):
     return BatchShipmentTracking.get_customer_batch_history(customer)
 
 @frappe.whitelist()
-def initiate_recall(batch_no, reason, severity="Medium"):
+def initiate_recall(batch_no, reason, severity="Medium", scope="family"):
     """Initiate batch recall"""
-    return BatchShipmentTracking.initiate_batch_recall(batch_no, reason, severity)
+    return BatchShipmentTracking.initiate_batch_recall(batch_no, reason, severity, scope)
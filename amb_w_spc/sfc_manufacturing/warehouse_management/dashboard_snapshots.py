@@ -0,0 +1,348 @@
+"""
+Warehouse Dashboard Snapshots
+Per-warehouse dashboard aggregates precomputed on a schedule and on document
+events, stored in Redis and merged per user without querying the database
+"""
+
+import hashlib
+import json
+
+import frappe
+from frappe.utils import add_days, flt, getdate, now_datetime
+
+# Raw Redis hashes and sets, always accessed through a pipeline on
+# make_key'd names (the cache wrapper's helpers prefix and pickle on their own)
+SNAPSHOTS_KEY = "warehouse_dashboard:snapshots"
+VERSIONS_KEY = "warehouse_dashboard:versions"
+DIRTY_KEY = "warehouse_dashboard:dirty"
+MERGED_KEY_PREFIX = "warehouse_dashboard:merged"
+REFRESH_JOB_ID = "amb_w_spc_warehouse_dashboard_refresh"
+
+# Merged dashboards are shared by every user with the same warehouses and
+# snapshot versions; the TTL only bounds how long "last 24 hours" counts drift
+MERGED_TTL = 5 * 60
+
+# Warehouse Pick Task is a child table of Sales Order Fulfillment; a task
+# belongs to its fulfillment's warehouse
+OPEN_TASK_STATUSES = ("Open", "Assigned", "In Progress")
+PICK_TASK_FROM = """
+    `tabWarehouse Pick Task` t
+    JOIN `tabSales Order Fulfillment` sof
+        ON sof.name = t.parent AND t.parenttype = 'Sales Order Fulfillment'
+"""
+
+WAREHOUSE_FIELDS = ["temperature_controlled", "warehouse_capacity", "current_utilization",
+                    "min_temperature", "max_temperature", "current_temperature"]
+
+def empty_snapshot(warehouse):
+    return {
+        "warehouse": warehouse.name,
+        "warehouse_name": warehouse.warehouse_name,
+        "date": str(getdate()),
+        "built_at": str(now_datetime()),
+        "temperature_controlled": warehouse.get("temperature_controlled") or 0,
+        "capacity": flt(warehouse.get("warehouse_capacity")),
+        "utilization": flt(warehouse.get("current_utilization")),
+        "min_temp": warehouse.get("min_temperature"),
+        "max_temp": warehouse.get("max_temperature"),
+        "current_temp": warehouse.get("current_temperature"),
+        "open_alerts": 0,
+        "critical_alerts": 0,
+        "warning_alerts": 0,
+        "temperature_alerts": 0,
+        "recent_alerts": 0,
+        "pending_tasks": 0,
+        "completed_today": 0,
+        "high_priority": 0,
+        "overdue_tasks": 0,
+        "completed_today_minutes": 0,
+        "completed_today_timed": 0,
+        "created_today": 0,
+        "created_today_completed": 0,
+        "created_today_minutes": 0,
+        "created_today_timed": 0,
+        "weekly": {}
+    }
+
+# =============================================================================
+# BUILD
+# =============================================================================
+
+def has_source(doctype, fields):
+    """Whether a section's source table and columns exist on this site"""
+    return frappe.db.table_exists(doctype) and all(frappe.db.has_column(doctype, field) for field in fields)
+
+def add_alert_counts(snapshots, values):
+    if not has_source("Warehouse Alert", ("warehouse", "status", "severity", "alert_type", "alert_datetime")):
+        return
+
+    for row in frappe.db.sql("""
+        SELECT warehouse,
+            SUM(status = 'Open') AS open_alerts,
+            SUM(status = 'Open' AND severity = 'High') AS critical_alerts,
+            SUM(status = 'Open' AND severity = 'Medium') AS warning_alerts,
+            SUM(status = 'Open' AND alert_type = 'Temperature Violation') AS temperature_alerts,
+            SUM(alert_datetime >= %(day_ago)s) AS recent_alerts
+        FROM `tabWarehouse Alert`
+        WHERE warehouse IN %(warehouses)s
+        GROUP BY warehouse
+    """, values, as_dict=True):
+        snapshots[row.warehouse].update({key: int(row[key] or 0) for key in
+            ("open_alerts", "critical_alerts", "warning_alerts", "temperature_alerts", "recent_alerts")})
+
+def has_pick_tasks():
+    return (has_source("Warehouse Pick Task", ("pick_task_status", "priority", "completion_time"))
+            and has_source("Sales Order Fulfillment", ("warehouse", "delivery_date")))
+
+def add_task_counts(snapshots, values):
+    if not has_pick_tasks():
+        return
+
+    for row in frappe.db.sql(f"""
+        SELECT sof.warehouse,
+            SUM(t.pick_task_status IN %(open)s) AS pending_tasks,
+            SUM(t.pick_task_status = 'Completed' AND DATE(t.completion_time) = %(today)s) AS completed_today,
+            SUM(t.pick_task_status IN %(open)s AND t.priority = 'High') AS high_priority,
+            SUM(t.pick_task_status IN %(open)s AND sof.delivery_date < %(today)s) AS overdue_tasks,
+            SUM(CASE WHEN t.pick_task_status = 'Completed' AND DATE(t.completion_time) = %(today)s
+                THEN TIMESTAMPDIFF(MINUTE, t.creation, t.completion_time) END) AS completed_today_minutes
+        FROM {PICK_TASK_FROM}
+        WHERE sof.warehouse IN %(warehouses)s
+        GROUP BY sof.warehouse
+    """, values, as_dict=True):
+        snapshots[row.warehouse].update({
+            "pending_tasks": int(row.pending_tasks or 0),
+            "completed_today": int(row.completed_today or 0),
+            "high_priority": int(row.high_priority or 0),
+            "overdue_tasks": int(row.overdue_tasks or 0),
+            "completed_today_minutes": flt(row.completed_today_minutes),
+            "completed_today_timed": int(row.completed_today or 0)
+        })
+
+def add_weekly_trends(snapshots, values):
+    if not has_pick_tasks():
+        return
+
+    today = values["today"]
+    for row in frappe.db.sql(f"""
+        SELECT sof.warehouse, DATE(t.creation) AS date,
+            COUNT(*) AS total_tasks,
+            SUM(t.pick_task_status = 'Completed') AS completed_tasks,
+            SUM(CASE WHEN t.pick_task_status = 'Completed'
+                THEN TIMESTAMPDIFF(MINUTE, t.creation, t.completion_time) END) AS completed_minutes,
+            SUM(t.pick_task_status = 'Completed' AND t.completion_time IS NOT NULL) AS completed_timed
+        FROM {PICK_TASK_FROM}
+        WHERE sof.warehouse IN %(warehouses)s
+            AND t.creation >= %(week_ago)s
+        GROUP BY sof.warehouse, DATE(t.creation)
+    """, values, as_dict=True):
+        snapshot = snapshots[row.warehouse]
+        snapshot["weekly"][str(row.date)] = [int(row.total_tasks or 0), int(row.completed_tasks or 0)]
+        if getdate(row.date) == today:
+            snapshot.update({
+                "created_today": int(row.total_tasks or 0),
+                "created_today_completed": int(row.completed_tasks or 0),
+                "created_today_minutes": flt(row.completed_minutes),
+                "created_today_timed": int(row.completed_timed or 0)
+            })
+
+SECTIONS = (add_alert_counts, add_task_counts, add_weekly_trends)
+
+def compute_snapshots(warehouse_names=None):
+    """Aggregate every dashboard metric per warehouse with one grouped query per source
+
+    Sources missing on the site are skipped, and a section that fails is
+    logged and left at zero without taking the rest of the dashboard down.
+    """
+    filters = {"is_group": 0}
+    if warehouse_names is not None:
+        filters["name"] = ["in", list(warehouse_names) or [""]]
+
+    warehouses = frappe.get_all("Warehouse",
+        filters=filters,
+        fields=["name", "warehouse_name"] + [f for f in WAREHOUSE_FIELDS if frappe.db.has_column("Warehouse", f)])
+
+    snapshots = {w.name: empty_snapshot(w) for w in warehouses}
+    if not snapshots:
+        return snapshots
+
+    today = getdate()
+    values = {
+        "warehouses": list(snapshots),
+        "today": today,
+        "week_ago": add_days(today, -7),
+        "day_ago": add_days(now_datetime(), -1),
+        "open": OPEN_TASK_STATUSES
+    }
+
+    for section in SECTIONS:
+        try:
+            section(snapshots, values)
+        except Exception:
+            frappe.log_error(frappe.get_traceback(), f"Warehouse dashboard section {section.__name__} failed")
+
+    return snapshots
+
+def build_snapshots(warehouse_names=None):
+    """Recompute and store snapshots; bumps each warehouse's version"""
+    snapshots = compute_snapshots(warehouse_names)
+    if not snapshots:
+        return snapshots
+
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+    pipe.hset(cache.make_key(SNAPSHOTS_KEY), mapping={
+        name: json.dumps(snapshot, default=str) for name, snapshot in snapshots.items()
+    })
+    for name in snapshots:
+        pipe.hincrby(cache.make_key(VERSIONS_KEY), name, 1)
+    pipe.execute()
+
+    return snapshots
+
+def queue_snapshot_refresh(doc, method=None):
+    """Doc event: refresh the touched warehouse's snapshot in the background after commit"""
+    warehouse = doc.name if doc.doctype == "Warehouse" else doc.get("warehouse")
+    if not warehouse:
+        return
+
+    def push():
+        cache = frappe.cache()
+        cache.pipeline().sadd(cache.make_key(DIRTY_KEY), warehouse).execute()
+        frappe.enqueue(
+            "amb_w_spc.sfc_manufacturing.warehouse_management.dashboard_snapshots.refresh_dirty_snapshots",
+            queue="short",
+            job_id=REFRESH_JOB_ID,
+            deduplicate=True
+        )
+
+    frappe.db.after_commit.add(push)
+
+def refresh_dirty_snapshots():
+    cache = frappe.cache()
+    key = cache.make_key(DIRTY_KEY)
+
+    pipe = cache.pipeline()
+    pipe.smembers(key)
+    pipe.delete(key)
+    dirty, _deleted = pipe.execute()
+
+    if dirty:
+        build_snapshots([frappe.safe_decode(name) for name in dirty])
+
+# =============================================================================
+# SERVE
+# =============================================================================
+
+def load_snapshots(warehouse_names):
+    """Snapshots from Redis; missing ones and ones from a previous day are rebuilt"""
+    cache = frappe.cache()
+    raw = cache.pipeline().hmget(cache.make_key(SNAPSHOTS_KEY), warehouse_names).execute()[0] if warehouse_names else []
+
+    today = str(getdate())
+    snapshots = {}
+    stale = []
+    for name, value in zip(warehouse_names, raw):
+        snapshot = json.loads(value) if value else None
+        if snapshot and snapshot.get("date") == today:
+            snapshots[name] = snapshot
+        else:
+            stale.append(name)
+
+    if stale:
+        snapshots.update(build_snapshots(stale))
+
+    return [snapshots[name] for name in warehouse_names if name in snapshots]
+
+def get_merged_dashboard(warehouse_names):
+    """Dashboard for a set of warehouses, shared between users with the same set"""
+    warehouse_names = sorted(warehouse_names)
+    cache = frappe.cache()
+
+    versions = cache.pipeline().hmget(cache.make_key(VERSIONS_KEY), warehouse_names).execute()[0] if warehouse_names else []
+    fingerprint = hashlib.md5(json.dumps(
+        [str(getdate()), warehouse_names, [frappe.safe_decode(v) if v else None for v in versions]]
+    ).encode()).hexdigest()
+    merged_key = f"{MERGED_KEY_PREFIX}:{fingerprint}"
+
+    dashboard = cache.get_value(merged_key)
+    if dashboard is None:
+        dashboard = merge_snapshots(load_snapshots(warehouse_names))
+        cache.set_value(merged_key, dashboard, expires_in_sec=MERGED_TTL)
+
+    return dashboard
+
+def merge_snapshots(snapshots):
+    """Combine per-warehouse snapshots into the dashboard sections"""
+    def total(key, rows=snapshots):
+        return sum(flt(s.get(key)) for s in rows)
+
+    def average(minutes, count):
+        return round(total(minutes) / total(count), 1) if total(count) else 0
+
+    with_capacity = [s for s in snapshots if flt(s.get("capacity")) > 0]
+    total_capacity = total("capacity", with_capacity)
+    total_utilization = total("utilization", with_capacity)
+    created_today = total("created_today")
+
+    weekly = {}
+    for snapshot in snapshots:
+        for date, (tasks, completed) in snapshot.get("weekly", {}).items():
+            day = weekly.setdefault(date, [0, 0])
+            day[0] += tasks
+            day[1] += completed
+
+    temperature_status = []
+    for s in snapshots:
+        if s.get("temperature_controlled") and s.get("current_temp") is not None:
+            in_range = flt(s.get("min_temp")) <= flt(s["current_temp"]) <= flt(s.get("max_temp"))
+            temperature_status.append({
+                "warehouse": s["warehouse"],
+                "warehouse_name": s.get("warehouse_name"),
+                "current_temp": s["current_temp"],
+                "min_temp": s.get("min_temp"),
+                "max_temp": s.get("max_temp"),
+                "in_range": in_range,
+                "status": "Normal" if in_range else "Alert"
+            })
+
+    utilization = sorted(({
+        "warehouse": s["warehouse"],
+        "warehouse_name": s.get("warehouse_name"),
+        "capacity": s["capacity"],
+        "utilization": s.get("utilization"),
+        "percentage": round(flt(s.get("utilization")) / flt(s["capacity"]) * 100, 1)
+    } for s in with_capacity), key=lambda row: -row["percentage"])
+
+    return {
+        "summary": {
+            "total_warehouses": len(snapshots),
+            "temperature_controlled": len([s for s in snapshots if s.get("temperature_controlled")]),
+            "warehouses_with_alerts": len([s for s in snapshots if s.get("open_alerts")]),
+            "total_capacity": total_capacity,
+            "total_utilization": total_utilization,
+            "utilization_percentage": (total_utilization / total_capacity * 100) if total_capacity > 0 else 0
+        },
+        "pick_tasks": {
+            "pending_tasks": int(total("pending_tasks")),
+            "completed_today": int(total("completed_today")),
+            "high_priority": int(total("high_priority")),
+            "overdue_tasks": int(total("overdue_tasks")),
+            "average_completion_time": average("completed_today_minutes", "completed_today_timed")
+        },
+        "alerts": {
+            "critical_alerts": int(total("critical_alerts")),
+            "warning_alerts": int(total("warning_alerts")),
+            "temperature_alerts": int(total("temperature_alerts")),
+            "recent_alerts": int(total("recent_alerts"))
+        },
+        "performance": {
+            "completion_rate": round(total("created_today_completed") / created_today * 100, 1) if created_today else 0,
+            "average_time": average("created_today_minutes", "created_today_timed"),
+            "weekly_trends": [{"date": date, "total": day[0], "completed": day[1]}
+                              for date, day in sorted(weekly.items())]
+        },
+        "temperature_status": temperature_status,
+        "utilization": utilization,
+        "snapshot_time": min((s.get("built_at") for s in snapshots), default=None)
+    }
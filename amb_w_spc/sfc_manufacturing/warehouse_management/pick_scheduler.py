@@ -0,0 +1,382 @@
+"""
+Warehouse Pick Task Scheduler
+Ranks open pick tasks by due date, sales order priority, temperature class and
+travel time, and keeps one priority queue per warehouse zone in Redis so every
+worker (and every handheld) sees the same order. Pick tasks are child rows of
+Sales Order Fulfillment, so a fulfillment's events re-rank only its own tasks;
+the hourly pass re-ranks everything for date drift and writes back only the
+priorities that moved
+"""
+
+import heapq
+import itertools
+import math
+from datetime import date
+
+import frappe
+from frappe import _
+from frappe.utils import flt, getdate, now_datetime
+
+from amb_w_spc.sfc_manufacturing.warehouse_management.dashboard_snapshots import OPEN_TASK_STATUSES, PICK_TASK_FROM
+
+# Raw Redis sorted sets, hashes and sets, always accessed through a pipeline on
+# make_key'd names (the cache wrapper's helpers prefix and pickle on their own)
+QUEUE_KEY_PREFIX = "pick_task_queue:queue"
+ZONES_KEY_PREFIX = "pick_task_queue:zones"
+QUEUES_KEY = "pick_task_queue:queues"
+INDEX_KEY = "pick_task_queue:index"
+ASSIGNEES_KEY = "pick_task_queue:assignees"
+
+PRIORITIES = ("High", "Medium", "Low")
+PRIORITY_RANK = {priority: rank for rank, priority in enumerate(PRIORITIES)}
+ORDER_PRIORITY = {"Urgent": "High", "High": "High", "Medium": "Medium", "Low": "Low"}
+
+# Cold chain stock is picked first so it spends the least time staged
+TEMPERATURE_RANK = {"Frozen": 0, "Refrigerated": 1, "Controlled": 2, "Ambient": 3}
+UNKNOWN_TEMPERATURE_RANK = len(TEMPERATURE_RANK)
+
+# Sort key components packed into one exact float score (< 2**53)
+DUE_EPOCH = date(2000, 1, 1)
+DUE_SPAN = 100000
+TEMPERATURE_SPAN = 10
+TRAVEL_SPAN = 10000
+
+# Queue entries read per zone (and candidates checked) per round trip when picking the next task
+CANDIDATE_DEPTH = 25
+UPDATE_CHUNK_SIZE = 500
+
+# =============================================================================
+# RANKING
+# =============================================================================
+
+def get_priority(task, today=None):
+    """High / Medium / Low from days to due date, raised to the sales order's priority
+
+    Tasks with neither keep the priority they were given.
+    """
+    today = getdate(today)
+    priority = task.get("priority") if task.get("priority") in PRIORITY_RANK else "Low"
+    if task.get("due_date"):
+        priority = "Low"
+        days_to_due = (getdate(task["due_date"]) - today).days
+        if days_to_due <= 1:
+            priority = "High"
+        elif days_to_due <= 3:
+            priority = "Medium"
+
+    order_priority = ORDER_PRIORITY.get(task.get("order_priority"))
+    if order_priority and PRIORITY_RANK[order_priority] < PRIORITY_RANK[priority]:
+        priority = order_priority
+
+    return priority
+
+def get_rank_key(task, today=None):
+    """(priority, due day, temperature class, travel minutes); lower picks first"""
+    due_day = DUE_SPAN - 1
+    if task.get("due_date"):
+        due_day = min(max((getdate(task["due_date"]) - DUE_EPOCH).days, 0), DUE_SPAN - 1)
+
+    travel = min(max(int(math.ceil(flt(task.get("estimated_time")))), 0), TRAVEL_SPAN - 1)
+
+    return (
+        PRIORITY_RANK[get_priority(task, today)],
+        due_day,
+        TEMPERATURE_RANK.get(task.get("temperature_zone"), UNKNOWN_TEMPERATURE_RANK),
+        travel,
+    )
+
+def get_queue_score(rank_key):
+    priority, due_day, temperature, travel = rank_key
+    return float(((priority * DUE_SPAN + due_day) * TEMPERATURE_SPAN + temperature) * TRAVEL_SPAN + travel)
+
+def get_changed_priorities(tasks, today=None):
+    """{task: new priority} for tasks whose stored priority is out of date"""
+    changed = {}
+    for task in tasks:
+        priority = get_priority(task, today)
+        if task.get("priority") != priority:
+            changed[task["name"]] = priority
+    return changed
+
+# =============================================================================
+# TASKS
+# =============================================================================
+
+def get_active_tasks(names=None):
+    """Open pick tasks with their fulfillment's warehouse, due date and order priority resolved"""
+    order_priority = "so.priority" if frappe.db.has_column("Sales Order", "priority") else "NULL"
+    conditions = "t.pick_task_status IN %(open)s"
+    values = {"open": OPEN_TASK_STATUSES}
+    if names is not None:
+        conditions += " AND t.name IN %(names)s"
+        values["names"] = list(names) or [""]
+
+    return frappe.db.sql(f"""
+        SELECT t.name, sof.warehouse, t.zone_assignment AS zone, t.pick_task_status AS status, t.priority,
+            t.assigned_to, t.temperature_zone, t.estimated_time,
+            COALESCE(sof.delivery_date, so.delivery_date) AS due_date,
+            {order_priority} AS order_priority
+        FROM {PICK_TASK_FROM}
+        LEFT JOIN `tabSales Order` so ON so.name = COALESCE(t.sales_order, sof.sales_order)
+        WHERE {conditions}
+    """, values, as_dict=True)
+
+def get_task_details(names):
+    """{name: task} for the pick tasks offered to an operator"""
+    if not names:
+        return {}
+
+    return {task.name: task for task in frappe.db.sql(f"""
+        SELECT t.name, COALESCE(t.sales_order, sof.sales_order) AS sales_order, sof.warehouse,
+            t.zone_assignment, t.pick_task_status AS status, t.priority, t.assigned_to,
+            t.temperature_zone, t.estimated_time, t.pick_route
+        FROM {PICK_TASK_FROM}
+        WHERE t.name IN %(names)s
+    """, {"names": list(names)}, as_dict=True)}
+
+def get_order_context(sales_order):
+    """Delivery date and priority of a sales order, for ranking a task being saved"""
+    if not sales_order:
+        return {}
+
+    fields = ["delivery_date"]
+    if frappe.db.has_column("Sales Order", "priority"):
+        fields.append("priority")
+
+    order = frappe.db.get_value("Sales Order", sales_order, fields, as_dict=True) or {}
+    return {"delivery_date": order.get("delivery_date"), "priority": order.get("priority")}
+
+def describe_task(task, fulfillment_delivery_date=None, order=None):
+    """Ranking inputs of a Warehouse Pick Task row"""
+    if order is None:
+        order = get_order_context(task.get("sales_order"))
+    return {
+        "name": task.name,
+        "priority": task.get("priority"),
+        "temperature_zone": task.get("temperature_zone"),
+        "estimated_time": task.get("estimated_time"),
+        "due_date": fulfillment_delivery_date or order.get("delivery_date"),
+        "order_priority": order.get("priority"),
+    }
+
+def persist_priorities(changed):
+    """Write changed priorities with one CASE UPDATE per chunk"""
+    names = list(changed)
+    for start in range(0, len(names), UPDATE_CHUNK_SIZE):
+        chunk = names[start:start + UPDATE_CHUNK_SIZE]
+        cases = " ".join(["WHEN %s THEN %s"] * len(chunk))
+        values = [value for name in chunk for value in (name, changed[name])]
+        frappe.db.sql(f"""
+            UPDATE `tabWarehouse Pick Task`
+            SET priority = CASE name {cases} END
+            WHERE name IN ({", ".join(["%s"] * len(chunk))})
+        """, values + chunk)
+
+# =============================================================================
+# QUEUES
+# =============================================================================
+
+def get_queue_name(warehouse, zone=None):
+    return f"{QUEUE_KEY_PREFIX}:{warehouse}:{zone or ''}"
+
+def parse_queue_name(queue):
+    """(warehouse, zone) of a queue name; zone names never contain ':'"""
+    warehouse, zone = queue[len(QUEUE_KEY_PREFIX) + 1:].rsplit(":", 1)
+    return warehouse, zone or None
+
+def add_to_queue(pipe, cache, task, today):
+    queue = get_queue_name(task.warehouse, task.zone)
+    pipe.zadd(cache.make_key(queue), {task.name: get_queue_score(get_rank_key(task, today))})
+    pipe.hset(cache.make_key(INDEX_KEY), task.name, queue)
+    if task.assigned_to:
+        pipe.hset(cache.make_key(ASSIGNEES_KEY), task.name, task.assigned_to)
+    else:
+        pipe.hdel(cache.make_key(ASSIGNEES_KEY), task.name)
+    pipe.sadd(cache.make_key(f"{ZONES_KEY_PREFIX}:{task.warehouse}"), task.zone or "")
+    pipe.sadd(cache.make_key(QUEUES_KEY), queue)
+
+def requeue_tasks(names):
+    """Move tasks to their current queue and position, or drop them once closed"""
+    names = list(names)
+    if not names:
+        return
+
+    today = getdate()
+    tasks = {task.name: task for task in get_active_tasks(names)}
+
+    cache = frappe.cache()
+    previous = cache.pipeline().hmget(cache.make_key(INDEX_KEY), names).execute()[0]
+
+    pipe = cache.pipeline()
+    for name, queue in zip(names, previous):
+        if queue:
+            pipe.zrem(cache.make_key(queue.decode()), name)
+        if name in tasks and tasks[name].warehouse:
+            add_to_queue(pipe, cache, tasks[name], today)
+        else:
+            pipe.hdel(cache.make_key(INDEX_KEY), name)
+            pipe.hdel(cache.make_key(ASSIGNEES_KEY), name)
+    pipe.execute()
+
+def rebuild_queues():
+    """Re-rank every open task, persist changed priorities and replace all queues"""
+    today = getdate()
+    tasks = get_active_tasks()
+
+    changed = get_changed_priorities(tasks, today)
+    if changed:
+        persist_priorities(changed)
+        frappe.db.commit()
+
+    cache = frappe.cache()
+    queues = cache.pipeline().smembers(cache.make_key(QUEUES_KEY)).execute()[0]
+
+    pipe = cache.pipeline()
+    for queue in queues:
+        queue = queue.decode()
+        pipe.delete(cache.make_key(queue))
+        pipe.delete(cache.make_key(f"{ZONES_KEY_PREFIX}:{parse_queue_name(queue)[0]}"))
+    pipe.delete(cache.make_key(QUEUES_KEY), cache.make_key(INDEX_KEY), cache.make_key(ASSIGNEES_KEY))
+    for task in tasks:
+        if task.warehouse:
+            add_to_queue(pipe, cache, task, today)
+    pipe.execute()
+
+    return {"tasks": len(tasks), "reprioritized": len(changed)}
+
+def get_queue_depths():
+    """{(warehouse, zone): queued tasks}"""
+    cache = frappe.cache()
+    queues = [queue.decode() for queue in cache.pipeline().smembers(cache.make_key(QUEUES_KEY)).execute()[0]]
+
+    pipe = cache.pipeline()
+    for queue in queues:
+        pipe.zcard(cache.make_key(queue))
+
+    depths = {}
+    for queue, depth in zip(queues, pipe.execute()):
+        if depth:
+            depths[parse_queue_name(queue)] = depth
+    return depths
+
+def iter_queue(cache, warehouse, zone, depth=CANDIDATE_DEPTH):
+    """(score, task, zone) of one zone queue in rank order, read `depth` entries at a time"""
+    key = cache.make_key(get_queue_name(warehouse, zone))
+    for start in itertools.count(0, depth):
+        members = cache.pipeline().zrange(key, start, start + depth - 1, withscores=True).execute()[0]
+        for member, score in members:
+            yield score, member.decode(), zone or None
+        if len(members) < depth:
+            return
+
+def get_ranked_candidates(warehouse, zone=None, depth=CANDIDATE_DEPTH):
+    """Queued tasks of a zone (or all zones of the warehouse) merged in rank order, read lazily"""
+    cache = frappe.cache()
+    if zone is None:
+        zones = [z.decode() for z in cache.pipeline().smembers(
+            cache.make_key(f"{ZONES_KEY_PREFIX}:{warehouse}")).execute()[0]]
+    else:
+        zones = [zone]
+
+    return heapq.merge(*(iter_queue(cache, warehouse, z, depth) for z in zones))
+
+# =============================================================================
+# API
+# =============================================================================
+
+def claim_task(names, user):
+    """Lock and assign the best-ranked of `names` that is still open and free; returns its name or None
+
+    Rows another operator is claiming at the same moment are skipped instead
+    of waited for, so two operators never leave with the same task.
+    """
+    if not names:
+        return None
+
+    values = {"open": OPEN_TASK_STATUSES, "user": user}
+    values.update((f"name_{i}", name) for i, name in enumerate(names))
+    placeholders = ", ".join(f"%(name_{i})s" for i in range(len(names)))
+
+    claimed = frappe.db.sql(f"""
+        SELECT name, pick_task_status
+        FROM `tabWarehouse Pick Task`
+        WHERE name IN ({placeholders})
+            AND pick_task_status IN %(open)s
+            AND (IFNULL(assigned_to, '') = '' OR assigned_to = %(user)s)
+        ORDER BY FIELD(name, {placeholders})
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    """, values)
+    if not claimed:
+        return None
+
+    name, status = claimed[0]
+    frappe.db.set_value("Warehouse Pick Task", name, {
+        "assigned_to": user,
+        "assigned_date": now_datetime(),
+        "pick_task_status": "Assigned" if status == "Open" else status,
+    })
+
+    # Other operators' queue scans skip it once the claim is committed
+    frappe.db.after_commit.add(lambda: requeue_tasks([name]))
+    return name
+
+@frappe.whitelist()
+def get_next_pick_task(warehouse, zone=None):
+    """Claim the best open task for the current user in a warehouse (optionally one zone)
+
+    Tasks assigned to other operators are skipped; unassigned tasks and the
+    user's own tasks are offered in rank order. The returned task is assigned
+    to the user.
+    """
+    from amb_w_spc.system_integration.access_context import can_access_warehouse
+
+    if not can_access_warehouse(warehouse, "write"):
+        frappe.throw(_("Not permitted to pick in warehouse {0}").format(warehouse), frappe.PermissionError)
+
+    user = frappe.session.user
+    cache = frappe.cache()
+    candidates = get_ranked_candidates(warehouse, zone)
+
+    # Walk the queues a page at a time until a task this user can take turns up
+    while True:
+        page = list(itertools.islice(candidates, CANDIDATE_DEPTH))
+        if not page:
+            return {"task": None}
+
+        assignees = cache.pipeline().hmget(cache.make_key(ASSIGNEES_KEY), [name for _score, name, _zone in page]).execute()[0]
+        names = [name for (_score, name, _zone), assignee in zip(page, assignees)
+                 if not assignee or assignee.decode() == user]
+
+        name = claim_task(names, user)
+        if name:
+            task = get_task_details([name])[name]
+            task["zone"] = task.zone_assignment
+            return {"task": task}
+
+# =============================================================================
+# DOC EVENTS
+# =============================================================================
+
+def set_fulfillment_task_priorities(doc, method=None):
+    """Sales Order Fulfillment before_save: pick task rows are saved with the parent"""
+    orders = {}
+    for task in doc.get("warehouse_pick_tasks") or []:
+        sales_order = task.get("sales_order") or doc.get("sales_order")
+        if sales_order not in orders:
+            orders[sales_order] = get_order_context(sales_order)
+        task.priority = get_priority(describe_task(task, doc.get("delivery_date"), orders[sales_order]))
+
+def queue_task_requeue(doc, method=None):
+    """Sales Order Fulfillment on_update and on_trash; pick tasks are its child rows
+
+    Rows removed from the fulfillment are requeued too, which drops them from their queue.
+    """
+    names = {task.name for task in doc.get("warehouse_pick_tasks") or []}
+    previous = doc.get_doc_before_save() if method == "on_update" else None
+    if previous:
+        names.update(task.name for task in previous.get("warehouse_pick_tasks") or [])
+
+    if names:
+        names = sorted(names)
+        frappe.db.after_commit.add(lambda: requeue_tasks(names))
@@ -39,34 +39,18 @@ def optimize_warehouse_operations():
 @frappe.whitelist()
 def update_pick_task_priorities():
     """
-    Update pick task priorities based on sales order urgency and delivery dates
+    Re-rank open pick tasks for date drift and rebuild the zone pick queues;
+    only priorities that changed are written back
     """
     try:
-        # Get all pending pick tasks
-        pick_tasks = frappe.get_all("Warehouse Pick Task", 
-            filters={"status": ["in", ["Pending", "In Progress"]]},
-            fields=["name", "sales_order", "delivery_date", "priority"])
-        
-        for task in pick_tasks:
-            if task.delivery_date:
-                days_to_delivery = (getdate(task.delivery_date) - getdate()).days
-                
-                # Update priority based on urgency
-                if days_to_delivery <= 1:
-                    priority = "High"
-                elif days_to_delivery <= 3:
-                    priority = "Medium"
-                else:
-                    priority = "Low"
-                
-                if task.priority != priority:
-                    frappe.db.set_value("Warehouse Pick Task", task.name, "priority", priority)
+        from amb_w_spc.sfc_manufacturing.warehouse_management.pick_scheduler import rebuild_queues
         
-        frappe.db.commit()
-        logger.info("Pick task priorities updated successfully")
+        result = rebuild_queues()
+        logger.info(f"Pick task priorities updated: {result['reprioritized']} of {result['tasks']} open tasks changed")
         
     except Exception as e:
         logger.error(f"Error updating pick task priorities: {str(e)}")
+        raise
 
 @frappe.whitelist()
 def check_temperature_compliance():
@@ -273,26 +257,41 @@ def analyze_warehouse_efficiency():
     """
     try:
         # Analyze pick path efficiency
-        analyze_pick_path_efficiency()
+        efficiency = analyze_pick_path_efficiency()
         
         # Analyze inventory turnover
         analyze_inventory_turnover()
         
         # Generate optimization recommendations
-        generate_optimization_recommendations()
+        generate_optimization_recommendations(efficiency)
         
         logger.info("Weekly warehouse efficiency analysis completed")
         
     except Exception as e:
         logger.error(f"Error in warehouse efficiency analysis: {str(e)}")
 
-def analyze_pick_path_efficiency():
-    """Analyze pick path efficiency for optimization"""
+def analyze_pick_path_efficiency(days=7):
+    """Estimated vs actual pick time per warehouse zone over the last `days` days"""
     try:
-        # Implementation for pick path analysis
-        pass
+        rows = frappe.db.sql("""
+            SELECT warehouse, zone_assignment AS zone,
+                COUNT(*) AS completed_tasks,
+                AVG(estimated_time) AS avg_estimated_time,
+                AVG(actual_time) AS avg_actual_time
+            FROM `tabWarehouse Pick Task`
+            WHERE status = 'Completed'
+                AND completion_datetime >= %(since)s
+                AND estimated_time > 0 AND actual_time > 0
+            GROUP BY warehouse, zone_assignment
+        """, {"since": add_days(now_datetime(), -days)}, as_dict=True)
+        
+        for row in rows:
+            row["efficiency"] = round(row.avg_estimated_time / row.avg_actual_time * 100, 1)
+        
+        return rows
     except Exception as e:
         logger.error(f"Error analyzing pick path efficiency: {str(e)}")
+        return []
 
 def analyze_inventory_turnover():
     """Analyze inventory turnover rates"""
@@ -302,13 +301,39 @@ def analyze_inventory_turnover():
     except Exception as e:
         logger.error(f"Error analyzing inventory turnover: {str(e)}")
 
-def generate_optimization_recommendations():
-    """Generate warehouse optimization recommendations"""
+def generate_optimization_recommendations(efficiency=None, min_efficiency=80, max_queue_depth=50):
+    """Recommendations for zones picking slower than estimated or with a deep pick queue"""
     try:
-        # Implementation for generating recommendations
-        pass
+        from amb_w_spc.sfc_manufacturing.warehouse_management.pick_scheduler import get_queue_depths
+        
+        if efficiency is None:
+            efficiency = analyze_pick_path_efficiency()
+        
+        recommendations = []
+        for row in efficiency:
+            if row.efficiency < min_efficiency:
+                recommendations.append({
+                    "warehouse": row.warehouse,
+                    "zone": row.zone,
+                    "type": "Pick Path",
+                    "message": f"Picks take {row.avg_actual_time:.1f} min against {row.avg_estimated_time:.1f} min estimated "
+                               f"({row.efficiency}% efficiency) - review pick routes and slotting"
+                })
+        
+        for (warehouse, zone), depth in get_queue_depths().items():
+            if depth > max_queue_depth:
+                recommendations.append({
+                    "warehouse": warehouse,
+                    "zone": zone,
+                    "type": "Zone Staffing",
+                    "message": f"{depth} open pick tasks queued - assign more pickers to this zone"
+                })
+        
+        logger.info(f"Generated {len(recommendations)} warehouse optimization recommendations")
+        return recommendations
     except Exception as e:
         logger.error(f"Error generating optimization recommendations: {str(e)}")
+        return []
 
 @frappe.whitelist()
 def monitor_warehouse_alerts():
@@ -371,10 +396,12 @@ def initialize_daily_metrics():
         logger.error(f"Error initializing daily metrics: {str(e)}")
 
 def update_warehouse_dashboard_cache():
-    """Update warehouse dashboard cache"""
+    """Rebuild the dashboard snapshots of every warehouse"""
     try:
-        # Implementation for updating dashboard cache
-        pass
+        from amb_w_spc.sfc_manufacturing.warehouse_management.dashboard_snapshots import build_snapshots
+        
+        snapshots = build_snapshots()
+        logger.info(f"Rebuilt dashboard snapshots for {len(snapshots)} warehouses")
     except Exception as e:
         logger.error(f"Error updating warehouse dashboard cache: {str(e)}")
 
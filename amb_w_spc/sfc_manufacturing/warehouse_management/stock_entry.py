@@ -282,25 +282,10 @@ def on_update_after_submit(doc, method=None):
 
 def get_permission_query_conditions(user):
 	"""Permission query conditions for Stock Entry"""
-	if not user:
-		user = frappe.session.user
+	from amb_w_spc.system_integration.access_context import get_permission_query_condition
 	
-	user_roles = frappe.get_roles(user)
-	
-	# Define role-based warehouse access
-	role_warehouse_access = {
-		"Warehouse Manager": "1=1",  # Access to all
-		"Stock User": "1=1",        # Access to all
-		"Production Manager": "(`tabStock Entry`.purpose in ('Material Issue', 'Material Transfer'))",
-		"Sales User": "(`tabStock Entry`.purpose = 'Material Issue' AND `tabStock Entry`.to_warehouse LIKE '%FG%')"
-	}
-	
-	conditions = []
-	for role in user_roles:
-		if role in role_warehouse_access:
-			conditions.append(role_warehouse_access[role])
-	
-	return " OR ".join(conditions) if conditions else "0=1"
+	# Role-based conditions are compiled once per user and cached
+	return get_permission_query_condition("Stock Entry", user or frappe.session.user)
 
 @frappe.whitelist()
 def make_custom_stock_entry(work_order, purpose, qty=None):
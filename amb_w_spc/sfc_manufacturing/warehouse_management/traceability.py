@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+# Batch Traceability Graph
+# Copyright (c) 2025, AMB Wellness & Spa and contributors
+#
+# Builds the forward/backward trace of a batch family with set-based queries:
+# purchase receipt -> raw material batch -> Level 1 batch -> sub-lots ->
+# containers -> delivery notes -> customers. Results are cached per family
+# version (the latest modification of any batch in the family) and source
+# version, a token rotated when a Delivery Note, Stock Entry or Purchase
+# Receipt is submitted or cancelled.
+
+import frappe
+from frappe import _
+from frappe.utils import flt
+
+from amb_w_spc.sfc_manufacturing.integration.batch_genealogy import (
+    BATCH_INFO_FIELDS,
+    CLOSURE_TABLE,
+    get_ancestor_names,
+    get_batch_select,
+)
+
+CACHE_KEY_PREFIX = "batch_traceability"
+CACHE_TTL = 10 * 60
+SOURCE_VERSION_KEY = "batch_traceability:version"
+
+FAMILY_FIELDS = BATCH_INFO_FIELDS + ["modified", "erpnext_batch_reference"]
+
+class BatchTraceability:
+    """Traceability graph for one batch family"""
+
+    def __init__(self, batch, scope="family"):
+        self.start, self.erpnext_batch = self.resolve_batch(batch)
+        # "family" traces everything under the Level 1 root, "batch" only the batch and its sub-lots
+        self.scope = scope
+        if not self.start:
+            # An ERPNext Batch without a Batch AMB has no family, only its own shipments
+            self.root = None
+        elif scope == "family":
+            self.root = (get_ancestor_names(self.start, include_self=True) or [self.start])[-1]
+        else:
+            self.root = self.start
+        self.nodes = {}
+        self.edges = []
+
+    @staticmethod
+    def resolve_batch(batch):
+        """(Batch AMB, None) for a Batch AMB name or its ERPNext Batch number, (None, batch) for
+        an ERPNext Batch that has no Batch AMB"""
+        if frappe.db.exists("Batch AMB", batch):
+            return batch, None
+
+        batch_amb = frappe.db.get_value("Batch AMB", {"erpnext_batch_reference": batch}, "name")
+        if batch_amb:
+            return batch_amb, None
+        if frappe.db.exists("Batch", batch):
+            return None, batch
+
+        frappe.throw(_("Batch AMB record not found for {0}").format(batch))
+
+    def build(self, use_cache=True):
+        batches = self.get_family() if self.root else []
+        version = str(max(b.modified for b in batches)) if batches else ""
+        source_version = frappe.cache().get_value(SOURCE_VERSION_KEY) or ""
+        cache_key = f"{CACHE_KEY_PREFIX}:{self.scope}:{self.root or self.erpnext_batch}:{version}:{source_version}"
+
+        if use_cache:
+            cached = frappe.cache().get_value(cache_key)
+            if cached:
+                return cached
+
+        self.add_batches(batches)
+        if self.root:
+            batch_refs = {b.erpnext_batch_reference: b.name for b in batches if b.erpnext_batch_reference}
+        else:
+            batch_refs = {self.erpnext_batch: None}
+        containers = self.add_containers([b.name for b in batches])
+        shipments = self.add_shipments(batch_refs)
+        receipts = self.add_raw_materials(batches)
+
+        graph = {
+            "batch": self.start or self.erpnext_batch,
+            "root": self.root,
+            "scope": self.scope,
+            "version": version,
+            "nodes": self.nodes,
+            "edges": self.edges,
+            "blast_radius": {
+                "batches": len(batches),
+                "containers": len(containers),
+                "container_net_weight": sum(flt(c.net_weight) for c in containers),
+                "delivery_notes": len({s.delivery_note for s in shipments}),
+                "customers": len({s.customer for s in shipments}),
+                "shipped_qty": sum(flt(s.qty) for s in shipments),
+                "purchase_receipts": len({r.purchase_receipt for r in receipts}),
+                "suppliers": len({r.supplier for r in receipts if r.supplier}),
+            },
+            "affected_customers": self.get_affected_customers(shipments),
+            "shipments": shipments,
+        }
+
+        frappe.cache().set_value(cache_key, graph, expires_in_sec=CACHE_TTL)
+        return graph
+
+    def add_node(self, kind, key, data):
+        self.nodes.setdefault(kind, {})[key] = data
+
+    def get_family(self):
+        return frappe.db.sql(f"""
+            SELECT {get_batch_select(FAMILY_FIELDS)},
+                   COALESCE(b.work_order_ref, b.work_order) AS work_order, c.depth
+            FROM `{CLOSURE_TABLE}` c
+            JOIN `tabBatch AMB` b ON b.name = c.descendant
+            WHERE c.ancestor = %s
+            ORDER BY c.depth, b.name
+        """, self.root, as_dict=True)
+
+    def add_batches(self, batches):
+        for batch in batches:
+            self.add_node("batches", batch.name, {
+                "level": batch.custom_batch_level,
+                "item": batch.item_to_manufacture,
+                "qty": batch.batch_qty,
+                "net_weight": batch.total_net_weight,
+                "workflow_state": batch.workflow_state,
+                "plant": batch.production_plant_name,
+                "erpnext_batch": batch.erpnext_batch_reference,
+            })
+            if batch.parent_batch_amb and batch.depth:
+                self.edges.append((batch.parent_batch_amb, batch.name, "sub_lot"))
+
+    def add_containers(self, batch_names):
+        containers = frappe.db.sql("""
+            SELECT name, parent, barrel_serial_number, packaging_type, net_weight
+            FROM `tabContainer Barrels`
+            WHERE parent IN %s AND parenttype = 'Batch AMB'
+        """, [tuple(batch_names) or ("",)], as_dict=True)
+
+        for container in containers:
+            key = container.barrel_serial_number or container.name
+            self.add_node("containers", key, {
+                "batch": container.parent,
+                "packaging_type": container.packaging_type,
+                "net_weight": container.net_weight,
+            })
+            self.edges.append((container.parent, key, "container"))
+
+        return containers
+
+    def add_shipments(self, batch_refs):
+        """Delivery Note items for the family's ERPNext batches, plus tracked shipments without one"""
+        if not batch_refs:
+            return []
+
+        refs = tuple(batch_refs)
+        shipments = frappe.db.sql("""
+            SELECT dni.batch_no, dn.name AS delivery_note, dn.customer, dn.customer_name,
+                   dn.posting_date AS shipping_date, dni.item_code, SUM(dni.qty) AS qty
+            FROM `tabDelivery Note Item` dni
+            JOIN `tabDelivery Note` dn ON dn.name = dni.parent
+            WHERE dni.batch_no IN %(refs)s AND dn.docstatus = 1
+            GROUP BY dni.batch_no, dn.name, dn.customer, dn.customer_name, dn.posting_date, dni.item_code
+        """, {"refs": refs}, as_dict=True)
+
+        seen = {(s.batch_no, s.delivery_note) for s in shipments}
+        for tracked in frappe.get_all("Batch Shipment Tracking",
+                                      filters={"batch_no": ["in", refs]},
+                                      fields=["batch_no", "delivery_note", "customer", "shipping_date",
+                                              "item_code", "shipped_qty"]):
+            if (tracked.batch_no, tracked.delivery_note) not in seen:
+                shipments.append(frappe._dict(tracked, qty=tracked.shipped_qty, customer_name=None))
+
+        for shipment in shipments:
+            shipment.batch_amb = batch_refs.get(shipment.batch_no)
+            self.add_node("delivery_notes", shipment.delivery_note, {
+                "customer": shipment.customer,
+                "shipping_date": shipment.shipping_date,
+            })
+            self.add_node("customers", shipment.customer, {"customer_name": shipment.customer_name})
+            self.edges.append((shipment.batch_amb or shipment.batch_no, shipment.delivery_note, "shipped"))
+            self.edges.append((shipment.delivery_note, shipment.customer, "delivered_to"))
+
+        return shipments
+
+    def add_raw_materials(self, batches):
+        """Raw material batches consumed by the family's work orders, and the receipts they came in on"""
+        work_orders = {b.work_order: b.name for b in batches if b.work_order}
+        if not work_orders:
+            return []
+
+        consumed = frappe.db.sql("""
+            SELECT DISTINCT se.work_order, sed.item_code, sed.batch_no
+            FROM `tabStock Entry Detail` sed
+            JOIN `tabStock Entry` se ON se.name = sed.parent
+            WHERE se.work_order IN %(work_orders)s AND se.docstatus = 1
+              AND IFNULL(sed.s_warehouse, '') != '' AND IFNULL(sed.batch_no, '') != ''
+        """, {"work_orders": tuple(work_orders)}, as_dict=True)
+
+        for row in consumed:
+            self.add_node("raw_material_batches", row.batch_no, {"item": row.item_code})
+            self.edges.append((row.batch_no, work_orders[row.work_order], "consumed_in"))
+
+        if not consumed:
+            return []
+
+        receipts = frappe.db.sql("""
+            SELECT DISTINCT pri.batch_no, pr.name AS purchase_receipt, pr.supplier, pr.posting_date
+            FROM `tabPurchase Receipt Item` pri
+            JOIN `tabPurchase Receipt` pr ON pr.name = pri.parent
+            WHERE pri.batch_no IN %(batches)s AND pr.docstatus = 1
+        """, {"batches": tuple({row.batch_no for row in consumed})}, as_dict=True)
+
+        for receipt in receipts:
+            self.add_node("purchase_receipts", receipt.purchase_receipt, {
+                "supplier": receipt.supplier,
+                "posting_date": receipt.posting_date,
+            })
+            self.edges.append((receipt.purchase_receipt, receipt.batch_no, "received"))
+
+        return receipts
+
+    @staticmethod
+    def get_affected_customers(shipments):
+        customers = {}
+        for shipment in shipments:
+            customer = customers.setdefault(shipment.customer, {
+                "customer": shipment.customer,
+                "customer_name": shipment.customer_name,
+                "delivery_notes": set(),
+                "batches": set(),
+                "qty": 0.0,
+            })
+            customer["delivery_notes"].add(shipment.delivery_note)
+            customer["batches"].add(shipment.batch_no)
+            customer["qty"] += flt(shipment.qty)
+
+        return sorted((dict(c, delivery_notes=sorted(c["delivery_notes"]), batches=sorted(c["batches"]))
+                       for c in customers.values()), key=lambda c: -c["qty"])
+
+def clear_traceability_cache(doc=None, method=None):
+    """Delivery Note / Stock Entry / Purchase Receipt submit and cancel"""
+    # Rotated once committed so a graph read in between is not cached under the new token
+    frappe.db.after_commit.add(
+        lambda: frappe.cache().set_value(SOURCE_VERSION_KEY, frappe.generate_hash(length=10))
+    )
+
+def get_traceability_graph(batch, scope="family", use_cache=True):
+    return BatchTraceability(batch, scope).build(use_cache)
+
+@frappe.whitelist()
+def get_batch_traceability_graph(batch, scope="family"):
+    """Forward/backward traceability graph with blast radius for a batch"""
+    return get_traceability_graph(batch, scope)
+
+@frappe.whitelist()
+def simulate_recall(batch, scope="family"):
+    """Mock recall: what a recall of this batch would reach, without creating any records"""
+    graph = get_traceability_graph(batch, scope, use_cache=False)
+    return {
+        "batch": graph["batch"],
+        "root": graph["root"],
+        "blast_radius": graph["blast_radius"],
+        "affected_customers": graph["affected_customers"],
+        "purchase_receipts": sorted(graph["nodes"].get("purchase_receipts", {})),
+    }
@@ -169,25 +169,10 @@ def integrate_with_batch_system(doc):
 
 def get_permission_query_conditions(user):
 	"""Permission query conditions for Work Order"""
-	if not user:
-		user = frappe.session.user
+	from amb_w_spc.system_integration.access_context import get_permission_query_condition
 	
-	user_roles = frappe.get_roles(user)
-	
-	# Define role-based access
-	role_access = {
-		"Production Manager": "1=1",  # Access to all
-		"Warehouse Manager": "1=1",   # Access to all
-		"Manufacturing User": "(`tabWork Order`.owner = '{user}' OR `tabWork Order`.docstatus = 1)".format(user=user),
-		"Stock User": "(`tabWork Order`.docstatus = 1)"  # Only submitted Work Orders
-	}
-	
-	conditions = []
-	for role in user_roles:
-		if role in role_access:
-			conditions.append(role_access[role])
-	
-	return " OR ".join(conditions) if conditions else "0=1"
+	# Role-based conditions are compiled once per user and cached
+	return get_permission_query_condition("Work Order", user or frappe.session.user)
 
 @frappe.whitelist()
 def update_work_order_zone_status(work_order_name):
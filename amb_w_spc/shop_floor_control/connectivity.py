@@ -0,0 +1,335 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# Connectivity telemetry for shop floor stations
+#
+# Every polling attempt (time, sensor, latency, outcome, bytes, error class)
+# is written to Redis by the polling scheduler:
+#   - a bounded ring buffer of the latest attempts per station (raw detail)
+#   - per-minute counter hashes per station (attempts, outcomes, latency
+#     histogram), kept for a few hours
+# The hourly maintenance job compacts closed hours of the minute counters
+# into Station Connectivity Summary rows. Uptime, p95 latency and error rate
+# are computed from the counters (live) or the summary rows (history).
+
+import asyncio
+import json
+import socket
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import frappe
+from frappe.utils import add_to_date, cint, convert_utc_to_system_timezone, get_datetime
+
+# Raw Redis lists and hashes, always accessed through a pipeline on
+# make_key'd names (the cache wrapper's helpers prefix and pickle on their own)
+RING_KEY_PREFIX = "station_comm_log"
+MINUTE_KEY_PREFIX = "station_comm"
+COMPACTED_KEY = "station_comm:compacted_until"
+
+RING_SIZE = 1000
+BUCKET_SECONDS = 60
+BUCKET_RETENTION = 3 * 60 * 60
+QUALITY_WINDOW_MINUTES = 60
+
+SUMMARY_DOCTYPE = "Station Connectivity Summary"
+
+# Upper bounds (ms) of the latency histogram; the last bucket is open ended
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Outcomes: ok (got a reading), no_data (station answered without a value),
+# timeout, unreachable, error
+SUCCESS_OUTCOMES = ("ok",)
+
+
+def new_attempt(station, sensor=None, outcome="ok", latency_ms=None, bytes_received=0,
+                error_class=None, timestamp=None):
+    return frappe._dict({
+        "timestamp": timestamp or time.time(),
+        "station": station,
+        "sensor": sensor,
+        "outcome": outcome,
+        "latency_ms": round(latency_ms, 2) if latency_ms is not None else None,
+        "bytes": cint(bytes_received),
+        "error_class": error_class,
+    })
+
+
+def classify_error(exc):
+    """(outcome, error class) for a failed attempt; wrapped errors are classified by their cause"""
+    cause = exc.__cause__ or exc
+    # asyncio.TimeoutError only became an alias of TimeoutError in Python 3.11
+    if isinstance(cause, (TimeoutError, asyncio.TimeoutError, socket.timeout)):
+        return "timeout", type(cause).__name__
+    if isinstance(cause, (ConnectionError, OSError)):
+        return "unreachable", type(cause).__name__
+    return "error", type(cause).__name__
+
+
+def get_bucket(timestamp=None):
+    return int((timestamp or time.time()) // BUCKET_SECONDS)
+
+
+def get_latency_bucket(latency_ms):
+    return next((bound for bound in LATENCY_BUCKETS_MS if latency_ms <= bound), "inf")
+
+
+# =============================================================================
+# WRITE
+# =============================================================================
+
+def get_attempt_counters(attempts):
+    """{(minute bucket, station): {metric: count}} for a list of attempts"""
+    counters = defaultdict(lambda: defaultdict(int))
+    for attempt in attempts:
+        counts = counters[(get_bucket(attempt.timestamp), attempt.station)]
+        counts["attempts"] += 1
+        counts[f"outcome:{attempt.outcome}"] += 1
+        counts["bytes"] += attempt.bytes or 0
+        if attempt.error_class:
+            counts[f"error:{attempt.error_class}"] += 1
+        if attempt.outcome in SUCCESS_OUTCOMES:
+            counts["successful"] += 1
+            if attempt.latency_ms is not None:
+                counts["latency_ms_sum"] += int(round(attempt.latency_ms))
+                counts[f"le:{get_latency_bucket(attempt.latency_ms)}"] += 1
+
+    return counters
+
+
+def record_attempts(attempts):
+    """Append attempts to the station ring buffers and minute counters in one round trip"""
+    if not attempts:
+        return
+
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+
+    by_station = defaultdict(list)
+    for attempt in attempts:
+        by_station[attempt.station].append(json.dumps(attempt, default=str))
+
+    for station, entries in by_station.items():
+        key = cache.make_key(f"{RING_KEY_PREFIX}:{station}")
+        pipe.lpush(key, *entries)
+        pipe.ltrim(key, 0, RING_SIZE - 1)
+
+    for (bucket, station), counts in get_attempt_counters(attempts).items():
+        key = cache.make_key(f"{MINUTE_KEY_PREFIX}:{bucket}")
+        for metric, count in counts.items():
+            pipe.hincrby(key, f"{station}|{metric}", count)
+        pipe.expire(key, BUCKET_RETENTION)
+
+    pipe.execute()
+
+
+# =============================================================================
+# READ
+# =============================================================================
+
+def read_minute_counts(first_bucket, last_bucket):
+    """{station: [{metric: count} per minute with attempts]} for the buckets in range"""
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+    for bucket in range(first_bucket, last_bucket + 1):
+        pipe.hgetall(cache.make_key(f"{MINUTE_KEY_PREFIX}:{bucket}"))
+
+    stations = defaultdict(list)
+    for bucket_counts in pipe.execute():
+        minute = defaultdict(dict)
+        for field, count in bucket_counts.items():
+            station, _, metric = frappe.safe_decode(field).rpartition("|")
+            minute[station][metric] = int(count)
+        for station, counts in minute.items():
+            stations[station].append(counts)
+
+    return stations
+
+
+def get_percentile(histogram, percentile):
+    """Upper bound of the histogram bucket holding the percentile (None when empty)"""
+    total = sum(histogram.values())
+    if not total:
+        return None
+
+    rank = total * percentile / 100.0
+    seen = 0
+    for bound in list(LATENCY_BUCKETS_MS) + ["inf"]:
+        seen += histogram.get(str(bound), 0)
+        if seen >= rank:
+            return float(bound) if bound != "inf" else float(LATENCY_BUCKETS_MS[-1])
+
+    return float(LATENCY_BUCKETS_MS[-1])
+
+
+def summarize_minutes(minutes):
+    """Uptime %, error rate, latency and outcome breakdown from per-minute counters"""
+    totals = defaultdict(int)
+    for counts in minutes:
+        for metric, count in counts.items():
+            totals[metric] += count
+
+    attempts = totals["attempts"]
+    successful = totals["successful"]
+    histogram = {metric[3:]: count for metric, count in totals.items() if metric.startswith("le:")}
+    minutes_up = sum(1 for counts in minutes if counts.get("successful"))
+
+    return {
+        "attempts": attempts,
+        "successful": successful,
+        "error_rate": round((attempts - successful) / attempts * 100, 2) if attempts else 0,
+        "minutes_polled": len(minutes),
+        "minutes_up": minutes_up,
+        "uptime_percentage": round(minutes_up / len(minutes) * 100, 2) if minutes else 0,
+        "avg_latency_ms": round(totals["latency_ms_sum"] / successful, 2) if successful else None,
+        "p95_latency_ms": get_percentile(histogram, 95),
+        "bytes_received": totals["bytes"],
+        "outcomes": {metric[8:]: count for metric, count in totals.items() if metric.startswith("outcome:")},
+        "error_classes": {metric[6:]: count for metric, count in totals.items() if metric.startswith("error:")},
+        "latency_histogram": histogram,
+    }
+
+
+def get_live_connectivity(station_names=None, minutes=QUALITY_WINDOW_MINUTES):
+    """{station: summary} over the last `minutes` minutes of counters"""
+    current = get_bucket()
+    stations = read_minute_counts(current - cint(minutes) + 1, current)
+    names = stations if station_names is None else station_names
+    return {station: summarize_minutes(stations.get(station, [])) for station in names}
+
+
+def get_connection_quality(station_names=None, minutes=QUALITY_WINDOW_MINUTES):
+    """{station: successful attempts as % of attempts}; stations without attempts get 0"""
+    return {
+        station: round(summary["successful"] / summary["attempts"] * 100, 1) if summary["attempts"] else 0
+        for station, summary in get_live_connectivity(station_names, minutes).items()
+    }
+
+
+def get_recent_attempts(station, sensor=None, limit=100):
+    """Latest attempts from the station's ring buffer, newest first"""
+    cache = frappe.cache()
+    entries = cache.pipeline().lrange(cache.make_key(f"{RING_KEY_PREFIX}:{station}"), 0, RING_SIZE - 1).execute()[0]
+
+    attempts = []
+    for entry in entries:
+        attempt = json.loads(entry)
+        if sensor and attempt.get("sensor") != sensor:
+            continue
+        attempts.append(attempt)
+        if len(attempts) >= cint(limit):
+            break
+
+    return attempts
+
+
+# =============================================================================
+# COMPACTION
+# =============================================================================
+
+def compact_connectivity():
+    """Hourly: write Station Connectivity Summary rows for closed hours not compacted yet"""
+    cache = frappe.cache()
+    minutes_per_hour = 3600 // BUCKET_SECONDS
+    current_hour = get_bucket() // minutes_per_hour
+    oldest_hour = (get_bucket() - BUCKET_RETENTION // BUCKET_SECONDS) // minutes_per_hour + 1
+
+    compacted_until = cache.get_value(COMPACTED_KEY)
+    first_hour = max(cint(compacted_until) + 1 if compacted_until else oldest_hour, oldest_hour)
+
+    user = frappe.session.user
+    now = get_datetime()
+    fields = ["name", "owner", "modified_by", "creation", "modified", "docstatus", "idx", "station", "period_start",
+              "attempts", "successful", "error_rate", "minutes_polled", "minutes_up", "uptime_percentage",
+              "avg_latency_ms", "p95_latency_ms", "bytes_received", "outcomes", "error_classes", "latency_histogram"]
+
+    rows = 0
+    for hour in range(first_hour, current_hour):
+        first_bucket = hour * minutes_per_hour
+        period_start = convert_utc_to_system_timezone(
+            datetime.utcfromtimestamp(first_bucket * BUCKET_SECONDS)).replace(tzinfo=None)
+
+        values = []
+        for station, minutes in read_minute_counts(first_bucket, first_bucket + minutes_per_hour - 1).items():
+            summary = summarize_minutes(minutes)
+            values.append((
+                frappe.generate_hash(length=10), user, user, now, now, 0, 0, station, period_start,
+                summary["attempts"], summary["successful"], summary["error_rate"], summary["minutes_polled"],
+                summary["minutes_up"], summary["uptime_percentage"], summary["avg_latency_ms"],
+                summary["p95_latency_ms"], summary["bytes_received"], json.dumps(summary["outcomes"]),
+                json.dumps(summary["error_classes"]), json.dumps(summary["latency_histogram"]),
+            ))
+
+        if values:
+            frappe.db.bulk_insert(SUMMARY_DOCTYPE, fields=fields, values=values, ignore_duplicates=True)
+            rows += len(values)
+
+        frappe.db.commit()
+        cache.set_value(COMPACTED_KEY, hour)
+
+    return rows
+
+
+# =============================================================================
+# API
+# =============================================================================
+
+def get_history(station, hours=24):
+    return frappe.get_all(SUMMARY_DOCTYPE,
+                          filters={"station": station,
+                                   "period_start": [">=", add_to_date(get_datetime(), hours=-cint(hours))]},
+                          fields=["period_start", "attempts", "successful", "error_rate", "minutes_polled",
+                                  "minutes_up", "uptime_percentage", "avg_latency_ms", "p95_latency_ms",
+                                  "bytes_received", "outcomes", "error_classes", "latency_histogram"],
+                          order_by="period_start asc")
+
+
+def summarize_history(rows):
+    """Window totals from hourly summary rows (p95 from the merged latency histograms)"""
+    attempts = sum(cint(row.attempts) for row in rows)
+    successful = sum(cint(row.successful) for row in rows)
+    minutes_polled = sum(cint(row.minutes_polled) for row in rows)
+    minutes_up = sum(cint(row.minutes_up) for row in rows)
+
+    histogram = defaultdict(int)
+    for row in rows:
+        for bound, count in json.loads(row.latency_histogram or "{}").items():
+            histogram[bound] += count
+
+    latency_rows = [row for row in rows if row.avg_latency_ms is not None and cint(row.successful)]
+    return {
+        "attempts": attempts,
+        "successful": successful,
+        "error_rate": round((attempts - successful) / attempts * 100, 2) if attempts else 0,
+        "uptime_percentage": round(minutes_up / minutes_polled * 100, 2) if minutes_polled else 0,
+        "avg_latency_ms": round(sum(row.avg_latency_ms * cint(row.successful) for row in latency_rows)
+                                / sum(cint(row.successful) for row in latency_rows), 2) if latency_rows else None,
+        "p95_latency_ms": get_percentile(histogram, 95),
+    }
+
+
+@frappe.whitelist()
+def get_station_connectivity(station, hours=24):
+    """Uptime %, p95 latency and error rate for a station: last hour (live) and the last `hours` (compacted)"""
+    frappe.has_permission("Manufacturing Station", "read", station, throw=True)
+
+    history = get_history(station, hours)
+    return {
+        "station": station,
+        "live": get_live_connectivity([station])[station],
+        "history": summarize_history(history),
+        "hourly": history,
+    }
+
+
+@frappe.whitelist()
+def get_connectivity_overview(minutes=QUALITY_WINDOW_MINUTES):
+    """Live uptime %, p95 latency and error rate for every station that was polled"""
+    frappe.has_permission("Manufacturing Station", "read", throw=True)
+    return get_live_connectivity(minutes=cint(minutes) or QUALITY_WINDOW_MINUTES)
+
+
+@frappe.whitelist()
+def get_station_attempts(station, sensor=None, limit=100):
+    """Latest raw polling attempts for a station (optionally one sensor)"""
+    frappe.has_permission("Manufacturing Station", "read", station, throw=True)
+    return get_recent_attempts(station, sensor, limit)
@@ -0,0 +1,17 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+class StationConnectivitySummary(Document):
+    """One station-hour of polling telemetry
+
+    Rows are written by amb_w_spc.shop_floor_control.connectivity.compact_connectivity, never by hand.
+    """
+    
+    pass
+
+def on_doctype_update():
+    frappe.db.add_unique("Station Connectivity Summary", ["station", "period_start"],
+                         constraint_name="unique_station_connectivity_period")
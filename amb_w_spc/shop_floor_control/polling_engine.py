@@ -0,0 +1,460 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# Asynchronous sensor polling engine for shop floor data collection
+#
+# A single long-running job polls every active sensor on its own
+# `polling_interval`, keeps a small pool of persistent connections per
+# station (sized by PLC Integration.max_concurrent_connections) and writes
+# readings to Real Time Process Data in batches.
+
+import asyncio
+import heapq
+import itertools
+import socket
+import time
+from collections import defaultdict
+
+import frappe
+import requests
+from frappe.utils import cint, flt, now_datetime
+
+from amb_w_spc.shop_floor_control.connectivity import classify_error, new_attempt, record_attempts
+from amb_w_spc.shop_floor_control.scheduler import (
+    apply_sensor_scaling,
+    generate_simulated_reading,
+    get_current_station_operation,
+    set_station_communication_status,
+)
+from amb_w_spc.sensor_management.rollups import update_rollups
+from amb_w_spc.system_integration.utils import reserve_series_names
+
+PROCESS_DATA_DOCTYPE = "Real Time Process Data"
+ENGINE_JOB_ID = "shop_floor_polling_engine"
+HEARTBEAT_KEY = "shop_floor_polling_engine:heartbeat"
+
+# Defaults mirror the doctype defaults (all intervals in milliseconds)
+DEFAULT_POLLING_INTERVAL_MS = 1000
+DEFAULT_CONNECTION_TIMEOUT_MS = 5000
+DEFAULT_KEEPALIVE_INTERVAL_MS = 30000
+DEFAULT_MAX_CONNECTIONS = 1
+DEFAULT_RETRY_ATTEMPTS = 3
+
+PROCESS_DATA_FIELDS = (
+    "name", "owner", "creation", "modified", "modified_by", "docstatus", "idx", "naming_series",
+    "timestamp", "station", "sensor", "parameter_name", "value", "unit_of_measure", "data_type", "status",
+    "upper_limit", "lower_limit", "upper_alarm_limit", "lower_alarm_limit", "within_spec",
+    "work_order", "item", "batch_no", "operation",
+)
+
+
+class StationConnectionError(Exception):
+    pass
+
+
+class StationConnectionPool:
+    """Bounded pool of persistent TCP connections to one station"""
+
+    def __init__(self, station, settings):
+        self.station = station
+        self.host = station.ip_address
+        self.port = cint(station.port_number)
+        self.timeout = settings["connection_timeout"]
+        self.keepalive = settings["keepalive_interval"]
+        self.retry_attempts = settings["retry_attempts"]
+        self._slots = asyncio.Semaphore(settings["max_concurrent_connections"])
+        self._idle = []
+
+    async def request(self, line):
+        """Send one request line and return the response line, retrying on failure"""
+        last_error = None
+
+        for attempt in range(self.retry_attempts + 1):
+            async with self._slots:
+                connection = self._idle.pop() if self._idle else None
+                try:
+                    if connection is None:
+                        connection = await self._open()
+
+                    reader, writer = connection
+                    writer.write(line.encode())
+                    await writer.drain()
+                    response = await asyncio.wait_for(reader.readline(), self.timeout)
+                    if not response:
+                        raise StationConnectionError("Connection closed by station")
+
+                    self._idle.append(connection)
+                    return response.decode().strip()
+
+                except (OSError, asyncio.TimeoutError, StationConnectionError) as e:
+                    last_error = e
+                    if connection:
+                        connection[1].close()
+
+            await asyncio.sleep(min(0.1 * 2 ** attempt, 2))
+
+        raise StationConnectionError(str(last_error)) from last_error
+
+    async def _open(self):
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            if hasattr(socket, "TCP_KEEPIDLE"):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, max(int(self.keepalive), 1))
+
+        return reader, writer
+
+    async def close(self):
+        while self._idle:
+            self._idle.pop()[1].close()
+
+
+class PollingEngine:
+    """Deadline-driven poller for all active sensors"""
+
+    def __init__(self, lifetime=3600, flush_interval=1.0, batch_size=500, refresh_interval=60):
+        self.lifetime = lifetime
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.refresh_interval = refresh_interval
+
+        self.stations = {}
+        self.sensors = {}
+        self.pools = {}
+        self.http_sessions = {}
+        self.operations = {}
+        self.station_status = {}
+
+        self.buffer = []
+        self.attempts = []
+        self.in_flight = set()
+        self.polling = {}  # sensor name -> its in-flight poll
+        self._sequence = itertools.count()
+
+    # -------------------------------------------------------------------------
+    # Configuration
+    # -------------------------------------------------------------------------
+
+    def load_configuration(self):
+        """(Re)load stations, sensors and PLC connection settings"""
+        stations = frappe.get_all("Manufacturing Station",
+                                  filters={"status": "Active", "polling_enabled": 1},
+                                  fields=["name", "station_id", "hostname", "ip_address", "port_number",
+                                          "read_interval", "connection_timeout", "retry_attempts",
+                                          "communication_status"])
+        self.stations = {station.name: station for station in stations}
+
+        plc_settings = {}
+        for plc in frappe.get_all("PLC Integration",
+                                  fields=["ip_address", "port", "connection_timeout", "retry_attempts",
+                                          "max_concurrent_connections", "keepalive_interval"]):
+            plc_settings[(plc.ip_address, cint(plc.port))] = plc
+
+        sensors = frappe.get_all("Sensor Configuration",
+                                 filters={"station": ["in", list(self.stations) or [""]], "status": "Active"},
+                                 fields=["name", "sensor_id", "sensor_name", "sensor_type", "station",
+                                         "communication_protocol", "address", "polling_interval", "data_type",
+                                         "scaling_factor", "offset", "unit_of_measure",
+                                         "upper_warning", "lower_warning", "upper_alarm", "lower_alarm"])
+        self.sensors = {sensor.name: sensor for sensor in sensors}
+
+        for name, station in self.stations.items():
+            settings = get_station_settings(station, plc_settings.get((station.ip_address, cint(station.port_number))))
+            pool = self.pools.get(name)
+            if pool is None or pool.host != station.ip_address or pool.port != cint(station.port_number):
+                self.pools[name] = StationConnectionPool(station, settings)
+                self.http_sessions[name] = get_http_session(settings["max_concurrent_connections"])
+
+            self.station_status.setdefault(name, station.communication_status)
+            self.operations[name] = get_current_station_operation(name)
+
+    def get_interval(self, sensor):
+        station = self.stations.get(sensor.station) or {}
+        interval_ms = cint(sensor.polling_interval) or cint(station.get("read_interval")) or DEFAULT_POLLING_INTERVAL_MS
+        return interval_ms / 1000.0
+
+    # -------------------------------------------------------------------------
+    # Main loop
+    # -------------------------------------------------------------------------
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        next_refresh = started + self.refresh_interval
+        next_flush = started + self.flush_interval
+
+        self.load_configuration()
+        schedule = self.build_schedule(started)
+
+        try:
+            while loop.time() - started < self.lifetime:
+                now = loop.time()
+
+                while schedule and schedule[0][0] <= now:
+                    due, _, sensor_name = heapq.heappop(schedule)
+                    sensor = self.sensors.get(sensor_name)
+                    if not sensor:
+                        continue  # removed or deactivated on the last refresh
+
+                    # A slow sensor skips the polls that fall due while it is still being read
+                    if sensor_name not in self.polling:
+                        self.start_poll(sensor)
+
+                    # Keep cadence, but never queue up a backlog of missed polls
+                    next_due = max(due + self.get_interval(sensor), now)
+                    heapq.heappush(schedule, (next_due, next(self._sequence), sensor_name))
+
+                if now >= next_flush or len(self.buffer) >= self.batch_size:
+                    self.flush()
+                    next_flush = now + self.flush_interval
+
+                if now >= next_refresh:
+                    self.load_configuration()
+                    known = {entry[2] for entry in schedule}
+                    for entry in self.build_schedule(now, exclude=known):
+                        heapq.heappush(schedule, entry)
+                    frappe.cache().set_value(HEARTBEAT_KEY, now_datetime(), expires_in_sec=3 * self.refresh_interval)
+                    next_refresh = now + self.refresh_interval
+
+                wake_at = min(schedule[0][0] if schedule else next_refresh, next_flush, next_refresh)
+                await asyncio.sleep(max(wake_at - loop.time(), 0.001))
+
+        finally:
+            if self.in_flight:
+                await asyncio.gather(*self.in_flight, return_exceptions=True)
+            self.flush()
+            for pool in self.pools.values():
+                await pool.close()
+
+    def start_poll(self, sensor):
+        task = asyncio.create_task(self.poll_sensor(sensor))
+        self.in_flight.add(task)
+        self.polling[sensor.name] = task
+
+        def done(task, sensor_name=sensor.name):
+            self.in_flight.discard(task)
+            if self.polling.get(sensor_name) is task:
+                del self.polling[sensor_name]
+
+        task.add_done_callback(done)
+        return task
+
+    def build_schedule(self, start, exclude=()):
+        """Spread first polls across each sensor's interval to avoid bursts"""
+        schedule = []
+        for index, (name, sensor) in enumerate(self.sensors.items()):
+            if name in exclude:
+                continue
+            interval = self.get_interval(sensor)
+            offset = (index * 0.037) % interval
+            schedule.append((start + offset, next(self._sequence), name))
+
+        heapq.heapify(schedule)
+        return schedule
+
+    async def poll_sensor(self, sensor):
+        started = time.perf_counter()
+        try:
+            value, bytes_received = await self.read_sensor(sensor)
+        except Exception as e:
+            outcome, error_class = classify_error(e)
+            self.attempts.append(new_attempt(sensor.station, sensor.name, outcome,
+                                             (time.perf_counter() - started) * 1000, error_class=error_class))
+            frappe.logger().error(f"Error reading sensor {sensor.sensor_id}: {str(e)}")
+            return
+
+        self.attempts.append(new_attempt(sensor.station, sensor.name, "ok" if value is not None else "no_data",
+                                         (time.perf_counter() - started) * 1000, bytes_received))
+        if value is None:
+            return
+
+        self.buffer.append(build_process_data_row(sensor, value, self.operations.get(sensor.station)))
+
+    async def read_sensor(self, sensor):
+        """(value, bytes received) for one poll"""
+        station = self.stations[sensor.station]
+        protocol = sensor.communication_protocol
+
+        if protocol == "TCP/IP":
+            response = await self.pools[sensor.station].request(f"READ {sensor.address or sensor.sensor_id}\n")
+            return apply_sensor_scaling(float(response), sensor), len(response)
+
+        if protocol == "HTTP":
+            session = self.http_sessions[sensor.station]
+            url = f"http://{station.ip_address}:{station.port_number}/api/sensors/{sensor.address or sensor.sensor_id}"
+            timeout = self.pools[sensor.station].timeout
+            response = await asyncio.to_thread(session.get, url, timeout=timeout)
+            if response.status_code != 200:
+                return None, len(response.content)
+            raw_value = response.json().get("value")
+            return (apply_sensor_scaling(raw_value, sensor) if raw_value is not None else None), len(response.content)
+
+        # Modbus TCP / MQTT drivers are not wired up yet; same fallback as scheduler.read_sensor_value
+        return generate_simulated_reading(sensor), 0
+
+    def get_station_status_changes(self, attempts):
+        """{station: status} for stations whose status the attempts change
+
+        A station is Online while any of its sensors answers and in Error only
+        when every attempt on it failed; polls that returned no data leave it
+        as it is.
+        """
+        outcomes = defaultdict(set)
+        for attempt in attempts:
+            outcomes[attempt.station].add(attempt.outcome)
+
+        changes = {}
+        for station, seen in outcomes.items():
+            if "ok" in seen:
+                status = "Online"
+            elif seen - {"no_data"}:
+                status = "Error"
+            else:
+                continue
+
+            if self.station_status.get(station) != status:
+                changes[station] = status
+
+        return changes
+
+    # -------------------------------------------------------------------------
+    # Persistence
+    # -------------------------------------------------------------------------
+
+    def flush(self):
+        """Write buffered readings with one multi-row INSERT, and station status changes, in one commit"""
+        attempts, self.attempts = self.attempts, []
+        try:
+            record_attempts(attempts)
+        except Exception as e:
+            frappe.logger().error(f"Error writing {len(attempts)} communication attempts: {str(e)}")
+
+        status_changes = self.get_station_status_changes(attempts)
+        if not self.buffer and not status_changes:
+            return
+
+        rows, self.buffer = self.buffer, []
+
+        try:
+            if rows:
+                insert_process_data_rows(rows)
+                update_rollups(rows)
+            for station, status in status_changes.items():
+                set_station_communication_status(station, status)
+            frappe.db.commit()
+        except Exception as e:
+            frappe.db.rollback()
+            frappe.log_error(f"Error writing {len(rows)} process data readings and "
+                             f"{len(status_changes)} station status changes: {str(e)}")
+            return
+
+        # Only remembered once stored, so a failed write is retried on the next flush
+        self.station_status.update(status_changes)
+
+
+def get_station_settings(station, plc=None):
+    """Connection settings for a station, preferring its PLC Integration record"""
+    plc = plc or frappe._dict()
+
+    timeout_ms = cint(plc.connection_timeout) or DEFAULT_CONNECTION_TIMEOUT_MS
+    if not plc.connection_timeout and station.connection_timeout:
+        timeout_ms = cint(station.connection_timeout) * 1000  # station timeout is in seconds
+
+    return {
+        "connection_timeout": timeout_ms / 1000.0,
+        "keepalive_interval": (cint(plc.keepalive_interval) or DEFAULT_KEEPALIVE_INTERVAL_MS) / 1000.0,
+        "retry_attempts": cint(plc.retry_attempts or station.retry_attempts or DEFAULT_RETRY_ATTEMPTS),
+        "max_concurrent_connections": max(cint(plc.max_concurrent_connections) or DEFAULT_MAX_CONNECTIONS, 1),
+    }
+
+
+def get_http_session(pool_size):
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    return session
+
+
+def build_process_data_row(sensor, value, operation=None):
+    operation = operation or {}
+    status = get_reading_status(sensor, value)
+
+    return frappe._dict({
+        "timestamp": now_datetime(),
+        "station": sensor.station,
+        "sensor": sensor.name,
+        "parameter_name": sensor.sensor_name,
+        "value": value,
+        "unit_of_measure": sensor.unit_of_measure,
+        "data_type": sensor.data_type or "Float",
+        "status": status,
+        "upper_limit": sensor.upper_warning,
+        "lower_limit": sensor.lower_warning,
+        "upper_alarm_limit": sensor.upper_alarm,
+        "lower_alarm_limit": sensor.lower_alarm,
+        "within_spec": 1 if status == "Normal" else 0,
+        "work_order": operation.get("work_order"),
+        "item": operation.get("item"),
+        "batch_no": operation.get("batch_no"),
+        "operation": operation.get("operation"),
+    })
+
+
+def get_reading_status(sensor, value):
+    value = flt(value)
+    if (sensor.upper_alarm and value > flt(sensor.upper_alarm)) or \
+            (sensor.lower_alarm and value < flt(sensor.lower_alarm)):
+        return "Alarm"
+    if (sensor.upper_warning and value > flt(sensor.upper_warning)) or \
+            (sensor.lower_warning and value < flt(sensor.lower_warning)):
+        return "Warning"
+    return "Normal"
+
+
+def insert_process_data_rows(rows):
+    """Insert readings into Real Time Process Data with a single statement"""
+    now = now_datetime()
+    user = frappe.session.user
+    names = reserve_series_names(now.strftime("RTPD-%Y-%m-%d-"), len(rows))
+
+    values = []
+    for name, row in zip(names, rows):
+        row.name = name
+        values.append((
+            name, user, now, now, user, 0, 0, "RTPD-.YYYY.-.MM.-.DD.-.#####",
+            row.timestamp, row.station, row.sensor, row.parameter_name, row.value, row.unit_of_measure,
+            row.data_type, row.status, row.upper_limit, row.lower_limit, row.upper_alarm_limit,
+            row.lower_alarm_limit, row.within_spec, row.work_order, row.item, row.batch_no, row.operation,
+        ))
+
+    frappe.db.bulk_insert(PROCESS_DATA_DOCTYPE, fields=PROCESS_DATA_FIELDS, values=values)
+    return rows
+
+
+# =============================================================================
+# ENTRY POINTS
+# =============================================================================
+
+def run_polling_engine(lifetime=3600):
+    """Long-queue job: poll all sensors until `lifetime` seconds have passed"""
+    frappe.cache().set_value(HEARTBEAT_KEY, now_datetime(), expires_in_sec=180)
+    try:
+        asyncio.run(PollingEngine(lifetime=cint(lifetime)).run())
+    finally:
+        frappe.cache().delete_value(HEARTBEAT_KEY)
+
+
+def ensure_polling_engine():
+    """Start the polling engine if no live instance has reported a heartbeat"""
+    if frappe.cache().get_value(HEARTBEAT_KEY):
+        return False
+
+    frappe.enqueue(
+        "amb_w_spc.shop_floor_control.polling_engine.run_polling_engine",
+        queue="long",
+        timeout=3600 + 300,
+        job_id=ENGINE_JOB_ID,
+        deduplicate=True,
+        lifetime=3600,
+    )
+    return True
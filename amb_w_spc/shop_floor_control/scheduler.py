@@ -7,45 +7,28 @@ import json
 import requests
 from frappe.utils import now, cint, flt, add_minutes
 from frappe import _
-import threading
 import time
 
 def collect_sensor_data():
-    """Main scheduler function to collect data from all active sensors - runs every minute"""
+    """Scheduler entry point (every minute): keep the asynchronous polling engine running
+
+    Sensors are polled continuously on their own polling_interval by
+    polling_engine.run_polling_engine; this tick only restarts it when no live
+    instance has reported a heartbeat.
+    """
+    from amb_w_spc.shop_floor_control.polling_engine import ensure_polling_engine
+    
     try:
-        frappe.logger().info("Starting scheduled sensor data collection")
-        
-        # Get all active manufacturing stations
-        active_stations = frappe.get_all("Manufacturing Station", 
-                                       filters={
-                                           "status": "Active",
-                                           "polling_enabled": 1
-                                       },
-                                       fields=["name", "station_id", "hostname", "ip_address", 
-                                              "port_number", "read_interval", "communication_status"])
-        
-        if not active_stations:
-            frappe.logger().info("No active stations found for data collection")
-            return
-        
-        # Process stations in parallel for better performance
-        threads = []
-        for station in active_stations:
-            thread = threading.Thread(target=collect_station_data, args=(station,))
-            threads.append(thread)
-            thread.start()
-        
-        # Wait for all threads to complete (with timeout)
-        for thread in threads:
-            thread.join(timeout=30)  # 30 second timeout per station
-        
-        frappe.logger().info(f"Completed data collection for {len(active_stations)} stations")
+        if ensure_polling_engine():
+            frappe.logger().info("Started shop floor polling engine")
         
     except Exception as e:
         frappe.log_error(f"Error in scheduled sensor data collection: {str(e)}")
 
 def collect_station_data(station):
-    """Collect data from a specific manufacturing station"""
+    """Collect data from a specific manufacturing station in one synchronous pass (manual/testing use)"""
+    from amb_w_spc.shop_floor_control.connectivity import new_attempt, record_attempts
+    
     try:
         frappe.logger().info(f"Collecting data from station: {station.station_id}")
         
@@ -64,14 +47,19 @@ def collect_station_data(station):
         
         # Test station connectivity first
         if not test_station_connectivity(station):
+            record_attempts([new_attempt(station.name, outcome="unreachable")])
             update_station_communication_status(station.name, "Offline")
             return
         
         # Collect data from each sensor
         successful_reads = 0
+        attempts = []
         for sensor in sensors:
             try:
+                started = time.perf_counter()
                 value = read_sensor_value(station, sensor)
+                attempts.append(new_attempt(station.name, sensor.name, "ok" if value is not None else "no_data",
+                                            (time.perf_counter() - started) * 1000))
                 if value is not None:
                     create_process_data_record(station, sensor, value)
                     successful_reads += 1
@@ -82,6 +70,8 @@ def collect_station_data(station):
             except Exception as e:
                 frappe.log_error(f"Error reading sensor {sensor.sensor_id} at station {station.station_id}: {str(e)}")
         
+        record_attempts(attempts)
+        
         # Update station communication status
         if successful_reads > 0:
             update_station_communication_status(station.name, "Online")
@@ -298,26 +288,31 @@ def get_current_station_operation(station_name):
 def update_station_communication_status(station_name, status):
     """Update station communication status"""
     try:
-        frappe.db.set_value("Manufacturing Station", station_name, {
-            "communication_status": status,
-            "last_communication": now()
-        })
+        set_station_communication_status(station_name, status)
         frappe.db.commit()
         
-        # Publish real-time status update
-        frappe.realtime.publish_realtime(
-            event="station_status_change",
-            message={
-                "station": station_name,
-                "communication_status": status,
-                "timestamp": now()
-            },
-            room="shop_floor_monitoring"
-        )
-        
     except Exception as e:
         frappe.log_error(f"Error updating station communication status: {str(e)}")
 
+def set_station_communication_status(station_name, status):
+    """Write station communication status in the current transaction; clients are told once it commits"""
+    timestamp = now()
+    frappe.db.set_value("Manufacturing Station", station_name, {
+        "communication_status": status,
+        "last_communication": timestamp
+    })
+    
+    # Publish real-time status update
+    frappe.db.after_commit.add(lambda: frappe.realtime.publish_realtime(
+        event="station_status_change",
+        message={
+            "station": station_name,
+            "communication_status": status,
+            "timestamp": timestamp
+        },
+        room="shop_floor_monitoring"
+    ))
+
 # Utility function for testing
 @frappe.whitelist()
 def test_sensor_data_collection():
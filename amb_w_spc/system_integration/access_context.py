@@ -0,0 +1,129 @@
+"""
+Warehouse Access Context
+Per-user warehouse access (roles, plant, accessible warehouses and the SQL
+conditions used by list views), compiled once and cached in Redis until a
+User, Role, User Permission or Warehouse change invalidates it
+"""
+
+import frappe
+
+CACHE_KEY = "warehouse_access_context"
+
+# Most permissive level wins
+ACCESS_LEVEL_ROLES = [
+    ("manager", "Warehouse Manager"),
+    ("production", "Production Manager"),
+    ("supervisor", "Plant Supervisor"),
+    ("operator", "Warehouse Operator"),
+    ("quality", "Quality Inspector"),
+]
+
+ACCESS_LEVEL_OPERATIONS = {
+    "all": None,
+    "manager": None,
+    "production": ("read", "write", "create", "submit"),
+    "supervisor": ("read", "write"),
+    "operator": ("read", "write"),
+    "quality": ("read", "write", "submit"),
+}
+
+# Role -> list view condition per doctype; "{user}" is replaced with the escaped user
+PERMISSION_QUERY_CONDITIONS = {
+    "Stock Entry": {
+        "Warehouse Manager": "1=1",  # Access to all
+        "Stock User": "1=1",        # Access to all
+        "Production Manager": "(`tabStock Entry`.purpose in ('Material Issue', 'Material Transfer'))",
+        "Sales User": "(`tabStock Entry`.purpose = 'Material Issue' AND `tabStock Entry`.to_warehouse LIKE '%FG%')"
+    },
+    "Work Order": {
+        "Production Manager": "1=1",  # Access to all
+        "Warehouse Manager": "1=1",   # Access to all
+        "Manufacturing User": "(`tabWork Order`.owner = {user} OR `tabWork Order`.docstatus = 1)",
+        "Stock User": "(`tabWork Order`.docstatus = 1)"  # Only submitted Work Orders
+    }
+}
+
+WAREHOUSE_FIELDS = ["name", "warehouse_name", "plant_code", "warehouse_type"]
+
+def get_access_context(user=None):
+    """Cached access context for a user"""
+    user = user or frappe.session.user
+
+    context = frappe.cache().hget(CACHE_KEY, user)
+    if context is None:
+        context = build_access_context(user)
+        frappe.cache().hset(CACHE_KEY, user, context)
+
+    return context
+
+def build_access_context(user):
+    roles = frappe.get_roles(user)
+    all_access = "System Manager" in roles
+
+    plant_code = None
+    if not all_access and frappe.get_meta("User").has_field("plant_code"):
+        plant_code = frappe.db.get_value("User", user, "plant_code")
+
+    filters = {"is_group": 0}
+    if plant_code:
+        filters["plant_code"] = plant_code
+
+    warehouses = frappe.get_all("Warehouse", filters=filters, fields=WAREHOUSE_FIELDS)
+
+    access_level = "all" if all_access else next(
+        (level for level, role in ACCESS_LEVEL_ROLES if role in roles), "restricted")
+
+    return frappe._dict({
+        "user": user,
+        "roles": roles,
+        "plant_code": plant_code,
+        "access_level": access_level,
+        "warehouses": warehouses,
+        "warehouse_names": frozenset(w.name for w in warehouses),
+        "conditions": {
+            doctype: compile_conditions(role_conditions, roles, user)
+            for doctype, role_conditions in PERMISSION_QUERY_CONDITIONS.items()
+        }
+    })
+
+def compile_conditions(role_conditions, roles, user):
+    conditions = [role_conditions[role] for role in roles if role in role_conditions]
+    if "1=1" in conditions:
+        return ""
+
+    escaped_user = frappe.db.escape(user)
+    return " OR ".join(c.replace("{user}", escaped_user) for c in conditions) if conditions else "0=1"
+
+def get_permission_query_condition(doctype, user=None):
+    """Precompiled list view condition for a doctype"""
+    return get_access_context(user).conditions.get(doctype, "")
+
+def can_access_warehouse(warehouse, operation="read", user=None):
+    context = get_access_context(user)
+
+    if context.access_level == "all":
+        return True
+
+    if warehouse not in context.warehouse_names:
+        return False
+
+    operations = ACCESS_LEVEL_OPERATIONS.get(context.access_level, ("read",))
+    return operations is None or operation in operations
+
+# =============================================================================
+# INVALIDATION
+# =============================================================================
+
+def clear_access_context(user=None):
+    if user:
+        frappe.cache().hdel(CACHE_KEY, user)
+    else:
+        frappe.cache().delete_key(CACHE_KEY)
+
+def clear_user_access_context(doc, method=None):
+    """User / User Permission doc event"""
+    clear_access_context(doc.name if doc.doctype == "User" else doc.get("user"))
+
+def clear_all_access_contexts(doc=None, method=None):
+    """Role / Warehouse doc event: affects every user"""
+    clear_access_context()
@@ -0,0 +1,368 @@
+"""
+Data Retention and Archival
+Moves aged rows of high-volume telemetry doctypes into compressed,
+date-partitioned archive files and keeps them queryable for audits
+"""
+
+import gzip
+import hashlib
+import json
+import os
+
+import frappe
+from frappe import _
+from frappe.utils import add_days, cint, get_datetime, getdate, now_datetime
+
+ARCHIVE_ROOT = ("private", "archives")
+MANIFEST_DOCTYPE = "Data Archive Manifest"
+CHUNK_SIZE = 5000
+
+AUDIT_TRAIL_DOCTYPE = "SPC Audit Trail"
+
+# Default policies; override per site with the `amb_w_spc_retention_policies`
+# key in site_config.json, e.g. {"Real Time Process Data": {"days": 30}}.
+# The audit trail is archived by sequence, see archive_audit_trail.
+RETENTION_POLICIES = {
+    "Real Time Process Data": {"date_field": "timestamp", "days": 90},
+    "Weight Event": {"date_field": "event_timestamp", "days": 180},
+    "SPC Data Point": {"date_field": "timestamp", "days": 730},
+    "SPC Audit Trail": {"date_field": "timestamp", "days": 365},
+    "Station Connectivity Summary": {"date_field": "period_start", "days": 365},
+}
+
+ARCHIVE_READER_ROLES = ("System Manager", "Quality Manager", "QA Manager")
+
+def get_retention_policies():
+    """Default policies merged with site overrides"""
+    policies = {doctype: dict(policy) for doctype, policy in RETENTION_POLICIES.items()}
+
+    for doctype, override in (frappe.conf.get("amb_w_spc_retention_policies") or {}).items():
+        policies.setdefault(doctype, {"date_field": "creation"}).update(override)
+
+    return {doctype: policy for doctype, policy in policies.items() if cint(policy.get("days")) > 0}
+
+# =============================================================================
+# RETENTION RUN
+# =============================================================================
+
+def apply_retention_policies():
+    """Archive and purge every doctype that has a retention policy"""
+    results = {}
+
+    for doctype, policy in get_retention_policies().items():
+        try:
+            if doctype == AUDIT_TRAIL_DOCTYPE:
+                results[doctype] = archive_audit_trail(policy["days"])
+            else:
+                results[doctype] = archive_doctype(doctype, policy["days"], policy.get("date_field", "creation"))
+        except Exception as e:
+            frappe.db.rollback()
+            frappe.log_error(f"Retention run failed for {doctype}: {str(e)}", "Data Retention")
+            results[doctype] = {"error": str(e)}
+
+    return results
+
+def enqueue_retention_run():
+    """Scheduler hook: retention can move millions of rows, keep it off the default queue"""
+    frappe.enqueue(
+        "amb_w_spc.system_integration.data_retention.apply_retention_policies",
+        queue="long",
+        timeout=6 * 60 * 60,
+        job_id="amb_w_spc_data_retention",
+        deduplicate=True
+    )
+
+def archive_doctype(doctype, days_to_keep, date_field="timestamp", chunk_size=CHUNK_SIZE):
+    """Archive rows older than `days_to_keep` days, then remove them from the hot table
+
+    Rows are streamed oldest-first in chunks; each chunk is written to one
+    gzip'd JSONL file per day before the rows are deleted, so a failure never
+    loses data that has not been archived. Expired partitions of a
+    partitioned table are dropped wholesale instead of being deleted row by
+    row.
+    """
+    cutoff = getdate(add_days(now_datetime(), -cint(days_to_keep)))
+    run_id = now_datetime().strftime("%Y%m%d%H%M%S")
+    table = f"tab{doctype}"
+
+    droppable, drop_until = get_expired_partitions(table, cutoff)
+
+    archived = 0
+    files = 0
+    last_seen = None
+
+    while True:
+        conditions = [f"`{date_field}` < %(cutoff)s"]
+        if last_seen:
+            # Keyset pagination: rows inside droppable partitions are not deleted
+            # per chunk, so we cannot rely on them disappearing between reads
+            conditions.append(f"(`{date_field}`, `name`) > (%(last_date)s, %(last_name)s)")
+
+        rows = frappe.db.sql(f"""
+            SELECT * FROM `{table}`
+            WHERE {" AND ".join(conditions)}
+            ORDER BY `{date_field}`, `name`
+            LIMIT {cint(chunk_size)}
+        """, {
+            "cutoff": cutoff,
+            "last_date": last_seen[0] if last_seen else None,
+            "last_name": last_seen[1] if last_seen else None
+        }, as_dict=True)
+
+        if not rows:
+            break
+
+        for partition_date, day_rows in group_rows_by_day(rows, date_field).items():
+            write_archive_file(doctype, partition_date, day_rows, date_field, run_id)
+            files += 1
+
+        to_delete = [row.name for row in rows if not drop_until or get_datetime(row[date_field]) >= drop_until]
+        if to_delete:
+            frappe.db.sql(f"DELETE FROM `{table}` WHERE `name` IN %(names)s", {"names": to_delete})
+
+        frappe.db.commit()
+
+        archived += len(rows)
+        last_seen = (rows[-1][date_field], rows[-1].name)
+
+    # Freed pages are reused by InnoDB; no OPTIMIZE TABLE, which rebuilds the whole table
+    if droppable:
+        frappe.db.sql_ddl(f"ALTER TABLE `{table}` DROP PARTITION {', '.join(f'`{p}`' for p in droppable)}")
+
+    return {
+        "archived_count": archived,
+        "files_written": files,
+        "partitions_dropped": droppable,
+        "cutoff": str(cutoff)
+    }
+
+def archive_audit_trail(days_to_keep, chunk_size=CHUNK_SIZE):
+    """Archive the oldest chained audit records and anchor the chain where they end
+
+    Records are numbered when the background writer chains them, some time
+    after their timestamp, so a timestamp cutoff is not a sequence range.
+    Only the run of sequences before the first record newer than the cutoff
+    is archived, which leaves the remaining trail contiguous, and the chain
+    head always stays. Each chunk is deleted in the transaction that records
+    the sequence and hash of its last record as the chain anchor, which the
+    integrity verifier links the remaining trail to.
+    """
+    from amb_w_spc.fda_compliance.audit_trail import get_chain_anchor, get_chain_head, record_chain_anchor
+
+    cutoff = getdate(add_days(now_datetime(), -cint(days_to_keep)))
+    run_id = now_datetime().strftime("%Y%m%d%H%M%S")
+    table = f"tab{AUDIT_TRAIL_DOCTYPE}"
+
+    head_sequence, _head_hash = get_chain_head()
+    first_kept = frappe.db.sql(f"""
+        SELECT MIN(sequence) FROM `{table}`
+        WHERE sequence IS NOT NULL AND timestamp >= %s
+    """, (cutoff,))[0][0]
+    archive_through = min(cint(first_kept) - 1 if first_kept else head_sequence, head_sequence - 1)
+
+    archived = 0
+    files = 0
+    last_sequence, _anchor_hash = get_chain_anchor()
+
+    while last_sequence < archive_through:
+        rows = frappe.db.sql(f"""
+            SELECT * FROM `{table}`
+            WHERE sequence > %(last_sequence)s AND sequence <= %(through)s
+            ORDER BY sequence
+            LIMIT {cint(chunk_size)}
+        """, {"last_sequence": last_sequence, "through": archive_through}, as_dict=True)
+
+        if not rows:
+            break
+
+        for partition_date, day_rows in group_rows_by_day(rows, "timestamp").items():
+            write_archive_file(AUDIT_TRAIL_DOCTYPE, partition_date, day_rows, "timestamp", run_id)
+            files += 1
+
+        frappe.db.sql(f"DELETE FROM `{table}` WHERE `name` IN %(names)s", {"names": [row.name for row in rows]})
+        record_chain_anchor(rows[-1].sequence, rows[-1].hash_value, len(rows), run_id)
+        frappe.db.commit()
+
+        archived += len(rows)
+        last_sequence = cint(rows[-1].sequence)
+
+    return {
+        "archived_count": archived,
+        "files_written": files,
+        "archived_through": last_sequence,
+        "cutoff": str(cutoff)
+    }
+
+def group_rows_by_day(rows, date_field):
+    days = {}
+    for row in rows:
+        days.setdefault(getdate(row[date_field]), []).append(row)
+    return days
+
+def get_archive_directory(doctype, partition_date):
+    return frappe.get_site_path(*ARCHIVE_ROOT, frappe.scrub(doctype),
+                                partition_date.strftime("%Y"), partition_date.strftime("%m"))
+
+def write_archive_file(doctype, partition_date, rows, date_field, run_id):
+    """Write one day of rows as gzip'd JSONL and record its manifest"""
+    directory = get_archive_directory(doctype, partition_date)
+    os.makedirs(directory, exist_ok=True)
+
+    path = os.path.join(directory, f"{partition_date.isoformat()}-{run_id}-{frappe.generate_hash(length=6)}.jsonl.gz")
+
+    # The file must be durable before the rows it holds are deleted
+    with open(path, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as archive:
+            for row in rows:
+                archive.write(json.dumps(row, default=str, sort_keys=True).encode("utf-8") + b"\n")
+        raw.flush()
+        os.fsync(raw.fileno())
+
+    manifest = frappe.get_doc({
+        "doctype": MANIFEST_DOCTYPE,
+        "archived_doctype": doctype,
+        "partition_date": partition_date,
+        "retention_run": run_id,
+        "status": "Archived",
+        "row_count": len(rows),
+        "file_path": os.path.relpath(path, frappe.get_site_path()),
+        "file_size": os.path.getsize(path),
+        "sha256": get_file_sha256(path),
+        "first_record_at": rows[0][date_field],
+        "last_record_at": rows[-1][date_field]
+    })
+    manifest.insert(ignore_permissions=True)
+
+    return manifest.name
+
+def get_file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# =============================================================================
+# PARTITION MANAGEMENT
+# =============================================================================
+
+def get_expired_partitions(table, cutoff):
+    """RANGE partitions whose upper bound is on or before `cutoff`
+
+    Returns (partition names, upper bound of the last droppable partition).
+    Only RANGE COLUMNS partitioning on a date/datetime column is recognised;
+    anything else falls back to chunked deletes.
+    """
+    partitions = frappe.db.sql("""
+        SELECT PARTITION_NAME, PARTITION_METHOD, PARTITION_DESCRIPTION
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """, (table,), as_dict=True)
+
+    droppable = []
+    drop_until = None
+
+    for partition in partitions:
+        if partition.PARTITION_METHOD != "RANGE COLUMNS":
+            return [], None
+
+        bound = (partition.PARTITION_DESCRIPTION or "").strip("'")
+        if bound == "MAXVALUE":
+            break
+
+        try:
+            bound = get_datetime(bound)
+        except Exception:
+            return [], None
+
+        if bound > get_datetime(cutoff):
+            break
+
+        droppable.append(partition.PARTITION_NAME)
+        drop_until = bound
+
+    # Never drop every partition of a table
+    if droppable and len(droppable) == len(partitions):
+        droppable.pop()
+        drop_until = None if not droppable else drop_until
+
+    return droppable, drop_until
+
+# =============================================================================
+# READ API
+# =============================================================================
+
+@frappe.whitelist()
+def query_archive(doctype, from_date, to_date, filters=None, limit=1000, verify=1):
+    """Read archived rows of a doctype between two dates (inclusive)
+
+    `filters` is a dict of field -> value equality conditions. Archive files
+    are checked against their manifest hash before being read unless
+    `verify` is 0.
+    """
+    if not set(ARCHIVE_READER_ROLES) & set(frappe.get_roles()):
+        frappe.throw(_("Not permitted to read archived records"), frappe.PermissionError)
+
+    if isinstance(filters, str):
+        filters = json.loads(filters)
+    filters = filters or {}
+    limit = cint(limit) or 1000
+
+    manifests = frappe.get_all(MANIFEST_DOCTYPE,
+        filters={
+            "archived_doctype": doctype,
+            "partition_date": ["between", [getdate(from_date), getdate(to_date)]],
+            "status": ["in", ["Archived", "Verified"]]
+        },
+        fields=["name", "partition_date", "file_path", "sha256", "row_count"],
+        order_by="partition_date asc, creation asc"
+    )
+
+    rows = []
+    for manifest in manifests:
+        path = frappe.get_site_path(manifest.file_path)
+
+        if not os.path.exists(path):
+            frappe.db.set_value(MANIFEST_DOCTYPE, manifest.name, "status", "Missing")
+            continue
+
+        if cint(verify) and get_file_sha256(path) != manifest.sha256:
+            frappe.db.set_value(MANIFEST_DOCTYPE, manifest.name, "status", "Corrupt")
+            continue
+
+        with gzip.open(path, "rt", encoding="utf-8") as archive:
+            for line in archive:
+                row = json.loads(line)
+                if all(str(row.get(field)) == str(value) for field, value in filters.items()):
+                    rows.append(row)
+                    if len(rows) >= limit:
+                        return {"rows": rows, "truncated": True}
+
+    return {"rows": rows, "truncated": False}
+
+@frappe.whitelist()
+def verify_archives(doctype=None):
+    """Re-hash archive files and mark each manifest Verified, Missing or Corrupt"""
+    frappe.only_for("System Manager")
+
+    filters = {"archived_doctype": doctype} if doctype else {}
+    summary = {"Verified": 0, "Missing": 0, "Corrupt": 0}
+
+    for manifest in frappe.get_all(MANIFEST_DOCTYPE, filters=filters, fields=["name", "file_path", "sha256"]):
+        path = frappe.get_site_path(manifest.file_path)
+
+        if not os.path.exists(path):
+            status = "Missing"
+        elif get_file_sha256(path) != manifest.sha256:
+            status = "Corrupt"
+        else:
+            status = "Verified"
+
+        frappe.db.set_value(MANIFEST_DOCTYPE, manifest.name, {
+            "status": status,
+            "last_verified_on": now_datetime()
+        })
+        summary[status] += 1
+
+    return summary
@@ -0,0 +1,13 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+class DataArchiveManifest(Document):
+    """One archive file (one doctype, one day, one retention run)
+    
+    Written by amb_w_spc.system_integration.data_retention.
+    """
+    
+    pass
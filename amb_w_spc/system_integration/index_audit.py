@@ -0,0 +1,144 @@
+"""
+Index and query plan audit
+
+Inventories the filters the app runs on its hot paths, EXPLAINs them against
+the site database and creates the composite indexes they need.
+"""
+
+import frappe
+from frappe.utils import add_days, cint, now_datetime
+
+# Composite indexes backing the hot paths below; created by
+# amb_w_spc.patches.v15.add_hot_path_indexes and by `bench audit-indexes --create`
+INDEXES = [
+    ("Container Barrels", ["barrel_serial_number"]),
+    ("Container Barrels", ["parent", "idx"]),
+    ("SPC Data Point", ["parameter", "status", "timestamp"]),
+    ("SPC Data Point", ["parameter", "timestamp"]),
+    ("Batch AMB", ["parent_batch_amb"]),
+    ("Batch AMB", ["erpnext_batch_reference"]),
+    ("Sensor Configuration", ["station", "status"]),
+    ("Real Time Process Data", ["sensor", "timestamp"]),
+    ("Real Time Process Data", ["timestamp"]),
+    ("Weight Event", ["event_timestamp"]),
+    ("SPC Audit Trail", ["timestamp"]),
+    ("SPC Electronic Signature", ["signature_date"]),
+]
+
+# Known query shapes: (label, doctype, WHERE clause, sample values, ORDER BY)
+QUERY_SHAPES = [
+    ("Weight event barrel lookup", "Container Barrels",
+     "barrel_serial_number IN %(serials)s", {"serials": ("",)}, None),
+    ("Container serial allocation", "Container Barrels",
+     "parent = %(parent)s AND parenttype = 'Batch AMB'", {"parent": ""}, "idx DESC"),
+    ("Rolling statistics rebuild", "SPC Data Point",
+     "parameter = %(parameter)s AND status = %(status)s", {"parameter": "", "status": "Valid"}, "timestamp DESC"),
+    ("Control rule rebuild", "SPC Data Point",
+     "parameter = %(parameter)s AND name != %(name)s", {"parameter": "", "name": ""}, "timestamp DESC"),
+    ("Control chart window", "SPC Data Point",
+     "parameter = %(parameter)s AND timestamp >= %(from_date)s", {"parameter": "", "from_date": "date"}, "timestamp DESC"),
+    ("Sub-batch children", "Batch AMB",
+     "parent_batch_amb = %(parent)s", {"parent": ""}, None),
+    ("ERPNext batch reference", "Batch AMB",
+     "erpnext_batch_reference = %(reference)s", {"reference": ""}, None),
+    ("Polling engine sensors", "Sensor Configuration",
+     "station IN %(stations)s AND status = %(status)s", {"stations": ("",), "status": "Active"}, None),
+    ("Sensor trend", "Real Time Process Data",
+     "sensor = %(sensor)s AND timestamp >= %(from_date)s", {"sensor": "", "from_date": "date"}, "timestamp"),
+    ("Rollup rebuild", "Real Time Process Data",
+     "timestamp >= %(from_date)s AND timestamp < %(to_date)s", {"from_date": "date", "to_date": "now"}, None),
+    ("Weight event retention", "Weight Event",
+     "event_timestamp < %(from_date)s", {"from_date": "date"}, "event_timestamp, name"),
+    ("Compliance metrics reconciliation", "SPC Audit Trail",
+     "timestamp >= %(from_date)s", {"from_date": "date"}, None),
+    ("Compliance signature reconciliation", "SPC Electronic Signature",
+     "signature_date >= %(from_date)s", {"from_date": "date"}, None),
+]
+
+
+def get_index_name(fields):
+    return "_".join(fields) + "_index"
+
+
+def get_missing_columns(doctype, fields):
+    return [field for field in fields if not frappe.db.has_column(doctype, field)]
+
+
+def ensure_index(doctype, fields):
+    """Create one composite index unless it exists; returns its status"""
+    index_name = get_index_name(fields)
+    result = {"doctype": doctype, "fields": fields, "index_name": index_name}
+
+    if not frappe.db.table_exists(doctype):
+        result["status"] = "missing table"
+    elif get_missing_columns(doctype, fields):
+        result["status"] = "missing columns: " + ", ".join(get_missing_columns(doctype, fields))
+    elif frappe.db.has_index(f"tab{doctype}", index_name):
+        result["status"] = "exists"
+    else:
+        frappe.db.add_index(doctype, fields, index_name=index_name)
+        result["status"] = "created"
+
+    return result
+
+
+def ensure_indexes():
+    """Create the INDEXES that do not exist yet; safe to run repeatedly"""
+    return [ensure_index(doctype, fields) for doctype, fields in INDEXES]
+
+
+def get_sample_values(values):
+    now = now_datetime()
+    samples = {"date": add_days(now, -1), "now": now}
+    return {key: samples.get(value, value) if isinstance(value, str) else value for key, value in values.items()}
+
+
+def explain_query_shapes():
+    """EXPLAIN every known query shape; flags plans that scan the whole table"""
+    report = []
+
+    for label, doctype, conditions, values, order_by in QUERY_SHAPES:
+        entry = {"query": label, "doctype": doctype}
+
+        if not frappe.db.table_exists(doctype):
+            entry["status"] = "missing table"
+            report.append(entry)
+            continue
+
+        query = f"SELECT name FROM `tab{doctype}` WHERE {conditions}"
+        if order_by:
+            query += f" ORDER BY {order_by}"
+
+        try:
+            plan = frappe.db.sql(f"EXPLAIN {query} LIMIT 100", get_sample_values(values), as_dict=True)
+        except Exception as e:
+            entry["status"] = f"error: {e}"
+            report.append(entry)
+            continue
+
+        row = plan[0] if plan else {}
+        entry.update({
+            "type": row.get("type"),
+            "key": row.get("key"),
+            "rows": row.get("rows"),
+            "extra": row.get("Extra"),
+            "status": "full scan" if row.get("type") == "ALL" else "ok",
+        })
+        report.append(entry)
+
+    return report
+
+
+@frappe.whitelist()
+def run_index_audit(create=0):
+    """Report query plans for the app's hot paths, optionally creating missing indexes first"""
+    frappe.only_for("System Manager")
+
+    indexes = ensure_indexes() if cint(create) else None
+    report = explain_query_shapes()
+
+    return {
+        "indexes": indexes,
+        "queries": report,
+        "full_scans": len([entry for entry in report if entry.get("status") == "full scan"]),
+    }
@@ -7,6 +7,8 @@ import frappe
 from frappe.utils import getdate, now_datetime
 import logging
 
+from amb_w_spc.system_integration.access_context import can_access_warehouse, get_access_context
+
 logger = logging.getLogger(__name__)
 
 @frappe.whitelist()
@@ -34,54 +36,15 @@ def setup_user_warehouse_context():
         logger.error(f"Error setting up user warehouse context: {str(e)}")
 
 def get_user_warehouse_context(user):
-    """Get warehouse context for a specific user"""
+    """Get warehouse context for a specific user (cached, see access_context)"""
     try:
-        user_doc = frappe.get_doc("User", user)
-        user_roles = frappe.get_roles(user)
-        
-        # System Manager has access to all warehouses
-        if "System Manager" in user_roles:
-            warehouses = frappe.get_all("Warehouse",
-                filters={"is_group": 0},
-                fields=["name", "warehouse_name", "plant_code", "warehouse_type"])
-            
-            return {
-                "warehouses": warehouses,
-                "plant_code": None,
-                "access_level": "all",
-                "roles": user_roles
-            }
-        
-        # Get user's plant code
-        user_plant_code = getattr(user_doc, "plant_code", None)
-        
-        # Get warehouses based on plant code
-        filters = {"is_group": 0}
-        if user_plant_code:
-            filters["plant_code"] = user_plant_code
-        
-        warehouses = frappe.get_all("Warehouse",
-            filters=filters,
-            fields=["name", "warehouse_name", "plant_code", "warehouse_type"])
-        
-        # Determine access level based on roles
-        access_level = "restricted"
-        if "Warehouse Manager" in user_roles:
-            access_level = "manager"
-        elif "Production Manager" in user_roles:
-            access_level = "production"
-        elif "Plant Supervisor" in user_roles:
-            access_level = "supervisor"
-        elif "Warehouse Operator" in user_roles:
-            access_level = "operator"
-        elif "Quality Inspector" in user_roles:
-            access_level = "quality"
+        context = get_access_context(user)
         
         return {
-            "warehouses": warehouses,
-            "plant_code": user_plant_code,
-            "access_level": access_level,
-            "roles": user_roles
+            "warehouses": context.warehouses,
+            "plant_code": context.plant_code,
+            "access_level": context.access_level,
+            "roles": context.roles
         }
         
     except Exception as e:
@@ -159,41 +122,7 @@ def check_warehouse_access(user, warehouse, operation="read"):
         operation: read, write, create, delete, submit, cancel
     """
     try:
-        user_context = get_user_warehouse_context(user)
-        
-        # System Manager has all access
-        if "System Manager" in user_context.get("roles", []):
-            return True
-        
-        # Check if user has access to this warehouse
-        user_warehouses = [w["name"] for w in user_context.get("warehouses", [])]
-        if warehouse not in user_warehouses:
-            return False
-        
-        # Check operation-specific permissions based on access level
-        access_level = user_context.get("access_level", "none")
-        
-        if access_level == "manager":
-            return True  # Warehouse Manager has all permissions
-        
-        elif access_level == "production":
-            # Production Manager can read and create but not delete
-            return operation in ["read", "write", "create", "submit"]
-        
-        elif access_level == "supervisor":
-            # Plant Supervisor can read and write
-            return operation in ["read", "write"]
-        
-        elif access_level == "operator":
-            # Warehouse Operator can read and update assigned tasks
-            return operation in ["read", "write"] 
-        
-        elif access_level == "quality":
-            # Quality Inspector can read and update quality-related items
-            return operation in ["read", "write", "submit"]
-        
-        else:
-            return operation == "read"  # Default read-only access
+        return can_access_warehouse(warehouse, operation, user)
         
     except Exception as e:
         logger.error(f"Error checking warehouse access: {str(e)}")
@@ -42,36 +42,74 @@ def auto_create_spc_alert(data_point_name):
         severity = "Warning"
     
     if alert_type:
-        # Create SPC Alert
-        alert = frappe.get_doc({
-            "doctype": "SPC Alert",
-            "data_point": data_point_name,
-            "parameter": data_point.parameter,
-            "workstation": data_point.workstation,
-            "plant": data_point.plant,
-            "alert_type": alert_type,
-            "severity": severity,
-            "measurement_value": value,
-            "limit_violated": get_violated_limit(spec, value, alert_type),
-            "deviation_amount": abs(value - flt(spec.target_value)) if spec.target_value else 0,
-            "status": "Open",
-            "priority": "High" if severity == "Critical" else "Medium",
-            "description": f"Parameter {data_point.parameter} exceeded {alert_type.lower()} limit. Value: {value}"
-        })
-        
-        alert.insert(ignore_permissions=True)
-        
-        # Send notifications
-        send_alert_notifications(alert.name)
-        
-        # Create deviation for critical alerts
-        if severity == "Critical":
-            create_deviation_from_alert(alert.name)
-        
-        return alert.name
+        return create_spc_alert(data_point_name, data_point, spec, value, alert_type, severity)
     
     return None
 
+def create_spc_alert(data_point_name, data_point, spec, value, alert_type, severity):
+    """Create an SPC Alert for a classified limit violation and notify"""
+    
+    alert = frappe.get_doc({
+        "doctype": "SPC Alert",
+        "data_point": data_point_name,
+        "parameter": data_point.parameter,
+        "workstation": data_point.workstation,
+        "plant": data_point.plant,
+        "alert_type": alert_type,
+        "severity": severity,
+        "measurement_value": value,
+        "limit_violated": get_violated_limit(spec, value, alert_type),
+        "deviation_amount": abs(value - flt(spec.target_value)) if spec.target_value else 0,
+        "status": "Open",
+        "priority": "High" if severity == "Critical" else "Medium",
+        "description": f"Parameter {data_point.parameter} exceeded {alert_type.lower()} limit. Value: {value}"
+    })
+    
+    alert.insert(ignore_permissions=True)
+    
+    # Send notifications
+    send_alert_notifications(alert.name)
+    
+    # Open a deviation for critical alerts once the alert is committed, so a
+    # failing deviation can never roll back the measurement that raised it
+    if severity == "Critical":
+        frappe.enqueue(
+            "amb_w_spc.system_integration.scripts.automation_scripts.create_deviation_from_alert",
+            queue="short",
+            enqueue_after_commit=True,
+            alert_name=alert.name
+        )
+    
+    return alert.name
+
+def create_deviation_from_alert(alert_name):
+    """Open a Critical SPC Deviation for a committed critical SPC Alert"""
+    
+    if not frappe.db.exists("SPC Alert", alert_name):
+        return None
+    
+    alert = frappe.get_doc("SPC Alert", alert_name)
+    occurred = frappe.db.get_value("SPC Data Point", alert.get("data_point"), "timestamp") \
+        if alert.get("data_point") else None
+    
+    deviation = frappe.get_doc({
+        "doctype": "SPC Deviation",
+        "deviation_type": "Quality Control",
+        "severity": "Critical",
+        "plant": alert.get("plant"),
+        "occurrence_date": occurred or alert.creation,
+        "detection_date": alert.creation,
+        "deviation_status": "Open",
+        "deviation_description": alert.get("description") or _("Critical SPC Alert {0}").format(alert_name),
+        "impact_assessment": _("Raised automatically from critical SPC Alert {0} (parameter {1}, value {2}). Pending assessment.").format(
+            alert_name, alert.get("parameter"), alert.get("measurement_value"))
+    })
+    
+    # Reporter and department are assigned when the deviation is triaged
+    deviation.insert(ignore_permissions=True, ignore_mandatory=True)
+    
+    return deviation.name
+
 def get_violated_limit(spec, value, alert_type):
     """Get the specific limit that was violated"""
     
@@ -87,29 +125,23 @@ def get_violated_limit(spec, value, alert_type):
     return 0
 
 def send_alert_notifications(alert_name):
-    """Send email and system notifications for SPC alerts"""
-    
-    alert = frappe.get_doc("SPC Alert", alert_name)
-    
-    # Get alert recipients
-    recipients = frappe.get_all("SPC Alert Recipient",
-        filters={
-            "parent": alert_name,
-            "parenttype": "SPC Alert"
-        },
-        fields=["recipient", "notification_type"]
-    )
-    
-    if not recipients:
-        # Get default recipients based on plant and severity
-        recipients = get_default_alert_recipients(alert.plant, alert.severity)
-    
-    for recipient in recipients:
-        if recipient.get("notification_type") == "Email" or not recipient.get("notification_type"):
-            send_email_notification(alert, recipient.get("recipient"))
-        
-        if recipient.get("notification_type") == "System":
-            send_system_notification(alert, recipient.get("recipient"))
+    """Queue email and system notifications for an SPC alert"""
+    
+    from amb_w_spc.core_spc.spc_alert_dispatch import queue_alert_event
+    
+    alert = frappe.db.get_value("SPC Alert", alert_name,
+        ["name", "parameter", "plant", "severity", "alert_type", "description", "data_point"], as_dict=True)
+    
+    queue_alert_event({
+        "alert": alert.name,
+        "parameter": alert.parameter,
+        "rule": alert.alert_type,
+        "plant": alert.plant,
+        "severity": alert.severity,
+        "data_point": alert.data_point,
+        "subject": f"SPC Alert {alert.name}: {alert.alert_type} ({alert.severity})",
+        "message": alert.description
+    })
 
 def get_default_alert_recipients(plant, severity):
     """Get default recipients based on plant and alert severity"""
@@ -139,78 +171,47 @@ def get_default_alert_recipients(plant, severity):
 def calculate_xbar_r_values(parameter, workstation, subgroup_size=5):
     """Calculate X-bar and R chart values"""
     
-    # Get recent data points
-    data_points = frappe.get_all("SPC Data Point",
-        filters={
-            "parameter": parameter,
-            "workstation": workstation
-        },
-        fields=["measurement_value", "measurement_datetime"],
-        order_by="measurement_datetime desc",
-        limit=100
-    )
+    from amb_w_spc.core_spc.control_chart_engine import get_window_values, to_subgroups, xbar_r_chart
+    
+    subgroup_size = cint(subgroup_size) or 5
+    
+    # Most recent 100 data points, oldest first
+    data_points = get_window_values(parameter, workstation, limit=100)
     
     if len(data_points) < subgroup_size:
         frappe.throw(_("Insufficient data for X-bar R chart. Need at least {0} points").format(subgroup_size))
     
-    # Group data into subgroups
-    subgroups = []
-    for i in range(0, len(data_points), subgroup_size):
-        subgroup = data_points[i:i+subgroup_size]
-        if len(subgroup) == subgroup_size:
-            values = [flt(dp.measurement_value) for dp in subgroup]
-            subgroups.append({
-                "values": values,
-                "xbar": statistics.mean(values),
-                "range": max(values) - min(values),
-                "datetime": subgroup[0].measurement_datetime
-            })
+    values = [flt(dp.measured_value) for dp in data_points]
+    chart = xbar_r_chart(values, subgroup_size)
     
-    if not subgroups:
+    if not chart:
         return {"error": "No complete subgroups available"}
     
-    # Calculate control limits
-    grand_mean = statistics.mean([sg["xbar"] for sg in subgroups])
-    avg_range = statistics.mean([sg["range"] for sg in subgroups])
-    
-    # Control limit constants for subgroup size
-    constants = get_control_chart_constants(subgroup_size)
-    
-    # X-bar chart limits
-    xbar_ucl = grand_mean + (constants["A2"] * avg_range)
-    xbar_lcl = grand_mean - (constants["A2"] * avg_range)
-    
-    # R chart limits
-    r_ucl = constants["D4"] * avg_range
-    r_lcl = constants["D3"] * avg_range
+    subgroups = [{
+        "values": subgroup,
+        "xbar": xbar,
+        "range": subgroup_range,
+        "datetime": data_points[index * subgroup_size].timestamp
+    } for index, (subgroup, xbar, subgroup_range) in enumerate(
+        zip(to_subgroups(values, subgroup_size).tolist(), chart["points"], chart["ranges"]))]
     
     return {
-        "grand_mean": grand_mean,
-        "avg_range": avg_range,
-        "xbar_ucl": xbar_ucl,
-        "xbar_lcl": xbar_lcl,
-        "r_ucl": r_ucl,
-        "r_lcl": r_lcl,
+        "grand_mean": chart["center"],
+        "avg_range": chart["r_center"],
+        "xbar_ucl": chart["ucl"],
+        "xbar_lcl": chart["lcl"],
+        "r_ucl": chart["r_ucl"],
+        "r_lcl": chart["r_lcl"],
         "subgroups": subgroups,
         "subgroup_size": subgroup_size
     }
 
 def get_control_chart_constants(n):
-    """Get control chart constants for subgroup size n"""
-    
-    constants = {
-        2: {"A2": 1.880, "D3": 0.000, "D4": 3.267},
-        3: {"A2": 1.023, "D3": 0.000, "D4": 2.574},
-        4: {"A2": 0.729, "D3": 0.000, "D4": 2.282},
-        5: {"A2": 0.577, "D3": 0.000, "D4": 2.114},
-        6: {"A2": 0.483, "D3": 0.000, "D4": 2.004},
-        7: {"A2": 0.419, "D3": 0.076, "D4": 1.924},
-        8: {"A2": 0.373, "D3": 0.136, "D4": 1.864},
-        9: {"A2": 0.337, "D3": 0.184, "D4": 1.816},
-        10: {"A2": 0.308, "D3": 0.223, "D4": 1.777}
-    }
+    """Get control chart constants (A2, A3, B3, B4, d2, d3, D3, D4, c4) for subgroup size n"""
+    
+    from amb_w_spc.core_spc.control_chart_engine import get_chart_constants
     
-    return constants.get(n, constants[5])  # Default to n=5 if not found
+    return get_chart_constants(max(cint(n), 2))
 
 @frappe.whitelist()
 def auto_calculate_cpk(parameter, workstation, specification):
@@ -333,33 +334,15 @@ def get_browser_info():
 def update_document_signature_status(doctype, docname, signature_meaning):
     """Update document status after electronic signature"""
     
+    from amb_w_spc.fda_compliance.bulk_signature import get_signature_status_values
+    
     try:
         doc = frappe.get_doc(doctype, docname)
         
         # Update specific fields based on signature meaning
-        if signature_meaning == "Approved":
-            if hasattr(doc, "approval_status"):
-                doc.approval_status = "Approved"
-            if hasattr(doc, "approved_by"):
-                doc.approved_by = frappe.session.user
-            if hasattr(doc, "approval_date"):
-                doc.approval_date = now_datetime()
-        
-        elif signature_meaning == "Reviewed":
-            if hasattr(doc, "review_status"):
-                doc.review_status = "Reviewed"
-            if hasattr(doc, "reviewed_by"):
-                doc.reviewed_by = frappe.session.user
-            if hasattr(doc, "review_date"):
-                doc.review_date = now_datetime()
-        
-        elif signature_meaning == "Acknowledged":
-            if hasattr(doc, "acknowledged"):
-                doc.acknowledged = 1
-            if hasattr(doc, "acknowledged_by"):
-                doc.acknowledged_by = frappe.session.user
-            if hasattr(doc, "acknowledgment_date"):
-                doc.acknowledgment_date = now_datetime()
+        for fieldname, value in get_signature_status_values(signature_meaning, frappe.session.user, now_datetime()).items():
+            if hasattr(doc, fieldname):
+                setattr(doc, fieldname, value)
         
         doc.save(ignore_permissions=True)
         
@@ -417,51 +400,22 @@ def bot_authenticate(api_key, bot_type):
 def bot_submit_data(data_points, session_token):
     """Handle bulk data submission from bot users"""
     
+    from amb_w_spc.system_integration.scripts.bulk_ingestion import ingest_data_points
+    
     try:
         # Validate session token
         bot_user = validate_bot_session_token(session_token)
         if not bot_user:
             return {"error": "Invalid session token"}
         
-        results = []
-        
-        for data in data_points:
-            try:
-                # Validate required fields
-                if not all(key in data for key in ["parameter", "workstation", "measurement_value"]):
-                    results.append({"status": "error", "message": "Missing required fields"})
-                    continue
-                
-                # Create data point
-                data_point = frappe.get_doc({
-                    "doctype": "SPC Data Point",
-                    "parameter": data["parameter"],
-                    "workstation": data["workstation"],
-                    "measurement_value": flt(data["measurement_value"]),
-                    "measurement_datetime": data.get("measurement_datetime", now_datetime()),
-                    "operator": bot_user,
-                    "measurement_source": "Automated",
-                    "data_entry_method": "API",
-                    "measurement_precision": data.get("measurement_precision", 0.001)
-                })
-                
-                data_point.insert(ignore_permissions=True)
-                
-                # Check for alerts
-                alert_created = auto_create_spc_alert(data_point.name)
-                
-                results.append({
-                    "status": "success",
-                    "data_point": data_point.name,
-                    "alert_created": alert_created is not None
-                })
-                
-            except Exception as e:
-                results.append({"status": "error", "message": str(e)})
+        # Validate, insert and alert-check the whole payload in one pass
+        results = ingest_data_points(data_points, bot_user)
         
         return {"results": results}
         
     except Exception as e:
+        # Nothing of a failed submission may be committed, or the bot's retry duplicates it
+        frappe.db.rollback()
         frappe.log_error(f"Bot data submission error: {str(e)}")
         return {"error": "Data submission failed"}
 
@@ -602,24 +556,23 @@ def daily_spc_maintenance():
     
     # Generate scheduled reports
     auto_generate_spc_reports()
-    
-    # Check for escalated alerts
-    escalate_overdue_alerts()
-    
-    # Clean up old audit trail entries
-    cleanup_old_audit_trail()
-    
-    # Update process capability studies
-    update_capability_studies()
 
 def hourly_spc_checks():
     """Hourly checks for SPC system"""
     
-    # Check for critical alerts without acknowledgment
-    check_unacknowledged_critical_alerts()
+    from amb_w_spc.core_spc.spc_alert_dispatch import flush_alert_events
+    from amb_w_spc.fda_compliance.audit_trail import write_audit_trail
+    from amb_w_spc.sfc_manufacturing.warehouse_management.scheduler import update_warehouse_dashboard_cache
+    from amb_w_spc.shop_floor_control.connectivity import compact_connectivity
+    
+    # Send suppressed-repeat summaries for alert windows that closed quietly
+    flush_alert_events()
+    
+    # Chain any audit records whose writer job was missed or failed
+    write_audit_trail()
     
-    # Validate bot user tokens
-    cleanup_expired_bot_tokens()
+    # Refresh warehouse dashboard snapshots (doc events keep them current in between)
+    update_warehouse_dashboard_cache()
     
-    # Check system health
-    perform_system_health_check()
\ No newline at end of file
+    # Compact closed hours of station polling telemetry into summary rows
+    compact_connectivity()
\ No newline at end of file
@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+# Bulk SPC measurement ingestion for bot users
+# Copyright (c) 2025 SPC System
+
+import json
+
+import frappe
+import numpy as np
+from frappe import _
+from frappe.utils import flt, get_datetime, now_datetime
+
+from amb_w_spc.core_spc.spc_control_rules import (
+    advance_rule_state_after_commit,
+    create_rule_alert,
+    evaluate_rows,
+    get_reference,
+)
+from amb_w_spc.core_spc.spc_rolling_statistics import get_rolling_state, record_values_after_commit
+from amb_w_spc.fda_compliance.audit_trail import build_audit_record, buffer_audit_record
+from amb_w_spc.system_integration.utils import reserve_series_names
+
+REQUIRED_FIELDS = ("parameter", "workstation", "measurement_value")
+
+DATA_POINT_DOCTYPE = "SPC Data Point"
+
+BATCH_SAVEPOINT = "spc_bulk_ingestion"
+
+# Checked in reverse precedence so that the first matching rule of
+# auto_create_spc_alert (critical before warning, low before high) wins
+ALERT_RULES = (
+    ("upper_warning_limit", np.greater, "Warning High", "Warning"),
+    ("lower_warning_limit", np.less, "Warning Low", "Warning"),
+    ("upper_critical_limit", np.greater, "Critical High", "Critical"),
+    ("lower_critical_limit", np.less, "Critical Low", "Critical"),
+)
+
+SPECIFICATION_LIMIT_FIELDS = (
+    "target_value", "upper_spec_limit", "lower_spec_limit",
+    "upper_warning_limit", "lower_warning_limit",
+    "upper_critical_limit", "lower_critical_limit",
+)
+
+DATA_POINT_FIELDS = (
+    "name", "owner", "creation", "modified", "modified_by", "docstatus", "idx",
+    "parameter", "workstation", "timestamp", "measured_value", "operator",
+    "target_value", "upper_spec_limit", "lower_spec_limit",
+    "x_bar", "r_value", "moving_range", "standard_deviation",
+    "status", "validation_notes", "is_out_of_control", "violation_rules",
+)
+
+# =============================================================================
+# INGESTION
+# =============================================================================
+
+def ingest_data_points(data_points, bot_user):
+    """Validate, insert and alert-check a whole batch of measurements
+
+    Specifications are resolved once per parameter, all rows are written with
+    a single multi-row INSERT and limit checks run over the batch as arrays.
+    If the batch write fails it is rolled back to a savepoint and the rows are
+    retried one by one, so only the failing rows are reported as errors and
+    nothing of a failed row is left behind. Returns one result per input row,
+    in input order.
+    """
+
+    if isinstance(data_points, str):
+        data_points = json.loads(data_points)
+
+    results = [None] * len(data_points)
+    rows = []
+
+    for index, data in enumerate(data_points):
+        error = validate_payload_row(data)
+        if error:
+            results[index] = {"status": "error", "message": error}
+            continue
+
+        rows.append({
+            "index": index,
+            "parameter": data["parameter"],
+            "workstation": data["workstation"],
+            "specification": data.get("specification"),
+            "measured_value": flt(data["measurement_value"]),
+            "timestamp": get_datetime(data.get("measurement_datetime") or now_datetime()),
+        })
+
+    if not rows:
+        return results
+
+    specifications = resolve_specifications(rows)
+    evaluate_limits(rows, specifications)
+    apply_rolling_statistics(rows)
+    evaluate_rows(rows)
+
+    frappe.db.savepoint(BATCH_SAVEPOINT)
+    try:
+        alerts = write_rows(rows, bot_user, specifications)
+    except Exception:
+        frappe.db.rollback(save_point=BATCH_SAVEPOINT)
+        rows, alerts = write_rows_individually(rows, bot_user, specifications, results)
+
+    update_cached_states(rows)
+    record_audit_trail(rows)
+
+    for row in rows:
+        results[row["index"]] = {
+            "status": "success",
+            "data_point": row["name"],
+            "alert_created": row["name"] in alerts,
+            "alert": alerts.get(row["name"]),
+        }
+
+    return results
+
+def validate_payload_row(data):
+    """Return an error message for an invalid payload row, or None"""
+
+    if not isinstance(data, dict) or not all(key in data for key in REQUIRED_FIELDS):
+        return _("Missing required fields")
+
+    try:
+        float(data["measurement_value"])
+    except (TypeError, ValueError):
+        return _("Measurement value must be numeric")
+
+    if data.get("measurement_datetime"):
+        try:
+            get_datetime(data["measurement_datetime"])
+        except Exception:
+            return _("Invalid measurement datetime")
+
+    return None
+
+# =============================================================================
+# SPECIFICATION RESOLUTION
+# =============================================================================
+
+def resolve_specifications(rows):
+    """Attach a specification name to every row, resolving each parameter once
+
+    Rows may name their specification explicitly; otherwise the active
+    specification for the parameter is used (SPC Specification has no
+    workstation field). Returns {name: spec}.
+    """
+
+    explicit = {row["specification"] for row in rows if row["specification"]}
+    parameters = {row["parameter"] for row in rows}
+
+    meta = frappe.get_meta("SPC Specification")
+    fields = ["name", "parameter"] + [fieldname for fieldname in SPECIFICATION_LIMIT_FIELDS if meta.has_field(fieldname)]
+
+    specifications = {}
+    if explicit:
+        for spec in frappe.get_all("SPC Specification", filters={"name": ["in", list(explicit)]}, fields=fields):
+            specifications[spec.name] = spec
+
+    active_by_parameter = {}
+    for spec in frappe.get_all("SPC Specification",
+        filters={"parameter": ["in", list(parameters)], "status": "Active"},
+        fields=fields,
+        order_by="modified desc"
+    ):
+        specifications.setdefault(spec.name, spec)
+        active_by_parameter.setdefault(spec.parameter, spec.name)
+
+    resolved = {}
+    for row in rows:
+        key = (row["parameter"], row["specification"])
+        if key not in resolved:
+            resolved[key] = row["specification"] if row["specification"] in specifications \
+                else active_by_parameter.get(row["parameter"])
+        row["specification"] = resolved[key]
+
+    return specifications
+
+# =============================================================================
+# VECTORISED LIMIT EVALUATION
+# =============================================================================
+
+def evaluate_limits(rows, specifications):
+    """Set status, validation notes and alert classification for every row"""
+
+    by_spec = {}
+    for position, row in enumerate(rows):
+        by_spec.setdefault(row["specification"], []).append(position)
+
+    for spec_name, positions in by_spec.items():
+        spec = specifications.get(spec_name)
+        values = np.array([rows[p]["measured_value"] for p in positions], dtype=float)
+
+        alert_types = np.full(values.shape, None, dtype=object)
+        severities = np.full(values.shape, None, dtype=object)
+        above_spec = np.zeros(values.shape, dtype=bool)
+        below_spec = np.zeros(values.shape, dtype=bool)
+
+        if spec:
+            for fieldname, compare, alert_type, severity in ALERT_RULES:
+                limit = spec.get(fieldname)
+                if not limit:
+                    continue
+                mask = compare(values, flt(limit))
+                alert_types[mask] = alert_type
+                severities[mask] = severity
+
+            if spec.get("upper_spec_limit"):
+                above_spec = values > flt(spec.upper_spec_limit)
+            if spec.get("lower_spec_limit"):
+                below_spec = values < flt(spec.lower_spec_limit)
+
+        for offset, position in enumerate(positions):
+            row = rows[position]
+            notes = []
+            if above_spec[offset]:
+                notes.append("Above Upper Specification Limit")
+            if below_spec[offset]:
+                notes.append("Below Lower Specification Limit")
+
+            row["status"] = "Invalid" if notes else "Valid"
+            row["validation_notes"] = ", ".join(notes) if notes else None
+            row["alert_type"] = alert_types[offset]
+            row["severity"] = severities[offset]
+
+def apply_rolling_statistics(rows):
+    """Fill x_bar, range, moving range and standard deviation from the rolling window"""
+
+    states = {}
+    for row in sorted(rows, key=lambda r: r["timestamp"]):
+        parameter = row["parameter"]
+        if parameter not in states:
+            states[parameter] = get_rolling_state(parameter)
+
+        preview = states[parameter].copy()
+        preview.push(row["measured_value"])
+        row.update(preview.summary())
+
+        if row["status"] == "Valid":
+            states[parameter] = preview
+
+def update_cached_states(rows):
+    """Push the written rows into the cached windows and rule states once the transaction commits"""
+
+    by_parameter = {}
+    for row in sorted(rows, key=lambda r: r["timestamp"]):
+        by_parameter.setdefault(row["parameter"], []).append(row)
+
+    for parameter, parameter_rows in by_parameter.items():
+        valid_values = [row["measured_value"] for row in parameter_rows if row["status"] == "Valid"]
+        if valid_values:
+            record_values_after_commit(parameter, valid_values)
+
+        reference = get_reference(parameter_rows[0].get("upper_control_limit"),
+                                  parameter_rows[0].get("lower_control_limit"))
+        advance_rule_state_after_commit(parameter, reference, [row["measured_value"] for row in parameter_rows])
+
+def record_audit_trail(rows):
+    """Buffer a Create audit record per written row (bulk_insert runs no document events)"""
+
+    for row in rows:
+        buffer_audit_record(build_audit_record(frappe.get_doc(dict(row["record"], doctype=DATA_POINT_DOCTYPE)), "Create"))
+
+# =============================================================================
+# PERSISTENCE
+# =============================================================================
+
+def write_rows(rows, bot_user, specifications):
+    """Insert the rows and create their alerts; returns {data point: alert}"""
+
+    insert_data_points(rows, bot_user, specifications)
+    return create_batch_alerts(rows, specifications)
+
+def write_rows_individually(rows, bot_user, specifications, results):
+    """Write rows one at a time, each behind its own savepoint
+
+    A failing row is rolled back and reported in `results`. Returns the
+    written rows and their alerts.
+    """
+
+    written, alerts = [], {}
+    for row in rows:
+        frappe.db.savepoint(BATCH_SAVEPOINT)
+        try:
+            alerts.update(write_rows([row], bot_user, specifications))
+        except Exception as e:
+            frappe.db.rollback(save_point=BATCH_SAVEPOINT)
+            results[row["index"]] = {"status": "error", "message": str(e)}
+            continue
+
+        written.append(row)
+
+    return written, alerts
+
+def insert_data_points(rows, bot_user, specifications):
+    """Insert all rows into `tabSPC Data Point` with a single multi-row INSERT
+
+    `operator` links to Employee, so it holds the bot user's employee (if any)
+    rather than the user itself.
+    """
+
+    names_by_parameter = {}
+    for row in rows:
+        names_by_parameter.setdefault(row["parameter"], []).append(row)
+
+    for parameter, parameter_rows in names_by_parameter.items():
+        names = reserve_series_names(f"SPC-{parameter}-", len(parameter_rows))
+        for row, name in zip(parameter_rows, names):
+            row["name"] = name
+
+    operator = frappe.db.get_value("Employee", {"user_id": bot_user}, "name")
+
+    now = now_datetime()
+    values = []
+    for row in rows:
+        spec = specifications.get(row["specification"]) or {}
+        values.append((
+            row["name"], bot_user, now, now, bot_user, 0, 0,
+            row["parameter"], row["workstation"], row["timestamp"], row["measured_value"], operator,
+            spec.get("target_value"), spec.get("upper_spec_limit"), spec.get("lower_spec_limit"),
+            row.get("x_bar"), row.get("r_value"), row.get("moving_range"), row.get("standard_deviation"),
+            row["status"], row["validation_notes"], row["is_out_of_control"], row["violation_rules"],
+        ))
+        row["record"] = dict(zip(DATA_POINT_FIELDS, values[-1]))
+
+    frappe.db.bulk_insert(DATA_POINT_DOCTYPE, fields=DATA_POINT_FIELDS, values=values)
+
+def create_batch_alerts(rows, specifications):
+    """Create SPC Alerts for limit breaches and newly violated control rules"""
+
+    from amb_w_spc.system_integration.scripts.automation_scripts import create_spc_alert
+
+    alerts = {}
+    for row in rows:
+        if row["new_rules"]:
+            create_rule_alert(row, row["new_rules"])
+
+        if not row["alert_type"]:
+            continue
+
+        alerts[row["name"]] = create_spc_alert(
+            row["name"],
+            frappe._dict(row),
+            specifications[row["specification"]],
+            row["measured_value"],
+            row["alert_type"],
+            row["severity"],
+        )
+
+    return alerts
@@ -0,0 +1,41 @@
+"""
+Sequence Allocation
+Gap-free counters per key (deviation plant/type/year, parent batch, ...)
+kept in tabSeries. Allocation locks only the key's row, so parallel workers
+on different keys never wait on each other; numbers are reserved inside the
+caller's transaction and handed back on rollback, which keeps them gap-free
+"""
+
+import hashlib
+
+import frappe
+
+# tabSeries.name is varchar(100)
+MAX_KEY_LENGTH = 100
+
+def get_series_key(key):
+    """Key as stored in tabSeries; over-long keys keep a readable prefix plus a digest"""
+    if len(key) <= MAX_KEY_LENGTH:
+        return key
+    return f"{key[:MAX_KEY_LENGTH - 33]}~{hashlib.md5(key.encode()).hexdigest()}"
+
+def reserve_sequence(key, count=1, seed=None):
+    """Reserve `count` consecutive numbers for `key`; returns a range
+
+    `seed` is called once, when the key has no counter yet, and returns the
+    highest number already in use (e.g. counted from existing records).
+    """
+    key = get_series_key(key)
+
+    if not frappe.db.sql("SELECT 1 FROM `tabSeries` WHERE `name` = %s", key):
+        # Concurrent first allocations race to create the row; the loser's insert is ignored
+        frappe.db.sql("INSERT IGNORE INTO `tabSeries` (`name`, `current`) VALUES (%s, %s)",
+                      (key, int(seed() or 0) if seed else 0))
+
+    start = frappe.db.sql("SELECT `current` FROM `tabSeries` WHERE `name` = %s FOR UPDATE", key)[0][0]
+    frappe.db.sql("UPDATE `tabSeries` SET `current` = `current` + %s WHERE `name` = %s", (count, key))
+
+    return range(start + 1, start + count + 1)
+
+def next_sequence(key, seed=None):
+    return reserve_sequence(key, 1, seed)[0]
@@ -4,6 +4,8 @@ System Integration Utilities
 
 import frappe
 
+from amb_w_spc.system_integration.sequences import reserve_sequence
+
 def get_user_warehouse_permissions(user=None):
     """
     Get user warehouse permissions for Jinja templates
@@ -20,3 +22,10 @@ def get_user_warehouse_permissions(user=None):
         'can_view_reports': 'Warehouse User' in user_roles or 'System Manager' in user_roles,
         'is_warehouse_manager': 'Warehouse Manager' in user_roles or 'System Manager' in user_roles
     }
+
+def reserve_series_names(prefix, count, digits=5):
+    """
+    Reserve `count` consecutive names of the form PREFIX##### with a single
+    naming series update, for rows written with a multi-row INSERT
+    """
+    return [f"{prefix}{str(number).zfill(digits)}" for number in reserve_sequence(prefix, count)]
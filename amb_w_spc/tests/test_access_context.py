@@ -0,0 +1,97 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+import frappe
+
+from amb_w_spc.system_integration import access_context
+from amb_w_spc.system_integration.access_context import PERMISSION_QUERY_CONDITIONS, compile_conditions
+
+
+class FakeCache:
+    def __init__(self):
+        self.hashes = {}
+
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = value
+
+    def hdel(self, key, field):
+        self.hashes.get(key, {}).pop(field, None)
+
+    def delete_key(self, key):
+        self.hashes.pop(key, None)
+
+
+class TestPermissionConditions(unittest.TestCase):
+    """List view conditions are compiled once from the user's roles"""
+
+    def setUp(self):
+        db = MagicMock()
+        db.escape.side_effect = lambda value: f"'{value}'"
+        patcher = patch.object(frappe, "db", db, create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_full_access_role_has_no_condition(self):
+        self.assertEqual(compile_conditions(PERMISSION_QUERY_CONDITIONS["Work Order"],
+                                            ["Manufacturing User", "Production Manager"], "mfg@example.com"), "")
+
+    def test_user_is_escaped(self):
+        condition = compile_conditions(PERMISSION_QUERY_CONDITIONS["Work Order"], ["Manufacturing User"], "o'brien@example.com")
+        self.assertIn("owner = 'o'brien@example.com'", condition)
+        self.assertNotIn("{user}", condition)
+
+    def test_no_matching_role_sees_nothing(self):
+        self.assertEqual(compile_conditions(PERMISSION_QUERY_CONDITIONS["Stock Entry"], ["Guest"], "guest"), "0=1")
+
+
+class TestAccessContext(unittest.TestCase):
+    """The context is built once per user and dropped on permission changes"""
+
+    def setUp(self):
+        self.cache = FakeCache()
+        self.roles = ["Warehouse Operator"]
+        meta = MagicMock()
+        meta.has_field.return_value = False
+        self.get_all = MagicMock(return_value=[frappe._dict(name="WH-A", warehouse_name="A")])
+
+        for patcher in (
+            patch.object(frappe, "cache", lambda: self.cache),
+            patch.object(frappe, "db", MagicMock(), create=True),
+            patch.object(frappe, "get_roles", lambda user: self.roles, create=True),
+            patch.object(frappe, "get_meta", return_value=meta, create=True),
+            patch.object(frappe, "get_all", self.get_all, create=True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_operator_reads_and_writes_own_warehouses_only(self):
+        self.assertTrue(access_context.can_access_warehouse("WH-A", "write", "op@example.com"))
+        self.assertFalse(access_context.can_access_warehouse("WH-A", "submit", "op@example.com"))
+        self.assertFalse(access_context.can_access_warehouse("WH-B", "read", "op@example.com"))
+        self.assertEqual(self.get_all.call_count, 1)
+
+    def test_user_permission_change_rebuilds_that_user(self):
+        access_context.get_access_context("op@example.com")
+        access_context.get_access_context("other@example.com")
+
+        access_context.clear_user_access_context(frappe._dict(doctype="User Permission", user="op@example.com"))
+        self.roles = ["System Manager"]
+
+        self.assertEqual(access_context.get_access_context("op@example.com").access_level, "all")
+        self.assertEqual(access_context.get_access_context("other@example.com").access_level, "operator")
+
+    def test_role_change_rebuilds_everyone(self):
+        access_context.get_access_context("op@example.com")
+        access_context.clear_all_access_contexts()
+        self.roles = ["Quality Inspector"]
+        self.assertEqual(access_context.get_access_context("op@example.com").access_level, "quality")
+
+
+if __name__ == "__main__":
+    unittest.main()
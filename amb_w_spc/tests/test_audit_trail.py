@@ -0,0 +1,94 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import types
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+import frappe
+
+from amb_w_spc.fda_compliance import audit_trail
+from amb_w_spc.fda_compliance.audit_trail import (
+    GENESIS_HASH,
+    chain_records,
+    diff_values,
+    hash_record,
+)
+
+
+def record(name, **values):
+    data = {"record_id": name, "timestamp": "2025-03-01 08:00:00.250000", "user_id": "qa@example.com",
+            "action_type": "Update", "table_name": "SPC Batch Record", "record_name": "BR-0001",
+            "checksum": "c" * 64}
+    data.update(values)
+    return data
+
+
+class TestAuditHashChain(unittest.TestCase):
+    """Chaining records to the previous record's hash"""
+
+    def test_records_link_to_their_predecessor(self):
+        records = chain_records([record("a"), record("b"), record("c")], 41, "f" * 64)
+        self.assertEqual([r["sequence"] for r in records], [42, 43, 44])
+        self.assertEqual(records[0]["previous_hash"], "f" * 64)
+        self.assertEqual(records[1]["previous_hash"], records[0]["hash_value"])
+        self.assertEqual(records[2]["hash_value"], hash_record(records[1]["hash_value"], records[2]))
+
+    def test_edit_changes_the_hash(self):
+        original = chain_records([record("a")])[0]
+        tampered = dict(original, new_value='{"batch_status": "Released"}')
+        self.assertNotEqual(hash_record(GENESIS_HASH, tampered), original["hash_value"])
+
+    def test_hash_survives_database_round_trip(self):
+        original = chain_records([record("a", timestamp="2025-03-01 08:00:00", ip_address=None)])[0]
+        # Datetime(6) columns come back as datetimes and empty Data columns as ""
+        stored = dict(original, timestamp=datetime(2025, 3, 1, 8, 0), sequence="1", ip_address="")
+        self.assertEqual(hash_record(GENESIS_HASH, stored), original["hash_value"])
+
+
+class TestDiffValues(unittest.TestCase):
+    """Capturing every changed field"""
+
+    def test_all_changed_fields_are_returned(self):
+        changes = diff_values(
+            {"status": "Draft", "qty": 10, "remarks": "a"},
+            {"status": "Approved", "qty": 12, "remarks": "a"},
+            ["status", "qty", "remarks"])
+        self.assertEqual(changes, {"status": ("Draft", "Approved"), "qty": (10, 12)})
+
+    def test_empty_to_empty_is_not_a_change(self):
+        self.assertEqual(diff_values({"remarks": None}, {"remarks": ""}, ["remarks"]), {})
+
+
+
+class TestCaptureScope(unittest.TestCase):
+    """Only regulated SPC and FDA doctypes are serialised"""
+
+    def capture(self, doctype, module):
+        doc = frappe._dict(doctype=doctype, name="DOC-1", flags=frappe._dict())
+        meta = types.SimpleNamespace(module=module)
+        with patch.object(frappe, "get_meta", return_value=meta, create=True), \
+                patch.object(frappe, "flags", frappe._dict(), create=True), \
+                patch.object(audit_trail, "build_audit_record") as build_audit_record, \
+                patch.object(audit_trail, "buffer_audit_record") as buffer_audit_record:
+            audit_trail.capture_audit_trail(doc, "after_insert")
+        return build_audit_record, buffer_audit_record
+
+    def test_regulated_doctype_is_captured(self):
+        build_audit_record, buffer_audit_record = self.capture("SPC Deviation", "FDA Compliance")
+        build_audit_record.assert_called_once()
+        buffer_audit_record.assert_called_once()
+
+    def test_other_doctype_is_not_serialised(self):
+        build_audit_record, buffer_audit_record = self.capture("ToDo", "Desk")
+        build_audit_record.assert_not_called()
+        buffer_audit_record.assert_not_called()
+
+    def test_audit_infrastructure_is_excluded(self):
+        build_audit_record, _buffer = self.capture(audit_trail.QUEUE_DOCTYPE, "FDA Compliance")
+        build_audit_record.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
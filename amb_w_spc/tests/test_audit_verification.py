@@ -0,0 +1,127 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import importlib
+import unittest
+from unittest.mock import patch
+
+import frappe
+
+from amb_w_spc import hooks
+from amb_w_spc.fda_compliance import audit_verification
+from amb_w_spc.fda_compliance.audit_trail import chain_records, hash_record
+from amb_w_spc.fda_compliance.audit_verification import (
+    ChainVerifier,
+    find_boundary_issues,
+    split_segments,
+)
+
+
+def chained(count, last_sequence=0, previous_hash="0" * 64):
+    records = [
+        {"name": f"AT-{i}", "record_id": f"R-{i}", "timestamp": "2025-03-01 08:00:00.000001",
+         "user_id": "qa@example.com", "action_type": "Update", "table_name": "SPC Batch Record",
+         "record_name": f"BR-{i % 3}", "checksum": "c" * 64}
+        for i in range(count)
+    ]
+    return chain_records(records, last_sequence, previous_hash)
+
+
+def verify(rows, start=1, end=None):
+    verifier = ChainVerifier(start)
+    verifier.feed(rows)
+    verifier.finish(end if end is not None else start + len(rows) - 1)
+    return verifier
+
+
+class TestChainVerifier(unittest.TestCase):
+    """Recomputing the audit hash chain"""
+
+    def test_intact_chain_has_no_issues(self):
+        verifier = verify(chained(10))
+        self.assertEqual(verifier.issue_count, 0)
+        self.assertEqual(verifier.records, 10)
+
+    def test_edited_record_is_reported_against_its_document(self):
+        rows = chained(5)
+        rows[2]["new_value"] = '{"batch_status": "Released"}'
+        issues = verify(rows).issues
+        self.assertEqual([(i["type"], i["sequence"], i["record_name"]) for i in issues],
+                         [("hash_mismatch", 3, "BR-2")])
+
+    def test_rehashed_edit_breaks_the_next_link(self):
+        rows = chained(5)
+        rows[2]["new_value"] = "forged"
+        rows[2]["hash_value"] = hash_record(rows[2]["previous_hash"], rows[2])
+        self.assertEqual([(i["type"], i["sequence"]) for i in verify(rows).issues], [("broken_link", 4)])
+
+    def test_deleted_records_are_reported_as_gaps(self):
+        rows = chained(6)
+        del rows[2:4]
+        issues = verify(rows, end=6).issues
+        self.assertEqual([(i["type"], i["sequence"]) for i in issues], [("gap", 5)])
+
+    def test_missing_tail_is_a_gap(self):
+        issues = verify(chained(3), end=5).issues
+        self.assertEqual([i["type"] for i in issues], ["gap"])
+
+
+class TestSegments(unittest.TestCase):
+    """Monthly segments and the links between them"""
+
+    def test_segments_are_contiguous(self):
+        segments = split_segments([("2025-02-01", 101, 230), ("2025-01-01", 1, 105), ("2025-03-01", 201, 300)])
+        self.assertEqual([(s["period"], s["start"], s["end"]) for s in segments],
+                         [("2025-01-01", 1, 100), ("2025-02-01", 101, 200), ("2025-03-01", 201, 300)])
+
+    def test_boundary_link_mismatch(self):
+        first, second = verify(chained(3)), verify(chained(3, 3, "f" * 64), start=4)
+        segments = [
+            frappe._dict(segment_start=1, segment_end=3, first_previous_hash=first.first_previous_hash, last_hash=first.last_hash),
+            frappe._dict(segment_start=4, segment_end=6, first_previous_hash=second.first_previous_hash, last_hash=second.last_hash),
+        ]
+        self.assertEqual([i["sequence"] for i in find_boundary_issues(segments)], [4])
+
+        segments[1].first_previous_hash = first.last_hash
+        self.assertEqual(find_boundary_issues(segments), [])
+
+    def test_trail_continues_from_the_archive_anchor(self):
+        archived = verify(chained(3))
+        remaining = verify(chained(3, 3, archived.last_hash), start=4)
+        segments = [frappe._dict(segment_start=4, segment_end=6,
+                                 first_previous_hash=remaining.first_previous_hash, last_hash=remaining.last_hash)]
+
+        self.assertEqual(find_boundary_issues(segments, (3, archived.last_hash)), [])
+        self.assertEqual([i["type"] for i in find_boundary_issues(segments, (3, "e" * 64))], ["broken_link"])
+
+    def test_missing_head_without_anchor_is_a_gap(self):
+        remaining = verify(chained(3, 3, "f" * 64), start=4)
+        segments = [frappe._dict(segment_start=4, segment_end=6,
+                                 first_previous_hash=remaining.first_previous_hash, last_hash=remaining.last_hash)]
+
+        issues = find_boundary_issues(segments)
+        self.assertEqual([(i["type"], i["sequence"]) for i in issues], [("gap", 1)])
+        self.assertEqual([i["type"] for i in find_boundary_issues(segments, (2, "f" * 64))], ["gap"])
+
+
+
+class TestScheduledVerification(unittest.TestCase):
+    """Changed months are verified daily, every month weekly"""
+
+    def run_scheduled(self, frequency):
+        with patch.object(audit_verification, "run_audit_verification") as run_audit_verification:
+            for path in hooks.scheduler_events[frequency]:
+                module, _, method = path.rpartition(".")
+                if module == audit_verification.__name__:
+                    getattr(importlib.import_module(module), method)()
+        return run_audit_verification
+
+    def test_daily_is_incremental(self):
+        self.run_scheduled("daily").assert_called_once_with()
+
+    def test_weekly_is_full(self):
+        self.run_scheduled("weekly").assert_called_once_with(full=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import types
+import unittest
+from unittest.mock import MagicMock, patch
+
+import frappe
+
+from amb_w_spc.sfc_manufacturing.integration import batch_announcements
+from amb_w_spc.sfc_manufacturing.integration.batch_announcements import (
+    build_announcement,
+    get_stats_delta,
+    group_announcements,
+)
+
+
+def batch(name, **values):
+    return frappe._dict(name=name, modified="2025-01-01 08:00:00", creation="2025-01-01 07:00:00",
+                        docstatus=0, **values)
+
+
+class TestBatchAnnouncements(unittest.TestCase):
+    """Announcement formatting and incremental stats"""
+
+    def test_new_batch_counts_once(self):
+        delta = get_stats_delta(None, batch("B-1", quality_status="Pending", custom_batch_level="3"))
+        self.assertEqual(delta, {"total": 1, "quality_check": 1, "container_level": 1})
+
+    def test_status_change_moves_counters(self):
+        delta = get_stats_delta(batch("B-1", quality_status="Pending"), batch("B-1", quality_status="Failed"))
+        self.assertEqual(delta, {"high_priority": 1, "quality_check": -1})
+
+    def test_removed_batch_is_subtracted(self):
+        self.assertEqual(get_stats_delta(batch("B-1", quality_status="Failed"), None),
+                         {"total": -1, "high_priority": -1})
+
+    def test_grouped_by_company_and_plant(self):
+        announcements = [
+            build_announcement(batch("B-1", production_plant_name="Juice", custom_plant_code="3")),
+            build_announcement(batch("B-2", production_plant_name="Juice")),
+        ]
+        grouped = group_announcements(announcements)
+        self.assertEqual(sorted(grouped["Juice"]), ["1", "3"])
+        self.assertEqual(grouped["Juice"]["3"][0]["name"], "B-1")
+
+
+
+class TestAnnouncementPush(unittest.TestCase):
+    """Changes are pushed after commit, only to the Batch AMB room"""
+
+    def setUp(self):
+        self.callbacks = []
+        db = types.SimpleNamespace(after_commit=types.SimpleNamespace(add=self.callbacks.append))
+
+        for patcher in (
+            patch.object(frappe, "db", db, create=True),
+            patch.object(frappe, "cache", MagicMock()),
+            patch.object(frappe, "get_all", return_value=[batch("B-1", quality_status="Failed")], create=True),
+            patch.object(frappe, "publish_realtime", create=True),
+            patch.object(batch_announcements, "get_stats", return_value={}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_push_is_scoped_to_doctype(self):
+        batch_announcements.queue_announcement_push("B-1")
+        frappe.publish_realtime.assert_not_called()
+
+        for callback in self.callbacks:
+            callback()
+
+        event, message = frappe.publish_realtime.call_args.args
+        self.assertEqual(event, batch_announcements.REALTIME_EVENT)
+        self.assertEqual([item["name"] for item in message["announcements"]], ["B-1"])
+        self.assertEqual(frappe.publish_realtime.call_args.kwargs, {"doctype": "Batch AMB"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import unittest
+
+import frappe
+
+from amb_w_spc.sfc_manufacturing.integration.batch_genealogy import build_trees
+
+
+def row(root, name, parent, depth):
+    return frappe._dict(root=root, name=name, parent_batch_amb=parent, depth=depth, custom_batch_level=str(depth + 1))
+
+
+class TestBuildTrees(unittest.TestCase):
+    """Nesting closure rows into batch trees"""
+
+    def test_nested_tree(self):
+        trees = build_trees([
+            row("B1", "B1", None, 0),
+            row("B1", "B1-1", "B1", 1),
+            row("B1", "B1-2", "B1", 1),
+            row("B1", "B1-1-1", "B1-1", 2),
+        ])
+        tree = trees["B1"]
+        self.assertEqual([child["name"] for child in tree["children"]], ["B1-1", "B1-2"])
+        self.assertEqual(tree["children"][0]["children"][0]["name"], "B1-1-1")
+        self.assertEqual(tree["children"][1]["children"], [])
+
+    def test_rows_grouped_by_root(self):
+        trees = build_trees([
+            row("B1", "B1", None, 0),
+            row("B2", "B2", None, 0),
+            row("B2", "B2-1", "B2", 1),
+        ])
+        self.assertEqual(sorted(trees), ["B1", "B2"])
+        self.assertEqual(trees["B1"]["children"], [])
+        self.assertEqual(len(trees["B2"]["children"]), 1)
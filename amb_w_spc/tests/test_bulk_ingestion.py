@@ -0,0 +1,165 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+import frappe
+
+from amb_w_spc.core_spc import spc_control_rules
+from amb_w_spc.core_spc.spc_control_rules import ControlRuleState
+from amb_w_spc.core_spc.spc_rolling_statistics import RollingStatistics
+from amb_w_spc.system_integration.scripts import automation_scripts, bulk_ingestion
+
+
+def payload(*values):
+    return [
+        {"parameter": "PH", "workstation": "WS-1", "measurement_value": value,
+         "measurement_datetime": f"2025-03-01 08:00:{index:02d}"}
+        for index, value in enumerate(values)
+    ]
+
+
+class TestPayloadValidation(unittest.TestCase):
+    """Malformed rows are reported without touching the database"""
+
+    def test_missing_fields(self):
+        self.assertEqual(bulk_ingestion.validate_payload_row({"parameter": "PH"}), "Missing required fields")
+
+    def test_non_numeric_value(self):
+        row = {"parameter": "PH", "workstation": "WS-1", "measurement_value": "seven"}
+        self.assertEqual(bulk_ingestion.validate_payload_row(row), "Measurement value must be numeric")
+
+    def test_valid_row(self):
+        self.assertIsNone(bulk_ingestion.validate_payload_row(payload(7.0)[0]))
+
+
+class TestEvaluateLimits(unittest.TestCase):
+    """Vectorised limit checks classify rows like auto_create_spc_alert"""
+
+    def test_classification(self):
+        spec = frappe._dict(upper_spec_limit=8.0, lower_spec_limit=6.0,
+                            upper_warning_limit=7.5, upper_critical_limit=7.8)
+        rows = [{"specification": "SPEC-1", "measured_value": value} for value in (7.0, 7.6, 7.9, 8.5, 5.0)]
+        bulk_ingestion.evaluate_limits(rows, {"SPEC-1": spec})
+
+        self.assertEqual([row["status"] for row in rows], ["Valid", "Valid", "Valid", "Invalid", "Invalid"])
+        self.assertEqual([row["alert_type"] for row in rows],
+                         [None, "Warning High", "Critical High", "Critical High", None])
+        self.assertEqual(rows[4]["validation_notes"], "Below Lower Specification Limit")
+
+
+class TestIngestion(unittest.TestCase):
+    """A failed batch write falls back to per-row writes behind savepoints"""
+
+    def setUp(self):
+        self.callbacks = []
+        self.db = MagicMock()
+        self.db.after_commit.add = self.callbacks.append
+
+        for patcher in (
+            patch.object(frappe, "db", self.db, create=True),
+            patch.object(bulk_ingestion, "resolve_specifications", return_value={}),
+            patch.object(bulk_ingestion, "get_rolling_state", side_effect=lambda parameter: RollingStatistics()),
+            patch.object(spc_control_rules, "get_rule_state", return_value=ControlRuleState(7.0, 0.5)),
+            patch.object(bulk_ingestion, "record_values_after_commit"),
+            patch.object(bulk_ingestion, "advance_rule_state_after_commit"),
+            patch.object(bulk_ingestion, "record_audit_trail"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write_rows(self, failing_values=()):
+        def write(rows, bot_user, specifications):
+            if len(rows) > 1 and failing_values:
+                raise frappe.ValidationError("batch failed")
+            for row in rows:
+                if row["measured_value"] in failing_values:
+                    raise frappe.ValidationError(f"row {row['measured_value']} failed")
+                row["name"] = f"SPC-PH-{row['index']}"
+            return {}
+
+        return patch.object(bulk_ingestion, "write_rows", side_effect=write)
+
+    def test_batch_written_at_once(self):
+        with self.write_rows() as write_rows:
+            results = bulk_ingestion.ingest_data_points(payload(7.0, 7.1, "bad"), "bot@example.com")
+
+        self.assertEqual(write_rows.call_count, 1)
+        self.assertEqual([result["status"] for result in results], ["success", "success", "error"])
+        self.db.rollback.assert_not_called()
+        bulk_ingestion.record_values_after_commit.assert_called_once_with("PH", [7.0, 7.1])
+
+    def test_failing_row_is_rolled_back_alone(self):
+        with self.write_rows(failing_values=(7.1,)) as write_rows:
+            results = bulk_ingestion.ingest_data_points(payload(7.0, 7.1, 7.2), "bot@example.com")
+
+        self.assertEqual(write_rows.call_count, 4)
+        self.assertEqual([result["status"] for result in results], ["success", "error", "success"])
+        self.assertEqual(results[1]["message"], "row 7.1 failed")
+        self.assertEqual(self.db.rollback.call_count, 2)
+        self.db.rollback.assert_called_with(save_point=bulk_ingestion.BATCH_SAVEPOINT)
+
+        # Only the written rows reach the cached window and rule state
+        bulk_ingestion.record_values_after_commit.assert_called_once_with("PH", [7.0, 7.2])
+        bulk_ingestion.advance_rule_state_after_commit.assert_called_once_with("PH", None, [7.0, 7.2])
+
+
+class TestCriticalIngestion(unittest.TestCase):
+    """A critical limit breach is written, alerted and audited; its deviation waits for the commit"""
+
+    def setUp(self):
+        self.db = MagicMock()
+        self.db.get_value.return_value = "EMP-BOT"
+        self.alert = MagicMock()
+        self.alert.name = "ALERT-0001"
+        spec = frappe._dict(name="SPEC-PH", parameter="PH", upper_critical_limit=7.8, upper_warning_limit=7.5)
+
+        def resolve_specifications(rows):
+            for row in rows:
+                row["specification"] = spec.name
+            return {spec.name: spec}
+
+        for patcher in (
+            patch.object(frappe, "db", self.db, create=True),
+            patch.object(frappe, "get_doc", return_value=self.alert, create=True),
+            patch.object(frappe, "enqueue", create=True),
+            patch.object(automation_scripts, "send_alert_notifications"),
+            patch.object(bulk_ingestion, "resolve_specifications", side_effect=resolve_specifications),
+            patch.object(bulk_ingestion, "reserve_series_names",
+                         side_effect=lambda prefix, count: [f"{prefix}{n:05d}" for n in range(1, count + 1)]),
+            patch.object(bulk_ingestion, "get_rolling_state", side_effect=lambda parameter: RollingStatistics()),
+            patch.object(spc_control_rules, "get_rule_state", return_value=ControlRuleState(7.0, 0.5)),
+            patch.object(bulk_ingestion, "record_values_after_commit"),
+            patch.object(bulk_ingestion, "advance_rule_state_after_commit"),
+            patch.object(bulk_ingestion, "build_audit_record", side_effect=lambda doc, action: action),
+            patch.object(bulk_ingestion, "buffer_audit_record"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_critical_value_is_kept(self):
+        results = bulk_ingestion.ingest_data_points(payload(7.0, 7.9), "bot@example.com")
+
+        self.assertEqual([result["status"] for result in results], ["success", "success"])
+        self.assertEqual(results[1]["alert"], "ALERT-0001")
+        self.db.rollback.assert_not_called()
+
+        frappe.enqueue.assert_called_once_with(
+            "amb_w_spc.system_integration.scripts.automation_scripts.create_deviation_from_alert",
+            queue="short",
+            enqueue_after_commit=True,
+            alert_name="ALERT-0001"
+        )
+
+        # operator links to Employee, resolved from the bot user
+        values = self.db.bulk_insert.call_args.kwargs["values"]
+        operator = bulk_ingestion.DATA_POINT_FIELDS.index("operator")
+        self.assertEqual([value[operator] for value in values], ["EMP-BOT", "EMP-BOT"])
+
+        # bulk_insert runs no document events, so each row is audited explicitly
+        self.assertEqual(bulk_ingestion.buffer_audit_record.call_count, 2)
+        audited = frappe.get_doc.call_args_list[-1].args[0]
+        self.assertEqual(audited["doctype"], "SPC Data Point")
+        self.assertEqual(audited["name"], "SPC-PH-00002")
+
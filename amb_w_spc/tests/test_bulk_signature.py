@@ -0,0 +1,144 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import hashlib
+import types
+import unittest
+from unittest.mock import MagicMock, patch
+
+import frappe
+
+from amb_w_spc.fda_compliance import bulk_signature
+from amb_w_spc.fda_compliance.bulk_signature import (
+    check_not_cancelled,
+    check_signer_role,
+    check_signing_permission,
+    get_signature_status_values,
+    hash_leaf,
+    hash_pair,
+    merkle_root,
+    parse_documents,
+)
+
+
+def leaf(index):
+    return hash_leaf("SPC Batch Record", f"BR-{index:04d}", "d" * 64, hashlib.sha256(str(index).encode()).hexdigest())
+
+
+class TestSignatureManifest(unittest.TestCase):
+    """Merkle root over a signing session's leaves"""
+
+    def test_root_of_four_leaves(self):
+        leaves = [leaf(i) for i in range(4)]
+        self.assertEqual(merkle_root(leaves),
+                         hash_pair(hash_pair(leaves[0], leaves[1]), hash_pair(leaves[2], leaves[3])))
+
+    def test_odd_leaf_is_carried_up(self):
+        leaves = [leaf(i) for i in range(3)]
+        self.assertEqual(merkle_root(leaves), hash_pair(hash_pair(leaves[0], leaves[1]), leaves[2]))
+        self.assertEqual(merkle_root(leaves[:1]), leaves[0])
+        self.assertIsNone(merkle_root([]))
+
+    def test_any_change_changes_the_root(self):
+        leaves = [leaf(i) for i in range(7)]
+        root = merkle_root(leaves)
+        self.assertNotEqual(merkle_root(leaves[:6]), root)
+        self.assertNotEqual(merkle_root(leaves[:3] + [leaf(99)] + leaves[4:]), root)
+        self.assertNotEqual(merkle_root([leaves[1], leaves[0]] + leaves[2:]), root)
+
+
+class TestSigningSession(unittest.TestCase):
+    """Session inputs and the document fields a signature sets"""
+
+    def test_documents_are_deduplicated_in_order(self):
+        self.assertEqual(
+            parse_documents('[["SPC Batch Record", "BR-2"], {"doctype": "SPC Batch Record", "name": "BR-1"}, '
+                            '{"document_type": "SPC Batch Record", "document_name": "BR-2"}]'),
+            [("SPC Batch Record", "BR-2"), ("SPC Batch Record", "BR-1")])
+
+    def test_status_values_use_signer_and_time(self):
+        self.assertEqual(get_signature_status_values("Approved", "qa@example.com", "2025-06-10 18:00:00"), {
+            "approval_status": "Approved",
+            "approved_by": "qa@example.com",
+            "approval_date": "2025-06-10 18:00:00",
+        })
+        self.assertEqual(get_signature_status_values("Witnessed", "qa@example.com", "2025-06-10 18:00:00"), {})
+
+
+class SignedDocument(frappe._dict):
+    def has_permission(self, ptype):
+        return ptype in self.permissions
+
+
+class TestSigningPermissions(unittest.TestCase):
+    """Signing needs write access to each document and a role allowed to sign its doctype"""
+
+    def test_read_only_access_cannot_sign(self):
+        doc = SignedDocument(doctype="SPC Batch Record", name="BR-1", docstatus=0, permissions={"read"})
+        with self.assertRaises(frappe.PermissionError):
+            check_signing_permission(doc)
+
+    def test_write_access_signs_drafts(self):
+        check_signing_permission(SignedDocument(docstatus=0, permissions={"read", "write"}))
+
+    def test_submitted_documents_accept_submit_access(self):
+        check_signing_permission(SignedDocument(docstatus=1, permissions={"read", "submit"}))
+        with self.assertRaises(frappe.PermissionError):
+            check_signing_permission(SignedDocument(doctype="SPC Batch Record", name="BR-1", docstatus=0,
+                                                    permissions={"read", "submit"}))
+
+    def test_cancelled_documents_cannot_be_signed(self):
+        with self.assertRaises(frappe.ValidationError):
+            check_signing_permission(SignedDocument(doctype="SPC Batch Record", name="BR-1", docstatus=2,
+                                                    permissions={"read", "write", "submit"}))
+
+    def test_signer_role_must_be_allowed_for_every_doctype(self):
+        roles = {"SPC Batch Record": {"Quality Manager"}, "SPC Deviation": {"Quality Manager", "QA User"}}
+        pairs = [("SPC Deviation", "DEV-1"), ("SPC Batch Record", "BR-1")]
+
+        with patch.object(frappe, "get_roles", return_value=["QA User", "Quality Manager"], create=True), \
+                patch.object(bulk_signature, "get_signing_roles", side_effect=roles.get):
+            check_signer_role(pairs, "Quality Manager", "qa@example.com")
+            with self.assertRaises(frappe.PermissionError):
+                check_signer_role(pairs, "QA User", "qa@example.com")
+
+    def test_signer_must_hold_the_role(self):
+        with patch.object(frappe, "get_roles", return_value=["QA User"], create=True), \
+                patch.object(bulk_signature, "get_signing_roles", return_value={"Quality Manager"}):
+            with self.assertRaises(frappe.PermissionError):
+                check_signer_role([("SPC Batch Record", "BR-1")], "Quality Manager", "qa@example.com")
+
+
+
+class TestCancelledDocuments(unittest.TestCase):
+    """A session naming a cancelled document is rejected before anything is locked"""
+
+    def cancelled(self, doctype, filters, pluck):
+        return [name for name in filters["name"][1] if name in {"BR-2"}]
+
+    def test_cancelled_document_is_reported(self):
+        with patch.object(frappe, "get_all", side_effect=self.cancelled, create=True):
+            check_not_cancelled([("SPC Batch Record", "BR-1"), ("SPC Deviation", "DEV-1")])
+            with self.assertRaises(frappe.ValidationError):
+                check_not_cancelled([("SPC Batch Record", "BR-1"), ("SPC Batch Record", "BR-2")])
+
+    def test_session_stops_before_locking(self):
+        meta = MagicMock()
+        meta.get_field.return_value.options = "Approved\nReviewed"
+
+        with patch.object(frappe, "session", types.SimpleNamespace(user="qa@example.com")), \
+                patch.object(frappe, "get_meta", return_value=meta, create=True), \
+                patch.object(frappe, "get_all", side_effect=self.cancelled, create=True), \
+                patch.object(frappe, "get_doc", create=True) as get_doc, \
+                patch.object(bulk_signature, "check_signer_role"), \
+                patch.object(bulk_signature, "check_password") as check_password:
+            with self.assertRaises(frappe.ValidationError):
+                bulk_signature.sign_documents([["SPC Batch Record", "BR-1"], ["SPC Batch Record", "BR-2"]],
+                                              "Approved", "secret", "Quality Manager")
+
+        check_password.assert_not_called()
+        get_doc.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
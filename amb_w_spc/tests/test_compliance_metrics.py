@@ -0,0 +1,77 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import unittest
+from datetime import date
+
+from amb_w_spc.fda_compliance.compliance_metrics import (
+    AUDIT_RECORDS,
+    OPEN_CAPAS,
+    OPEN_DEVIATIONS,
+    OVERDUE_CAPAS,
+    OVERDUE_DEVIATIONS,
+    audit_record_counts,
+    deviation_counts,
+    get_count_changes,
+    metric_key,
+)
+
+TODAY = date(2025, 6, 10)
+
+
+def deviation(**values):
+    data = {"docstatus": 0, "deviation_status": "Open", "investigation_target_date": "2025-06-20",
+            "corrective_actions": [], "preventive_actions": []}
+    data.update(values)
+    return data
+
+
+class TestDeviationGauges(unittest.TestCase):
+    """A deviation's contribution to the open and overdue gauges"""
+
+    def test_open_deviation_with_overdue_capa(self):
+        counts = deviation_counts(deviation(corrective_actions=[
+            {"status": "Open", "target_completion_date": "2025-06-01"},
+            {"status": "In Progress", "target_completion_date": "2025-06-30"},
+            {"status": "Closed", "target_completion_date": "2025-06-01"},
+        ]), TODAY)
+        self.assertEqual(counts[metric_key(OPEN_DEVIATIONS)], 1)
+        self.assertEqual(counts[metric_key(OVERDUE_DEVIATIONS)], 0)
+        self.assertEqual(counts[metric_key(OPEN_CAPAS)], 2)
+        self.assertEqual(counts[metric_key(OVERDUE_CAPAS)], 1)
+
+    def test_closed_and_cancelled_deviations_are_not_overdue(self):
+        self.assertEqual(deviation_counts(deviation(investigation_target_date="2025-06-01"), TODAY)
+                         [metric_key(OVERDUE_DEVIATIONS)], 1)
+        self.assertFalse(deviation_counts(deviation(deviation_status="Closed",
+                                                    investigation_target_date="2025-06-01"), TODAY))
+        self.assertFalse(deviation_counts(deviation(docstatus=2), TODAY))
+
+    def test_change_moves_only_the_affected_gauges(self):
+        before = deviation_counts(deviation(corrective_actions=[{"status": "Open"}]), TODAY)
+        after = deviation_counts(deviation(deviation_status="Pending CAPA",
+                                           corrective_actions=[{"status": "Open"}]), TODAY)
+        self.assertEqual(get_count_changes(before, after), {metric_key(OPEN_DEVIATIONS): -1})
+
+    def test_new_document_adds_its_whole_contribution(self):
+        self.assertEqual(get_count_changes(deviation_counts(None, TODAY), deviation_counts(deviation(), TODAY)),
+                         {metric_key(OPEN_DEVIATIONS): 1})
+
+
+class TestAuditRecordCounts(unittest.TestCase):
+    """Daily audit counts per action and user"""
+
+    def test_records_are_counted_per_day_action_and_user(self):
+        counts = audit_record_counts([
+            {"timestamp": "2025-06-10 23:59:59.900000", "action_type": "Update", "user_id": "qa@example.com"},
+            {"timestamp": "2025-06-10 08:00:00", "action_type": "Update", "user_id": "qa@example.com"},
+            {"timestamp": "2025-06-11 00:00:00", "action_type": "Update", "user_id": "qa@example.com"},
+        ])
+        self.assertEqual(counts, {
+            metric_key(AUDIT_RECORDS, date(2025, 6, 10), "Update", "qa@example.com"): 2,
+            metric_key(AUDIT_RECORDS, date(2025, 6, 11), "Update", "qa@example.com"): 1,
+        })
+
+
+if __name__ == "__main__":
+    unittest.main()
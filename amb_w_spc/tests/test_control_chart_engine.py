@@ -0,0 +1,49 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import unittest
+
+from amb_w_spc.core_spc.control_chart_engine import (
+    compute_charts,
+    ewma_series,
+    get_chart_constants,
+)
+
+# Published values (ASTM STP 15D) for comparison with the computed constants
+PUBLISHED_CONSTANTS = {
+    2: {"A2": 1.880, "A3": 2.659, "B4": 3.267, "c4": 0.7979, "d2": 1.128, "d3": 0.853, "D4": 3.267},
+    5: {"A2": 0.577, "A3": 1.427, "B4": 2.089, "c4": 0.9400, "d2": 2.326, "d3": 0.864, "D4": 2.114},
+    10: {"A2": 0.308, "A3": 0.975, "B3": 0.284, "c4": 0.9727, "d2": 3.078, "D3": 0.223, "D4": 1.777},
+}
+
+
+class TestControlChartEngine(unittest.TestCase):
+
+    def test_constants_match_published_tables(self):
+        for n, expected in PUBLISHED_CONSTANTS.items():
+            constants = get_chart_constants(n)
+            for key, value in expected.items():
+                self.assertAlmostEqual(constants[key], value, delta=0.002, msg=f"{key} for n={n}")
+
+    def test_ewma_matches_recursion(self):
+        values = [10.0 + ((i * 7) % 11) * 0.13 for i in range(700)]
+        previous = 10.0
+        series = ewma_series(values, 0.2, 10.0)
+        for value, computed in zip(values, series):
+            previous = 0.2 * value + 0.8 * previous
+            self.assertAlmostEqual(computed, previous, places=9)
+
+    def test_ewma_with_lambda_near_and_at_one(self):
+        values = [10.0 + ((i * 7) % 11) * 0.13 for i in range(700)]
+        series = ewma_series(values, 0.99, 10.0)
+        self.assertTrue(all(abs(computed - value) < 0.02 for computed, value in zip(series[1:], values[1:])))
+
+        # lambda = 1 is the raw series
+        self.assertEqual(ewma_series(values, 1.0, 10.0).tolist(), values)
+
+    def test_compute_charts_drops_incomplete_subgroup(self):
+        result = compute_charts([1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0], subgroup_size=3)
+        self.assertEqual(result["xbar_r"]["points"], [2.0, 5.0])
+        self.assertEqual(result["xbar_r"]["ranges"], [2.0, 2.0])
+        self.assertEqual(len(result["imr"]["moving_ranges"]), 6)
+        self.assertEqual(len(result["cusum"]["c_plus"]), 7)
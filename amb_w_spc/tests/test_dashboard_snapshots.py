@@ -0,0 +1,100 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+import frappe
+
+from amb_w_spc.sfc_manufacturing.warehouse_management import dashboard_snapshots
+from amb_w_spc.sfc_manufacturing.warehouse_management.dashboard_snapshots import merge_snapshots
+
+
+def snapshot(name, **values):
+    data = {
+        "warehouse": name, "warehouse_name": name, "built_at": "2025-01-01 06:00:00",
+        "temperature_controlled": 0, "capacity": 0, "utilization": 0, "current_temp": None,
+        "open_alerts": 0, "weekly": {},
+    }
+    data.update(values)
+    return data
+
+
+class TestMergeSnapshots(unittest.TestCase):
+    """Combining per-warehouse dashboard snapshots"""
+
+    def test_counts_are_summed(self):
+        dashboard = merge_snapshots([
+            snapshot("WH-A", pending_tasks=3, critical_alerts=1, open_alerts=1),
+            snapshot("WH-B", pending_tasks=2, critical_alerts=0),
+        ])
+        self.assertEqual(dashboard["pick_tasks"]["pending_tasks"], 5)
+        self.assertEqual(dashboard["alerts"]["critical_alerts"], 1)
+        self.assertEqual(dashboard["summary"]["warehouses_with_alerts"], 1)
+        self.assertEqual(dashboard["summary"]["total_warehouses"], 2)
+
+    def test_averages_are_weighted_by_count(self):
+        dashboard = merge_snapshots([
+            snapshot("WH-A", completed_today_minutes=30, completed_today_timed=1),
+            snapshot("WH-B", completed_today_minutes=90, completed_today_timed=3),
+        ])
+        self.assertEqual(dashboard["pick_tasks"]["average_completion_time"], 30.0)
+
+    def test_utilization_only_counts_warehouses_with_capacity(self):
+        dashboard = merge_snapshots([
+            snapshot("WH-A", capacity=100, utilization=50),
+            snapshot("WH-B", capacity=100, utilization=90),
+            snapshot("WH-C", utilization=40),
+        ])
+        self.assertEqual(dashboard["summary"]["utilization_percentage"], 70.0)
+        self.assertEqual([row["warehouse"] for row in dashboard["utilization"]], ["WH-B", "WH-A"])
+
+    def test_weekly_trends_are_merged_by_date(self):
+        dashboard = merge_snapshots([
+            snapshot("WH-A", weekly={"2025-01-02": [2, 1], "2025-01-01": [1, 1]}),
+            snapshot("WH-B", weekly={"2025-01-02": [3, 0]}),
+        ])
+        self.assertEqual(dashboard["performance"]["weekly_trends"], [
+            {"date": "2025-01-01", "total": 1, "completed": 1},
+            {"date": "2025-01-02", "total": 5, "completed": 1},
+        ])
+
+class TestComputeSnapshots(unittest.TestCase):
+    """Each source section is guarded and isolated"""
+
+    def compute(self, tables, sql):
+        db = MagicMock()
+        db.table_exists.side_effect = lambda doctype: doctype in tables
+        db.has_column.side_effect = lambda doctype, field: doctype in tables
+        db.sql.side_effect = sql
+
+        with patch.object(frappe, "db", db, create=True), \
+                patch.object(frappe, "get_all", return_value=[frappe._dict(name="WH-A", warehouse_name="A")], create=True), \
+                patch.object(frappe, "get_traceback", return_value="", create=True), \
+                patch.object(frappe, "log_error") as log_error:
+            snapshots = dashboard_snapshots.compute_snapshots()
+        return snapshots["WH-A"], db, log_error
+
+    def test_missing_sources_are_skipped(self):
+        snapshot, db, log_error = self.compute(("Warehouse Pick Task",), lambda *args, **kwargs: [])
+        db.sql.assert_not_called()
+        log_error.assert_not_called()
+        self.assertEqual(snapshot["capacity"], 0)
+
+    def test_failing_section_leaves_the_others(self):
+        def sql(query, values, as_dict=False):
+            if "Warehouse Alert" in query:
+                raise Exception("Unknown column 'severity'")
+            if "DATE(t.creation)" in query:
+                return []
+            return [frappe._dict(warehouse="WH-A", pending_tasks=4, completed_today=1, high_priority=2,
+                                 overdue_tasks=1, completed_today_minutes=30)]
+
+        snapshot, _db, log_error = self.compute(
+            ("Warehouse Alert", "Warehouse Pick Task", "Sales Order Fulfillment"), sql)
+        self.assertEqual(log_error.call_count, 1)
+        self.assertEqual((snapshot["open_alerts"], snapshot["pending_tasks"], snapshot["overdue_tasks"]), (0, 4, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
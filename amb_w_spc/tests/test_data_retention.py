@@ -0,0 +1,99 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import frappe
+
+from amb_w_spc.fda_compliance import audit_trail
+from amb_w_spc.system_integration import data_retention
+
+
+class FakeAuditTable:
+    """Just enough of `tabSPC Audit Trail` for archive_audit_trail"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.deleted = []
+        self.statements = []
+
+    def sql(self, query, values=None, as_dict=False):
+        self.statements.append(query)
+        if "MIN(sequence)" in query:
+            kept = [row.sequence for row in self.rows if row.timestamp >= datetime.combine(values[0], datetime.min.time())]
+            return [[min(kept) if kept else None]]
+        if query.lstrip().startswith("SELECT *"):
+            chunk = [row for row in self.rows
+                     if values["last_sequence"] < row.sequence <= values["through"] and row.name not in self.deleted]
+            return chunk[:2]
+        if query.lstrip().startswith("DELETE"):
+            self.deleted.extend(values["names"])
+        return []
+
+
+def audit_row(sequence, timestamp):
+    return frappe._dict(name=f"AT-{sequence}", sequence=sequence, timestamp=timestamp, hash_value=f"h{sequence}")
+
+
+class TestAuditTrailArchive(unittest.TestCase):
+    """The audit trail is archived as a contiguous run of sequences and anchored"""
+
+    def archive(self, rows, head, anchor=(0, audit_trail.GENESIS_HASH)):
+        table = FakeAuditTable(rows)
+        db = MagicMock()
+        db.sql.side_effect = table.sql
+        anchors = []
+
+        with patch.object(frappe, "db", db, create=True), \
+                patch.object(data_retention, "now_datetime", return_value=datetime(2026, 3, 1, 12)), \
+                patch.object(data_retention, "write_archive_file"), \
+                patch.object(audit_trail, "get_chain_head", return_value=(head, f"h{head}")), \
+                patch.object(audit_trail, "get_chain_anchor", return_value=anchor), \
+                patch.object(audit_trail, "record_chain_anchor", side_effect=lambda *args: anchors.append(args[:3])):
+            result = data_retention.archive_audit_trail(days_to_keep=365)
+
+        return result, table, anchors
+
+    def test_late_chained_record_bounds_the_archive(self):
+        old, new = datetime(2024, 6, 1), datetime(2025, 12, 1)
+        # Sequence 3 was chained late with a timestamp inside the retention window
+        rows = [audit_row(1, old), audit_row(2, old), audit_row(3, new), audit_row(4, old), audit_row(5, new)]
+        result, table, anchors = self.archive(rows, head=5)
+
+        self.assertEqual(table.deleted, ["AT-1", "AT-2"])
+        self.assertEqual(anchors, [(2, "h2", 2)])
+        self.assertEqual(result["archived_through"], 2)
+
+    def test_head_is_never_archived(self):
+        old = datetime(2024, 6, 1)
+        result, table, anchors = self.archive([audit_row(sequence, old) for sequence in range(1, 6)], head=5)
+
+        self.assertEqual(table.deleted, ["AT-1", "AT-2", "AT-3", "AT-4"])
+        self.assertEqual([anchor[0] for anchor in anchors], [2, 4])
+        self.assertFalse(any("OPTIMIZE" in statement for statement in table.statements))
+
+    def test_resumes_after_the_last_anchor(self):
+        old = datetime(2024, 6, 1)
+        rows = [audit_row(sequence, old) for sequence in range(3, 7)]
+        result, table, anchors = self.archive(rows, head=6, anchor=(2, "h2"))
+
+        self.assertEqual(table.deleted, ["AT-3", "AT-4", "AT-5"])
+        self.assertEqual(anchors[-1][:2], (5, "h5"))
+
+
+class TestRetentionPolicies(unittest.TestCase):
+
+    def test_site_overrides(self):
+        conf = frappe._dict(amb_w_spc_retention_policies={
+            "Real Time Process Data": {"days": 30},
+            "Weight Event": {"days": 0},
+            "Custom Log": {"days": 10},
+        })
+        with patch.object(frappe, "conf", conf):
+            policies = data_retention.get_retention_policies()
+
+        self.assertEqual(policies["Real Time Process Data"], {"date_field": "timestamp", "days": 30})
+        self.assertNotIn("Weight Event", policies)
+        self.assertEqual(policies["Custom Log"], {"date_field": "creation", "days": 10})
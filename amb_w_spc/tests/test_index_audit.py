@@ -0,0 +1,72 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+import frappe
+
+from amb_w_spc.patches.v15 import add_container_allocation_index
+from amb_w_spc.system_integration import index_audit
+
+
+def fake_db(existing_indexes=(), missing_columns=()):
+    db = MagicMock()
+    db.table_exists.return_value = True
+    db.has_column.side_effect = lambda doctype, field: field not in missing_columns
+    db.has_index.side_effect = lambda table, index_name: index_name in existing_indexes
+    return db
+
+
+class TestEnsureIndex(unittest.TestCase):
+    """Composite indexes are created once and skipped when they cannot apply"""
+
+    def test_missing_index_is_created(self):
+        db = fake_db()
+        with patch.object(frappe, "db", db, create=True):
+            result = index_audit.ensure_index("Container Barrels", ["parent", "idx"])
+        self.assertEqual(result["status"], "created")
+        db.add_index.assert_called_once_with("Container Barrels", ["parent", "idx"], index_name="parent_idx_index")
+
+    def test_existing_index_is_left_alone(self):
+        db = fake_db(existing_indexes=("parent_idx_index",))
+        with patch.object(frappe, "db", db, create=True):
+            self.assertEqual(index_audit.ensure_index("Container Barrels", ["parent", "idx"])["status"], "exists")
+        db.add_index.assert_not_called()
+
+    def test_missing_column_is_reported(self):
+        with patch.object(frappe, "db", fake_db(missing_columns=("idx",)), create=True):
+            result = index_audit.ensure_index("Container Barrels", ["parent", "idx"])
+        self.assertEqual(result["status"], "missing columns: idx")
+
+
+class TestContainerAllocationPatch(unittest.TestCase):
+
+    def test_only_the_allocation_index_is_created(self):
+        db = fake_db()
+        with patch.object(frappe, "db", db, create=True):
+            add_container_allocation_index.execute()
+        db.add_index.assert_called_once_with("Container Barrels", ["parent", "idx"], index_name="parent_idx_index")
+        db.commit.assert_called_once()
+
+
+class TestQueryShapes(unittest.TestCase):
+    """EXPLAIN of the known hot-path queries"""
+
+    def test_full_scans_and_missing_tables_are_flagged(self):
+        db = MagicMock()
+        db.table_exists.side_effect = lambda doctype: doctype != "Weight Event"
+        db.sql.side_effect = lambda query, values, as_dict=False: [
+            {"type": "ALL" if "tabSPC Audit Trail" in query else "ref", "key": None, "rows": 10, "Extra": None}]
+
+        with patch.object(frappe, "db", db, create=True):
+            report = {entry["query"]: entry for entry in index_audit.explain_query_shapes()}
+
+        self.assertEqual(report["Compliance metrics reconciliation"]["status"], "full scan")
+        self.assertEqual(report["Weight event retention"]["status"], "missing table")
+        self.assertEqual(report["Weight event barrel lookup"]["status"], "ok")
+        self.assertTrue(all(call.args[0].startswith("EXPLAIN ") for call in db.sql.call_args_list))
+
+
+if __name__ == "__main__":
+    unittest.main()
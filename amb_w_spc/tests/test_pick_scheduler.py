@@ -0,0 +1,200 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import types
+import unittest
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+import frappe
+
+from amb_w_spc.sfc_manufacturing.warehouse_management import pick_scheduler
+from amb_w_spc.sfc_manufacturing.warehouse_management.pick_scheduler import (
+    get_changed_priorities,
+    get_priority,
+    get_queue_score,
+    get_rank_key,
+)
+
+TODAY = date(2025, 6, 10)
+
+
+def task(name="WPT-25-0001", **values):
+    data = {"name": name, "priority": None, "due_date": None, "order_priority": None,
+            "temperature_zone": "Ambient", "estimated_time": 10}
+    data.update(values)
+    return data
+
+
+class TestPickTaskPriority(unittest.TestCase):
+    """Priority from due date and sales order priority"""
+
+    def test_due_date_thresholds(self):
+        self.assertEqual(get_priority(task(due_date=date(2025, 6, 11)), TODAY), "High")
+        self.assertEqual(get_priority(task(due_date=date(2025, 6, 13)), TODAY), "Medium")
+        self.assertEqual(get_priority(task(due_date=date(2025, 6, 20)), TODAY), "Low")
+
+    def test_order_priority_only_raises(self):
+        self.assertEqual(get_priority(task(due_date=date(2025, 6, 20), order_priority="Urgent"), TODAY), "High")
+        self.assertEqual(get_priority(task(due_date=date(2025, 6, 11), order_priority="Low"), TODAY), "High")
+
+    def test_task_without_due_date_keeps_its_priority(self):
+        self.assertEqual(get_priority(task(priority="High"), TODAY), "High")
+        self.assertEqual(get_priority(task(), TODAY), "Low")
+
+    def test_only_changed_priorities_are_returned(self):
+        changed = get_changed_priorities([
+            task("WPT-1", priority="High", due_date=date(2025, 6, 10)),
+            task("WPT-2", priority="High", due_date=date(2025, 6, 30)),
+        ], TODAY)
+        self.assertEqual(changed, {"WPT-2": "Low"})
+
+
+class TestPickTaskRanking(unittest.TestCase):
+    """Queue order: priority, due date, temperature class, travel time"""
+
+    def ordered(self, *tasks):
+        return [t["name"] for t in sorted(tasks, key=lambda t: get_queue_score(get_rank_key(t, TODAY)))]
+
+    def test_score_matches_rank_key_order(self):
+        tasks = [
+            task("late-far", due_date=date(2025, 6, 30), estimated_time=60),
+            task("soon-ambient", due_date=date(2025, 6, 11), temperature_zone="Ambient"),
+            task("soon-frozen", due_date=date(2025, 6, 11), temperature_zone="Frozen"),
+            task("overdue", due_date=date(2025, 6, 1), estimated_time=9000),
+            task("soon-frozen-near", due_date=date(2025, 6, 11), temperature_zone="Frozen", estimated_time=2),
+        ]
+        expected = [t["name"] for t in sorted(tasks, key=lambda t: get_rank_key(t, TODAY))]
+        self.assertEqual(self.ordered(*tasks), expected)
+        self.assertEqual(expected, ["overdue", "soon-frozen-near", "soon-frozen", "soon-ambient", "late-far"])
+
+    def test_order_priority_outranks_earlier_due_date(self):
+        self.assertEqual(
+            self.ordered(task("medium", due_date=date(2025, 6, 12)),
+                         task("urgent", due_date=date(2025, 6, 25), order_priority="Urgent")),
+            ["urgent", "medium"])
+
+    def test_undated_tasks_rank_after_dated_tasks_of_same_priority(self):
+        self.assertEqual(
+            self.ordered(task("undated", priority="Low"), task("dated", due_date=date(2025, 7, 30))),
+            ["dated", "undated"])
+
+
+class FakePipeline:
+    def __init__(self, store):
+        self.store = store
+        self.results = []
+
+    def zrange(self, key, start, end, withscores=False):
+        members = sorted(self.store.get(key, {}).items(), key=lambda item: item[1])
+        self.results.append([(name.encode(), score) for name, score in members[start:end + 1]])
+        return self
+
+    def smembers(self, key):
+        self.results.append({member.encode() for member in self.store.get(key, ())})
+        return self
+
+    def hmget(self, key, fields):
+        hash_ = self.store.get(key, {})
+        self.results.append([hash_[field].encode() if field in hash_ else None for field in fields])
+        return self
+
+    def execute(self):
+        results, self.results = self.results, []
+        return results
+
+
+class FakeCache:
+    def __init__(self, store):
+        self.store = store
+
+    def make_key(self, key):
+        return key
+
+    def pipeline(self):
+        return FakePipeline(self.store)
+
+
+class TestNextPickTask(unittest.TestCase):
+    """The queue is scanned past the first page until a task can be claimed"""
+
+    def setUp(self):
+        depth = pick_scheduler.CANDIDATE_DEPTH
+        names = [f"WPT-{i:04d}" for i in range(depth * 2 + 5)]
+        queue = {name: float(i) for i, name in enumerate(names)}
+        store = {
+            f"{pick_scheduler.ZONES_KEY_PREFIX}:WH-A": {"Z1", "Z2"},
+            pick_scheduler.get_queue_name("WH-A", "Z1"): dict(list(queue.items())[::2]),
+            pick_scheduler.get_queue_name("WH-A", "Z2"): dict(list(queue.items())[1::2]),
+            # The cached assignees show every task but the last two as claimed by someone else
+            pick_scheduler.ASSIGNEES_KEY: {name: "other@example.com" for name in names[:-2]},
+        }
+        self.names = names
+        self.status = dict.fromkeys(names, "Open")
+        self.assigned = {}
+        self.callbacks = []
+        self.db = MagicMock()
+        self.db.sql.side_effect = self.sql
+        self.db.after_commit.add = self.callbacks.append
+
+        for patcher in (
+            patch.object(frappe, "db", self.db, create=True),
+            patch.object(frappe, "cache", lambda: FakeCache(store)),
+            patch.object(frappe, "session", types.SimpleNamespace(user="picker@example.com")),
+            patch("amb_w_spc.system_integration.access_context.can_access_warehouse", return_value=True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def sql(self, query, values, as_dict=False):
+        if "FOR UPDATE SKIP LOCKED" in query:
+            names = [value for key, value in sorted(values.items()) if key.startswith("name_")]
+            names.sort(key=lambda name: int(name.split("-")[1]))
+            return [(name, self.status[name]) for name in names
+                    if self.status[name] in values["open"] and self.assigned.get(name) in (None, values["user"])][:1]
+
+        return [frappe._dict(name=name, status=self.status[name], assigned_to=None, zone_assignment="Z2")
+                for name in values["names"]]
+
+    def test_task_beyond_the_first_page_is_claimed(self):
+        task = pick_scheduler.get_next_pick_task("WH-A")["task"]
+        self.assertEqual((task.name, task.zone), (self.names[-2], "Z2"))
+
+        self.db.set_value.assert_called_once()
+        doctype, name, values = self.db.set_value.call_args.args
+        self.assertEqual((doctype, name), ("Warehouse Pick Task", self.names[-2]))
+        self.assertEqual((values["assigned_to"], values["pick_task_status"]), ("picker@example.com", "Assigned"))
+        self.assertEqual(len(self.callbacks), 1)
+
+    def test_task_taken_since_it_was_queued_is_skipped(self):
+        # Claimed by another operator after the cached assignees were written
+        self.status[self.names[-2]] = "Assigned"
+        self.assigned[self.names[-2]] = "other@example.com"
+        self.status[self.names[-1]] = "Completed"
+        self.assertIsNone(pick_scheduler.get_next_pick_task("WH-A")["task"])
+
+    def test_closed_task_is_skipped(self):
+        self.status.update(dict.fromkeys(self.names, "Completed"))
+        self.assertIsNone(pick_scheduler.get_next_pick_task("WH-A")["task"])
+        self.db.set_value.assert_not_called()
+
+
+class TestRequeueOnFulfillment(unittest.TestCase):
+
+    def test_removed_rows_are_requeued_too(self):
+        callbacks = []
+        previous = frappe._dict(warehouse_pick_tasks=[frappe._dict(name="WPT-1"), frappe._dict(name="WPT-2")])
+        doc = frappe._dict(warehouse_pick_tasks=[frappe._dict(name="WPT-1")], get_doc_before_save=lambda: previous)
+
+        db = types.SimpleNamespace(after_commit=types.SimpleNamespace(add=callbacks.append))
+        with patch.object(frappe, "db", db, create=True), \
+                patch.object(pick_scheduler, "requeue_tasks") as requeue_tasks:
+            pick_scheduler.queue_task_requeue(doc, "on_update")
+            requeue_tasks.assert_not_called()
+            callbacks[0]()
+
+        requeue_tasks.assert_called_once_with(["WPT-1", "WPT-2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import asyncio
+import unittest
+from unittest.mock import MagicMock, patch
+
+import frappe
+
+from amb_w_spc.shop_floor_control import polling_engine
+from amb_w_spc.shop_floor_control.connectivity import new_attempt
+from amb_w_spc.shop_floor_control.polling_engine import PollingEngine
+
+
+class TestStationStatus(unittest.TestCase):
+    """Station status is derived per station from all of its sensors' attempts"""
+
+    def setUp(self):
+        self.engine = PollingEngine()
+        self.engine.station_status = {"ST-1": "Online", "ST-2": "Online", "ST-3": "Error"}
+
+    def test_one_answering_sensor_keeps_station_online(self):
+        changes = self.engine.get_station_status_changes([
+            new_attempt("ST-1", "S-1", "timeout"),
+            new_attempt("ST-1", "S-2", "ok"),
+            new_attempt("ST-2", "S-3", "unreachable"),
+            new_attempt("ST-2", "S-4", "timeout"),
+            new_attempt("ST-3", "S-5", "no_data"),
+        ])
+        self.assertEqual(changes, {"ST-2": "Error"})
+
+    def test_changes_are_written_in_one_commit_and_remembered_after_it(self):
+        self.engine.attempts = [new_attempt("ST-2", "S-3", "timeout"), new_attempt("ST-3", "S-5", "ok")]
+        db = MagicMock()
+        with patch.object(frappe, "db", db, create=True), \
+                patch.object(polling_engine, "record_attempts"), \
+                patch.object(polling_engine, "set_station_communication_status") as set_status:
+            self.engine.flush()
+
+        self.assertEqual(sorted(call.args for call in set_status.call_args_list),
+                         [("ST-2", "Error"), ("ST-3", "Online")])
+        db.commit.assert_called_once_with()
+        self.assertEqual(self.engine.station_status, {"ST-1": "Online", "ST-2": "Error", "ST-3": "Online"})
+
+    def test_failed_write_is_retried(self):
+        self.engine.attempts = [new_attempt("ST-2", "S-3", "timeout")]
+        db = MagicMock()
+        db.commit.side_effect = Exception("lock wait timeout")
+        with patch.object(frappe, "db", db, create=True), \
+                patch.object(frappe, "log_error", create=True), \
+                patch.object(polling_engine, "record_attempts"), \
+                patch.object(polling_engine, "set_station_communication_status"):
+            self.engine.flush()
+
+        db.rollback.assert_called_once_with()
+        self.assertEqual(self.engine.station_status["ST-2"], "Online")
+
+
+class TestPollScheduling(unittest.TestCase):
+    """A sensor is never polled again while its previous poll is still running"""
+
+    def test_slow_sensor_is_not_polled_concurrently(self):
+        engine = PollingEngine(lifetime=0.3, flush_interval=10, refresh_interval=10)
+        sensor = frappe._dict(name="S-1", station="ST-1", polling_interval=10)
+        running, started = [], []
+
+        async def slow_poll(sensor):
+            running.append(sensor.name)
+            started.append(sensor.name)
+            self.assertEqual(running.count(sensor.name), 1)
+            await asyncio.sleep(0.1)
+            running.remove(sensor.name)
+
+        def load_configuration():
+            engine.sensors = {"S-1": sensor}
+
+        with patch.object(engine, "load_configuration", side_effect=load_configuration), \
+                patch.object(engine, "poll_sensor", side_effect=slow_poll), \
+                patch.object(engine, "flush"):
+            asyncio.run(engine.run())
+
+        # Due every 10 ms for 300 ms, but each poll takes 100 ms
+        self.assertGreaterEqual(len(started), 2)
+        self.assertLessEqual(len(started), 4)
+        self.assertEqual(engine.polling, {})
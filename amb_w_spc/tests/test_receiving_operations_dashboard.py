@@ -0,0 +1,31 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import unittest
+
+from amb_w_spc.sfc_manufacturing.report.receiving_operations_dashboard.receiving_operations_dashboard import (
+    get_completion,
+    get_conditions,
+)
+
+
+class TestReceivingOperationsDashboard(unittest.TestCase):
+    """Filter handling and completion figures"""
+
+    def test_filter_values_are_bound(self):
+        conditions, values = get_conditions({"supplier": "O'Brien Farms", "from_date": "2025-01-01"})
+        self.assertNotIn("O'Brien", conditions)
+        self.assertIn("pr.supplier = %(supplier)s", conditions)
+        self.assertEqual(values, {"supplier": "O'Brien Farms", "from_date": "2025-01-01"})
+
+    def test_only_submitted_without_filters(self):
+        self.assertEqual(get_conditions({}), ("pr.docstatus = 1", {}))
+
+    def test_completion(self):
+        self.assertEqual(get_completion((4, 3)), 75)
+        self.assertEqual(get_completion((2, None)), 0)
+        self.assertEqual(get_completion(None), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import statistics
+import unittest
+from datetime import datetime
+
+from amb_w_spc.sensor_management.rollups import aggregate_readings, choose_resolution, get_bucket_start, get_std_dev
+
+
+def reading(value, minute=0, second=0, status="Normal"):
+    return {"sensor": "S-1", "station": "ST-1", "parameter_name": "Temperature", "value": value,
+            "status": status, "timestamp": datetime(2025, 3, 1, 8, minute, second)}
+
+
+class TestRollups(unittest.TestCase):
+    """Bucket aggregates for Real Time Process Data"""
+
+    def test_bucket_start(self):
+        self.assertEqual(get_bucket_start("2025-03-01 08:44:59", 15 * 60), datetime(2025, 3, 1, 8, 30))
+        self.assertEqual(get_bucket_start("2025-03-01 08:44:59", 60), datetime(2025, 3, 1, 8, 44))
+
+    def test_aggregates_match_full_recomputation(self):
+        values = [20.0 + ((i * 7) % 11) * 0.25 for i in range(40)]
+        buckets = aggregate_readings([reading(value, minute=i % 4, second=i) for i, value in enumerate(values)])
+
+        hour = buckets[("S-1", "Temperature", "1h", datetime(2025, 3, 1, 8))]
+        self.assertEqual(hour["sample_count"], 40)
+        self.assertAlmostEqual(hour["mean_value"], statistics.mean(values))
+        self.assertAlmostEqual(get_std_dev(hour["sample_count"], hour["value_m2"]), statistics.stdev(values))
+        self.assertEqual((hour["min_value"], hour["max_value"]), (min(values), max(values)))
+
+    def test_large_values_keep_their_spread(self):
+        # Sums of squares of values this large lose the spread entirely
+        values = [1e9 + offset for offset in (0.1, 0.2, 0.3, 0.4)]
+        bucket = aggregate_readings([reading(value) for value in values])[("S-1", "Temperature", "1m", datetime(2025, 3, 1, 8))]
+        self.assertAlmostEqual(get_std_dev(bucket["sample_count"], bucket["value_m2"]), statistics.stdev(values), places=5)
+
+    def test_out_of_spec_count(self):
+        buckets = aggregate_readings([reading(1.0), reading(2.0, status="Alarm"), reading(3.0, status="Warning")])
+        self.assertEqual(buckets[("S-1", "Temperature", "1m", datetime(2025, 3, 1, 8))]["out_of_spec_count"], 2)
+
+    def test_choose_resolution(self):
+        self.assertIsNone(choose_resolution(1))
+        self.assertEqual(choose_resolution(24), "15m")
+        self.assertEqual(choose_resolution(24 * 7), "1h")
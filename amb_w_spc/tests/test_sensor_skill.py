@@ -0,0 +1,102 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+import frappe
+
+from amb_w_spc.api import sensor_skill
+
+
+def reading(index=0, serial="JAR0001261-1-C1-001", gross=120.0, tara_hint=None):
+    return frappe._dict(
+        index=index, barrel_serial=serial, gross_weight=gross, tara_weight=tara_hint,
+        event_time="2025-03-01 08:00:00", event_type="Weight Capture", device_id="SCALE-1",
+        unit="kg", client_event_id=None,
+        row=frappe._dict(name=f"ROW-{index}", parent="BATCH-1", tara_weight=10.0),
+        resolved_batch_name="BATCH-1",
+    )
+
+
+def locked_row(index=0, serial="JAR0001261-1-C1-001", tara=12.0):
+    return frappe._dict(name=f"ROW-{index}", parent="BATCH-1", barrel_serial_number=serial,
+                        packaging_type=None, gross_weight=0, tara_weight=tara, net_weight=0)
+
+
+class FakeWeightEvent(frappe._dict):
+    """Stands in for the Weight Event controller's validate()"""
+
+    __setattr__ = dict.__setitem__
+
+    def run_method(self, method):
+        if self.gross_weight > 500:
+            self.weight_range_status = "Alarm"
+        if not self.barrel_serial.startswith("JAR"):
+            frappe.throw("Invalid barrel serial format")
+
+
+class TestWeighing(unittest.TestCase):
+    """Tara and net weights come from the locked barrel row"""
+
+    def test_locked_tara_wins_over_the_cached_row(self):
+        item = reading()
+        self.assertIsNone(sensor_skill._weigh_reading(item, locked_row(tara=12.0)))
+        self.assertEqual((item.resolved_tara, item.resolved_net), (12.0, 108.0))
+
+    def test_tara_heavier_than_gross_is_rejected(self):
+        error = sensor_skill._weigh_reading(reading(gross=10.0), locked_row(tara=12.0))
+        self.assertEqual(error["code"], "invalid_net_weight")
+
+
+class TestWeightEventValidation(unittest.TestCase):
+    """Bulk-inserted Weight Events get the controller's validations"""
+
+    def setUp(self):
+        patcher = patch.object(frappe, "get_doc", lambda values: FakeWeightEvent(values), create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def validate(self, item):
+        sensor_skill._weigh_reading(item, locked_row())
+        return sensor_skill._validate_weight_event(item)
+
+    def test_valid_reading_passes(self):
+        item = reading()
+        self.assertIsNone(self.validate(item))
+        self.assertEqual(item.quality_status, "Pass")
+
+    def test_out_of_range_reading_is_held_for_review(self):
+        item = reading(gross=600.0)
+        self.assertIsNone(self.validate(item))
+        self.assertEqual(item.quality_status, "Pending Review")
+
+    def test_invalid_serial_is_rejected(self):
+        self.assertEqual(self.validate(reading(serial="BARREL-7"))["code"], "invalid_weight_event")
+
+
+class TestApplyReadings(unittest.TestCase):
+    """Readings that fail weighing or validation are answered and not written"""
+
+    def test_rejected_readings_are_not_written(self):
+        readings = [reading(0), reading(1, serial="BARREL-7")]
+        readings[1].row["name"] = "ROW-1"
+        db = MagicMock()
+        db.sql.return_value = [locked_row(0), locked_row(1, serial="BARREL-7")]
+        results = [None, None]
+
+        with patch.object(frappe, "db", db, create=True), \
+                patch.object(frappe, "get_doc", lambda values: FakeWeightEvent(values), create=True), \
+                patch.object(sensor_skill, "_update_barrel_rows") as update_rows, \
+                patch.object(sensor_skill, "_insert_weight_events") as insert_events, \
+                patch.object(sensor_skill, "_insert_process_data"):
+            sensor_skill._apply_readings(readings, results)
+
+        self.assertEqual([r["code"] for r in results], ["updated", "invalid_weight_event"])
+        self.assertEqual([r.index for r in insert_events.call_args.args[0]], [0])
+        self.assertEqual([row.name for row, _ in update_rows.call_args.args[0]], ["ROW-0"])
+        self.assertEqual(results[0]["tara_weight"], 12.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
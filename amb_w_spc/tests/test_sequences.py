@@ -0,0 +1,25 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import unittest
+
+from amb_w_spc.system_integration.sequences import MAX_KEY_LENGTH, get_series_key
+
+
+class TestSeriesKey(unittest.TestCase):
+    """Counter keys stored in tabSeries"""
+
+    def test_short_key_is_unchanged(self):
+        self.assertEqual(get_series_key("DEV-MAI-TEM-2025-"), "DEV-MAI-TEM-2025-")
+
+    def test_long_keys_fit_and_stay_distinct(self):
+        parent = "B" * 120
+        level2 = get_series_key(f"BATCH-AMB-LEVEL2-{parent}")
+        level3 = get_series_key(f"BATCH-AMB-LEVEL3-{parent}")
+        self.assertEqual(len(level2), MAX_KEY_LENGTH)
+        self.assertNotEqual(level2, level3)
+        self.assertEqual(level2, get_series_key(f"BATCH-AMB-LEVEL2-{parent}"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+import frappe
+
+from amb_w_spc.real_time_monitoring.page.shop_floor_dashboard import shop_floor_dashboard
+from amb_w_spc.shop_floor_control import connectivity
+
+
+class FakeCache:
+    def __init__(self):
+        self.values = {}
+
+    def get_value(self, key):
+        return self.values.get(key)
+
+    def set_value(self, key, value, expires_in_sec=None):
+        self.values[key] = value
+
+
+def station(name, **values):
+    data = frappe._dict(name=name, station_name=name, current_work_order=None, work_order_qty=None, produced_qty=None)
+    data.update(values)
+    return data
+
+
+class TestStationStatus(unittest.TestCase):
+    """Station figures come from one grouped query per source and are shared between viewers"""
+
+    def setUp(self):
+        self.db = MagicMock()
+        self.db.sql.side_effect = self.sql
+        self.cache = FakeCache()
+
+        for patcher in (
+            patch.object(frappe, "db", self.db, create=True),
+            patch.object(frappe, "cache", lambda: self.cache),
+            patch.object(shop_floor_dashboard, "get_connection_quality",
+                         return_value={"ST-1": 95.0, "ST-2": 0}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def sql(self, query, values=None, as_dict=False):
+        if "tabManufacturing Station" in query:
+            return [station("ST-1", current_work_order="WO-1", work_order_qty=200, produced_qty=50), station("ST-2")]
+        if "tabSensor Configuration" in query:
+            return [("ST-1", 4), ("ST-2", 1)]
+        return [("ST-2", 3)]
+
+    def test_counts_are_merged_per_station(self):
+        rows = {row.name: row for row in shop_floor_dashboard.build_station_status()}
+
+        self.assertEqual(self.db.sql.call_count, 3)
+        self.assertEqual((rows["ST-1"].sensor_count, rows["ST-1"].active_alerts), (4, 0))
+        self.assertEqual((rows["ST-2"].sensor_count, rows["ST-2"].active_alerts), (1, 3))
+        self.assertEqual(rows["ST-1"].production_progress, 25.0)
+        self.assertEqual((rows["ST-1"].connection_quality, rows["ST-2"].connection_quality), (95.0, 0))
+
+    def test_status_is_built_once_per_cache_window(self):
+        first = shop_floor_dashboard.get_station_status()
+        second = shop_floor_dashboard.get_station_status()
+
+        self.assertIs(first, second)
+        self.assertEqual(self.db.sql.call_count, 3)
+
+
+class TestConnectionQuality(unittest.TestCase):
+    """Connection quality is the share of poll attempts that got a reading"""
+
+    def test_success_ratio_over_the_window(self):
+        minutes = {"ST-1": [{"attempts": 6, "successful": 6}, {"attempts": 4, "successful": 1}]}
+        with patch.object(connectivity, "read_minute_counts", return_value=minutes):
+            self.assertEqual(connectivity.get_connection_quality(["ST-1", "ST-2"]), {"ST-1": 70.0, "ST-2": 0})
+
+
+if __name__ == "__main__":
+    unittest.main()
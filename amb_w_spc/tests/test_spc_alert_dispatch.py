@@ -0,0 +1,216 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import importlib
+import json
+import types
+import unittest
+from unittest.mock import patch
+
+import frappe
+
+from amb_w_spc import hooks
+from amb_w_spc.core_spc import spc_alert_dispatch, spc_control_rules, spc_rolling_statistics, spc_server_validations
+from amb_w_spc.core_spc.spc_control_rules import ControlRuleState
+from amb_w_spc.core_spc.spc_rolling_statistics import RollingStatistics
+
+
+class FakePipeline:
+    """The Redis commands the dispatcher issues, against a dict"""
+
+    def __init__(self, store):
+        self.store = store
+        self.results = []
+
+    def rpush(self, key, *values):
+        self.store.setdefault(key, []).extend(values)
+        self.results.append(len(self.store[key]))
+        return self
+
+    def lrange(self, key, start, end):
+        self.results.append(list(self.store.get(key, [])))
+        return self
+
+    def delete(self, key):
+        self.results.append(int(self.store.pop(key, None) is not None))
+        return self
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.store:
+            self.results.append(None)
+        else:
+            self.store[key] = value
+            self.results.append(True)
+        return self
+
+    def exists(self, key):
+        self.results.append(int(key in self.store))
+        return self
+
+    def hincrby(self, key, field, amount):
+        hash_ = self.store.setdefault(key, {})
+        hash_[field] = int(hash_.get(field, 0)) + amount
+        self.results.append(hash_[field])
+        return self
+
+    def hset(self, key, field, value):
+        self.store.setdefault(key, {})[field] = value
+        self.results.append(1)
+        return self
+
+    def hgetall(self, key):
+        self.results.append(dict(self.store.get(key, {})))
+        return self
+
+    def hdel(self, key, *fields):
+        for field in fields:
+            self.store.get(key, {}).pop(field, None)
+        self.results.append(len(fields))
+        return self
+
+    def execute(self):
+        results, self.results = self.results, []
+        return results
+
+
+class FakeCache:
+    def __init__(self):
+        self.store = {}
+
+    def make_key(self, key):
+        return f"site|{key}"
+
+    def pipeline(self):
+        return FakePipeline(self.store)
+
+
+def event(rule="Rule 1", chart="CHART-1"):
+    return {"chart": chart, "parameter": "PH", "rule": rule, "subject": f"PH {rule}", "message": rule}
+
+
+class TestAlertDispatch(unittest.TestCase):
+    """Alert events are queued on commit, deduplicated and coalesced per window"""
+
+    def setUp(self):
+        self.cache = FakeCache()
+        self.callbacks = []
+        self.delivered = []
+        db = types.SimpleNamespace(after_commit=types.SimpleNamespace(add=self.callbacks.append))
+
+        for patcher in (
+            patch.object(frappe, "db", db, create=True),
+            patch.object(frappe, "cache", lambda: self.cache),
+            patch.object(frappe, "enqueue", create=True),
+            patch.object(frappe, "safe_decode", lambda value: value, create=True),
+            patch.object(spc_alert_dispatch, "send_digests", side_effect=self.delivered.extend),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def queue(self, *events):
+        for item in events:
+            spc_alert_dispatch.queue_alert_event(item)
+        for callback in self.callbacks:
+            callback()
+        self.callbacks.clear()
+
+    def test_nothing_is_queued_before_commit(self):
+        spc_alert_dispatch.queue_alert_event(event())
+        self.assertEqual(self.cache.store, {})
+        frappe.enqueue.assert_not_called()
+
+    def test_burst_is_delivered_once(self):
+        self.queue(event(), event(), event(rule="Rule 2"))
+        self.assertEqual(spc_alert_dispatch.flush_alert_events(), 2)
+        self.assertEqual(sorted(len(group["events"]) for group in self.delivered), [1, 2])
+
+    def test_repeats_in_window_are_counted_then_summarised(self):
+        self.queue(event())
+        spc_alert_dispatch.flush_alert_events()
+
+        self.queue(event(), event())
+        self.assertEqual(spc_alert_dispatch.flush_alert_events(), 0)
+
+        # The window closes; the next flush reports the suppressed repeats
+        del self.cache.store[self.cache.make_key(f"{spc_alert_dispatch.SENT_KEY_PREFIX}:CHART-1|PH|Rule 1")]
+        self.assertEqual(spc_alert_dispatch.flush_alert_events(), 1)
+        self.assertEqual(self.delivered[-1]["suppressed"], 2)
+
+
+class TestEventRecipients(unittest.TestCase):
+
+    def test_chart_recipients(self):
+        rows = [frappe._dict(user="qa@example.com", notification_method="Both"),
+                frappe._dict(user="ops@example.com", notification_method="SMS")]
+        with patch.object(frappe, "get_all", return_value=rows, create=True) as get_all:
+            recipients = spc_alert_dispatch.get_event_recipients({"chart": "CHART-1"})
+
+        self.assertEqual(get_all.call_args.kwargs["fields"], ["user", "notification_method"])
+        self.assertEqual(recipients, [
+            {"user": "qa@example.com", "email": "qa@example.com", "system": True},
+            {"user": "ops@example.com", "email": None, "system": True},
+        ])
+
+    def test_alert_without_recipients_uses_plant_defaults(self):
+        defaults = [{"recipient": "qa@example.com", "notification_type": "Email"}]
+        with patch.object(frappe, "get_all", return_value=[], create=True), \
+                patch("amb_w_spc.system_integration.scripts.automation_scripts.get_default_alert_recipients",
+                      return_value=defaults):
+            recipients = spc_alert_dispatch.get_event_recipients({"alert": "ALERT-1", "plant": "P1"})
+
+        self.assertEqual(recipients, [{"user": "qa@example.com", "email": "qa@example.com", "system": False}])
+
+
+class FakeDataPoint(frappe._dict):
+    def is_new(self):
+        return not self.name
+
+    def set(self, fieldname, value):
+        self[fieldname] = value
+
+
+class TestSaveQueuesAlert(unittest.TestCase):
+    """An invalid point saved through the validate hook queues one event per alert chart"""
+
+    def setUp(self):
+        self.cache = FakeCache()
+        self.callbacks = []
+        db = types.SimpleNamespace(after_commit=types.SimpleNamespace(add=self.callbacks.append))
+
+        for patcher in (
+            patch.object(frappe, "db", db, create=True),
+            patch.object(frappe, "cache", lambda: self.cache),
+            patch.object(frappe, "enqueue", create=True),
+            patch.object(spc_rolling_statistics, "get_rolling_state", side_effect=lambda parameter: RollingStatistics()),
+            patch.object(spc_control_rules, "get_rule_state", return_value=ControlRuleState(7.0, 0.5)),
+            patch.object(spc_server_validations, "get_alert_charts", return_value=["CHART-1"]),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def save(self, measured_value):
+        doc = FakeDataPoint(parameter="PH", measured_value=measured_value, upper_spec_limit=8.0, lower_spec_limit=6.0)
+        module, _, method = hooks.doc_events["SPC Data Point"]["validate"].rpartition(".")
+        getattr(importlib.import_module(module), method)(doc, "validate")
+        return doc
+
+    def queued(self):
+        return [json.loads(item) for item in self.cache.store.get(self.cache.make_key(spc_alert_dispatch.EVENT_QUEUE_KEY), [])]
+
+    def test_invalid_point_is_queued_on_commit(self):
+        self.save(8.4)
+        self.assertEqual(self.queued(), [])
+
+        for callback in self.callbacks:
+            callback()
+
+        events = self.queued()
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["chart"], "CHART-1")
+        self.assertEqual(events[0]["rule"], "Above Upper Specification Limit")
+        frappe.enqueue.assert_called_once()
+
+    def test_valid_point_queues_nothing(self):
+        self.save(7.1)
+        self.assertEqual(self.callbacks, [])
+
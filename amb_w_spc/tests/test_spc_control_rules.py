@@ -0,0 +1,153 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import importlib
+import types
+import unittest
+from unittest.mock import patch
+
+import frappe
+
+from amb_w_spc import hooks
+from amb_w_spc.core_spc import spc_control_rules, spc_rolling_statistics, spc_server_validations
+from amb_w_spc.core_spc.spc_control_rules import ControlRuleState
+from amb_w_spc.core_spc.spc_rolling_statistics import RollingStatistics
+
+
+def run(values, center=10.0, sigma=1.0):
+    state = ControlRuleState(center, sigma)
+    return state, [state.push(value) for value in values]
+
+
+class TestControlRuleState(unittest.TestCase):
+    """Streaming Nelson rule evaluation"""
+
+    def test_point_beyond_three_sigma(self):
+        _state, results = run([10.0, 13.5, 10.0])
+        self.assertEqual(results[1], ([1], [1]))
+        self.assertEqual(results[2], ([], []))
+
+    def test_nine_points_same_side(self):
+        values = [10.5, 10.2, 10.6, 10.3, 10.4, 10.1, 10.7, 10.2, 10.3, 10.4]
+        _state, results = run(values)
+        self.assertNotIn(2, results[7][0])
+        self.assertEqual(results[8][1], [2])
+        # Still violated on the next point, but not a new transition
+        self.assertIn(2, results[9][0])
+        self.assertEqual(results[9][1], [])
+
+    def test_six_point_trend(self):
+        _state, results = run([9.0, 9.2, 9.4, 9.6, 9.8, 10.0])
+        self.assertNotIn(3, results[4][0])
+        self.assertIn(3, results[5][0])
+
+    def test_fourteen_points_alternating(self):
+        values = [10.2 if i % 2 else 9.8 for i in range(14)]
+        _state, results = run(values)
+        self.assertNotIn(4, results[12][0])
+        self.assertIn(4, results[13][0])
+
+    def test_two_of_three_beyond_two_sigma(self):
+        _state, results = run([12.5, 10.0, 12.2])
+        self.assertIn(5, results[2][0])
+
+    def test_fifteen_points_within_one_sigma(self):
+        values = [10.1 if i % 3 else 9.9 for i in range(15)]
+        _state, results = run(values)
+        self.assertIn(7, results[14][0])
+
+    def test_state_round_trip(self):
+        state, _results = run([10.5, 10.2, 10.6, 10.3])
+        restored = ControlRuleState.from_dict(state.as_dict())
+        self.assertEqual(restored.push(10.4), state.push(10.4))
+
+    def test_reference_change_resets_runs(self):
+        state, _results = run([10.5] * 8)
+        state.set_reference(20.0, 1.0)
+        self.assertEqual(state.side_run, 0)
+
+
+class TestRecordControlRules(unittest.TestCase):
+    """The cached state only advances once the inserting transaction commits"""
+
+    def setUp(self):
+        self.callbacks = []
+        db = types.SimpleNamespace(after_commit=types.SimpleNamespace(add=self.callbacks.append))
+        self.db = patch.object(frappe, "db", db, create=True)
+        self.db.start()
+        self.addCleanup(self.db.stop)
+
+        self.state = ControlRuleState(10.0, 1.0)
+        self.patches = [
+            patch.object(spc_control_rules, "get_rule_state", return_value=self.state),
+            patch.object(spc_control_rules, "create_rule_alert"),
+            patch.object(spc_control_rules, "advance_rule_state"),
+        ]
+        for patcher in self.patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_alert_in_transaction_state_after_commit(self):
+        doc = frappe._dict(name="DP-1", parameter="PH", measured_value=14.0,
+                           upper_control_limit=None, lower_control_limit=None)
+        spc_control_rules.record_control_rules(doc)
+
+        spc_control_rules.create_rule_alert.assert_called_once_with(doc, [1])
+        spc_control_rules.advance_rule_state.assert_not_called()
+        self.assertEqual(self.state.as_dict(), ControlRuleState(10.0, 1.0).as_dict())
+
+        for callback in self.callbacks:
+            callback()
+        spc_control_rules.advance_rule_state.assert_called_once_with("PH", None, [14.0])
+
+    def test_batch_evaluation_leaves_state(self):
+        rows = [{"parameter": "PH", "measured_value": value, "timestamp": index}
+                for index, value in enumerate([10.5, 14.0])]
+        spc_control_rules.evaluate_rows(rows)
+
+        self.assertEqual([row["is_out_of_control"] for row in rows], [0, 1])
+        self.assertEqual([row["new_rules"] for row in rows], [[], [1]])
+        self.assertEqual(self.callbacks, [])
+        self.assertEqual(self.state.as_dict(), ControlRuleState(10.0, 1.0).as_dict())
+
+
+class FakeDataPoint(frappe._dict):
+    def is_new(self):
+        return not self.name
+
+    def set(self, fieldname, value):
+        self[fieldname] = value
+
+
+class TestValidateHook(unittest.TestCase):
+    """Saving a new point flags its Nelson rule violations"""
+
+    def setUp(self):
+        self.state = ControlRuleState(10.0, 1.0)
+        for patcher in (
+            patch.object(spc_rolling_statistics, "get_rolling_state", side_effect=lambda parameter: RollingStatistics()),
+            patch.object(spc_control_rules, "get_rule_state", return_value=self.state),
+            patch.object(spc_server_validations, "check_spc_alerts"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def validate(self, measured_value):
+        doc = FakeDataPoint(parameter="PH", measured_value=measured_value)
+        module, _, method = hooks.doc_events["SPC Data Point"]["validate"].rpartition(".")
+        getattr(importlib.import_module(module), method)(doc, "validate")
+        return doc
+
+    def test_violation_is_flagged(self):
+        doc = self.validate(14.0)
+
+        self.assertEqual(doc.is_out_of_control, 1)
+        self.assertEqual(doc.violation_rules, spc_control_rules.format_violations([1]))
+        self.assertEqual(self.state.as_dict(), ControlRuleState(10.0, 1.0).as_dict())
+
+    def test_point_in_control(self):
+        doc = self.validate(10.2)
+
+        self.assertEqual(doc.is_out_of_control, 0)
+        self.assertIsNone(doc.violation_rules)
+
@@ -0,0 +1,140 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import importlib
+import statistics
+import types
+import unittest
+from unittest.mock import patch
+
+import frappe
+
+from amb_w_spc import hooks
+from amb_w_spc.core_spc import spc_rolling_statistics, spc_server_validations
+from amb_w_spc.core_spc.spc_rolling_statistics import RollingStatistics
+
+
+class FakeDataPoint(frappe._dict):
+    def is_new(self):
+        return not self.name
+
+    def set(self, fieldname, value):
+        self[fieldname] = value
+
+
+def run_validate_hook(doc):
+    """Run the SPC Data Point validate hook registered in hooks.py"""
+    module, _, method = hooks.doc_events["SPC Data Point"]["validate"].rpartition(".")
+    getattr(importlib.import_module(module), method)(doc, "validate")
+
+
+class TestRollingStatistics(unittest.TestCase):
+    """Incremental window statistics must match a full recomputation"""
+
+    def test_matches_full_recomputation(self):
+        values = [10.0 + ((i * 7) % 11) * 0.13 for i in range(75)]
+        state = RollingStatistics(window_size=30)
+
+        for i, value in enumerate(values):
+            state.push(value)
+            window = values[max(0, i - 29):i + 1]
+
+            self.assertEqual(state.values(), window)
+            self.assertAlmostEqual(state.mean, statistics.mean(window), places=9)
+            if len(window) >= 2:
+                self.assertAlmostEqual(state.stdev(), statistics.stdev(window), places=9)
+
+    def test_summary_fields(self):
+        state = RollingStatistics(window_size=30)
+        for value in [1.0, 4.0, 2.0, 8.0, 5.0, 3.0]:
+            state.push(value)
+
+        summary = state.summary()
+        self.assertAlmostEqual(summary["x_bar"], statistics.mean([1.0, 4.0, 2.0, 8.0, 5.0, 3.0]))
+        self.assertEqual(summary["r_value"], 8.0 - 2.0)  # last five values
+        self.assertEqual(summary["moving_range"], 2.0)
+
+    def test_summary_requires_two_points(self):
+        state = RollingStatistics()
+        state.push(3.0)
+        self.assertEqual(state.summary(), {})
+
+    def test_round_trip_preserves_order(self):
+        state = RollingStatistics(window_size=5)
+        for value in range(12):
+            state.push(value)
+
+        restored = RollingStatistics.from_dict(state.as_dict())
+        self.assertEqual(restored.values(), [7.0, 8.0, 9.0, 10.0, 11.0])
+
+        restored.push(12)
+        self.assertEqual(restored.values(), [8.0, 9.0, 10.0, 11.0, 12.0])
+        self.assertAlmostEqual(restored.mean, 10.0)
+
+
+class TestDataPointHooks(unittest.TestCase):
+    """The cached window only moves once the inserting transaction commits"""
+
+    def setUp(self):
+        self.callbacks = []
+        db = types.SimpleNamespace(after_commit=types.SimpleNamespace(add=self.callbacks.append))
+        self.db = patch.object(frappe, "db", db, create=True)
+        self.db.start()
+        self.addCleanup(self.db.stop)
+
+    def test_insert_is_pushed_after_commit(self):
+        doc = frappe._dict(parameter="PH", status="Valid", measured_value=7.1)
+        with patch.object(spc_rolling_statistics, "record_values") as record_values:
+            spc_rolling_statistics.record_data_point(doc)
+            record_values.assert_not_called()
+
+            for callback in self.callbacks:
+                callback()
+            record_values.assert_called_once_with("PH", [7.1])
+
+    def test_invalid_point_is_not_pushed(self):
+        spc_rolling_statistics.record_data_point(frappe._dict(parameter="PH", status="Invalid", measured_value=7.1))
+        self.assertEqual(self.callbacks, [])
+
+    def test_edit_invalidates_after_commit(self):
+        doc = frappe._dict(parameter="PH", flags=frappe._dict(in_insert=False))
+        with patch.object(spc_rolling_statistics, "invalidate_rolling_state") as invalidate:
+            spc_rolling_statistics.refresh_data_point_window(doc)
+            invalidate.assert_not_called()
+
+            for callback in self.callbacks:
+                callback()
+            invalidate.assert_called_once_with("PH")
+
+
+class TestValidateHook(unittest.TestCase):
+    """Saving a new point fills its statistics from the cached window"""
+
+    def setUp(self):
+        self.window = [7.0, 7.4, 6.8, 7.2, 7.1]
+        state = RollingStatistics()
+        for value in self.window:
+            state.push(value)
+
+        for patcher in (
+            patch.object(spc_rolling_statistics, "get_rolling_state", return_value=state),
+            patch.object(spc_server_validations, "evaluate_control_rules"),
+            patch.object(spc_server_validations, "check_spc_alerts"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_statistics_through_hook(self):
+        doc = FakeDataPoint(parameter="PH", measured_value=7.5)
+        run_validate_hook(doc)
+
+        values = self.window + [7.5]
+        self.assertAlmostEqual(doc.x_bar, statistics.mean(values))
+        self.assertAlmostEqual(doc.r_value, max(values[-5:]) - min(values[-5:]))
+        self.assertAlmostEqual(doc.moving_range, abs(7.5 - 7.1))
+        self.assertAlmostEqual(doc.standard_deviation, statistics.stdev(values))
+        self.assertEqual(doc.status, "Valid")
+
+        # The cached window itself is untouched until the point commits
+        self.assertEqual(spc_rolling_statistics.get_rolling_state("PH").values(), self.window)
+
@@ -0,0 +1,93 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import asyncio
+import importlib
+import unittest
+from unittest.mock import patch
+
+from amb_w_spc import hooks
+from amb_w_spc.core_spc import spc_alert_dispatch
+from amb_w_spc.fda_compliance import audit_trail
+from amb_w_spc.sfc_manufacturing.warehouse_management import scheduler
+from amb_w_spc.shop_floor_control import connectivity
+from amb_w_spc.shop_floor_control.connectivity import (
+    classify_error,
+    get_attempt_counters,
+    get_percentile,
+    new_attempt,
+    summarize_minutes,
+)
+
+
+class TestStationConnectivity(unittest.TestCase):
+    """Attempt counters and the metrics derived from them"""
+
+    def test_counters_per_minute_and_station(self):
+        counters = get_attempt_counters([
+            new_attempt("ST-1", "S-1", "ok", 12, 8, timestamp=120),
+            new_attempt("ST-1", "S-2", "timeout", 5000, error_class="TimeoutError", timestamp=130),
+            new_attempt("ST-1", "S-1", "ok", 40, 8, timestamp=190),
+        ])
+        first = counters[(2, "ST-1")]
+        self.assertEqual(first["attempts"], 2)
+        self.assertEqual(first["successful"], 1)
+        self.assertEqual(first["le:25"], 1)
+        self.assertEqual(first["error:TimeoutError"], 1)
+        self.assertEqual(counters[(3, "ST-1")]["le:50"], 1)
+
+    def test_slow_station_is_up_with_high_p95(self):
+        minutes = [{"attempts": 10, "successful": 10, "latency_ms_sum": 20000, "le:2500": 10}] * 3
+        summary = summarize_minutes(minutes)
+        self.assertEqual(summary["uptime_percentage"], 100)
+        self.assertEqual(summary["error_rate"], 0)
+        self.assertEqual(summary["p95_latency_ms"], 2500)
+
+    def test_dead_station_has_no_latency(self):
+        summary = summarize_minutes([{"attempts": 5, "outcome:unreachable": 5}, {"attempts": 5, "outcome:unreachable": 5}])
+        self.assertEqual(summary["uptime_percentage"], 0)
+        self.assertEqual(summary["error_rate"], 100)
+        self.assertIsNone(summary["p95_latency_ms"])
+        self.assertEqual(summary["outcomes"], {"unreachable": 10})
+
+    def test_percentile_bucket(self):
+        self.assertEqual(get_percentile({"10": 95, "500": 5}, 95), 10)
+        self.assertEqual(get_percentile({"10": 94, "500": 6}, 95), 500)
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+class TestClassifyError(unittest.TestCase):
+    """Failed attempts are classified by their cause"""
+
+    def test_asyncio_timeout(self):
+        self.assertEqual(classify_error(asyncio.TimeoutError())[0], "timeout")
+
+    def test_wrapped_connection_error(self):
+        try:
+            try:
+                raise ConnectionRefusedError()
+            except ConnectionRefusedError as e:
+                raise RuntimeError("poll failed") from e
+        except RuntimeError as e:
+            self.assertEqual(classify_error(e), ("unreachable", "ConnectionRefusedError"))
+
+
+class TestHourlyCompaction(unittest.TestCase):
+    """The registered hourly job compacts closed hours of telemetry"""
+
+    def test_hourly_job_compacts(self):
+        with patch.object(spc_alert_dispatch, "flush_alert_events"), \
+                patch.object(audit_trail, "write_audit_trail"), \
+                patch.object(scheduler, "update_warehouse_dashboard_cache"), \
+                patch.object(connectivity, "compact_connectivity") as compact_connectivity:
+            path = "amb_w_spc.system_integration.scripts.automation_scripts.hourly_spc_checks"
+            self.assertIn(path, hooks.scheduler_events["hourly"])
+
+            module, _, method = path.rpartition(".")
+            getattr(importlib.import_module(module), method)()
+
+        compact_connectivity.assert_called_once_with()
+
@@ -0,0 +1,77 @@
+# Copyright (c) 2025, MiniMax Agent and contributors
+# For license information, please see license.txt
+
+import types
+import unittest
+from unittest.mock import MagicMock, patch
+
+import frappe
+
+from amb_w_spc.sfc_manufacturing.warehouse_management import traceability
+
+
+class FakeCache:
+    def __init__(self):
+        self.values = {}
+
+    def get_value(self, key):
+        return self.values.get(key)
+
+    def set_value(self, key, value, expires_in_sec=None):
+        self.values[key] = value
+
+
+class TestTraceability(unittest.TestCase):
+    """Graphs are cached per family and source version; plain ERPNext batches are traced too"""
+
+    def setUp(self):
+        self.cache = FakeCache()
+        self.callbacks = []
+        self.db = MagicMock()
+        self.db.after_commit = types.SimpleNamespace(add=self.callbacks.append)
+        self.db.exists.side_effect = lambda doctype, name: doctype == "Batch" and name == "ERP-7"
+        self.db.get_value.return_value = None
+        self.db.sql.return_value = [frappe._dict(batch_no="ERP-7", delivery_note="DN-1", customer="CUST-1",
+                                                 customer_name="Customer", shipping_date="2025-03-01",
+                                                 item_code="ALOE", qty=40.0)]
+
+        for patcher in (
+            patch.object(frappe, "db", self.db, create=True),
+            patch.object(frappe, "cache", lambda: self.cache),
+            patch.object(frappe, "get_all", return_value=[frappe._dict(
+                batch_no="ERP-7", delivery_note="DN-2", customer="CUST-2", shipping_date="2025-03-02",
+                item_code="ALOE", shipped_qty=10.0)], create=True),
+            patch.object(frappe, "generate_hash", side_effect=["token-1", "token-2"], create=True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_erpnext_batch_without_batch_amb_is_traced_by_its_shipments(self):
+        graph = traceability.get_traceability_graph("ERP-7")
+
+        self.assertEqual((graph["batch"], graph["root"]), ("ERP-7", None))
+        self.assertEqual(graph["blast_radius"]["customers"], 2)
+        self.assertEqual(graph["blast_radius"]["shipped_qty"], 50.0)
+        self.assertIn(("ERP-7", "DN-2", "shipped"), graph["edges"])
+
+    def test_unknown_batch_is_rejected(self):
+        with self.assertRaises(frappe.ValidationError):
+            traceability.get_traceability_graph("NOPE")
+
+    def test_submitted_shipments_rotate_the_cached_graph_after_commit(self):
+        traceability.get_traceability_graph("ERP-7")
+        queries = self.db.sql.call_count
+        traceability.get_traceability_graph("ERP-7")
+        self.assertEqual(self.db.sql.call_count, queries)
+
+        traceability.clear_traceability_cache()
+        self.assertIsNone(self.cache.get_value(traceability.SOURCE_VERSION_KEY))
+        for callback in self.callbacks:
+            callback()
+
+        traceability.get_traceability_graph("ERP-7")
+        self.assertGreater(self.db.sql.call_count, queries)
+
+
+if __name__ == "__main__":
+    unittest.main()